@@ -248,6 +248,7 @@ async def lifespan(app: FastAPI):
                     gateway_token=openclaw_status.gateway_token,
                     hooks_token=openclaw_status.hooks_token,
                     hooks_path=getattr(openclaw_status, "hooks_path", "/hooks"),
+                    events_path=getattr(config.openclaw, "events_path", None) if hasattr(config, "openclaw") else None,
                     timeout=120,
                 )
                 logger.info(f"OpenClaw 配置: {openclaw_config.gateway_url}")
@@ -269,6 +270,7 @@ async def lifespan(app: FastAPI):
                     hooks_path=getattr(config.openclaw, "hooks_path", "/hooks")
                     if hasattr(config, "openclaw")
                     else "/hooks",
+                    events_path=getattr(config.openclaw, "events_path", None) if hasattr(config, "openclaw") else None,
                     timeout=120,
                 )
                 logger.info(f"OpenClaw 未检测到安装，使用配置文件: {openclaw_config.gateway_url}")
@@ -324,6 +326,20 @@ async def lifespan(app: FastAPI):
             logger.warning(f"[DogTag] 军牌系统初始化失败（可选功能）: {e}")
             Modules.dogtag_scheduler = None
 
+        # 同进程的 api_server / mcp_server 直接调用以下内部接口，无需经过 HTTP
+        from system.service_transport import get_service_transport
+
+        get_service_transport().register("agent_server", {
+            ("GET", "/openclaw/health"): lambda body: openclaw_health_check(),
+            ("POST", "/openclaw/send"): openclaw_send_message,
+            ("POST", "/openclaw/tools/invoke"): openclaw_invoke_tool,
+            ("POST", "/openclaw/gateway/start"): lambda body: openclaw_start_gateway(),
+            ("POST", "/proactive_vision/activity"): lambda body: update_user_activity(),
+            ("POST", "/proactive_vision/reset_timer"): reset_proactive_vision_timer,
+            ("POST", "/dogtag/conversation_event"): dogtag_conversation_event,
+            ("POST", "/travel/execute"): travel_execute,
+        })
+
         logger.info("NagaAgent服务初始化完成")
 
         # 执行启动时健康检查（延迟2秒等待所有服务就绪）
@@ -338,6 +354,13 @@ async def lifespan(app: FastAPI):
 
     # shutdown
     try:
+        from system.service_transport import get_service_transport
+        get_service_transport().unregister("agent_server")
+
+        # 停止健康检查后台刷新
+        from system.health_check import get_health_checker
+        await get_health_checker().stop_background_refresh()
+
         # 停止军牌系统
         if Modules.dogtag_scheduler:
             await Modules.dogtag_scheduler.stop()
@@ -423,28 +446,38 @@ async def health_check():
 
 
 @app.get("/health/full")
-async def full_health_check():
-    """完整健康检查（包括所有服务）"""
+async def full_health_check(fresh: bool = False, deadline: Optional[float] = None):
+    """完整健康检查（包括所有服务）；默认读取缓存，fresh=true 时强制重新探测"""
     from system.health_check import get_health_checker
 
     checker = get_health_checker()
-    results = await checker.check_all()
+    results = await checker.check_all(deadline=deadline, use_cache=not fresh)
     summary = checker.get_summary(results)
 
-    # 转换为可序列化格式
-    results_dict = {}
-    for service_name, result in results.items():
-        results_dict[service_name] = {
-            "status": result.status.value,
-            "message": result.message,
-            "checks": result.checks,
-            "details": result.details,
-            "latency_ms": result.latency_ms,
-        }
-
     return {
         "summary": summary,
-        "services": results_dict,
+        "services": {service_name: result.to_dict() for service_name, result in results.items()},
+        "timestamp": _now_iso(),
+    }
+
+
+@app.get("/health/ready")
+async def readiness_check(budget_ms: float = 50):
+    """就绪检查：在延迟预算内基于缓存的探测结果作答"""
+    from system.health_check import get_health_checker
+
+    readiness = await get_health_checker().readiness(budget=max(budget_ms, 0) / 1000)
+    readiness["timestamp"] = _now_iso()
+    return readiness
+
+
+@app.get("/health/history")
+async def health_history():
+    """各探测的耗时历史"""
+    from system.health_check import get_health_checker
+
+    return {
+        "history": get_health_checker().get_latency_history(),
         "timestamp": _now_iso(),
     }
 
@@ -484,6 +517,7 @@ async def configure_openclaw(payload: Dict[str, Any]):
             gateway_url=payload.get("gateway_url", "http://localhost:18789"),
             token=payload.get("token"),
             hooks_path=payload.get("hooks_path", "/hooks"),
+            events_path=payload.get("events_path"),
             timeout=payload.get("timeout", 120),
             default_model=payload.get("default_model"),
             default_channel=payload.get("default_channel", "last"),
@@ -587,22 +621,10 @@ async def openclaw_wake(payload: Dict[str, Any]):
 
 # ============ 本地搜索代理（拦截 OpenClaw web_search） ============
 
-_search_http_client: Optional["httpx.AsyncClient"] = None
-
-
-def _get_search_client() -> "httpx.AsyncClient":
-    """搜索代理共享 httpx 客户端"""
-    import httpx
-
-    global _search_http_client
-    if _search_http_client is None or _search_http_client.is_closed:
-        _search_http_client = httpx.AsyncClient(timeout=30.0, proxy=None)
-    return _search_http_client
-
-
 async def _local_search_proxy(args: Dict[str, Any]) -> Dict[str, Any]:
     """
     本地搜索代理：拦截 web_search 请求，走 Naga 或 Brave，不转发给 OpenClaw。
+    与 api_server 的 web_search 共用搜索缓存。
     返回 MCP 工具结果格式 { success, result: { content: [...] } }
     """
     query = args.get("query", "") or args.get("q", "")
@@ -613,71 +635,26 @@ async def _local_search_proxy(args: Dict[str, Any]) -> Dict[str, Any]:
         return {"success": False, "error": "缺少搜索关键词 (query)"}
 
     try:
-        # 优先级1: 已登录 Naga → NagaBusiness 搜索代理
-        from apiserver import naga_auth
-
-        if naga_auth.is_authenticated():
-            token = naga_auth.get_access_token()
-            params: Dict[str, Any] = {"q": query, "count": count}
-            if freshness:
-                params["freshness"] = freshness
-            client = _get_search_client()
-            resp = await client.post(
-                naga_auth.NAGA_MODEL_URL + "/tools/search",
-                json=params,
-                headers={"Authorization": f"Bearer {token}"},
-            )
-            source = "naga"
-        else:
-            # 优先级2: 配置了 search_api_key → 直接调 Brave
-            api_key = config.online_search.search_api_key
-            if not api_key:
-                return {"success": False, "error": "未登录且未配置 search_api_key，无法搜索"}
-            api_base = config.online_search.search_api_base
-            params = {"q": query, "count": count}
-            if freshness:
-                params["freshness"] = freshness
-            client = _get_search_client()
-            resp = await client.get(
-                api_base,
-                params=params,
-                headers={"Accept": "application/json", "X-Subscription-Token": api_key},
-            )
-            source = "brave"
+        from apiserver.web_search import SearchError, get_web_search
 
-        if resp.status_code != 200:
-            try:
-                err = resp.json()
-                msg = err.get("error", {}).get("message", "") if isinstance(err.get("error"), dict) else str(err)
-            except Exception:
-                msg = f"HTTP {resp.status_code}"
-            logger.warning(f"[搜索代理] {source} 搜索失败: {msg}")
-            return {"success": False, "error": f"搜索失败: {msg}"}
+        web_search = get_web_search()
+        # 优先级1: 已登录 Naga → NagaBusiness 搜索代理；优先级2: 配置了 search_api_key → 直接调 Brave
+        source = web_search.default_provider()
+        if source is None:
+            return {"success": False, "error": "未登录且未配置 search_api_key，无法搜索"}
 
-        data = resp.json()
-        results = data.get("web", {}).get("results", [])
+        try:
+            result = await web_search.search(source, query, count=count, freshness=freshness)
+        except SearchError as e:
+            logger.warning(f"[搜索代理] {source} 搜索失败: {e}")
+            return {"success": False, "error": f"搜索失败: {e}"}
 
-        # 格式化为可读文本
-        if not results:
-            text = "未找到相关搜索结果。"
-        else:
-            lines = []
-            for i, r in enumerate(results, 1):
-                lines.append(f"{i}. {r.get('title', '')}")
-                lines.append(f"   URL: {r.get('url', '')}")
-                if r.get("description"):
-                    lines.append(f"   摘要: {r['description']}")
-                if r.get("age"):
-                    lines.append(f"   时间: {r['age']}")
-                lines.append("")
-            text = "\n".join(lines)
-
-        logger.info(f"[搜索代理] {source} 搜索完成: query=\"{query}\", 结果数={len(results)}")
+        logger.info(f"[搜索代理] {source} 搜索完成: query=\"{query}\", 结果数={len(result.top(count))}")
 
         # 返回 MCP 工具结果格式
         return {
             "success": True,
-            "result": {"content": [{"type": "text", "text": text}]},
+            "result": {"content": [{"type": "text", "text": result.text(count)}]},
         }
 
     except Exception as e:
@@ -1868,10 +1845,7 @@ async def get_heartbeat_status():
         if Modules.dogtag_scheduler:
             registry = get_dogtag_registry()
             tag = registry.get("heartbeat")
-            countdown_active = (
-                "heartbeat" in Modules.dogtag_scheduler._event_countdowns
-                and not Modules.dogtag_scheduler._event_countdowns["heartbeat"].done()
-            )
+            countdown_active = Modules.dogtag_scheduler.is_countdown_active("heartbeat")
             status["running"] = Modules.dogtag_scheduler._running
             status["conversation_active"] = Modules.dogtag_scheduler._conversation_active
             status["countdown_active"] = countdown_active
@@ -1987,6 +1961,25 @@ async def get_dogtag_status():
         raise HTTPException(500, f"获取失败: {e}")
 
 
+@app.get("/dogtag/metrics")
+async def get_dogtag_metrics():
+    """获取军牌调度器指标（调度延迟、运行耗时、跳过与错过触发）"""
+    if not Modules.dogtag_scheduler:
+        return {"success": True, "running": False, "message": "调度器未初始化"}
+    return {"success": True, "metrics": Modules.dogtag_scheduler.metrics.get_all_metrics()}
+
+
+@app.get("/dogtag/metrics/prometheus")
+async def get_dogtag_metrics_prometheus():
+    """获取Prometheus格式的军牌调度器指标"""
+    from fastapi.responses import PlainTextResponse
+
+    if not Modules.dogtag_scheduler:
+        raise HTTPException(503, "军牌调度器未初始化")
+    prometheus_text = Modules.dogtag_scheduler.metrics.get_prometheus_format()
+    return PlainTextResponse(content=prometheus_text, media_type="text/plain; version=0.0.4")
+
+
 @app.get("/dogtag/duties")
 async def get_dogtag_duties():
     """获取所有注册的职责列表"""
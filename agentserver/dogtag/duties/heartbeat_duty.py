@@ -195,13 +195,11 @@ class HeartbeatExecutor:
     async def _notify_ui(self, response: str):
         """推送心跳结果：通过 api_server /queue/push 统一路由"""
         try:
-            from system.config import get_server_port
+            from system.service_transport import get_service_transport
 
-            api_port = get_server_port("api_server")
-            client = self._get_http_client()
-            resp = await client.post(
-                f"http://localhost:{api_port}/queue/push",
-                json={"content": response, "source": "heartbeat"},
+            resp = await get_service_transport().post(
+                "api_server", "/queue/push",
+                json={"content": response, "source": "heartbeat"}, timeout=5.0,
             )
             if resp.status_code == 200:
                 result = resp.json()
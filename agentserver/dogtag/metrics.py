@@ -0,0 +1,146 @@
+"""
+军牌系统 (DogTag) — 调度器 Metrics
+
+按职责统计调度延迟（实际触发时间 - 计划触发时间）与运行耗时直方图、
+运行/失败/跳过/错过触发计数，以及调度循环的唤醒次数。
+输出格式与屏幕感知 metrics 一致（JSON + Prometheus 文本）。
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from .screen_vision.metrics import MetricCounter, MetricHistogram
+
+LAG_BUCKETS = [0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0]
+DURATION_BUCKETS = [0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0]
+
+# 跳过原因：条件不满足 / 达到并发上限 / 错过触发按 skip 策略放弃
+SKIP_REASONS = ("condition", "concurrency", "misfire")
+
+
+def _histogram_lines(histogram: MetricHistogram, labels: str) -> List[str]:
+    lines = [
+        f"{histogram.name}_sum{{{labels}}} {histogram.sum}",
+        f"{histogram.name}_count{{{labels}}} {histogram.count}",
+    ]
+    for bucket, count in histogram.bucket_counts.items():
+        lines.append(f'{histogram.name}_bucket{{{labels},le="{bucket}"}} {count}')
+    lines.append(f'{histogram.name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    return lines
+
+
+class DogTagMetrics:
+    """调度器指标收集器"""
+
+    def __init__(self):
+        self.wakeups = MetricCounter(
+            name="dogtag_scheduler_wakeups_total",
+            help="Total number of scheduler loop wakeups",
+        )
+        self.lag = defaultdict(lambda: MetricHistogram(
+            name="dogtag_schedule_lag_seconds",
+            help="Delay between planned and actual fire time",
+            buckets=list(LAG_BUCKETS),
+        ))
+        self.duration = defaultdict(lambda: MetricHistogram(
+            name="dogtag_run_duration_seconds",
+            help="Time spent running one duty",
+            buckets=list(DURATION_BUCKETS),
+        ))
+        self.runs = defaultdict(lambda: MetricCounter(
+            name="dogtag_runs_total",
+            help="Total number of duty runs",
+        ))
+        self.failures = defaultdict(lambda: MetricCounter(
+            name="dogtag_run_failures_total",
+            help="Total number of failed duty runs",
+        ))
+        self.misfires = defaultdict(lambda: MetricCounter(
+            name="dogtag_misfires_total",
+            help="Total number of fires delayed beyond the misfire grace period",
+        ))
+        self.skipped = defaultdict(lambda: MetricCounter(
+            name="dogtag_skipped_total",
+            help="Total number of fires skipped",
+        ))
+
+    def record_wakeup(self):
+        """记录一次调度循环唤醒"""
+        self.wakeups.inc()
+
+    def record_lag(self, duty_id: str, lag: float):
+        """记录调度延迟（秒）"""
+        self.lag[duty_id].observe(max(0.0, lag))
+
+    def record_run(self, duty_id: str, duration: float, success: bool):
+        """记录一次运行"""
+        self.runs[duty_id].inc()
+        self.duration[duty_id].observe(duration)
+        if not success:
+            self.failures[duty_id].inc()
+
+    def record_misfire(self, duty_id: str):
+        """记录一次错过触发"""
+        self.misfires[duty_id].inc()
+
+    def record_skip(self, duty_id: str, reason: str):
+        """记录一次跳过"""
+        self.skipped[(duty_id, reason)].inc()
+
+    def get_all_metrics(self) -> Dict[str, Any]:
+        """获取所有指标"""
+        duty_ids = sorted(set(self.lag) | set(self.duration) | set(self.runs)
+                          | set(self.misfires) | {duty_id for duty_id, _ in self.skipped})
+        duties = {}
+        for duty_id in duty_ids:
+            duties[duty_id] = {
+                "runs": self.runs[duty_id].get() if duty_id in self.runs else 0,
+                "failures": self.failures[duty_id].get() if duty_id in self.failures else 0,
+                "misfires": self.misfires[duty_id].get() if duty_id in self.misfires else 0,
+                "skipped": {
+                    reason: self.skipped[(duty_id, reason)].get()
+                    for reason in SKIP_REASONS
+                    if (duty_id, reason) in self.skipped
+                },
+                "lag": self.lag[duty_id].get_stats() if duty_id in self.lag else None,
+                "duration": self.duration[duty_id].get_stats() if duty_id in self.duration else None,
+            }
+        return {
+            "counters": {"wakeups": self.wakeups.get()},
+            "duties": duties,
+        }
+
+    def get_prometheus_format(self) -> str:
+        """获取Prometheus格式的指标"""
+        lines = [
+            f"# HELP {self.wakeups.name} {self.wakeups.help}",
+            f"# TYPE {self.wakeups.name} counter",
+            f"{self.wakeups.name} {self.wakeups.get()}",
+        ]
+
+        for counters in (self.runs, self.failures, self.misfires):
+            if not counters:
+                continue
+            sample = next(iter(counters.values()))
+            lines.append(f"# HELP {sample.name} {sample.help}")
+            lines.append(f"# TYPE {sample.name} counter")
+            for duty_id, counter in counters.items():
+                lines.append(f'{counter.name}{{duty_id="{duty_id}"}} {counter.get()}')
+
+        if self.skipped:
+            sample = next(iter(self.skipped.values()))
+            lines.append(f"# HELP {sample.name} {sample.help}")
+            lines.append(f"# TYPE {sample.name} counter")
+            for (duty_id, reason), counter in self.skipped.items():
+                lines.append(f'{counter.name}{{duty_id="{duty_id}",reason="{reason}"}} {counter.get()}')
+
+        for histograms in (self.lag, self.duration):
+            if not histograms:
+                continue
+            sample = next(iter(histograms.values()))
+            lines.append(f"# HELP {sample.name} {sample.help}")
+            lines.append(f"# TYPE {sample.name} histogram")
+            for duty_id, histogram in histograms.items():
+                lines.extend(_histogram_lines(histogram, f'duty_id="{duty_id}"'))
+
+        return "\n".join(lines)
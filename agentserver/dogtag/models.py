@@ -23,6 +23,12 @@ class DutyStatus(str, Enum):
     PAUSED = "paused"               # 条件不满足时暂停（如经典模式）
 
 
+class MisfirePolicy(str, Enum):
+    """错过触发时间（调度延迟超过宽限期）时的处理策略"""
+    COALESCE = "coalesce"           # 合并为一次，立即补跑
+    SKIP = "skip"                   # 放弃本次，等下一个周期
+
+
 class ActivationCondition(BaseModel):
     """激活条件"""
     window_modes: Optional[List[str]] = Field(
@@ -61,6 +67,21 @@ class DogTag(BaseModel):
         default=None,
         description="事件任务的延迟（秒）",
     )
+    jitter_seconds: float = Field(
+        default=0.0,
+        ge=0,
+        description="周期任务每次触发时间随机后延的上限（秒），避免多个任务同时唤醒",
+    )
+    misfire_policy: MisfirePolicy = MisfirePolicy.COALESCE
+    misfire_grace_seconds: Optional[float] = Field(
+        default=None,
+        description="调度延迟超过该值视为错过触发；None 表示一个完整周期",
+    )
+    max_concurrency: int = Field(
+        default=1,
+        ge=1,
+        description="同一职责允许同时运行的实例数，达到上限时本次触发跳过",
+    )
     status: DutyStatus = DutyStatus.DISABLED
     activation: Optional[ActivationCondition] = None
     execution_count: int = 0
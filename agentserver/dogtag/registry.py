@@ -18,6 +18,24 @@ class DogTagRegistry:
     def __init__(self):
         self._duties: Dict[str, DogTag] = {}
         self._executors: Dict[str, Callable] = {}  # duty_id → async executor()
+        self._listeners: List[Callable[[str], None]] = []  # 职责变更回调（调度器据此重排触发时间）
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """订阅职责变更（注册 / 移除 / 状态变化），回调参数为 duty_id"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str], None]) -> None:
+        """取消订阅"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, duty_id: str) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(duty_id)
+            except Exception as e:
+                logger.error(f"[DogTag] 职责变更回调失败 ({duty_id}): {e}", exc_info=True)
 
     def register(self, tag: DogTag, executor: Callable) -> None:
         """注册一个职责"""
@@ -26,12 +44,14 @@ class DogTagRegistry:
         self._duties[tag.duty_id] = tag
         self._executors[tag.duty_id] = executor
         logger.info(f"[DogTag] 注册职责: {tag.duty_id} ({tag.name})")
+        self._notify(tag.duty_id)
 
     def unregister(self, duty_id: str) -> None:
         """移除一个职责"""
         self._duties.pop(duty_id, None)
         self._executors.pop(duty_id, None)
         logger.info(f"[DogTag] 移除职责: {duty_id}")
+        self._notify(duty_id)
 
     def get(self, duty_id: str) -> Optional[DogTag]:
         """获取单个职责"""
@@ -59,6 +79,7 @@ class DogTagRegistry:
             old_status = tag.status
             tag.status = status
             logger.info(f"[DogTag] 职责 '{duty_id}' 状态变更: {old_status.value} → {status.value}")
+            self._notify(duty_id)
         else:
             logger.warning(f"[DogTag] 职责 '{duty_id}' 不存在，无法更新状态")
 
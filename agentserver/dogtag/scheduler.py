@@ -3,19 +3,40 @@
 
 合并 HeartbeatScheduler 的事件驱动逻辑与 ProactiveVisionScheduler 的周期调度逻辑，
 用单一主循环管理所有后台职责。
+
+主循环基于最小堆：堆中保存各职责的下一次触发时间（单调时钟），循环只在最早的
+触发时间到达、或职责被注册/移除/修改状态、窗口模式与用户活动变化时被唤醒，
+不再每秒轮询。
+
+- 周期任务：上次开始时间 + 间隔 + 随机抖动（jitter_seconds）
+- 事件任务：对话结束后的延迟倒计时同样放入堆中
+- 错过触发（延迟超过宽限期）：coalesce 合并为一次立即执行，skip 放弃本次
+- 并发上限（max_concurrency）：达到上限时本次触发跳过
+- 调度延迟与运行耗时直方图见 DogTagMetrics
 """
 
 import asyncio
+import heapq
+import itertools
+import random
 import time
 import logging
-from datetime import datetime, time as dt_time
-from typing import Optional, Dict
+from datetime import datetime, timedelta, time as dt_time
+from typing import Optional, Dict, List, Set, Tuple
 
-from .models import DogTag, DutyStatus, TriggerType
+from .metrics import DogTagMetrics
+from .models import DogTag, DutyStatus, MisfirePolicy, TriggerType
 from .registry import DogTagRegistry, get_dogtag_registry
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_INTERVAL = 30
+DEFAULT_DELAY = 300
+
+# 堆条目类型
+_PERIODIC = "periodic"
+_COUNTDOWN = "countdown"
+
 
 class DogTagScheduler:
     """统一调度器"""
@@ -32,11 +53,26 @@ class DogTagScheduler:
         self._conversation_active: bool = False
         self._last_user_activity: float = time.time()
 
-        # 事件驱动：duty_id → 倒计时 asyncio.Task
-        self._event_countdowns: Dict[str, asyncio.Task] = {}
+        # 触发时间堆：(触发时间, 序号, 类型, duty_id)；失效条目惰性删除
+        self._heap: List[Tuple[float, int, str, str]] = []
+        self._seq = itertools.count()
+        # (类型, duty_id) → 当前有效的 (触发时间, 序号)
+        self._next_fire: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self._wakeup = asyncio.Event()
 
-        # 周期任务：duty_id → 上次执行时间
+        # 周期任务：duty_id → 上次执行时间（墙钟，供状态接口展示）/ 上次触发时间（单调时钟，排期基准）
         self._last_check_times: Dict[str, float] = {}
+        self._last_fired: Dict[str, float] = {}
+
+        # 因条件不满足而推迟的周期任务，用户活动或窗口模式变化时立即重新检查
+        self._blocked: Set[str] = set()
+
+        # 运行中的实例：duty_id → 数量 / 调度器启动的 Task
+        self._inflight: Dict[str, int] = {}
+        self._run_tasks: Set[asyncio.Task] = set()
+
+        self.metrics = DogTagMetrics()
+        self._registry.add_listener(self._on_duty_changed)
 
     # ------------------------------------------------------------------
     # 生命周期
@@ -49,6 +85,8 @@ class DogTagScheduler:
             return
 
         self._running = True
+        for duty_id in self._registry.get_all():
+            self._reschedule(duty_id)
         self._task = asyncio.create_task(self._main_loop())
         logger.info("[DogTag] 调度器已启动")
 
@@ -59,41 +97,41 @@ class DogTagScheduler:
 
         self._running = False
 
-        # 取消所有事件倒计时
-        for duty_id, countdown in list(self._event_countdowns.items()):
-            if not countdown.done():
-                countdown.cancel()
-        self._event_countdowns.clear()
+        # 清空触发时间堆（含事件倒计时）
+        self._heap.clear()
+        self._next_fire.clear()
 
-        # 取消主循环
-        if self._task:
-            self._task.cancel()
+        # 取消主循环与运行中的职责
+        tasks = [t for t in (self._task, *self._run_tasks) if t and not t.done()]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
             try:
-                await self._task
+                await task
             except asyncio.CancelledError:
                 pass
 
         logger.info("[DogTag] 调度器已停止")
 
     # ------------------------------------------------------------------
-    # 主循环：1s tick，遍历 PERIODIC 任务
+    # 主循环：等待最早的触发时间或变更事件
     # ------------------------------------------------------------------
 
     async def _main_loop(self):
-        """主循环：每秒检查周期任务"""
+        """主循环：触发所有到期条目后，休眠到下一个触发时间"""
         while self._running:
             try:
-                # 遍历所有 ENABLED 的周期任务
-                periodic_duties = self._registry.get_active_by_trigger(TriggerType.PERIODIC)
-                for duty in periodic_duties:
-                    if self._should_execute(duty):
-                        last_time = self._last_check_times.get(duty.duty_id, 0.0)
-                        elapsed = time.time() - last_time
-                        interval = duty.interval_seconds or 30
-                        if elapsed >= interval:
-                            await self._execute_duty(duty)
-
-                await asyncio.sleep(1)
+                self._wakeup.clear()
+                self.metrics.record_wakeup()
+                self._fire_due(time.monotonic())
+
+                timeout = None
+                if self._heap:
+                    timeout = max(0.0, self._heap[0][0] - time.monotonic())
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
             except asyncio.CancelledError:
                 logger.info("[DogTag] 主循环被取消")
                 break
@@ -101,6 +139,121 @@ class DogTagScheduler:
                 logger.error(f"[DogTag] 主循环异常: {e}", exc_info=True)
                 await asyncio.sleep(5)
 
+    # ------------------------------------------------------------------
+    # 触发时间堆
+    # ------------------------------------------------------------------
+
+    def _push(self, kind: str, duty_id: str, fire_at: float):
+        """设置 (类型, 职责) 的下一次触发时间，旧条目随之失效"""
+        seq = next(self._seq)
+        self._next_fire[(kind, duty_id)] = (fire_at, seq)
+        heapq.heappush(self._heap, (fire_at, seq, kind, duty_id))
+        # 失效条目过多时重建堆
+        if len(self._heap) > 4 * len(self._next_fire) + 16:
+            self._heap = [(f, q, k, d) for (k, d), (f, q) in self._next_fire.items()]
+            heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def _cancel(self, kind: str, duty_id: str) -> bool:
+        """取消 (类型, 职责) 的待触发条目"""
+        if self._next_fire.pop((kind, duty_id), None) is None:
+            return False
+        self._wakeup.set()
+        return True
+
+    def _jitter(self, duty: DogTag) -> float:
+        return random.uniform(0, duty.jitter_seconds) if duty.jitter_seconds > 0 else 0.0
+
+    def _reschedule(self, duty_id: str):
+        """按职责当前配置重排周期触发时间：上次触发 + 间隔，未触发过则立即触发"""
+        duty = self._registry.get(duty_id)
+        if (
+            duty is None
+            or duty.trigger_type != TriggerType.PERIODIC
+            or duty.status != DutyStatus.ENABLED
+        ):
+            self._cancel(_PERIODIC, duty_id)
+            self._blocked.discard(duty_id)
+            return
+
+        now = time.monotonic()
+        last = self._last_fired.get(duty_id)
+        interval = duty.interval_seconds or DEFAULT_INTERVAL
+        fire_at = now if last is None else max(now, last + interval + self._jitter(duty))
+        self._push(_PERIODIC, duty_id, fire_at)
+
+    def _on_duty_changed(self, duty_id: str):
+        """注册表回调：职责注册/移除/状态变化时重排（间隔调整也由此生效）"""
+        if self._running:
+            self._reschedule(duty_id)
+
+    def _fire_due(self, now: float):
+        """触发所有到期的有效条目"""
+        # _push 可能重建堆，每次都从 self._heap 取
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, seq, kind, duty_id = heapq.heappop(self._heap)
+            if self._next_fire.get((kind, duty_id)) != (fire_at, seq):
+                continue
+            del self._next_fire[(kind, duty_id)]
+            if kind == _COUNTDOWN:
+                self._fire_countdown(duty_id, now - fire_at)
+            else:
+                self._fire_periodic(duty_id, now - fire_at, now)
+
+    def _fire_periodic(self, duty_id: str, lag: float, now: float):
+        duty = self._registry.get(duty_id)
+        if not duty or duty.trigger_type != TriggerType.PERIODIC or duty.status != DutyStatus.ENABLED:
+            return
+        interval = duty.interval_seconds or DEFAULT_INTERVAL
+
+        if not self._should_execute(duty):
+            # 条件不满足：推迟到条件可能满足的时间；用户活动/窗口模式变化会提前唤醒
+            self._blocked.add(duty_id)
+            self.metrics.record_skip(duty_id, "condition")
+            self._push(_PERIODIC, duty_id, now + self._condition_retry_delay(duty, interval))
+            return
+        self._blocked.discard(duty_id)
+
+        grace = duty.misfire_grace_seconds if duty.misfire_grace_seconds is not None else interval
+        if lag > grace:
+            self.metrics.record_misfire(duty_id)
+            logger.warning(f"[DogTag] 职责 '{duty_id}' 错过触发 {lag:.1f}s (策略: {duty.misfire_policy.value})")
+            if duty.misfire_policy == MisfirePolicy.SKIP:
+                self.metrics.record_skip(duty_id, "misfire")
+                self._last_fired[duty_id] = now
+                self._push(_PERIODIC, duty_id, now + interval + self._jitter(duty))
+                return
+
+        if self._inflight.get(duty_id, 0) >= duty.max_concurrency:
+            logger.info(f"[DogTag] 职责 '{duty_id}' 仍在运行，跳过本次触发")
+            self.metrics.record_skip(duty_id, "concurrency")
+        else:
+            self.metrics.record_lag(duty_id, lag)
+            self._spawn(duty)
+        self._last_fired[duty_id] = now
+        self._push(_PERIODIC, duty_id, now + interval + self._jitter(duty))
+
+    def _condition_retry_delay(self, duty: DogTag, interval: float) -> float:
+        """条件不满足时的重试延迟：不在活跃时段则等到时段开始，否则一个周期"""
+        activation = duty.activation
+        if activation and activation.active_hours_start and activation.active_hours_end:
+            if not self._is_in_active_hours(activation.active_hours_start, activation.active_hours_end):
+                try:
+                    start = dt_time.fromisoformat(activation.active_hours_start)
+                except ValueError:
+                    return interval
+                now = datetime.now()
+                target = datetime.combine(now.date(), start)
+                if target <= now:
+                    target += timedelta(days=1)
+                return max(1.0, (target - now).total_seconds())
+        return interval
+
+    def _wake_blocked(self):
+        """重新检查因条件不满足而推迟的周期任务"""
+        for duty_id in list(self._blocked):
+            self._reschedule(duty_id)
+
     # ------------------------------------------------------------------
     # 条件检查
     # ------------------------------------------------------------------
@@ -155,6 +308,12 @@ class DogTagScheduler:
     # 执行
     # ------------------------------------------------------------------
 
+    def _spawn(self, duty: DogTag):
+        """在独立 Task 中执行职责，主循环不等待其完成"""
+        task = asyncio.create_task(self._execute_duty(duty))
+        self._run_tasks.add(task)
+        task.add_done_callback(self._run_tasks.discard)
+
     async def _execute_duty(self, duty: DogTag):
         """执行一个职责"""
         executor = self._registry.get_executor(duty.duty_id)
@@ -162,21 +321,31 @@ class DogTagScheduler:
             logger.warning(f"[DogTag] 职责 '{duty.duty_id}' 无执行器，跳过")
             return
 
+        duty_id = duty.duty_id
+        self._inflight[duty_id] = self._inflight.get(duty_id, 0) + 1
+        started = time.perf_counter()
+        success = False
         try:
-            logger.info(f"[DogTag] 执行职责: {duty.duty_id} ({duty.name})")
-            self._last_check_times[duty.duty_id] = time.time()
+            logger.info(f"[DogTag] 执行职责: {duty_id} ({duty.name})")
+            self._last_check_times[duty_id] = time.time()
             await executor()
+            success = True
             duty.execution_count += 1
             duty.last_executed_at = datetime.now().isoformat()
             logger.info(
-                f"[DogTag] 职责 '{duty.duty_id}' 执行完成 "
+                f"[DogTag] 职责 '{duty_id}' 执行完成 "
                 f"(第 {duty.execution_count} 次)"
             )
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(
-                f"[DogTag] 职责 '{duty.duty_id}' 执行失败: {e}",
+                f"[DogTag] 职责 '{duty_id}' 执行失败: {e}",
                 exc_info=True,
             )
+        finally:
+            self._inflight[duty_id] -= 1
+            self.metrics.record_run(duty_id, time.perf_counter() - started, success)
 
     # ------------------------------------------------------------------
     # 事件驱动支持
@@ -185,12 +354,10 @@ class DogTagScheduler:
     def on_conversation_started(self):
         """对话开始 → 取消所有事件倒计时"""
         self._conversation_active = True
-        cancelled = []
-        for duty_id, countdown in list(self._event_countdowns.items()):
-            if not countdown.done():
-                countdown.cancel()
-                cancelled.append(duty_id)
-        self._event_countdowns.clear()
+        cancelled = [
+            duty_id for kind, duty_id in list(self._next_fire)
+            if kind == _COUNTDOWN and self._cancel(_COUNTDOWN, duty_id)
+        ]
         if cancelled:
             logger.info(f"[DogTag] 对话开始，已取消倒计时: {cancelled}")
 
@@ -198,41 +365,43 @@ class DogTagScheduler:
         """对话结束 → 为所有 ENABLED 的 EVENT_DRIVEN 任务启动倒计时"""
         self._conversation_active = False
         event_duties = self._registry.get_active_by_trigger(TriggerType.EVENT_DRIVEN)
+        now = time.monotonic()
         for duty in event_duties:
-            # 取消该职责已有的倒计时
-            old = self._event_countdowns.get(duty.duty_id)
-            if old and not old.done():
-                old.cancel()
-            task = asyncio.create_task(self._countdown_then_execute(duty))
-            self._event_countdowns[duty.duty_id] = task
-            delay = duty.delay_seconds or 300
+            # 覆盖该职责已有的倒计时
+            delay = duty.delay_seconds or DEFAULT_DELAY
+            self._push(_COUNTDOWN, duty.duty_id, now + delay)
             logger.info(
                 f"[DogTag] 对话结束，职责 '{duty.duty_id}' 启动 {delay}s 倒计时"
             )
 
-    async def _countdown_then_execute(self, duty: DogTag):
+    def is_countdown_active(self, duty_id: str) -> bool:
+        """事件任务的倒计时是否在进行中"""
+        return (_COUNTDOWN, duty_id) in self._next_fire
+
+    def _fire_countdown(self, duty_id: str, lag: float):
         """倒计时结束后执行职责"""
-        try:
-            delay = duty.delay_seconds or 300
-            await asyncio.sleep(delay)
-
-            # 再次检查条件
-            if self._should_execute(duty) and not self._conversation_active:
-                logger.info(
-                    f"[DogTag] 职责 '{duty.duty_id}' 倒计时到期，执行"
-                )
-                await self._execute_duty(duty)
-            else:
-                logger.info(
-                    f"[DogTag] 职责 '{duty.duty_id}' 倒计时到期，"
-                    f"但条件不满足或对话已开始，跳过"
-                )
-        except asyncio.CancelledError:
+        duty = self._registry.get(duty_id)
+        if not duty:
+            return
+
+        # 再次检查条件
+        if not self._should_execute(duty) or self._conversation_active:
             logger.info(
-                f"[DogTag] 职责 '{duty.duty_id}' 倒计时被取消"
+                f"[DogTag] 职责 '{duty_id}' 倒计时到期，"
+                f"但条件不满足或对话已开始，跳过"
             )
-        finally:
-            self._event_countdowns.pop(duty.duty_id, None)
+            self.metrics.record_skip(duty_id, "condition")
+            return
+        if self._inflight.get(duty_id, 0) >= duty.max_concurrency:
+            logger.info(f"[DogTag] 职责 '{duty_id}' 倒计时到期，但仍在运行，跳过")
+            self.metrics.record_skip(duty_id, "concurrency")
+            return
+
+        logger.info(
+            f"[DogTag] 职责 '{duty_id}' 倒计时到期，执行"
+        )
+        self.metrics.record_lag(duty_id, lag)
+        self._spawn(duty)
 
     # ------------------------------------------------------------------
     # 手动触发
@@ -277,14 +446,25 @@ class DogTagScheduler:
                         f"[DogTag] 职责 '{duty.duty_id}' 因窗口模式 "
                         f"'{mode}' 自动恢复"
                     )
+                else:
+                    continue
+                if self._running:
+                    self._reschedule(duty.duty_id)
+        if self._running:
+            self._wake_blocked()
 
     def update_user_activity(self):
         """更新用户活动时间"""
         self._last_user_activity = time.time()
+        if self._blocked and self._running:
+            self._wake_blocked()
 
     def reset_check_timer(self, duty_id: str, reason: str = "external_trigger"):
         """重置指定周期任务的检查计时器"""
         self._last_check_times[duty_id] = time.time()
+        self._last_fired[duty_id] = time.monotonic()
+        if self._running:
+            self._reschedule(duty_id)
         logger.info(
             f"[DogTag] 职责 '{duty_id}' 检查计时器已重置 (原因: {reason})"
         )
@@ -292,11 +472,10 @@ class DogTagScheduler:
     def get_status(self) -> dict:
         """返回调度器状态 + 所有任务状态"""
         duties_status = {}
+        now = time.monotonic()
         for duty_id, duty in self._registry.get_all().items():
-            countdown_active = (
-                duty_id in self._event_countdowns
-                and not self._event_countdowns[duty_id].done()
-            )
+            countdown_active = self.is_countdown_active(duty_id)
+            next_fire = self._next_fire.get((_PERIODIC, duty_id)) or self._next_fire.get((_COUNTDOWN, duty_id))
             duties_status[duty_id] = {
                 "name": duty.name,
                 "description": duty.description,
@@ -305,6 +484,9 @@ class DogTagScheduler:
                 "execution_count": duty.execution_count,
                 "last_executed_at": duty.last_executed_at,
                 "countdown_active": countdown_active,
+                "next_run_in": round(max(0.0, next_fire[0] - now), 3) if next_fire else None,
+                "running": self._inflight.get(duty_id, 0),
+                "blocked": duty_id in self._blocked,
             }
 
         return {
@@ -314,6 +496,8 @@ class DogTagScheduler:
             "last_user_activity": datetime.fromtimestamp(
                 self._last_user_activity
             ).isoformat(),
+            "pending_timers": len(self._next_fire),
+            "wakeups": self.metrics.wakeups.get(),
             "duties": duties_status,
         }
 
@@ -332,6 +516,7 @@ def create_dogtag_scheduler(
     global _scheduler
     if _scheduler is not None:
         logger.warning("[DogTag] 调度器已存在，将被替换")
+        _scheduler._registry.remove_listener(_scheduler._on_duty_changed)
     _scheduler = DogTagScheduler(registry)
     return _scheduler
 
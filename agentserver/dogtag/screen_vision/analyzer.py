@@ -265,10 +265,7 @@ class ProactiveVisionAnalyzer:
         Returns:
             AI分析的屏幕描述，失败返回None
         """
-        from system.config import get_server_port
-
-        mcp_port = get_server_port("mcp_server")
-        url = f"http://127.0.0.1:{mcp_port}/call"
+        from system.service_transport import get_service_transport
 
         payload = {
             "service_name": "screen_vision",
@@ -278,8 +275,7 @@ class ProactiveVisionAnalyzer:
         }
 
         try:
-            client = self._get_http_client()
-            resp = await client.post(url, json=payload)
+            resp = await get_service_transport().post("mcp_server", "/call", json=payload, timeout=30.0)
             if resp.status_code == 200:
                 result = resp.json()
                 if result.get("status") == "ok":
@@ -78,18 +78,17 @@ class ProactiveVisionTrigger:
 
     async def _route_via_queue(self, message: str, source: str) -> bool:
         """通过 api_server 的消息队列路由（设置临时屏幕槽 + 对话中入队）"""
-        from system.config import get_server_port
+        from system.service_transport import get_service_transport
 
-        api_port = get_server_port("api_server")
         try:
-            client = self._get_http_client()
-            resp = await client.post(
-                f"http://localhost:{api_port}/queue/push",
+            resp = await get_service_transport().post(
+                "api_server", "/queue/push",
                 json={
                     "content": message,
                     "source": "screen_monitor",
                     "metadata": {"rule": source},
                 },
+                timeout=5.0,
             )
             if resp.status_code == 200:
                 result = resp.json()
@@ -119,7 +118,8 @@ class ProactiveVisionTrigger:
         """尝试通过WebSocket推送消息"""
         try:
             # 调用API Server的内部接口触发WebSocket广播
-            url = f"http://127.0.0.1:{api_port}/ws/broadcast"
+            from system.service_transport import get_service_transport
+
             payload = {
                 "type": "proactive_message",
                 "content": message,
@@ -127,8 +127,7 @@ class ProactiveVisionTrigger:
                 "timestamp": time.time()
             }
 
-            client = self._get_http_client()
-            resp = await client.post(url, json=payload)
+            resp = await get_service_transport().post("api_server", "/ws/broadcast", json=payload, timeout=5.0)
             if resp.status_code == 200:
                 result = resp.json()
                 sent_count = result.get("sent_count", 0)
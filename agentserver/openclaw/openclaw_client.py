@@ -23,6 +23,8 @@ from enum import Enum
 
 import httpx
 
+from .reply_channel import OpenClawReplyChannel, assistant_text, history_messages
+
 logger = logging.getLogger(__name__)
 
 
@@ -123,6 +125,8 @@ class OpenClawConfig:
     hooks_token: Optional[str] = None
     # Hooks API 基础路径 (对应 hooks.path)
     hooks_path: str = "/hooks"
+    # 回复事件流（SSE）路径，配置后优先用推送唤醒收取异步回复，不支持时回退到增量轮询
+    events_path: Optional[str] = None
     # 请求超时时间（秒）
     timeout: int = 120
     # 默认参数
@@ -193,6 +197,8 @@ class OpenClawClient:
         self.config = config or OpenClawConfig()
         self._tasks: Dict[str, OpenClawTask] = {}
         self._http_client: Optional[httpx.AsyncClient] = None
+        # 异步回复通道（按会话共享拉取器）
+        self._reply_channel = OpenClawReplyChannel(self)
 
         # 调度终端会话信息 - 首次调用时初始化，保持整个运行期间
         self._session_info: Optional[OpenClawSessionInfo] = None
@@ -318,6 +324,9 @@ class OpenClawClient:
         hooks_agent_url = self.config.get_hooks_agent_url()
         hooks_agent_path = f"{self.config.hooks_path}/agent"
 
+        # 发送前记录会话游标，202 后只收取本次任务产生的回复
+        reply_cursor = await self._reply_channel.cursor(actual_session_key)
+
         last_error = None
         for attempt in range(1, max_retries + 1):
             try:
@@ -359,7 +368,7 @@ class OpenClawClient:
                 )
 
                 # /hooks/agent 返回 200/202
-                # 200 表示同步完成（含 reply），202 表示异步接受（需轮询获取回复）
+                # 200 表示同步完成（含 reply），202 表示异步接受（经回复通道收取回复）
                 if response.status_code in (200, 202):
                     try:
                         result = response.json()
@@ -397,15 +406,16 @@ class OpenClawClient:
                                 },
                             )
                         else:
-                            # 202 异步接受，需要轮询 sessions_history 获取回复
+                            # 202 异步接受，经回复通道收取本次任务的回复
                             task.status = TaskStatus.RUNNING
                             logger.info(
-                                f"[OpenClaw] 任务已接受(202): {task.task_id}, runId: {task.run_id}, 开始轮询回复..."
+                                f"[OpenClaw] 任务已接受(202): {task.task_id}, runId: {task.run_id}, 开始等待回复..."
                             )
 
                             replies = await self._poll_for_reply(
                                 actual_session_key,
                                 timeout_seconds=timeout_seconds,
+                                cursor=reply_cursor,
                             )
                             if replies:
                                 task.status = TaskStatus.COMPLETED
@@ -414,7 +424,7 @@ class OpenClawClient:
                                     task.result = {}
                                 task.result["replies"] = replies
                                 task.result["reply"] = replies[0] if len(replies) == 1 else "\n\n---\n\n".join(replies)
-                                logger.info(f"[OpenClaw] 轮询获取{len(replies)}条回复成功")
+                                logger.info(f"[OpenClaw] 收取{len(replies)}条回复成功")
 
                                 self._emit_task_event(
                                     task,
@@ -429,7 +439,7 @@ class OpenClawClient:
                             else:
                                 task.status = TaskStatus.COMPLETED
                                 task.completed_at = datetime.now().isoformat()
-                                logger.warning("[OpenClaw] 轮询超时，未获取到回复")
+                                logger.warning("[OpenClaw] 等待超时，未获取到回复")
                     except Exception:
                         task.result = {"raw": response.text}
                         task.status = TaskStatus.RUNNING
@@ -603,119 +613,33 @@ class OpenClawClient:
         self,
         session_key: str,
         timeout_seconds: int = 1200,
-        poll_interval: float = 3.0,
-        initial_delay: float = 1.0,
+        cursor: Optional[int] = None,
     ) -> List[str]:
         """
-        轮询 sessions_history 获取 Agent 回复
+        等待 Agent 回复
 
-        /hooks/agent 返回 202 后，通过 /tools/invoke 调用 sessions_history
-        持续轮询收集所有 assistant 消息，直到消息不再增加或超时。
+        /hooks/agent 返回 202 后，由会话共享的回复通道（reply_channel）收取游标之后的 assistant 消息：
+        Gateway 支持事件流时推送唤醒，否则按自适应间隔增量拉取 sessions_history。
 
         Args:
             session_key: 会话标识
             timeout_seconds: 最大等待时间（秒）
-            poll_interval: 轮询间隔（秒）
-            initial_delay: 首次轮询前等待时间（秒）
+            cursor: 发送消息前取得的会话游标，只收取其后的回复
 
         Returns:
-            回复文本列表，超时返回收集到的所有消息
+            回复文本列表，超时返回已收集的回复
         """
-        import asyncio
-        import time
-
-        await asyncio.sleep(initial_delay)
-
-        start_time = time.time()
-        all_replies: List[str] = []
-        last_count = 0
-        stable_count = 0
-
-        while time.time() - start_time < timeout_seconds:
-            attempt = int(time.time() - start_time)
-            try:
-                client = await self._get_client()
-
-                response = await client.post(
-                    f"{self.config.gateway_url}/tools/invoke",
-                    json={
-                        "tool": "sessions_history",
-                        "args": {
-                            "sessionKey": session_key,
-                            "limit": 50,
-                        },
-                    },
-                    headers=self.config.get_gateway_headers(),
-                    timeout=15,
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    replies = self._extract_all_assistant_replies(data)
-                    current_count = len(replies)
-
-                    if current_count > last_count:
-                        all_replies = replies
-                        last_count = current_count
-                        stable_count = 0
-                        logger.info(
-                            f"[OpenClaw] 轮询第{attempt}次: 发现{current_count}条assistant消息 (新增{current_count - last_count})"
-                        )
-                    else:
-                        stable_count += 1
-                        if stable_count >= 2 and current_count > 0:
-                            logger.info(f"[OpenClaw] 消息已稳定{stable_count}次，共{current_count}条，结束轮询")
-                            return replies
-
-            except Exception as e:
-                logger.warning(f"[OpenClaw] 轮询第{attempt}次异常: {e}")
-
-            await asyncio.sleep(poll_interval)
-
-        logger.warning(f"[OpenClaw] 轮询超时({timeout_seconds}s)，共收集{len(all_replies)}条消息")
-        return all_replies
+        return await self._reply_channel.wait_for_replies(session_key, timeout_seconds, cursor=cursor)
 
     @staticmethod
     def _extract_all_assistant_replies(data: Dict[str, Any]) -> List[str]:
         """
         从 sessions_history 返回值中提取所有 assistant 的文本回复
         """
-        replies: List[str] = []
         try:
-            result = data.get("result", {})
-            details = result.get("details", {})
-            messages = details.get("messages", [])
-
-            if not messages:
-                content = result.get("content", [])
-                if content and isinstance(content, list) and len(content) > 0:
-                    text = content[0].get("text", "")
-                    if isinstance(text, str) and text.strip():
-                        try:
-                            inner = json.loads(text)
-                            messages = inner.get("messages", [])
-                        except json.JSONDecodeError:
-                            pass
-
-            for msg in messages:
-                if msg.get("role") != "assistant":
-                    continue
-                content = msg.get("content", [])
-                if isinstance(content, str):
-                    if content.strip():
-                        replies.append(content)
-                elif isinstance(content, list):
-                    text_parts = [
-                        item.get("text", "")
-                        for item in content
-                        if isinstance(item, dict) and item.get("type") == "text"
-                    ]
-                    text = "\n".join(text_parts)
-                    if text.strip():
-                        replies.append(text)
+            return [text for text in (assistant_text(msg) for msg in history_messages(data)) if text]
         except Exception:
-            pass
-        return replies
+            return []
 
     async def wake(self, text: str, mode: str = "now") -> Dict[str, Any]:
         """
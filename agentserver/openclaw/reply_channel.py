@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OpenClaw 回复通道
+/hooks/agent 返回 202 后收取 Agent 的异步回复
+
+每个会话一个共享的监听器（SessionReplyWatcher），同一会话上等待中的任务共用一次 sessions_history 拉取：
+  - 增量游标：按消息 id（没有 id 时按内容指纹）记录已见过的消息，每个任务只收取发送前游标之后的新消息，
+    不会把同一会话中之前任务的回复当成本次回复；拉取窗口对不齐时自动扩大 limit，避免漏消息。
+    发送前的游标拉取失败时，第一次成功的拉取只用来建立游标，不把窗口内的旧消息当成回复
+  - 自适应退避：有新消息后立即以最短间隔拉取，持续无变化时间隔按倍数增长到上限
+  - 推送唤醒：配置了 events_path 且 Gateway 支持时订阅 SSE 事件流，收到会话事件立即拉取，
+    轮询只作为兜底（间隔放宽）；订阅返回 404/405 或非事件流时回退到纯轮询
+  - 完成判定：最后一条新消息是带结束标记（stopReason）的 assistant 消息时立即完成，
+    否则在收到回复后静默 settle_seconds 并经一次确认拉取后完成；超时返回已收集的回复
+  - 空闲回收：没有等待者的监听器空闲 WATCHER_IDLE_SECONDS 后移除
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL = 0.5  # 有新消息后的拉取间隔（秒）
+MAX_INTERVAL = 8.0  # 无变化时退避的上限（秒）
+PUSH_MAX_INTERVAL = 30.0  # 推送连接正常时兜底轮询的上限（秒）
+BACKOFF = 1.5
+SETTLE_SECONDS = 3.0  # 没有结束标记时，最后一条消息之后静默多久视为回复完成
+HISTORY_LIMIT = 10  # 每次拉取的消息条数（窗口对不齐时翻倍）
+MAX_HISTORY_LIMIT = 200
+SEEN_KEYS = 500  # 每个会话保留的已见消息指纹数
+WATCHER_IDLE_SECONDS = 600.0  # 没有等待者的会话监听器保留多久
+
+_FINAL_STOP_REASONS = {"stop", "end_turn", "endTurn", "stop_sequence", "max_tokens", "length"}
+
+
+def message_key(msg: Dict[str, Any]) -> str:
+    """消息标识：优先使用 Gateway 提供的 id，否则用角色 + 内容 + 时间戳的指纹"""
+    for field in ("id", "messageId", "uuid"):
+        if msg.get(field):
+            return str(msg[field])
+    raw = json.dumps([msg.get("role"), msg.get("content"), msg.get("timestamp") or msg.get("createdAt")],
+                     sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def history_messages(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """从 sessions_history 返回值中取出消息列表（details.messages，或 content[0].text 中的 JSON）"""
+    result = data.get("result", {}) if isinstance(data, dict) else {}
+    messages = result.get("details", {}).get("messages", [])
+    if not messages:
+        content = result.get("content", [])
+        if content and isinstance(content, list) and isinstance(content[0], dict):
+            text = content[0].get("text", "")
+            if isinstance(text, str) and text.strip():
+                try:
+                    messages = json.loads(text).get("messages", [])
+                except (json.JSONDecodeError, AttributeError):
+                    messages = []
+    return [m for m in messages if isinstance(m, dict)]
+
+
+def assistant_text(msg: Dict[str, Any]) -> str:
+    """assistant 消息的文本内容（非 assistant 或没有文本时返回空字符串）"""
+    if msg.get("role") != "assistant":
+        return ""
+    content = msg.get("content", [])
+    if isinstance(content, str):
+        return content if content.strip() else ""
+    if isinstance(content, list):
+        text = "\n".join(
+            item.get("text", "") for item in content if isinstance(item, dict) and item.get("type") == "text"
+        )
+        return text if text.strip() else ""
+    return ""
+
+
+def is_final(msg: Dict[str, Any]) -> bool:
+    """带结束标记的 assistant 文本消息（Agent 本轮已结束，无需等待静默期）"""
+    return bool(assistant_text(msg)) and msg.get("stopReason") in _FINAL_STOP_REASONS
+
+
+class ReplyWaiter:
+    """一个等待中的任务：收集游标之后的 assistant 回复"""
+
+    def __init__(self, cursor: int, deadline: float):
+        self.cursor = cursor  # 只收取序号 >= cursor 的消息
+        self.deadline = deadline
+        self.replies: List[str] = []
+        self.last_activity: Optional[float] = None  # 最后一次看到新消息的时间
+        self.done = asyncio.Event()
+
+    def settle_at(self, settle_seconds: float) -> Optional[float]:
+        if not self.replies or self.last_activity is None:
+            return None
+        return self.last_activity + settle_seconds
+
+
+class SessionReplyWatcher:
+    """单个会话的共享拉取器：有任务等待时运行，所有任务都结束后停止"""
+
+    def __init__(self, channel: "OpenClawReplyChannel", session_key: str):
+        self.channel = channel
+        self.session_key = session_key
+        self.seq = 0  # 已见消息总数（游标）
+        self._keys: List[str] = []  # 最近已见消息的指纹（按顺序）
+        self._limit = channel.history_limit
+        self._waiters: List[ReplyWaiter] = []
+        self._wake = asyncio.Event()
+        self._fetch_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._push_task: Optional[asyncio.Task] = None
+        self.push_connected = False
+        self.last_fetch = 0.0
+        self.interval = channel.min_interval
+        self.primed = False  # 是否已成功拉取过一次（游标覆盖了之前的历史）
+        self.fetches = 0
+        self.pushes = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def idle(self) -> bool:
+        """没有等待者且拉取循环已结束"""
+        return not self._waiters and (self._task is None or self._task.done())
+
+    # ── 游标 ──
+
+    async def cursor(self) -> int:
+        """当前游标：立即拉取一次，使游标覆盖发送消息之前的全部历史"""
+        self.last_used = time.monotonic()
+        await self.fetch()
+        return self.seq
+
+    def _ingest(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """与已见消息对齐，返回新消息；窗口内找不到最后一条已见消息时返回 None（需要扩大窗口）"""
+        keys = [message_key(m) for m in messages]
+        if not self._keys:
+            start = 0
+        else:
+            last = self._keys[-1]
+            position = next((i for i in range(len(keys) - 1, -1, -1) if keys[i] == last), None)
+            if position is None:
+                if len(messages) >= self._limit and self._limit < MAX_HISTORY_LIMIT:
+                    return None
+                seen = set(self._keys)  # 历史被压缩或已达窗口上限：按指纹去重
+                fresh = [(k, m) for k, m in zip(keys, messages) if k not in seen]
+                return self._append(fresh)
+            start = position + 1
+        return self._append(list(zip(keys[start:], messages[start:])))
+
+    def _append(self, fresh) -> List[Dict[str, Any]]:
+        self._keys.extend(key for key, _ in fresh)
+        self.seq += len(fresh)
+        del self._keys[:max(0, len(self._keys) - SEEN_KEYS)]
+        return [msg for _, msg in fresh]
+
+    async def fetch(self) -> Optional[List[Dict[str, Any]]]:
+        """拉取一次会话历史，把新消息分发给等待中的任务并返回；请求失败返回 None"""
+        async with self._fetch_lock:
+            while True:
+                data = await self.channel.fetch_history(self.session_key, self._limit)
+                self.fetches += 1
+                self.last_fetch = time.monotonic()
+                if data is None:
+                    return None
+                fresh = self._ingest(history_messages(data))
+                if fresh is not None:
+                    break
+                self._limit = min(self._limit * 2, MAX_HISTORY_LIMIT)
+                logger.info(f"[OpenClaw] 会话 {self.session_key} 新消息超过拉取窗口，limit 扩大到 {self._limit}")
+            if not self.primed:
+                # 第一次成功拉取只建立游标：窗口内的消息都发生在游标之前，之前登记的等待者从这里开始收取
+                self.primed = True
+                for waiter in self._waiters:
+                    waiter.cursor = max(waiter.cursor, self.seq)
+                return []
+            if fresh:
+                self._dispatch(fresh, self.last_fetch)
+            return fresh
+
+    # ── 等待 ──
+
+    def add_waiter(self, waiter: ReplyWaiter) -> None:
+        self.last_used = time.monotonic()
+        self._waiters.append(waiter)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        if self.channel.events_url and self.channel.push_supported is not False and (
+            self._push_task is None or self._push_task.done()
+        ):
+            self._push_task = asyncio.ensure_future(self._subscribe())
+
+    def wake(self) -> None:
+        self.pushes += 1
+        self._wake.set()
+
+    def _dispatch(self, fresh: List[Dict[str, Any]], now: float) -> None:
+        base = self.seq - len(fresh)
+        for waiter in self._waiters:
+            mine = [m for i, m in enumerate(fresh) if base + i >= waiter.cursor]
+            if not mine:
+                continue
+            waiter.last_activity = now
+            waiter.replies.extend(text for text in (assistant_text(m) for m in mine) if text)
+            if is_final(mine[-1]):
+                waiter.done.set()
+
+    async def _run(self) -> None:
+        channel = self.channel
+        try:
+            while self._waiters:
+                fresh = await self.fetch()
+                now = time.monotonic()
+                if fresh:
+                    self.interval = channel.min_interval
+                else:
+                    ceiling = PUSH_MAX_INTERVAL if self.push_connected else channel.max_interval
+                    self.interval = min(self.interval * BACKOFF, max(ceiling, channel.min_interval))
+
+                for waiter in self._waiters:
+                    settle_at = waiter.settle_at(channel.settle_seconds)
+                    if fresh == [] and settle_at is not None and now >= settle_at:
+                        waiter.done.set()  # 静默期后的确认拉取仍无新消息
+                    elif now >= waiter.deadline:
+                        waiter.done.set()
+                self._waiters = [w for w in self._waiters if not w.done.is_set()]
+                if not self._waiters:
+                    break
+
+                # 下一次拉取：退避间隔，但不晚于最近的静默期结束 / 超时时间
+                wake_at = now + self.interval
+                for waiter in self._waiters:
+                    settle_at = waiter.settle_at(channel.settle_seconds)
+                    wake_at = min(wake_at, waiter.deadline, settle_at if settle_at is not None else wake_at)
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), max(0.0, wake_at - time.monotonic()))
+                    self.interval = channel.min_interval  # 推送唤醒：Agent 正在活动
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for waiter in self._waiters:
+                waiter.done.set()
+            self._waiters = []
+            self.last_used = time.monotonic()
+            if self._push_task is not None:
+                self._push_task.cancel()
+
+    # ── 推送 ──
+
+    async def _subscribe(self) -> None:
+        """订阅 Gateway 事件流：任何属于本会话的事件都只作为"立即拉取"的信号"""
+        channel = self.channel
+        retry = channel.min_interval
+        while self._waiters:
+            try:
+                client = await channel.client._get_client()
+                async with client.stream(
+                    "GET", channel.events_url, params={"sessionKey": self.session_key},
+                    headers={**channel.client.config.get_gateway_headers(), "Accept": "text/event-stream"},
+                    timeout=None,
+                ) as response:
+                    content_type = response.headers.get("content-type", "")
+                    if response.status_code != 200 or "text/event-stream" not in content_type:
+                        if response.status_code in (404, 405) or response.status_code == 200:
+                            channel.push_supported = False
+                            logger.info(f"[OpenClaw] Gateway 不支持回复事件流（HTTP {response.status_code}），使用增量轮询")
+                            return
+                        raise RuntimeError(f"HTTP {response.status_code}")
+                    channel.push_supported = True
+                    self.push_connected = True
+                    retry = channel.min_interval
+                    async for line in response.aiter_lines():
+                        if line.startswith("data:"):
+                            self.wake()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.debug(f"[OpenClaw] 回复事件流断开: {e}")
+            finally:
+                self.push_connected = False
+            await asyncio.sleep(retry)
+            retry = min(retry * 2, channel.max_interval)
+
+
+class OpenClawReplyChannel:
+    """按会话管理回复监听器"""
+
+    def __init__(self, client, min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL,
+                 settle_seconds: float = SETTLE_SECONDS, history_limit: int = HISTORY_LIMIT):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.settle_seconds = settle_seconds
+        self.history_limit = history_limit
+        self.push_supported: Optional[bool] = None  # None 表示尚未探测
+        self._watchers: Dict[str, SessionReplyWatcher] = {}
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def events_url(self) -> Optional[str]:
+        path = getattr(self.client.config, "events_path", None)
+        if not path:
+            return None
+        return f"{self.client.config.gateway_url}/{path.lstrip('/')}"
+
+    def watcher(self, session_key: str) -> SessionReplyWatcher:
+        self._evict_idle()
+        watcher = self._watchers.get(session_key)
+        if watcher is None:
+            watcher = self._watchers[session_key] = SessionReplyWatcher(self, session_key)
+        return watcher
+
+    def _evict_idle(self) -> None:
+        """移除长时间没有使用的会话监听器（下次使用时重新建立游标）"""
+        expire = time.monotonic() - WATCHER_IDLE_SECONDS
+        for key in [k for k, w in self._watchers.items() if w.idle and w.last_used < expire]:
+            del self._watchers[key]
+
+    async def fetch_history(self, session_key: str, limit: int) -> Optional[Dict[str, Any]]:
+        self.requests += 1
+        try:
+            client = await self.client._get_client()
+            response = await client.post(
+                f"{self.client.config.gateway_url}/tools/invoke",
+                json={"tool": "sessions_history", "args": {"sessionKey": session_key, "limit": limit}},
+                headers=self.client.config.get_gateway_headers(),
+                timeout=15,
+            )
+            if response.status_code == 200:
+                return response.json()
+            logger.warning(f"[OpenClaw] 拉取会话历史失败: HTTP {response.status_code}")
+        except Exception as e:
+            logger.warning(f"[OpenClaw] 拉取会话历史异常: {e}")
+        self.errors += 1
+        return None
+
+    async def cursor(self, session_key: str) -> int:
+        """发送消息前调用：返回当前游标，之后等待只收取游标之后的消息"""
+        return await self.watcher(session_key).cursor()
+
+    async def wait_for_replies(self, session_key: str, timeout_seconds: float,
+                               cursor: Optional[int] = None) -> List[str]:
+        """等待游标之后的 assistant 回复；超时返回已收集的回复"""
+        watcher = self.watcher(session_key)
+        if cursor is None:
+            cursor = watcher.seq if watcher.primed else 0
+        waiter = ReplyWaiter(cursor, time.monotonic() + timeout_seconds)
+        watcher.add_waiter(waiter)
+        await waiter.done.wait()
+        if not waiter.replies:
+            logger.warning(f"[OpenClaw] 等待回复超时({timeout_seconds}s)，未获取到回复")
+        return waiter.replies
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "push_supported": self.push_supported,
+            "sessions": {
+                key: {
+                    "waiters": len(w._waiters),
+                    "seen": w.seq,
+                    "fetches": w.fetches,
+                    "pushes": w.pushes,
+                    "push_connected": w.push_connected,
+                    "interval": round(w.interval, 2),
+                    "history_limit": w._limit,
+                }
+                for key, w in self._watchers.items()
+            },
+        }
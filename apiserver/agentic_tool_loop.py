@@ -5,16 +5,18 @@ Agentic Tool Loop 核心引擎
 """
 
 import asyncio
+import functools
 import json
 import logging
 import re
 import time as _time
 from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
-import httpx
-
-from system.config import get_config, get_server_port
+from system.config import get_config
+from system.service_transport import ServiceTransport, get_service_transport
 from apiserver import naga_auth
+from apiserver.tool_execution import CALLER_ERROR, error_result, get_tool_executor
+from apiserver.web_search import SearchError, get_web_search
 
 logger = logging.getLogger(__name__)
 
@@ -85,6 +87,26 @@ def _extract_json_objects(text: str) -> List[Dict[str, Any]]:
     return [obj for obj in objects if isinstance(obj.get("agentType"), str) and obj["agentType"]]
 
 
+# 匹配 ```tool ... ``` 代码块（允许未闭合的尾部块用 \Z 兜底）
+# 注意: 用 [ \t]* 而非 \s* 避免吃掉换行符; 用 \Z 而非 $ 避免 MULTILINE 下提前匹配行尾
+_TOOL_BLOCK_PATTERN = re.compile(r"```tool[ \t]*\n([\s\S]*?)(?:```|\Z)")
+_TOOL_BLOCK_OPEN = re.compile(r"```tool[ \t]*\n")
+
+
+def _parse_tool_block(block_content: str) -> List[Dict[str, Any]]:
+    """解析单个 ```tool``` 代码块的内容"""
+    block_content = block_content.strip()
+    if not block_content:
+        return []
+    return _extract_json_objects(_normalize_fullwidth_json_chars(block_content))
+
+
+def _strip_tool_blocks(text: str) -> str:
+    """从文本中移除 ```tool...``` 代码块并清理多余空行"""
+    clean_text = _TOOL_BLOCK_PATTERN.sub("", text).strip()
+    return re.sub(r"\n{3,}", "\n\n", clean_text)
+
+
 def _extract_tool_blocks(text: str) -> Tuple[str, List[Dict[str, Any]]]:
     """从 ```tool``` 代码块中提取工具调用JSON。
 
@@ -93,23 +115,9 @@ def _extract_tool_blocks(text: str) -> Tuple[str, List[Dict[str, Any]]]:
     """
 
     tool_calls: List[Dict[str, Any]] = []
-    # 匹配 ```tool ... ``` 代码块（允许未闭合的尾部块用 \Z 兜底）
-    # 注意: 用 [ \t]* 而非 \s* 避免吃掉换行符; 用 \Z 而非 $ 避免 MULTILINE 下提前匹配行尾
-    pattern = re.compile(r"```tool[ \t]*\n([\s\S]*?)(?:```|\Z)")
-
-    for match in pattern.finditer(text):
-        block_content = match.group(1).strip()
-        if not block_content:
-            continue
-        normalized = _normalize_fullwidth_json_chars(block_content)
-        extracted = _extract_json_objects(normalized)
-        tool_calls.extend(extracted)
-
-    # 从文本中移除 ```tool...``` 代码块
-    clean_text = pattern.sub("", text).strip()
-    # 清理多余空行
-    clean_text = re.sub(r"\n{3,}", "\n\n", clean_text)
-    return clean_text, tool_calls
+    for match in _TOOL_BLOCK_PATTERN.finditer(text):
+        tool_calls.extend(_parse_tool_block(match.group(1)))
+    return _strip_tool_blocks(text), tool_calls
 
 
 def parse_tool_calls_from_text(text: str) -> Tuple[str, List[Dict[str, Any]]]:
@@ -146,28 +154,74 @@ def parse_tool_calls_from_text(text: str) -> Tuple[str, List[Dict[str, Any]]]:
     return clean_text, tool_calls
 
 
-# ---------------------------------------------------------------------------
-# OpenClaw 共享客户端与可用性预检
-# ---------------------------------------------------------------------------
+class StreamingToolCallParser:
+    """文本工具调用的增量解析器：逐段接收流式输出，```tool``` 代码块一闭合就返回其中的工具调用。
 
-_shared_openclaw_client: Optional[httpx.AsyncClient] = None
+    对同一段完整文本，feed() 返回的调用 + finish() 的结果与 parse_tool_calls_from_text 一致：
+      - 代码块按出现顺序在闭合时解析（未闭合的尾块在 finish() 时解析）
+      - 整段输出中没有任何代码块调用时才回退到裸JSON提取，这需要完整文本，只能在 finish() 时进行
+    """
 
+    def __init__(self):
+        self.text = ""
+        self.tool_calls: List[Dict[str, Any]] = []  # 已从代码块中解析出的调用
+        self._scan_pos = 0  # 下一个代码块开头的搜索起点
+        self._block_start: Optional[int] = None  # 未闭合代码块的内容起点
+        self._close_scan = 0  # 闭合标记的搜索起点
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        """追加一段输出，返回本段中闭合的代码块里的工具调用"""
+        if not delta:
+            return []
+        self.text += delta
+        completed: List[Dict[str, Any]] = []
+        while True:
+            if self._block_start is None:
+                match = _TOOL_BLOCK_OPEN.search(self.text, self._scan_pos)
+                if match is None:
+                    self._scan_pos = self._resume_pos()
+                    break
+                self._block_start = self._close_scan = match.end()
+            close = self.text.find("```", self._close_scan)
+            if close == -1:
+                self._close_scan = max(self._block_start, len(self.text) - 2)  # 闭合标记可能跨段
+                break
+            completed.extend(self._take_block(self.text[self._block_start:close]))
+            self._block_start = None
+            self._scan_pos = close + 3
+        return completed
+
+    def _resume_pos(self) -> int:
+        """未找到代码块开头时的下次搜索起点：只保留可能是开头前缀的尾部，避免重复扫描"""
+        tail = self.text.rfind("```tool", self._scan_pos)
+        if tail != -1 and not self.text[tail + 7:].strip(" \t"):
+            return tail
+        return max(self._scan_pos, len(self.text) - 6)
+
+    def _take_block(self, block_content: str) -> List[Dict[str, Any]]:
+        calls = _parse_tool_block(block_content)
+        self.tool_calls.extend(calls)
+        return calls
+
+    def finish(self) -> Tuple[str, List[Dict[str, Any]]]:
+        """流结束：解析未闭合的尾块，返回与 parse_tool_calls_from_text(完整文本) 相同的 (clean_text, tool_calls)"""
+        if self._block_start is not None:
+            self._take_block(self.text[self._block_start:])
+            self._block_start = None
+        if self.tool_calls:
+            return _strip_tool_blocks(self.text), list(self.tool_calls)
+        return parse_tool_calls_from_text(self.text)
 
-def _get_openclaw_client() -> httpx.AsyncClient:
-    """获取或创建共享的 httpx 客户端（避免每次调用都新建连接）"""
-    global _shared_openclaw_client
-    if _shared_openclaw_client is None or _shared_openclaw_client.is_closed:
-        _shared_openclaw_client = httpx.AsyncClient(
-            timeout=httpx.Timeout(timeout=150.0, connect=10.0),
-            proxy=None,  # localhost 请求不走系统代理
-        )
-    return _shared_openclaw_client
 
+# ---------------------------------------------------------------------------
+# OpenClaw 可用性预检
+# ---------------------------------------------------------------------------
 
 _openclaw_available: Optional[bool] = None
 _openclaw_check_time: float = 0.0
 _OPENCLAW_CHECK_TTL = 30.0
 _openclaw_start_attempted: bool = False  # 每次进程生命周期内只自动启动一次
+_OPENCLAW_CALL_TIMEOUT = 150.0
 
 
 async def _check_openclaw_available() -> bool:
@@ -177,28 +231,27 @@ async def _check_openclaw_available() -> bool:
     if _openclaw_available is not None and (now - _openclaw_check_time) < _OPENCLAW_CHECK_TTL:
         return _openclaw_available
 
-    agent_base = f"http://localhost:{get_server_port('agent_server')}"
-    client = _get_openclaw_client()
+    transport = get_service_transport()
 
-    _openclaw_available = await _probe_openclaw_health(client, agent_base)
+    _openclaw_available = await _probe_openclaw_health(transport)
 
     # 不可用且还没尝试过自动启动 → 启动一次
     if not _openclaw_available and not _openclaw_start_attempted:
         _openclaw_start_attempted = True
         logger.info("[AgenticLoop] OpenClaw gateway 不可用，尝试自动启动...")
         try:
-            resp = await client.post(f"{agent_base}/openclaw/gateway/start", timeout=45.0)
+            resp = await transport.post("agent_server", "/openclaw/gateway/start", timeout=45.0)
             if resp.status_code == 200:
                 start_result = resp.json()
                 # start_gateway 内部已经等待并检查了连通性
                 if start_result.get("success"):
                     logger.info("[AgenticLoop] OpenClaw gateway 启动成功")
                     # 再确认一次 health
-                    _openclaw_available = await _probe_openclaw_health(client, agent_base)
+                    _openclaw_available = await _probe_openclaw_health(transport)
                     if not _openclaw_available:
                         # start 说成功但 health 还没好，短暂等待
                         await asyncio.sleep(2)
-                        _openclaw_available = await _probe_openclaw_health(client, agent_base)
+                        _openclaw_available = await _probe_openclaw_health(transport)
                 else:
                     msg = start_result.get("message", "未知原因")
                     logger.warning(f"[AgenticLoop] OpenClaw gateway 启动失败: {msg}")
@@ -211,10 +264,10 @@ async def _check_openclaw_available() -> bool:
     return _openclaw_available
 
 
-async def _probe_openclaw_health(client: httpx.AsyncClient, agent_base: str) -> bool:
+async def _probe_openclaw_health(transport: ServiceTransport) -> bool:
     """探测 OpenClaw gateway 是否健康"""
     try:
-        resp = await client.get(f"{agent_base}/openclaw/health", timeout=3.0)
+        resp = await transport.get("agent_server", "/openclaw/health", timeout=3.0)
         data = resp.json()
         return (
             resp.status_code == 200
@@ -230,8 +283,8 @@ async def _probe_openclaw_health(client: httpx.AsyncClient, agent_base: str) ->
 # ---------------------------------------------------------------------------
 
 
-async def _execute_mcp_call(call: Dict[str, Any]) -> Dict[str, Any]:
-    """执行单个MCP调用"""
+async def _execute_mcp_call(call: Dict[str, Any], session_id: Optional[str] = None) -> Dict[str, Any]:
+    """执行单个MCP调用（session_id 用于会话级工具缓存）"""
     service_name = call.get("service_name", "")
     tool_name = call.get("tool_name", "")
 
@@ -251,6 +304,7 @@ async def _execute_mcp_call(call: Dict[str, Any]) -> Dict[str, Any]:
                 "tool_call": call,
                 "result": "游戏攻略功能需要登录 Naga 账号后才能使用，请先登录。",
                 "status": "error",
+                "error_kind": CALLER_ERROR,
                 "service_name": service_name,
                 "tool_name": tool_name,
             }
@@ -260,7 +314,7 @@ async def _execute_mcp_call(call: Dict[str, Any]) -> Dict[str, Any]:
 
         manager = get_mcp_manager()
         t0 = _time.monotonic()
-        result = await manager.unified_call(service_name, call)
+        result = await manager.unified_call(service_name, call, session_id=session_id)
         elapsed = _time.monotonic() - t0
         logger.info(f"[AgenticLoop] MCP调用完成: {service_name}/{tool_name} 耗时 {elapsed:.2f}s")
         return {
@@ -291,6 +345,7 @@ async def _execute_openclaw_call(call: Dict[str, Any], session_id: str) -> Dict[
             "tool_call": call,
             "result": "缺少message字段",
             "status": "error",
+            "error_kind": CALLER_ERROR,
             "service_name": "openclaw",
             "tool_name": task_type,
         }
@@ -318,10 +373,8 @@ async def _execute_openclaw_call(call: Dict[str, Any], session_id: str) -> Dict[
         payload["message"] = f"[提醒 在 {call.get('at')} 后] {message}"
 
     try:
-        client = _get_openclaw_client()
-        response = await client.post(
-            f"http://localhost:{get_server_port('agent_server')}/openclaw/send",
-            json=payload,
+        response = await get_service_transport().post(
+            "agent_server", "/openclaw/send", json=payload, timeout=_OPENCLAW_CALL_TIMEOUT
         )
         if response.status_code == 200:
             result_data = response.json()
@@ -369,8 +422,8 @@ async def _execute_openclaw_call(call: Dict[str, Any], session_id: str) -> Dict[
         }
 
 
-async def _execute_naga_search(call: Dict[str, Any]) -> Dict[str, Any]:
-    """通过 NagaBusiness 搜索代理执行 web_search（已登录时优先使用）"""
+async def _execute_cached_search(call: Dict[str, Any], provider: str, service_name: str, label: str) -> Dict[str, Any]:
+    """通过共享搜索缓存执行 web_search（相同查询复用结果，并发相同查询只请求一次上游）"""
     tool_args = call.get("args", {})
     query = tool_args.get("query", "") or tool_args.get("q", "")
     count = tool_args.get("count", 10)
@@ -378,150 +431,44 @@ async def _execute_naga_search(call: Dict[str, Any]) -> Dict[str, Any]:
 
     if not query:
         return {
-            "tool_call": call, "result": "缺少搜索关键词",
-            "status": "error", "service_name": "naga_search", "tool_name": "web_search",
+            "tool_call": call, "result": "缺少搜索关键词", "error_kind": CALLER_ERROR,
+            "status": "error", "service_name": service_name, "tool_name": "web_search",
         }
 
     try:
-        token = naga_auth.get_access_token()
-        params: Dict[str, Any] = {"q": query, "count": count}
-        if freshness:
-            params["freshness"] = freshness
-
-        client = _get_openclaw_client()
         t0 = _time.monotonic()
-        resp = await client.post(
-            naga_auth.NAGA_MODEL_URL + "/tools/search",
-            json=params,
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=30.0,
-        )
+        result = await get_web_search().search(provider, query, count=count, freshness=freshness)
         elapsed = _time.monotonic() - t0
-
-        if resp.status_code != 200:
-            try:
-                error_data = resp.json()
-                error_msg = error_data.get("error", {}).get("message", f"HTTP {resp.status_code}")
-            except Exception:
-                error_msg = f"HTTP {resp.status_code}"
-            logger.error(f"[AgenticLoop] Naga搜索代理错误: {error_msg}")
-            return {
-                "tool_call": call, "result": f"搜索失败: {error_msg}",
-                "status": "error", "service_name": "naga_search", "tool_name": "web_search",
-            }
-
-        data = resp.json()
-        results = data.get("web", {}).get("results", [])
-        # 格式化搜索结果为可读文本
-        if not results:
-            readable = "未找到相关搜索结果。"
-        else:
-            lines = []
-            for i, r in enumerate(results, 1):
-                title = r.get("title", "")
-                url = r.get("url", "")
-                desc = r.get("description", "")
-                age = r.get("age", "")
-                lines.append(f"{i}. {title}")
-                lines.append(f"   URL: {url}")
-                if desc:
-                    lines.append(f"   摘要: {desc}")
-                if age:
-                    lines.append(f"   时间: {age}")
-                lines.append("")
-            readable = "\n".join(lines)
-
-        logger.info(f"[AgenticLoop] Naga搜索完成: query=\"{query}\" 耗时 {elapsed:.2f}s, 结果数={len(results)}")
+    except SearchError as e:
+        logger.error(f"[AgenticLoop] {label}错误: {e}")
         return {
-            "tool_call": call, "result": readable,
-            "status": "success", "service_name": "naga_search", "tool_name": "web_search",
+            "tool_call": call, "result": f"搜索失败: {e}",
+            "status": "error", "service_name": service_name, "tool_name": "web_search",
         }
     except Exception as e:
-        logger.error(f"[AgenticLoop] Naga搜索代理异常: {e}")
+        logger.error(f"[AgenticLoop] {label}异常: {e}")
         return {
             "tool_call": call, "result": f"搜索异常: {e}",
-            "status": "error", "service_name": "naga_search", "tool_name": "web_search",
-        }
-
-
-async def _execute_brave_search(call: Dict[str, Any]) -> Dict[str, Any]:
-    """通过配置的 Brave Search API Key 直接搜索（未登录 Naga 时使用）"""
-    tool_args = call.get("args", {})
-    query = tool_args.get("query", "") or tool_args.get("q", "")
-    count = tool_args.get("count", 10)
-    freshness = tool_args.get("freshness")
-
-    if not query:
-        return {
-            "tool_call": call, "result": "缺少搜索关键词",
-            "status": "error", "service_name": "brave_search", "tool_name": "web_search",
+            "status": "error", "service_name": service_name, "tool_name": "web_search",
         }
 
-    try:
-        cfg = get_config()
-        api_key = cfg.online_search.search_api_key
-        api_base = cfg.online_search.search_api_base
+    logger.info(
+        f"[AgenticLoop] {label}完成: query=\"{query}\" 耗时 {elapsed:.2f}s, 结果数={len(result.top(count))}"
+    )
+    return {
+        "tool_call": call, "result": result.text(count),
+        "status": "success", "service_name": service_name, "tool_name": "web_search",
+    }
 
-        params: Dict[str, Any] = {"q": query, "count": count}
-        if freshness:
-            params["freshness"] = freshness
 
-        client = _get_openclaw_client()
-        t0 = _time.monotonic()
-        resp = await client.get(
-            api_base,
-            params=params,
-            headers={
-                "Accept": "application/json",
-                "X-Subscription-Token": api_key,
-            },
-            timeout=30.0,
-        )
-        elapsed = _time.monotonic() - t0
+async def _execute_naga_search(call: Dict[str, Any]) -> Dict[str, Any]:
+    """通过 NagaBusiness 搜索代理执行 web_search（已登录时优先使用）"""
+    return await _execute_cached_search(call, "naga", "naga_search", "Naga搜索")
 
-        if resp.status_code != 200:
-            try:
-                error_data = resp.json()
-                error_msg = str(error_data)[:200]
-            except Exception:
-                error_msg = f"HTTP {resp.status_code}"
-            logger.error(f"[AgenticLoop] Brave搜索错误: {error_msg}")
-            return {
-                "tool_call": call, "result": f"搜索失败: {error_msg}",
-                "status": "error", "service_name": "brave_search", "tool_name": "web_search",
-            }
 
-        data = resp.json()
-        results = data.get("web", {}).get("results", [])
-        if not results:
-            readable = "未找到相关搜索结果。"
-        else:
-            lines = []
-            for i, r in enumerate(results, 1):
-                title = r.get("title", "")
-                url = r.get("url", "")
-                desc = r.get("description", "")
-                age = r.get("age", "")
-                lines.append(f"{i}. {title}")
-                lines.append(f"   URL: {url}")
-                if desc:
-                    lines.append(f"   摘要: {desc}")
-                if age:
-                    lines.append(f"   时间: {age}")
-                lines.append("")
-            readable = "\n".join(lines)
-
-        logger.info(f"[AgenticLoop] Brave搜索完成: query=\"{query}\" 耗时 {elapsed:.2f}s, 结果数={len(results)}")
-        return {
-            "tool_call": call, "result": readable,
-            "status": "success", "service_name": "brave_search", "tool_name": "web_search",
-        }
-    except Exception as e:
-        logger.error(f"[AgenticLoop] Brave搜索异常: {e}")
-        return {
-            "tool_call": call, "result": f"搜索异常: {e}",
-            "status": "error", "service_name": "brave_search", "tool_name": "web_search",
-        }
+async def _execute_brave_search(call: Dict[str, Any]) -> Dict[str, Any]:
+    """通过配置的 Brave Search API Key 直接搜索（未登录 Naga 时使用）"""
+    return await _execute_cached_search(call, "brave", "brave_search", "Brave搜索")
 
 
 async def execute_pre_search(query: str, count: int = 8) -> Optional[str]:
@@ -553,7 +500,7 @@ async def _execute_openclaw_tool_call(call: Dict[str, Any]) -> Dict[str, Any]:
 
     if not tool_name:
         return {
-            "tool_call": call, "result": "缺少 tool_name",
+            "tool_call": call, "result": "缺少 tool_name", "error_kind": CALLER_ERROR,
             "status": "error", "service_name": "openclaw_tool", "tool_name": "unknown",
         }
 
@@ -572,11 +519,10 @@ async def _execute_openclaw_tool_call(call: Dict[str, Any]) -> Dict[str, Any]:
         }
 
     try:
-        client = _get_openclaw_client()
         t0 = _time.monotonic()
-        response = await client.post(
-            f"http://localhost:{get_server_port('agent_server')}/openclaw/tools/invoke",
-            json={"tool": tool_name, "args": tool_args},
+        response = await get_service_transport().post(
+            "agent_server", "/openclaw/tools/invoke",
+            json={"tool": tool_name, "args": tool_args}, timeout=_OPENCLAW_CALL_TIMEOUT,
         )
         elapsed = _time.monotonic() - t0
         if response.status_code == 200:
@@ -706,67 +652,77 @@ async def _send_live2d_actions(live2d_calls: List[Dict[str, Any]], session_id: s
     """Fire-and-forget发送Live2D动作到UI"""
 
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(timeout=5.0)) as client:
-            for call in live2d_calls:
-                action_name = call.get("action", "")
-                logger.info(f"[AgenticLoop] 发送 Live2D 动作: {action_name}, 完整调用: {call}")
-                if not action_name:
-                    continue
-                payload = {
-                    "session_id": session_id,
-                    "action": "live2d_action",
-                    "action_name": action_name,
-                }
-                try:
-                    await client.post(
-                        f"http://localhost:{get_server_port('api_server')}/ui_notification",
-                        json=payload,
-                    )
-                except Exception:
-                    pass
+        transport = get_service_transport()
+        for call in live2d_calls:
+            action_name = call.get("action", "")
+            logger.info(f"[AgenticLoop] 发送 Live2D 动作: {action_name}, 完整调用: {call}")
+            if not action_name:
+                continue
+            payload = {
+                "session_id": session_id,
+                "action": "live2d_action",
+                "action_name": action_name,
+            }
+            try:
+                await transport.post("api_server", "/ui_notification", json=payload, timeout=5.0)
+            except Exception:
+                pass
     except Exception as e:
         logger.debug(f"[AgenticLoop] Live2D动作发送失败: {e}")
 
 
-async def execute_tool_calls(tool_calls: List[Dict[str, Any]], session_id: str) -> List[Dict[str, Any]]:
+def _tool_attempt(call: Dict[str, Any], session_id: str):
+    """按 agentType 选择执行函数，未知 agentType 返回 None"""
+    agent_type = call.get("agentType", "")
+    if agent_type == "mcp":
+        return functools.partial(_execute_mcp_call, call, session_id)
+    if agent_type == "openclaw":
+        return functools.partial(_execute_openclaw_call, call, session_id)
+    if agent_type == "openclaw_tool":
+        return functools.partial(_execute_openclaw_tool_call, call)
+    if agent_type == "naga_control":
+        return functools.partial(_execute_naga_control, call)
+    return None
+
+
+def start_tool_call(call: Dict[str, Any], session_id: str) -> Optional[asyncio.Task]:
+    """立即开始执行单个工具调用（流式输出中解析出完整调用块时使用），未知 agentType 返回 None"""
+    attempt = _tool_attempt(call, session_id)
+    if attempt is None:
+        return None
+    return get_tool_executor().start(call, attempt)
+
+
+async def execute_tool_calls(tool_calls: List[Dict[str, Any]], session_id: str,
+                             started: Optional[Dict[int, asyncio.Task]] = None) -> List[Dict[str, Any]]:
     """按 agentType 分组并行执行工具调用（不包含 live2d）。
 
+    每个调用受 ToolExecutor 的超时 / 对冲 / 熔断策略约束，整轮受总预算约束，
+    结果与 tool_calls 一一对应（未知 agentType 返回错误结果）。
+    started 为流式阶段已提前开始执行的调用（id(call) → 任务），这些调用只等待结果，不再重复执行。
+
     Returns:
-        [{"tool_call": {...}, "result": "...", "status": "success|error", "service_name": "...", "tool_name": "..."}]
+        [{"tool_call": {...}, "result": "...", "status": "success|error", "service_name": "...", "tool_name": "...",
+          "elapsed_ms": ...}]
     """
-    tasks = []
-    for call in tool_calls:
-        agent_type = call.get("agentType", "")
-        if agent_type == "mcp":
-            tasks.append(_execute_mcp_call(call))
-        elif agent_type == "openclaw":
-            tasks.append(_execute_openclaw_call(call, session_id))
-        elif agent_type == "openclaw_tool":
-            tasks.append(_execute_openclaw_tool_call(call))
-        elif agent_type == "naga_control":
-            tasks.append(_execute_naga_control(call))
-        else:
-            logger.warning(f"[AgenticLoop] 未知agentType: {agent_type}, 跳过: {call}")
-
-    if not tasks:
-        return []
-
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    final = []
-    for r in results:
-        if isinstance(r, Exception):
-            final.append(
-                {
-                    "tool_call": {},
-                    "result": f"执行异常: {r}",
-                    "status": "error",
-                    "service_name": "unknown",
-                    "tool_name": "unknown",
-                }
-            )
-        else:
-            final.append(r)
-    return final
+    executor = get_tool_executor()
+    started = started or {}
+    calls = []
+    unknown = {}
+    for i, call in enumerate(tool_calls):
+        task = started.get(id(call))
+        if task is None:
+            attempt = _tool_attempt(call, session_id)
+            if attempt is None:
+                agent_type = call.get("agentType", "")
+                logger.warning(f"[AgenticLoop] 未知agentType: {agent_type}, 返回错误结果: {call}")
+                unknown[i] = error_result(call, f"未知的 agentType: {agent_type}")
+                continue
+            task = executor.start(call, attempt)
+        calls.append((call, task))
+
+    executed = iter(await executor.collect(calls))
+    return [unknown[i] if i in unknown else next(executed) for i in range(len(tool_calls))]
 
 
 # ---------------------------------------------------------------------------
@@ -926,99 +882,128 @@ async def run_agentic_loop(
         # 总结轮不传 tools（禁止再次工具调用）
         round_tools = tools if round_num <= max_rounds else None
 
-        async for chunk in llm_service.stream_chat_with_context(messages, get_config().api.temperature,
-                                                                 model_override=model_override,
-                                                                 tools=round_tools):
-            if chunk.startswith("data: "):
-                try:
-                    data_str = chunk[6:].strip()
-                    if data_str and data_str != "[DONE]":
-                        chunk_data = json.loads(data_str)
-                        chunk_type = chunk_data.get("type", "content")
-                        chunk_text = chunk_data.get("text", "")
-
-                        if chunk_type == "content":
-                            complete_text += chunk_text
-                        elif chunk_type == "reasoning":
-                            complete_reasoning += chunk_text
-                        elif chunk_type == "tool_calls_native":
-                            # 原生 function calling：完整 tool_calls JSON
-                            try:
-                                native_calls = json.loads(chunk_text)
-                            except (json.JSONDecodeError, TypeError):
-                                logger.warning(f"[AgenticLoop] native tool_calls 解析失败: {chunk_text[:200]}")
-                            continue  # 不透传此内部事件给前端
-                except Exception:
-                    pass
+        # 文本工具调用模式：```tool``` 代码块一闭合就开始执行，与剩余输出的流式生成并行
+        stream_parser = StreamingToolCallParser() if not round_tools else None
+        started: Dict[int, asyncio.Task] = {}  # id(call) → 已开始执行的任务
+        early_live2d: set = set()  # 已提前发送的 live2d 调用
 
-            # 透传所有SSE chunks给前端（content + reasoning）
-            yield chunk
-
-        # 3. 从完整输出中解析工具调用
-        #    优先使用 native tool calls，回退到文本解析（兼容期）
-        t_llm_elapsed = _time.monotonic() - t_llm_start
-        logger.info(
-            f"[AgenticLoop] Round {round_num} LLM流式输出完成: {t_llm_elapsed:.2f}s, "
-            f"content={len(complete_text)}字, reasoning={len(complete_reasoning)}字, "
-            f"native_calls={'yes' if native_calls else 'no'}"
-        )
-        logger.debug(
-            f"[AgenticLoop] Round {round_num} complete_text ({len(complete_text)} chars): {complete_text[:300]!r}"
-        )
-
-        use_native = False
-        if native_calls:
-            tool_calls = _convert_native_to_dispatch(native_calls)
-            clean_text = complete_text  # native 模式下 content 就是纯文本
-            use_native = True
-            logger.info(f"[AgenticLoop] Round {round_num}: 使用原生 function calling, {len(tool_calls)} 个工具调用")
-        else:
-            clean_text, tool_calls = parse_tool_calls_from_text(complete_text)
-
-        # 4. 分离live2d和可执行调用
-        actionable_calls = [tc for tc in tool_calls if tc.get("agentType") != "live2d"]
-        live2d_calls = [tc for tc in tool_calls if tc.get("agentType") == "live2d"]
-
-        # 4a. fire-and-forget Live2D
-        if live2d_calls:
-            asyncio.create_task(_send_live2d_actions(live2d_calls, session_id))
-
-        # 4b. 如果检测到了任何工具调用，发送 content_clean 让前端替换掉带有工具代码块的原文
-        if tool_calls and clean_text != complete_text:
-            # 保留工具调用前的简短说明文字（如"让我查一下"），仅移除 ```tool``` 代码块
-            yield _format_sse_event("content_clean", {"text": clean_text})
-
-        # 5. 如果没有可执行的工具调用，循环结束
-        if not actionable_calls:
-            t_round_elapsed = _time.monotonic() - t_round_start
-            t_total_elapsed = _time.monotonic() - t_loop_start
-            logger.info(f"[AgenticLoop] Round {round_num}: 无工具调用，循环结束 "
-                        f"(本轮 {t_round_elapsed:.2f}s, 总计 {t_total_elapsed:.2f}s)")
-            # 发送本轮结束信号
-            yield _format_sse_event("round_end", {"round": round_num, "has_more": False})
-            break
+        try:
+            async for chunk in llm_service.stream_chat_with_context(messages, get_config().api.temperature,
+                                                                     model_override=model_override,
+                                                                     tools=round_tools):
+                if chunk.startswith("data: "):
+                    try:
+                        data_str = chunk[6:].strip()
+                        if data_str and data_str != "[DONE]":
+                            chunk_data = json.loads(data_str)
+                            chunk_type = chunk_data.get("type", "content")
+                            chunk_text = chunk_data.get("text", "")
+
+                            if chunk_type == "content":
+                                complete_text += chunk_text
+                                if stream_parser is not None:
+                                    for call in stream_parser.feed(chunk_text):
+                                        if call.get("agentType") == "live2d":
+                                            early_live2d.add(id(call))
+                                            asyncio.create_task(_send_live2d_actions([call], session_id))
+                                            continue
+                                        task = start_tool_call(call, session_id)
+                                        if task is not None:
+                                            started[id(call)] = task
+                                            logger.info(
+                                                f"[AgenticLoop] Round {round_num}: 工具调用块已闭合，提前开始执行 "
+                                                f"{call.get('agentType')}:{call.get('service_name') or call.get('tool_name', '')} "
+                                                f"(LLM 已输出 {_time.monotonic() - t_llm_start:.2f}s)"
+                                            )
+                            elif chunk_type == "reasoning":
+                                complete_reasoning += chunk_text
+                            elif chunk_type == "tool_calls_native":
+                                # 原生 function calling：完整 tool_calls JSON
+                                try:
+                                    native_calls = json.loads(chunk_text)
+                                except (json.JSONDecodeError, TypeError):
+                                    logger.warning(f"[AgenticLoop] native tool_calls 解析失败: {chunk_text[:200]}")
+                                continue  # 不透传此内部事件给前端
+                    except Exception:
+                        pass
+
+                # 透传所有SSE chunks给前端（content + reasoning）
+                yield chunk
+
+            # 3. 从完整输出中解析工具调用
+            #    优先使用 native tool calls，回退到文本解析（兼容期）
+            t_llm_elapsed = _time.monotonic() - t_llm_start
+            logger.info(
+                f"[AgenticLoop] Round {round_num} LLM流式输出完成: {t_llm_elapsed:.2f}s, "
+                f"content={len(complete_text)}字, reasoning={len(complete_reasoning)}字, "
+                f"native_calls={'yes' if native_calls else 'no'}"
+            )
+            logger.debug(
+                f"[AgenticLoop] Round {round_num} complete_text ({len(complete_text)} chars): {complete_text[:300]!r}"
+            )
 
-        logger.info(f"[AgenticLoop] Round {round_num}: 检测到 {len(actionable_calls)} 个工具调用")
-
-        # 6. 通知前端正在执行工具
-        call_descriptions = []
-        for tc in actionable_calls:
-            desc = {"agentType": tc.get("agentType", "")}
-            if tc.get("service_name"):
-                desc["service_name"] = tc["service_name"]
-            if tc.get("tool_name"):
-                desc["tool_name"] = tc["tool_name"]
-            if tc.get("message"):
-                desc["message"] = tc["message"][:100]
-            call_descriptions.append(desc)
-        yield _format_sse_event("tool_calls", {"calls": call_descriptions})
-
-        # 7. 并行执行工具调用
-        t_tool_start = _time.monotonic()
-        results = await execute_tool_calls(actionable_calls, session_id)
+            use_native = False
+            if native_calls:
+                tool_calls = _convert_native_to_dispatch(native_calls)
+                clean_text = complete_text  # native 模式下 content 就是纯文本
+                use_native = True
+                logger.info(f"[AgenticLoop] Round {round_num}: 使用原生 function calling, {len(tool_calls)} 个工具调用")
+            elif stream_parser is not None:
+                clean_text, tool_calls = stream_parser.finish()
+            else:
+                clean_text, tool_calls = parse_tool_calls_from_text(complete_text)
+
+            # 4. 分离live2d和可执行调用（流式阶段已发送的 live2d 不再重复发送）
+            actionable_calls = [tc for tc in tool_calls if tc.get("agentType") != "live2d"]
+            live2d_calls = [tc for tc in tool_calls if tc.get("agentType") == "live2d" and id(tc) not in early_live2d]
+
+            # 4a. fire-and-forget Live2D
+            if live2d_calls:
+                asyncio.create_task(_send_live2d_actions(live2d_calls, session_id))
+
+            # 4b. 如果检测到了任何工具调用，发送 content_clean 让前端替换掉带有工具代码块的原文
+            if tool_calls and clean_text != complete_text:
+                # 保留工具调用前的简短说明文字（如"让我查一下"），仅移除 ```tool``` 代码块
+                yield _format_sse_event("content_clean", {"text": clean_text})
+
+            # 5. 如果没有可执行的工具调用，循环结束
+            if not actionable_calls:
+                t_round_elapsed = _time.monotonic() - t_round_start
+                t_total_elapsed = _time.monotonic() - t_loop_start
+                logger.info(f"[AgenticLoop] Round {round_num}: 无工具调用，循环结束 "
+                            f"(本轮 {t_round_elapsed:.2f}s, 总计 {t_total_elapsed:.2f}s)")
+                # 发送本轮结束信号
+                yield _format_sse_event("round_end", {"round": round_num, "has_more": False})
+                break
+
+            logger.info(f"[AgenticLoop] Round {round_num}: 检测到 {len(actionable_calls)} 个工具调用")
+
+            # 6. 通知前端正在执行工具
+            call_descriptions = []
+            for tc in actionable_calls:
+                desc = {"agentType": tc.get("agentType", "")}
+                if tc.get("service_name"):
+                    desc["service_name"] = tc["service_name"]
+                if tc.get("tool_name"):
+                    desc["tool_name"] = tc["tool_name"]
+                if tc.get("message"):
+                    desc["message"] = tc["message"][:100]
+                call_descriptions.append(desc)
+            yield _format_sse_event("tool_calls", {"calls": call_descriptions})
+
+            # 7. 并行执行工具调用
+            t_tool_start = _time.monotonic()
+            results = await execute_tool_calls(actionable_calls, session_id, started=started)
+        except BaseException:
+            # 客户端断开或生成器被关闭（流式输出中、content_clean/tool_calls 事件 yield 时或等待工具结果时）：
+            # 取消已提前派发的工具调用
+            for task in started.values():
+                task.cancel()
+            raise
         t_tool_elapsed = _time.monotonic() - t_tool_start
+        early_note = f", 其中 {len(started)} 个在流式输出中提前开始" if started else ""
         logger.info(f"[AgenticLoop] Round {round_num}: 工具执行完成 {t_tool_elapsed:.2f}s "
-                    f"({len(results)} 个工具)")
+                    f"({len(results)} 个工具{early_note})")
 
         # 7a. 检测连续失败：本轮所有工具是否全部失败
         all_failed = all(r.get("status") == "error" for r in results)
@@ -1040,6 +1025,7 @@ async def run_agentic_loop(
                     "tool_name": r.get("tool_name", ""),
                     "status": r.get("status", "unknown"),
                     "result": display_result,
+                    "elapsed_ms": r.get("elapsed_ms"),
                 }
             )
         yield _format_sse_event("tool_results", {"results": result_summaries})
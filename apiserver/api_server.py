@@ -74,14 +74,11 @@ def _save_conversation_and_logs(session_id: str, user_message: str, assistant_re
 async def _notify_conversation_event(event: str):
     """通知 agent_server 对话生命周期事件"""
     try:
-        from system.config import get_server_port
-        import httpx
-
-        async with httpx.AsyncClient(timeout=3.0, proxy=None) as client:
-            await client.post(
-                f"http://localhost:{get_server_port('agent_server')}/dogtag/conversation_event",
-                json={"event": event},
-            )
+        from system.service_transport import get_service_transport
+
+        await get_service_transport().post(
+            "agent_server", "/dogtag/conversation_event", json={"event": event}, timeout=3.0
+        )
         logger.info(f"[ConversationEvent] 已通知 agent_server: {event}")
     except Exception as e:
         logger.debug(f"[ConversationEvent] 通知失败: {e}")
@@ -102,6 +99,19 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             print(f"[WARN] 角色加载失败，使用默认提示词目录: {e}")
 
+        # 同进程的 mcp_server / agent_server 以及本服务自身直接调用以下内部接口，无需经过 HTTP
+        from system.service_transport import get_service_transport
+        from apiserver.routes.chat import chat, chat_stream
+        from apiserver.routes.tools import queue_push, ui_notification, websocket_broadcast
+
+        get_service_transport().register("api_server", {
+            ("POST", "/chat"): lambda body: chat(ChatRequest(**body)),
+            ("POST", "/chat/stream"): lambda body: chat_stream(ChatRequest(**body)),
+            ("POST", "/ui_notification"): ui_notification,
+            ("POST", "/queue/push"): queue_push,
+            ("POST", "/ws/broadcast"): websocket_broadcast,
+        })
+
         print("[SUCCESS] API服务器初始化完成")
         yield
     except Exception as e:
@@ -110,6 +120,8 @@ async def lifespan(app: FastAPI):
         sys.exit(1)
     finally:
         print("[INFO] 正在清理资源...")
+        from system.service_transport import get_service_transport
+        get_service_transport().unregister("api_server")
         # MCP服务现在由mcpserver独立管理，无需清理
 
 
@@ -316,19 +316,23 @@ def _get_compress_model_name() -> str:
 
 async def _generate_summary(conversation_text: str) -> Optional[str]:
     """调用轻量 LLM 生成对话摘要"""
+    from apiserver.llm_service import get_llm_service
+
+    model = _get_compress_model_name()
+    messages = [
+        {"role": "system", "content": _load_summarize_prompt()},
+        {"role": "user", "content": conversation_text},
+    ]
+    params = {"temperature": 0.3, "max_tokens": 5500}
+
+    async def call() -> str:
+        response = await acompletion(model=model, messages=messages, timeout=60, **params, **_get_compress_llm_params())
+        return response.choices[0].message.content or ""
+
     try:
-        response = await acompletion(
-            model=_get_compress_model_name(),
-            messages=[
-                {"role": "system", "content": _load_summarize_prompt()},
-                {"role": "user", "content": conversation_text},
-            ],
-            temperature=0.3,
-            max_tokens=5500,
-            timeout=60,
-            **_get_compress_llm_params(),
-        )
-        summary = response.choices[0].message.content or ""
+        # 相同的待压缩内容（如重试、多个会话共享的历史）直接复用摘要
+        result = await get_llm_service().cached_call("context_compressor", messages, call, model=model, params=params)
+        summary = result.content
         logger.info(f"[压缩] 摘要生成成功，{len(summary)} 字")
         return summary.strip()
     except Exception as e:
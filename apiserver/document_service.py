@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+文档解析服务 — 流式抽取 docx / xlsx / 文本内容
+
+- office-docs 模板中的抽取模块只加载一次并缓存
+- docx / xlsx 使用 iterparse 逐元素解析、处理完立即释放，内存占用与文档大小无关
+- 文本按块输出，达到字符预算后立即停止解析
+- 解析在专用线程池中执行，不阻塞事件循环
+"""
+
+import asyncio
+import csv
+import importlib.util
+import io
+import logging
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from types import ModuleType
+from typing import AsyncIterator, BinaryIO, Iterator, List, Optional, Tuple
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_SUFFIXES = (".docx", ".xlsx", ".txt", ".csv", ".md")
+DEFAULT_MAX_CHARS = 50000
+DEFAULT_MAX_ROWS = 500  # 每个工作表的行数上限，避免首个大表占满字符预算
+PARSE_WORKERS = 2
+TEXT_CHUNK_CHARS = 8192
+
+_TOOLS_DIR = Path(__file__).parent / "skills_templates" / "office-docs" / "tools"
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+@lru_cache(maxsize=None)
+def load_extractor(name: str) -> ModuleType:
+    """加载 office-docs 模板中的抽取模块（docx_extract / xlsx_extract），进程内只加载一次"""
+    spec = importlib.util.spec_from_file_location(f"office_docs_{name}", _TOOLS_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="doc-parse")
+    return _executor
+
+
+# ── 流式抽取 ─────────────────────────────────────
+
+
+def _batched(pieces: Iterator[str], chunk_chars: int = TEXT_CHUNK_CHARS) -> Iterator[str]:
+    """把段落/行级的小片段攒成约 chunk_chars 的文本块，减少逐片段经过生成器链的开销"""
+    pending: List[str] = []
+    size = 0
+    try:
+        for piece in pieces:
+            pending.append(piece)
+            size += len(piece)
+            if size >= chunk_chars:
+                yield "".join(pending)
+                pending.clear()
+                size = 0
+        if pending:
+            yield "".join(pending)
+    finally:
+        close = getattr(pieces, "close", None)
+        if close:
+            close()
+
+
+def iter_docx_text(source) -> Iterator[str]:
+    """按块输出 docx 正文，格式与 docx_extract.extract_docx_text 按换行拼接的结果一致"""
+    return _batched(_iter_docx_pieces(source))
+
+
+def _iter_docx_pieces(source) -> Iterator[str]:
+    mod = load_extractor("docx_extract")
+    body_tag = f"{{{mod.WORD_NS}}}body"
+    para_tag = f"{{{mod.WORD_NS}}}p"
+    table_tag = f"{{{mod.WORD_NS}}}tbl"
+
+    with zipfile.ZipFile(source, "r") as archive, archive.open("word/document.xml") as xml_file:
+        first = True
+        # 只在 body 的直接子元素结束时处理，表格内的段落由表格整体处理
+        depth = 0
+        body, body_depth = None, None
+        for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if elem.tag == body_tag:
+                    body, body_depth = elem, depth
+                continue
+
+            if body_depth is not None and depth == body_depth + 1:
+                lines: List[str] = []
+                if elem.tag == para_tag:
+                    paragraph = mod._extract_paragraph_text(elem)
+                    if paragraph:
+                        lines.append(paragraph)
+                elif elem.tag == table_tag:
+                    table_rows = mod._extract_table_rows(elem)
+                    if table_rows:
+                        lines.append("[TABLE]")
+                        lines.extend("\t".join(row) for row in table_rows)
+                        lines.append("[/TABLE]")
+                # 从 body 上摘掉已处理的元素，保持内存恒定
+                body.remove(elem)
+                if lines:
+                    text = "\n".join(lines)
+                    yield text if first else "\n" + text
+                    first = False
+            depth -= 1
+
+
+def _iter_shared_strings(archive: zipfile.ZipFile, sheet_ns: str) -> List[str]:
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    si_tag = f"{{{sheet_ns}}}si"
+    text_tag = f"{{{sheet_ns}}}t"
+    strings: List[str] = []
+    root = None
+    with archive.open("xl/sharedStrings.xml") as xml_file:
+        for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+            if root is None:
+                root = elem
+            if event == "end" and elem.tag == si_tag:
+                strings.append("".join(node.text for node in elem.iter(text_tag) if node.text))
+                root.remove(elem)
+    return strings
+
+
+def _iter_sheet_rows(
+    archive: zipfile.ZipFile,
+    sheet_path: str,
+    shared_strings: List[str],
+    max_rows: Optional[int],
+    mod: ModuleType,
+) -> Iterator[List[str]]:
+    """逐行解析工作表，单元格取值规则与 xlsx_extract._parse_sheet 一致"""
+    ns = mod.SHEET_NS
+    row_tag, cell_tag = f"{{{ns}}}row", f"{{{ns}}}c"
+    value_tag, text_tag = f"{{{ns}}}v", f"{{{ns}}}t"
+    emitted = 0
+    parents = []
+    col_cache: dict = {}  # 列字母 -> 列号，避免每个单元格都走一次正则
+    with archive.open(sheet_path) as xml_file:
+        for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+            if event == "start":
+                parents.append(elem)
+                continue
+            parents.pop()
+            if elem.tag != row_tag:
+                continue
+            row_cells = {}
+            for cell in elem:
+                if cell.tag != cell_tag:
+                    continue
+                letters = cell.attrib.get("r", "").rstrip("0123456789")
+                col_index = col_cache.get(letters)
+                if col_index is None:
+                    col_index = col_cache[letters] = mod._cell_ref_to_col_index(letters)
+                cell_type = cell.attrib.get("t")
+                value = ""
+                # 直接遍历子元素取 <v>，比 find() 的路径解析便宜
+                value_node = None
+                for child in cell:
+                    if child.tag == value_tag:
+                        value_node = child
+                        break
+                if cell_type == "s":
+                    if value_node is not None and value_node.text is not None:
+                        try:
+                            idx = int(value_node.text)
+                            value = shared_strings[idx] if idx < len(shared_strings) else ""
+                        except ValueError:
+                            value = ""
+                elif cell_type == "inlineStr":
+                    inline_node = next(cell.iter(text_tag), None)
+                    if inline_node is not None and inline_node.text is not None:
+                        value = inline_node.text
+                else:
+                    if value_node is not None and value_node.text is not None:
+                        value = value_node.text
+                if col_index > 0:
+                    row_cells[col_index] = value
+            # 从 sheetData 上摘掉已处理的行，保持内存恒定
+            if parents:
+                parents[-1].remove(elem)
+
+            if row_cells:
+                yield [row_cells.get(i, "") for i in range(1, max(row_cells) + 1)]
+                emitted += 1
+                if max_rows is not None and emitted >= max_rows:
+                    return
+
+
+def iter_xlsx_text(source, max_rows: Optional[int] = DEFAULT_MAX_ROWS) -> Iterator[str]:
+    """按块输出各工作表的 CSV 文本（每个表以 "## Sheet: 名称" 开头）"""
+    return _batched(_iter_xlsx_pieces(source, max_rows))
+
+
+def _iter_xlsx_pieces(source, max_rows: Optional[int]) -> Iterator[str]:
+    mod = load_extractor("xlsx_extract")
+    with zipfile.ZipFile(source, "r") as archive:
+        shared_strings = _iter_shared_strings(archive, mod.SHEET_NS)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=",", lineterminator="\n")
+        for i, (name, path) in enumerate(mod._load_sheet_targets(archive)):
+            yield ("\n" if i else "") + f"## Sheet: {name}\n"
+            for row in _iter_sheet_rows(archive, path, shared_strings, max_rows, mod):
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerow(row)
+                yield buffer.getvalue()
+
+
+def iter_plain_text(source: BinaryIO, chunk_chars: int = TEXT_CHUNK_CHARS) -> Iterator[str]:
+    """按块解码文本（UTF-8，非法字节替换；换行统一为 \\n）"""
+    stream = io.TextIOWrapper(source, encoding="utf-8", errors="replace")
+    try:
+        while True:
+            chunk = stream.read(chunk_chars)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        # 不关闭调用方传入的底层文件
+        stream.detach()
+
+
+def iter_document_text(source, suffix: str, max_rows: Optional[int] = DEFAULT_MAX_ROWS) -> Iterator[str]:
+    """按文件类型选择流式抽取器"""
+    suffix = suffix.lower()
+    if suffix == ".docx":
+        return iter_docx_text(source)
+    if suffix == ".xlsx":
+        return iter_xlsx_text(source, max_rows)
+    if suffix in (".txt", ".csv", ".md"):
+        return iter_plain_text(source)
+    raise ValueError(f"不支持的文件格式: {suffix}")
+
+
+def limit_chars(chunks: Iterator[str], max_chars: int) -> Iterator[Tuple[str, bool]]:
+    """
+    按字符预算截断文本流
+
+    产出 (文本块, 是否已截断)；预算用完后只再探测一次是否还有剩余内容，
+    随即关闭底层生成器，后续内容不再解析。
+    """
+    remaining = max_chars
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if remaining <= 0:
+                yield "", True
+                return
+            if len(chunk) > remaining:
+                yield chunk[:remaining], True
+                return
+            remaining -= len(chunk)
+            yield chunk, False
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+def parse_document(source, suffix: str, max_chars: int = DEFAULT_MAX_CHARS,
+                   max_rows: Optional[int] = DEFAULT_MAX_ROWS) -> Tuple[str, bool]:
+    """同步解析文档，返回 (截断后的文本, 是否截断)"""
+    parts: List[str] = []
+    truncated = False
+    for chunk, truncated in limit_chars(iter_document_text(source, suffix, max_rows), max_chars):
+        parts.append(chunk)
+    return "".join(parts), truncated
+
+
+# ── 异步接口 ─────────────────────────────────────
+
+
+async def parse_document_async(source, suffix: str, max_chars: int = DEFAULT_MAX_CHARS,
+                               max_rows: Optional[int] = DEFAULT_MAX_ROWS) -> Tuple[str, bool]:
+    """在解析线程池中执行 parse_document"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), parse_document, source, suffix, max_chars, max_rows)
+
+
+async def stream_document(source, suffix: str, max_chars: int = DEFAULT_MAX_CHARS,
+                          max_rows: Optional[int] = DEFAULT_MAX_ROWS) -> AsyncIterator[Tuple[str, bool]]:
+    """
+    异步流式解析：解析在线程池中逐块推进，文本块产生后立即交给调用方
+
+    调用方提前停止迭代时，底层生成器会被关闭，不再继续解析。
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    iterator = limit_chars(iter_document_text(source, suffix, max_rows), max_chars)
+    sentinel = object()
+    try:
+        while True:
+            item = await loop.run_in_executor(executor, next, iterator, sentinel)
+            if item is sentinel:
+                return
+            yield item
+    finally:
+        await loop.run_in_executor(executor, iterator.close)
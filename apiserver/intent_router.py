@@ -281,17 +281,19 @@ async def classify_intent(
         RouteResult 或 None（失败时回退到全量注入）
     """
     try:
+        from apiserver.llm_service import get_llm_service
+
         router_messages = _build_router_messages(messages, user_msg)
+        model = _get_router_model_name()
+        params = {"temperature": 0, "max_tokens": 80}
 
-        response = await acompletion(
-            model=_get_router_model_name(),
-            messages=router_messages,
-            temperature=0,
-            max_tokens=80,
-            **_get_router_llm_params(),
-        )
+        async def call() -> str:
+            response = await acompletion(model=model, messages=router_messages, **params, **_get_router_llm_params())
+            return response.choices[0].message.content or ""
 
-        output = response.choices[0].message.content or ""
+        # 语义缓存：最新用户消息相近且之前的上下文一致时复用分类结果
+        cached = await get_llm_service().cached_call("intent_router", router_messages, call, model=model, params=params)
+        output = cached.content
         result = _parse_router_output(output)
 
         tools_str = 'none' if not result.needs_tools else ', '.join(result.needed_builtins + result.needed_mcp + result.needed_skills)
@@ -0,0 +1,366 @@
+"""
+LLM 响应缓存 - 非对话类辅助调用（摘要、意图分类、五元组抽取等）的结果复用
+
+调用点通过 LLMService.cached_call(site, ...) 显式启用，策略按调用点配置：
+  - 精确匹配：键为 (调用点, 模型, 消息哈希, 参数)，参数不含 api_key / api_base / timeout 等连接字段
+  - 语义匹配（可选）：除"语义文本"（默认为最后一条 user 消息）外其余输入完全一致时，
+    用本地字符 n-gram 哈希向量（忽略空白与标点）计算余弦相似度，达到阈值即复用已有回答
+  - TTL 与条目上限（LRU 淘汰），空回答与调用失败不缓存
+  - 持久化到数据目录 llm_cache/responses.json，启动时加载未过期条目
+  - 按调用点统计命中（精确 / 语义）、未命中与节省的调用耗时
+
+内置策略见 DEFAULT_POLICIES，可通过 api.response_cache_sites 按调用点覆盖（如 {"intent_router": {"enabled": false}}）。
+心跳这类时效性强、结果会主动推送的调用不缓存；攻略路由已有 QueryRouter 自身的决策缓存，不再叠加一层。
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from system.config import get_config, get_data_dir
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 512
+SAVE_INTERVAL = 5.0  # 两次落盘之间的最短间隔（秒）
+
+# 连接与传输参数，不影响回答内容
+_TRANSPORT_PARAMS = {"api_key", "api_base", "base_url", "extra_body", "timeout", "stream", "stream_timeout", "num_retries"}
+
+_NOISE = re.compile(r"[\s\W_]+")  # 空白与标点不参与语义向量
+
+
+@dataclass
+class LLMCachePolicy:
+    """单个调用点的缓存策略"""
+
+    ttl: float
+    semantic: bool = False
+    threshold: float = 0.92  # 语义匹配的余弦相似度阈值
+    enabled: bool = True
+
+
+DEFAULT_POLICIES: Dict[str, LLMCachePolicy] = {
+    "context_compressor": LLMCachePolicy(ttl=86400.0),
+    "intent_router": LLMCachePolicy(ttl=600.0, semantic=True, threshold=0.95),
+    "quintuple_extraction": LLMCachePolicy(ttl=7 * 86400.0),
+}
+
+
+def policy_for(site: str) -> Optional[LLMCachePolicy]:
+    """内置策略叠加配置覆盖；未知调用点需在配置中给出 ttl 才会缓存"""
+    override = get_config().api.response_cache_sites.get(site) or {}
+    base = DEFAULT_POLICIES.get(site)
+    if base is None and "ttl" not in override:
+        return None
+    fields = dict(base.__dict__) if base is not None else {}
+    fields.update({k: v for k, v in override.items() if k in LLMCachePolicy.__dataclass_fields__})
+    policy = LLMCachePolicy(**fields)
+    return policy if policy.enabled and policy.ttl > 0 else None
+
+
+def embed_text(text: str) -> np.ndarray:
+    """本地文本向量：字符 1/2/3-gram 计数哈希到固定维度后 L2 归一化（无需模型与网络）"""
+    text = _NOISE.sub("", text).lower()
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for n, weight in ((1, 0.5), (2, 1.0), (3, 1.0)):
+        for i in range(len(text) - n + 1):
+            vector[zlib.crc32(text[i:i + n].encode("utf-8")) % EMBEDDING_DIM] += weight
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def _digest(value: Any) -> str:
+    text = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):  # 多模态消息只取文本部分
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+@dataclass
+class CacheEntry:
+    site: str
+    content: str
+    reasoning_content: Optional[str]
+    expires_at: float  # 墙钟时间，便于持久化
+    latency: float  # 原始调用耗时（秒），命中时计入节省
+    bucket: str = ""  # 语义匹配分桶（语义文本之外的输入哈希）
+    semantic_text: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+@dataclass
+class CacheLookup:
+    """一次查询的上下文：未命中时用于写回"""
+
+    site: str
+    policy: LLMCachePolicy
+    key: str
+    bucket: str = ""
+    semantic_text: str = ""
+    entry: Optional[CacheEntry] = None
+    matched_key: str = ""
+    match: str = ""  # exact / semantic
+    similarity: float = 0.0
+
+
+class LLMResponseCache:
+    """LLM 响应缓存（精确 + 可选语义匹配，LRU + TTL，可持久化）"""
+
+    def __init__(self, path: Optional[Path] = None, max_entries: Optional[int] = None,
+                 persist: Optional[bool] = None):
+        self._path = path
+        self._max_entries = max_entries
+        self._persist = persist
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._vectors: Dict[str, Dict[str, np.ndarray]] = {}  # {分桶: {键: 向量}}
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_save = 0.0
+        self._site_metrics: Dict[str, Dict[str, float]] = {}
+        self._loaded = False
+
+    # ── 配置 ──
+
+    @property
+    def enabled(self) -> bool:
+        return get_config().api.response_cache_enabled
+
+    @property
+    def max_entries(self) -> int:
+        if self._max_entries is not None:
+            return self._max_entries
+        return get_config().api.response_cache_max_entries
+
+    @property
+    def persist(self) -> bool:
+        if self._persist is not None:
+            return self._persist
+        return get_config().api.response_cache_persist
+
+    @property
+    def path(self) -> Path:
+        return self._path or get_data_dir() / "llm_cache" / "responses.json"
+
+    # ── 查询与写入 ──
+
+    def lookup(self, site: str, model: str, messages: List[Dict[str, Any]],
+               params: Optional[Dict[str, Any]] = None, semantic_text: Optional[str] = None
+               ) -> Optional[CacheLookup]:
+        """查询缓存；调用点未启用缓存时返回 None（调用方直接调用模型，不写回）"""
+        policy = policy_for(site) if self.enabled else None
+        if policy is None:
+            return None
+        self._ensure_loaded()
+
+        params = {k: v for k, v in (params or {}).items() if k not in _TRANSPORT_PARAMS and v is not None}
+        key = _digest({"site": site, "model": model, "messages": messages, "params": params})
+        lookup = CacheLookup(site=site, policy=policy, key=key)
+        if policy.semantic:
+            user_index = next((i for i in range(len(messages) - 1, -1, -1) if messages[i].get("role") == "user"), None)
+            if semantic_text is None:
+                semantic_text = _content_text(messages[user_index].get("content")) if user_index is not None else ""
+                rest = [m for i, m in enumerate(messages) if i != user_index]
+            else:
+                rest = [m for m in messages if _content_text(m.get("content")) != semantic_text]
+            lookup.semantic_text = semantic_text
+            lookup.bucket = _digest({"site": site, "model": model, "messages": rest, "params": params})
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                lookup.entry, lookup.matched_key, lookup.match, lookup.similarity = entry, key, "exact", 1.0
+            elif policy.semantic and lookup.semantic_text and lookup.bucket in self._vectors:
+                lookup.matched_key, lookup.similarity = self._nearest(lookup, now)
+                if lookup.matched_key:
+                    lookup.entry, lookup.match = self._entries[lookup.matched_key], "semantic"
+
+            if lookup.entry is not None:
+                self._entries.move_to_end(lookup.matched_key)
+                self._count(site, "exact_hits" if lookup.match == "exact" else "semantic_hits")
+                self._count(site, "saved_seconds", lookup.entry.latency)
+            else:
+                self._count(site, "misses")
+        return lookup
+
+    def _nearest(self, lookup: CacheLookup, now: float) -> Tuple[str, float]:
+        """同一分桶内相似度最高且未过期的条目键（未达阈值返回空字符串）"""
+        candidates = self._vectors[lookup.bucket]
+        keys = list(candidates)
+        matrix = np.stack([candidates[k] for k in keys])
+        scores = matrix @ embed_text(lookup.semantic_text)
+        for index in np.argsort(-scores):
+            score = float(scores[index])
+            if score < lookup.policy.threshold:
+                break
+            entry = self._entries.get(keys[index])
+            if entry is not None and entry.expires_at > now:
+                return keys[index], round(score, 4)
+        return "", round(float(scores.max()), 4) if len(scores) else 0.0
+
+    def store(self, lookup: CacheLookup, content: str, reasoning_content: Optional[str], latency: float) -> bool:
+        """写入成功的回答（空回答不缓存）"""
+        if not content or not content.strip():
+            return False
+        entry = CacheEntry(
+            site=lookup.site,
+            content=content,
+            reasoning_content=reasoning_content,
+            expires_at=time.time() + lookup.policy.ttl,
+            latency=latency,
+            bucket=lookup.bucket,
+            semantic_text=lookup.semantic_text if lookup.bucket else "",
+        )
+        with self._lock:
+            self._insert(lookup.key, entry)
+            self._count(lookup.site, "stores")
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._count(lookup.site, "evictions")
+            self._dirty = True
+        self.maybe_save()
+        return True
+
+    def _insert(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if entry.bucket and entry.semantic_text:
+            self._vectors.setdefault(entry.bucket, {})[key] = embed_text(entry.semantic_text)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.bucket in self._vectors:
+            bucket = self._vectors[entry.bucket]
+            bucket.pop(key, None)
+            if not bucket:
+                del self._vectors[entry.bucket]
+
+    def invalidate(self, site: Optional[str] = None) -> int:
+        """清除某个调用点（None 表示全部）的条目"""
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if site is None or e.site == site]
+            for key in keys:
+                self._remove(key)
+            self._dirty = self._dirty or bool(keys)
+        self.maybe_save(force=True)
+        return len(keys)
+
+    def _count(self, site: str, name: str, value: float = 1) -> None:
+        metrics = self._site_metrics.setdefault(site, {
+            "exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "saved_seconds": 0.0,
+        })
+        metrics[name] += value
+
+    # ── 持久化 ──
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.persist or not self.path.exists():
+                return
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception as e:
+                logger.warning(f"[LLMCache] 读取缓存文件失败，忽略: {e}")
+                return
+            now = time.time()
+            for key, raw in data.get("entries", {}).items():
+                try:
+                    entry = CacheEntry(**raw)
+                except TypeError:
+                    continue
+                if entry.expires_at > now:
+                    self._insert(key, entry)
+            logger.info(f"[LLMCache] 从磁盘加载 {len(self._entries)} 条缓存")
+
+    def maybe_save(self, force: bool = False) -> bool:
+        """有变更时落盘（两次落盘之间至少间隔 SAVE_INTERVAL 秒，force 时立即写入）"""
+        if not self.persist or not self._dirty:
+            return False
+        if not force and time.monotonic() - self._last_save < SAVE_INTERVAL:
+            return False
+        with self._lock:
+            now = time.time()
+            payload = {"version": 1, "entries": {
+                k: e.to_dict() for k, e in self._entries.items() if e.expires_at > now
+            }}
+            self._dirty = False
+            self._last_save = time.monotonic()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+            return True
+        except Exception as e:
+            logger.warning(f"[LLMCache] 写入缓存文件失败: {e}")
+            return False
+
+    # ── 统计 ──
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_site_entries: Dict[str, int] = {}
+            for entry in self._entries.values():
+                per_site_entries[entry.site] = per_site_entries.get(entry.site, 0) + 1
+            sites = {}
+            for site, metrics in sorted(self._site_metrics.items()):
+                hits = metrics["exact_hits"] + metrics["semantic_hits"]
+                lookups = hits + metrics["misses"]
+                sites[site] = {
+                    **{k: v for k, v in metrics.items() if k != "saved_seconds"},
+                    "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                    "saved_ms": round(metrics["saved_seconds"] * 1000, 1),
+                    "entries": per_site_entries.get(site, 0),
+                }
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persist": self.persist,
+                "saved_ms": round(sum(m["saved_seconds"] for m in self._site_metrics.values()) * 1000, 1),
+                "sites": sites,
+            }
+
+
+_response_cache: Optional[LLMResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> LLMResponseCache:
+    """获取全局 LLM 响应缓存"""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = LLMResponseCache()
+                atexit.register(_response_cache.maybe_save, True)  # 退出前写入防抖期内的变更
+    return _response_cache
@@ -0,0 +1,297 @@
+"""
+LLM 提供商池 - 多提供商加权路由、健康评分与故障转移
+
+主配置（api.base_url / api_key / model）与 api.providers 中启用的备用提供商组成提供商池：
+  - 加权路由：每次请求按 权重 × 健康系数 做加权随机排序，得到本次请求的尝试顺序
+  - 健康评分：按观测到的首 token 延迟（TTFT）与错误率的指数滑动平均计算健康系数，
+    TTFT 相对最快提供商越慢、错误率越高，分到的请求越少
+  - 熔断：连续失败达到阈值的提供商暂时移出（冷却后放行一个探测请求），全部熔断时仍按顺序尝试
+  - 并发上限：max_concurrency > 0 时满载的提供商排到后面，全部满载时在排序第一的提供商上排队
+  - 故障转移：尚未输出任何 token 前的失败（连接错误、首 token 超时、限流、5xx、认证失败）
+    切换到下一个提供商；已开始输出后失败不再切换，避免重复内容
+
+NagaModel 登录态与临时模型覆盖（视觉模型等）不经过提供商池。
+"""
+
+import asyncio
+import logging
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from system.config import get_config
+from apiserver.tool_execution import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_FAILURE_THRESHOLD = 3
+PROVIDER_RESET_SECONDS = 30.0
+EWMA_ALPHA = 0.3
+MIN_HEALTH = 0.05  # 健康系数下限：降权但不完全断流，便于恢复后重新被选中
+TTFT_TOLERANCE = 0.2  # 比最快提供商慢不超过该秒数时视为同样快，避免毫秒级抖动影响权重
+DEFAULT_ATTEMPTS = 3
+
+
+@dataclass(frozen=True)
+class ProviderEndpoint:
+    """单个提供商的连接参数"""
+
+    name: str
+    model: str
+    base_url: str
+    api_key: str
+    weight: float = 1.0
+    max_concurrency: int = 0
+
+    @property
+    def api_base(self) -> Optional[str]:
+        return self.base_url.rstrip("/") + "/" if self.base_url else None
+
+
+class ProviderState:
+    """提供商的健康状态、并发占用与统计"""
+
+    def __init__(self, endpoint: ProviderEndpoint):
+        self.endpoint = endpoint
+        self.breaker = CircuitBreaker(PROVIDER_FAILURE_THRESHOLD, PROVIDER_RESET_SECONDS)
+        self.ttft_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.in_flight = 0
+        # apiserver 与 agentserver 的事件循环各在自己的线程里，名额计数用线程锁保护，
+        # 等待者按 (事件循环, future) 登记，释放时在各自的循环里唤醒
+        self._slots_lock = threading.Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.requests = 0
+        self.failures = 0
+        self.failovers = 0  # 本提供商失败后转移到其他提供商的次数
+
+    @property
+    def name(self) -> str:
+        return self.endpoint.name
+
+    @property
+    def full(self) -> bool:
+        limit = self.endpoint.max_concurrency
+        return limit > 0 and self.in_flight >= limit
+
+    def available(self) -> bool:
+        """熔断器闭合，或冷却期已过可以探测（不改变熔断器状态）"""
+        return self.breaker.state == CircuitBreaker.CLOSED or self.breaker.retry_in() == 0.0
+
+    def health(self, best_ttft: Optional[float]) -> float:
+        factor = (1.0 - self.error_ewma) ** 2
+        if self.ttft_ewma and best_ttft:
+            factor *= min(1.0, (best_ttft + TTFT_TOLERANCE) / self.ttft_ewma)
+        return max(factor, MIN_HEALTH)
+
+    # ── 并发 ──
+
+    async def acquire(self, timeout: float) -> bool:
+        """占用一个并发名额，超时返回 False（有空闲名额时不会挂起，并发请求排序时能立即看到占用）"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self._slots_lock:
+                if not self.full:
+                    self.in_flight += 1
+                    return True
+                waiter = (loop, loop.create_future())
+                self._waiters.append(waiter)
+            try:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                await asyncio.wait_for(waiter[1], remaining)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                with self._slots_lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        with self._slots_lock:
+            self.in_flight -= 1
+            waiters, self._waiters = self._waiters, []
+        # 唤醒全部等待者重新争抢名额：被取消的等待者不会吞掉唤醒
+        for loop, future in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake, future)
+
+    # ── 观测 ──
+
+    def record_success(self, ttft: Optional[float]) -> None:
+        self.requests += 1
+        self.error_ewma *= 1 - EWMA_ALPHA
+        if ttft is not None:
+            self.ttft_ewma = ttft if self.ttft_ewma is None else (
+                EWMA_ALPHA * ttft + (1 - EWMA_ALPHA) * self.ttft_ewma
+            )
+        self.breaker.record_success()
+
+    def record_failure(self) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.error_ewma = EWMA_ALPHA + (1 - EWMA_ALPHA) * self.error_ewma
+        self.breaker.record_failure()
+
+    def record_caller_error(self) -> None:
+        """请求本身有问题（400、上下文过长、工具 schema 错误等）：不计入健康评分与熔断"""
+        self.requests += 1
+        self.breaker.release()
+
+    def to_dict(self, best_ttft: Optional[float]) -> Dict[str, Any]:
+        endpoint = self.endpoint
+        return {
+            "name": endpoint.name,
+            "model": endpoint.model,
+            "base_url": endpoint.base_url,
+            "weight": endpoint.weight,
+            "health": round(self.health(best_ttft), 4),
+            "ttft_ms": round(self.ttft_ewma * 1000, 1) if self.ttft_ewma is not None else None,
+            "error_rate": round(self.error_ewma, 4),
+            "in_flight": self.in_flight,
+            "max_concurrency": endpoint.max_concurrency,
+            "requests": self.requests,
+            "failures": self.failures,
+            "failovers": self.failovers,
+            "breaker": self.breaker.to_dict(),
+        }
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def endpoints_from_config(api_config=None) -> List[ProviderEndpoint]:
+    """主配置 + 启用的备用提供商；备用提供商未填 model 时沿用主配置"""
+    api = api_config or get_config().api
+    endpoints = [ProviderEndpoint(
+        name="primary",
+        model=api.model,
+        base_url=api.base_url,
+        api_key=api.api_key,
+        weight=api.weight,
+        max_concurrency=api.max_concurrency,
+    )]
+    names = {"primary"}
+    for provider in api.providers:
+        if not provider.enabled or not provider.base_url:
+            continue
+        name = provider.name or urlparse(provider.base_url).netloc or provider.base_url
+        if name in names:
+            name = f"{name}#{len(endpoints)}"
+        names.add(name)
+        endpoints.append(ProviderEndpoint(
+            name=name,
+            model=provider.model or api.model,
+            base_url=provider.base_url,
+            api_key=provider.api_key,
+            weight=provider.weight,
+            max_concurrency=provider.max_concurrency,
+        ))
+    return endpoints
+
+
+class ProviderPool:
+    """按配置维护提供商状态；配置变化时重建变化的提供商，未变化的保留健康数据"""
+
+    def __init__(self, endpoints: Optional[List[ProviderEndpoint]] = None, rng: Optional[random.Random] = None):
+        self._fixed = endpoints is not None
+        self._states: Dict[str, ProviderState] = {}
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._sync(endpoints if endpoints is not None else endpoints_from_config())
+
+    def _sync(self, endpoints: List[ProviderEndpoint]) -> None:
+        states = {}
+        for endpoint in endpoints:
+            state = self._states.get(endpoint.name)
+            states[endpoint.name] = state if state is not None and state.endpoint == endpoint else ProviderState(endpoint)
+        self._states = states
+        if len(states) > 1:
+            logger.info(f"[LLM] 提供商池: {', '.join(f'{name}(权重 {s.endpoint.weight:g})' for name, s in states.items())}")
+
+    @property
+    def states(self) -> List[ProviderState]:
+        if not self._fixed:
+            with self._lock:
+                endpoints = endpoints_from_config()
+                if [s.endpoint for s in self._states.values()] != endpoints:
+                    self._sync(endpoints)
+        return list(self._states.values())
+
+    def _best_ttft(self, states: List[ProviderState]) -> Optional[float]:
+        samples = [s.ttft_ewma for s in states if s.ttft_ewma is not None]
+        return min(samples) if samples else None
+
+    def rank(self) -> List[ProviderState]:
+        """本次请求的尝试顺序：可用且未满载 → 可用但满载 → 熔断中（按剩余冷却时间）"""
+        states = self.states
+        best_ttft = self._best_ttft(states)
+
+        def sort_key(state: ProviderState) -> float:
+            weight = state.endpoint.weight * state.health(best_ttft)
+            if weight <= 0:
+                return -1.0
+            return self._rng.random() ** (1.0 / weight)  # 加权随机排序（Efraimidis-Spirakis）
+
+        available = sorted((s for s in states if s.available()), key=sort_key, reverse=True)
+        ordered = [s for s in available if not s.full] + [s for s in available if s.full]
+        tripped = sorted((s for s in states if not s.available()), key=lambda s: s.breaker.retry_in())
+        return ordered + tripped
+
+    def plan(self, attempts: int = DEFAULT_ATTEMPTS) -> List[ProviderState]:
+        """尝试序列：每个提供商至少一次，不足 attempts 次时按顺序循环补足"""
+        ranked = self.rank()
+        plan = list(ranked)
+        while len(plan) < attempts:
+            plan.append(ranked[len(plan) % len(ranked)])
+        return plan
+
+    def get_stats(self) -> Dict[str, Any]:
+        states = self.states
+        best_ttft = self._best_ttft(states)
+        return {
+            "providers": [s.to_dict(best_ttft) for s in states],
+            "failovers": sum(s.failovers for s in states),
+        }
+
+
+def is_failover_error(error: BaseException) -> bool:
+    """尚未输出内容时是否可以换一个提供商重试；请求本身有问题（400 等）时换提供商也无济于事"""
+    import litellm
+
+    if isinstance(error, (asyncio.TimeoutError, litellm.Timeout, litellm.APIConnectionError,
+                          litellm.RateLimitError, litellm.ServiceUnavailableError,
+                          litellm.InternalServerError, litellm.AuthenticationError)):
+        return True
+    if isinstance(error, litellm.BadRequestError):
+        return False
+    status = getattr(error, "status_code", None)
+    return status is None or status >= 500 or status in (401, 403, 408, 429)
+
+
+def is_auth_error(error: BaseException) -> bool:
+    """认证失败：换提供商可能成功，但同一提供商重试没有意义"""
+    import litellm
+
+    return isinstance(error, litellm.AuthenticationError) or getattr(error, "status_code", None) in (401, 403)
+
+
+_pool: Optional[ProviderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_provider_pool() -> ProviderPool:
+    """获取全局 LLM 提供商池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProviderPool()
+    return _pool
+
@@ -5,10 +5,13 @@ LLM服务模块
 使用 LiteLLM 统一处理多模型的 COT/reasoning_content
 """
 
+import asyncio
+import json
 import logging
 import sys
 import os
-from typing import Optional, Dict, Any, List
+import time
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Union
 from dataclasses import dataclass
 
 # 添加项目根目录到Python路径
@@ -123,30 +126,33 @@ class LLMService:
             or (cfg.api.base_url.rstrip("/") + "/" if cfg.api.base_url else None),
         }
 
-    async def get_response(self, prompt: str, temperature: float = 0.7) -> str:
+    async def get_response(self, prompt: str, temperature: float = 0.7, cache_site: Optional[str] = None) -> str:
         """为其他模块提供API调用接口（保持向后兼容，只返回 content）"""
-        response = await self.get_response_with_reasoning(prompt, temperature)
+        response = await self.get_response_with_reasoning(prompt, temperature, cache_site=cache_site)
         return response.content
 
-    async def get_response_with_reasoning(self, prompt: str, temperature: float = 0.7) -> LLMResponse:
-        """为其他模块提供API调用接口，返回包含 reasoning_content 的完整响应"""
+    async def get_response_with_reasoning(self, prompt: str, temperature: float = 0.7,
+                                          cache_site: Optional[str] = None) -> LLMResponse:
+        """为其他模块提供API调用接口，返回包含 reasoning_content 的完整响应
+
+        cache_site: 非对话类调用点名称，指定时按该调用点的策略缓存结果（见 llm_cache）
+        """
         if not self._initialized:
             self._initialize_client()
             if not self._initialized:
                 return LLMResponse(content="LLM服务不可用: 客户端初始化失败")
 
+        messages = [{"role": "user", "content": prompt}]
+        params = {"temperature": temperature, "max_tokens": get_config().api.max_tokens}
+
+        async def call() -> LLMResponse:
+            response = await self._complete_with_failover(messages=messages, **params)
+            return self._to_llm_response(response)
+
         try:
-            response = await acompletion(
-                model=self._get_model_name(),
-                messages=[{"role": "user", "content": prompt}],
-                temperature=temperature,
-                max_tokens=get_config().api.max_tokens,
-                **self._get_llm_params()
-            )
-            message = response.choices[0].message
-            return LLMResponse(
-                content=message.content or "", reasoning_content=getattr(message, "reasoning_content", None)
-            )
+            if cache_site:
+                return await self.cached_call(cache_site, messages, call, params=params)
+            return await call()
         except Exception as e:
             logger.error(f"API调用失败: {e}")
             return LLMResponse(content=f"API调用出错: {str(e)}")
@@ -155,9 +161,10 @@ class LLMService:
         """检查LLM服务是否可用"""
         return self._initialized
 
-    async def chat_with_context(self, messages: List[Dict], temperature: float = 0.7) -> str:
+    async def chat_with_context(self, messages: List[Dict], temperature: float = 0.7,
+                                cache_site: Optional[str] = None) -> str:
         """带上下文的聊天调用（保持向后兼容，只返回 content）"""
-        response = await self.chat_with_context_and_reasoning(messages, temperature)
+        response = await self.chat_with_context_and_reasoning(messages, temperature, cache_site=cache_site)
         return response.content
 
     async def chat_with_context_and_reasoning_with_overrides(
@@ -168,8 +175,12 @@ class LLMService:
         api_key_override: Optional[str] = None,
         api_base_override: Optional[str] = None,
         provider_hint: Optional[str] = None,
+        cache_site: Optional[str] = None,
     ) -> LLMResponse:
-        """带上下文聊天（支持模型/网关覆写）"""
+        """带上下文聊天（支持模型/网关覆写）
+
+        cache_site: 非对话类调用点名称，指定时按该调用点的策略缓存结果（见 llm_cache）
+        """
         if not self._initialized:
             self._initialize_client()
             if not self._initialized:
@@ -178,33 +189,41 @@ class LLMService:
         final_model = model_override or get_config().api.model
         final_base = api_base_override or get_config().api.base_url
         final_api_key = api_key_override or get_config().api.api_key
+        overridden = bool(model_override or api_key_override or api_base_override or provider_hint)
 
-        try:
-            model_name = final_model
-            if provider_hint and provider_hint != "openai":
-                # gemini 等非 openai provider，加 LiteLLM 前缀
-                if not model_name.startswith(f"{provider_hint}/"):
-                    model_name = f"{provider_hint}/{model_name}"
+        model_name = final_model
+        if provider_hint and provider_hint != "openai":
+            # gemini 等非 openai provider，加 LiteLLM 前缀
+            if not model_name.startswith(f"{provider_hint}/"):
+                model_name = f"{provider_hint}/{model_name}"
+        else:
+            # openai 或未指定: 走原有 base_url 推断逻辑
+            model_name = self._get_model_name(model_name, final_base)
+        params = {"temperature": temperature, "max_tokens": get_config().api.max_tokens}
+
+        async def call() -> LLMResponse:
+            if not overridden:
+                # 未覆写时走提供商池（NagaModel 登录态走网关）
+                response = await self._complete_with_failover(messages=messages, **params)
             else:
-                # openai 或未指定: 走原有 base_url 推断逻辑
-                model_name = self._get_model_name(model_name, final_base)
-
-            response = await acompletion(
-                model=model_name,
-                messages=messages,
-                temperature=temperature,
-                    max_tokens=get_config().api.max_tokens if hasattr(get_config().api, 'max_tokens') else None,
-                **self._get_overridden_llm_params(final_api_key, final_base)
-            )
-            message = response.choices[0].message
-            return LLMResponse(
-                content=message.content or "", reasoning_content=getattr(message, "reasoning_content", None)
-            )
+                response = await acompletion(
+                    model=model_name,
+                    messages=messages,
+                    **params,
+                    **self._get_overridden_llm_params(final_api_key, final_base)
+                )
+            return self._to_llm_response(response)
+
+        try:
+            if cache_site:
+                return await self.cached_call(cache_site, messages, call, model=model_name, params=params)
+            return await call()
         except Exception as e:
             logger.error(f"上下文聊天调用失败: {e}")
             return LLMResponse(content=f"聊天调用出错: {str(e)}")
 
-    async def chat_with_context_and_reasoning(self, messages: List[Dict], temperature: float = 0.7) -> LLMResponse:
+    async def chat_with_context_and_reasoning(self, messages: List[Dict], temperature: float = 0.7,
+                                              cache_site: Optional[str] = None) -> LLMResponse:
         """带上下文的聊天调用，返回包含 reasoning_content 的完整响应"""
         return await self.chat_with_context_and_reasoning_with_overrides(
             messages=messages,
@@ -212,13 +231,61 @@ class LLMService:
             model_override=None,
             api_key_override=None,
             api_base_override=None,
+            cache_site=cache_site,
         )
 
+    @staticmethod
+    def _to_llm_response(response) -> LLMResponse:
+        message = response.choices[0].message
+        return LLMResponse(content=message.content or "", reasoning_content=getattr(message, "reasoning_content", None))
+
+    async def cached_call(
+        self,
+        site: str,
+        messages: List[Dict[str, Any]],
+        call: Callable[[], Awaitable[Union[LLMResponse, str]]],
+        *,
+        model: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        semantic_text: Optional[str] = None,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> LLMResponse:
+        """非流式辅助调用的响应缓存：命中时直接返回，未命中时执行 call 并写回
+
+        Args:
+            site: 调用点名称，对应 llm_cache 中的缓存策略（未配置策略的调用点不缓存）
+            messages: 本次调用的消息（参与缓存键计算）
+            call: 实际调用模型的无参协程函数，返回 LLMResponse 或文本
+            model: 模型名称，默认使用主配置的模型
+            params: 影响输出的调用参数（temperature、max_tokens 等）
+            semantic_text: 语义匹配使用的文本，默认为最后一条 user 消息
+            validate: 结果校验函数，返回 False 时不写入缓存（如 JSON 解析失败）
+
+        call 抛出的异常原样向上传递，空结果与异常都不会被缓存。
+        """
+        from apiserver.llm_cache import get_response_cache
+
+        cache = get_response_cache()
+        lookup = cache.lookup(site, model or self._get_model_name(), messages, params, semantic_text)
+        if lookup is not None and lookup.entry is not None:
+            similarity = f"，相似度 {lookup.similarity}" if lookup.match == "semantic" else ""
+            logger.debug(f"[LLMCache] {site} 命中（{lookup.match}{similarity}）")
+            return LLMResponse(content=lookup.entry.content, reasoning_content=lookup.entry.reasoning_content)
+
+        start = time.monotonic()
+        result = await call()
+        response = result if isinstance(result, LLMResponse) else LLMResponse(content=result or "")
+        if lookup is not None and (validate is None or validate(response.content)):
+            cache.store(lookup, response.content, response.reasoning_content, time.monotonic() - start)
+        return response
+
     async def stream_chat_with_context(self, messages: List[Dict], temperature: float = 0.7,
                                        model_override: Optional[Dict[str, str]] = None,
                                        tools: Optional[List[Dict]] = None):
         """带上下文的流式聊天调用，支持 reasoning_content 交织输出 + 原生 function calling
 
+        未登录 NagaModel 且无模型覆盖时经过提供商池（加权路由 + 故障转移），见 llm_providers。
+
         Args:
             messages: 对话消息列表
             temperature: 生成温度
@@ -236,6 +303,209 @@ class LLMService:
                 yield self._format_sse_chunk("content", "LLM服务不可用: 客户端初始化失败")
                 return
 
+        if model_override or naga_auth.is_authenticated():
+            stream = self._stream_single_endpoint(messages, temperature, model_override, tools)
+        else:
+            stream = self._stream_with_failover(messages, temperature, tools)
+        async for chunk in stream:
+            yield chunk
+
+    def _build_stream_params(self, model_name: str, messages: List[Dict], temperature: float,
+                             tools: Optional[List[Dict]], llm_params: Dict[str, Any]) -> Dict[str, Any]:
+        call_params = {
+            "model": model_name,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": get_config().api.max_tokens if hasattr(get_config().api, "max_tokens") else None,
+            "stream": True,
+            "timeout": 120,
+            "stream_timeout": 120,
+            "num_retries": 0,
+            **llm_params
+        }
+        if tools:
+            call_params["tools"] = tools
+            call_params["parallel_tool_calls"] = True
+        return call_params
+
+    async def _relay_stream(self, response, deadline: Optional[float] = None, timing: Optional[Dict] = None):
+        """把 LiteLLM 流式响应转换为 SSE 事件
+
+        Args:
+            response: acompletion(stream=True) 的返回值
+            deadline: 首个 token 的截止时间（time.monotonic()），超时抛出 asyncio.TimeoutError
+            timing: 收到首个 token 时写入 {"first_token": time.monotonic()}
+        """
+        # 累积器：tool_calls 增量拼接
+        pending_tool_calls = {}  # {index: {id, name, arguments}}
+        first_token = False
+        iterator = response.__aiter__()
+
+        while True:
+            try:
+                if deadline is not None and not first_token:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), max(deadline - time.monotonic(), 0.001))
+                else:
+                    chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            if not chunk.choices:
+                continue
+
+            delta = chunk.choices[0].delta
+            reasoning = getattr(delta, "reasoning_content", None)
+            content = getattr(delta, "content", None)
+            tc_deltas = getattr(delta, "tool_calls", None)
+            if not first_token and (reasoning or content or tc_deltas):
+                first_token = True
+                if timing is not None:
+                    timing["first_token"] = time.monotonic()
+
+            # 处理 reasoning_content（思考过程）
+            if reasoning:
+                yield self._format_sse_chunk("reasoning", reasoning)
+
+            # 处理 content（正式回答）
+            if content:
+                yield self._format_sse_chunk("content", content)
+
+            # 处理 tool_calls delta（原生 function calling）
+            if tc_deltas:
+                for tc in tc_deltas:
+                    idx = tc.index
+                    if idx not in pending_tool_calls:
+                        pending_tool_calls[idx] = {"id": "", "name": "", "arguments": ""}
+                    if tc.id:
+                        pending_tool_calls[idx]["id"] = tc.id
+                    if tc.function:
+                        if tc.function.name:
+                            pending_tool_calls[idx]["name"] = tc.function.name
+                        if tc.function.arguments:
+                            pending_tool_calls[idx]["arguments"] += tc.function.arguments
+
+        # 流结束后，如果有 tool_calls，yield 一个完整事件
+        if pending_tool_calls:
+            calls = [pending_tool_calls[i] for i in sorted(pending_tool_calls)]
+            yield self._format_sse_chunk("tool_calls_native", json.dumps(calls, ensure_ascii=False))
+
+    async def _stream_with_failover(self, messages: List[Dict], temperature: float, tools: Optional[List[Dict]]):
+        """按提供商池的尝试顺序流式调用：尚未输出内容前失败则切换到下一个提供商"""
+        from .llm_providers import get_provider_pool, is_auth_error, is_failover_error
+
+        plan = get_provider_pool().plan()
+        first_token_timeout = get_config().api.first_token_timeout
+        tried, rejected = set(), set()
+        last_error: Optional[BaseException] = None
+
+        for attempt, provider in enumerate(plan):
+            # 熔断中的提供商只在第一次尝试时放行（全部熔断时不至于直接失败）；认证失败的不再重试
+            if provider.name in rejected or (not provider.breaker.allow() and tried):
+                continue
+            if provider.name in tried:
+                await asyncio.sleep(1)  # 同一提供商重试前短暂等待
+            tried.add(provider.name)
+            if not await provider.acquire(first_token_timeout):
+                last_error = asyncio.TimeoutError(f"提供商 {provider.name} 并发已满")
+                continue
+
+            endpoint = provider.endpoint
+            call_params = self._build_stream_params(
+                self._get_model_name(endpoint.model, endpoint.base_url), messages, temperature, tools,
+                {"api_key": endpoint.api_key, "api_base": endpoint.api_base},
+            )
+            started = time.monotonic()
+            deadline = started + first_token_timeout
+            timing: Dict[str, float] = {}
+            yielded = False
+            try:
+                response = await asyncio.wait_for(acompletion(**call_params), first_token_timeout)
+                async for sse in self._relay_stream(response, deadline, timing):
+                    yielded = True
+                    yield sse
+            except Exception as e:
+                # 只有会触发故障转移的错误才算提供商失败；请求本身的错误（400 等）不计入熔断
+                failover = is_failover_error(e)
+                if failover:
+                    provider.record_failure()
+                else:
+                    provider.record_caller_error()
+                if yielded or not failover:
+                    logger.error(f"[LLM] 提供商 {provider.name} 流式调用失败: {e!r}")
+                    yield self._format_sse_chunk("content", f"流式调用出错: {str(e) or type(e).__name__}")
+                    return
+                last_error = e
+                if is_auth_error(e):
+                    rejected.add(provider.name)
+                if attempt < len(plan) - 1:
+                    provider.failovers += 1
+                    logger.warning(f"[LLM] 提供商 {provider.name} 未输出即失败 ({attempt + 1}/{len(plan)})，"
+                                   f"切换下一个: {e!r}")
+                continue
+            finally:
+                provider.release()
+
+            ttft = timing["first_token"] - started if "first_token" in timing else None
+            provider.record_success(ttft)
+            return
+
+        logger.error(f"[LLM] 流式调用已耗尽所有提供商: {last_error!r}")
+        yield self._format_sse_chunk(
+            "content", f"流式调用出错（已尝试 {len(tried)} 个提供商）: {str(last_error) or type(last_error).__name__}"
+        )
+
+    async def _complete_with_failover(self, **params):
+        """非流式调用：NagaModel 登录态走网关，否则按提供商池的尝试顺序调用，失败时切换提供商"""
+        if naga_auth.is_authenticated():
+            return await acompletion(model=self._get_model_name(), **params, **self._get_llm_params())
+
+        from .llm_providers import get_provider_pool, is_auth_error, is_failover_error
+
+        plan = get_provider_pool().plan()
+        timeout = get_config().api.first_token_timeout
+        tried, rejected = set(), set()
+        last_error: Optional[BaseException] = None
+
+        for attempt, provider in enumerate(plan):
+            if provider.name in rejected or (not provider.breaker.allow() and tried):
+                continue
+            if provider.name in tried:
+                await asyncio.sleep(1)
+            tried.add(provider.name)
+            if not await provider.acquire(timeout):
+                last_error = asyncio.TimeoutError(f"提供商 {provider.name} 并发已满")
+                continue
+
+            endpoint = provider.endpoint
+            try:
+                response = await acompletion(
+                    model=self._get_model_name(endpoint.model, endpoint.base_url),
+                    api_key=endpoint.api_key,
+                    api_base=endpoint.api_base,
+                    **params
+                )
+            except Exception as e:
+                if not is_failover_error(e):
+                    provider.record_caller_error()
+                    raise
+                provider.record_failure()
+                last_error = e
+                if is_auth_error(e):
+                    rejected.add(provider.name)
+                if attempt < len(plan) - 1:
+                    provider.failovers += 1
+                    logger.warning(f"[LLM] 提供商 {provider.name} 调用失败 ({attempt + 1}/{len(plan)})，切换下一个: {e!r}")
+                continue
+            finally:
+                provider.release()
+
+            provider.record_success(None)
+            return response
+
+        raise last_error
+
+    async def _stream_single_endpoint(self, messages: List[Dict], temperature: float,
+                                      model_override: Optional[Dict[str, str]], tools: Optional[List[Dict]]):
+        """单一端点的流式调用（NagaModel 网关 / 临时模型覆盖）"""
         # 重试策略：最多 3 次
         #   - 401 AuthenticationError → 刷新 token 后重试（最多 1 次）
         #   - 连接错误 / 流中断  → 直接重试（最多 2 次）
@@ -281,62 +551,11 @@ class LLMService:
                              f"api_key_prefix={str(llm_params.get('api_key', ''))[:20]}... "
                              f"api_base={llm_params.get('api_base')}")
 
-                call_params = {
-                    "model": model_name,
-                    "messages": messages,
-                    "temperature": temperature,
-                    "max_tokens": get_config().api.max_tokens if hasattr(get_config().api, "max_tokens") else None,
-                    "stream": True,
-                    "timeout": 120,
-                    "stream_timeout": 120,
-                    "num_retries": 0,
-                    **llm_params
-                }
-                if tools:
-                    call_params["tools"] = tools
-                    call_params["parallel_tool_calls"] = True
-
+                call_params = self._build_stream_params(model_name, messages, temperature, tools, llm_params)
                 response = await acompletion(**call_params)
 
-                # 累积器：tool_calls 增量拼接
-                pending_tool_calls = {}  # {index: {id, name, arguments}}
-
-                async for chunk in response:
-                    if not chunk.choices:
-                        continue
-
-                    delta = chunk.choices[0].delta
-
-                    # 处理 reasoning_content（思考过程）
-                    reasoning = getattr(delta, "reasoning_content", None)
-                    if reasoning:
-                        yield self._format_sse_chunk("reasoning", reasoning)
-
-                    # 处理 content（正式回答）
-                    content = getattr(delta, "content", None)
-                    if content:
-                        yield self._format_sse_chunk("content", content)
-
-                    # 处理 tool_calls delta（原生 function calling）
-                    tc_deltas = getattr(delta, "tool_calls", None)
-                    if tc_deltas:
-                        for tc in tc_deltas:
-                            idx = tc.index
-                            if idx not in pending_tool_calls:
-                                pending_tool_calls[idx] = {"id": "", "name": "", "arguments": ""}
-                            if tc.id:
-                                pending_tool_calls[idx]["id"] = tc.id
-                            if tc.function:
-                                if tc.function.name:
-                                    pending_tool_calls[idx]["name"] = tc.function.name
-                                if tc.function.arguments:
-                                    pending_tool_calls[idx]["arguments"] += tc.function.arguments
-
-                # 流结束后，如果有 tool_calls，yield 一个完整事件
-                if pending_tool_calls:
-                    import json
-                    calls = [pending_tool_calls[i] for i in sorted(pending_tool_calls)]
-                    yield self._format_sse_chunk("tool_calls_native", json.dumps(calls, ensure_ascii=False))
+                async for sse in self._relay_stream(response):
+                    yield sse
 
                 # 流式响应正常完成，跳出重试循环
                 return
@@ -368,7 +587,6 @@ class LLMService:
                 # 连接错误 / 流中断 / 超时 → 重试
                 if attempt < max_attempts - 1:
                     logger.warning(f"[LLM] 流式调用连接异常 (attempt {attempt + 1}/{max_attempts})，重试中: {e}")
-                    import asyncio
                     await asyncio.sleep(1)  # 短暂等待后重试
                     continue
                 logger.error(f"[LLM] 流式调用连接异常，已耗尽重试次数: {e}")
@@ -390,8 +608,6 @@ class LLMService:
         Returns:
             SSE 格式的数据块
         """
-        import json
-
         data = {"type": chunk_type, "text": text}
         return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
 
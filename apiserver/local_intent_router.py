@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+本地意图预路由
+
+在主 LLM 调用前，不经过任何模型调用，判断用户消息需要哪些工具组，只下发相关的工具 schema：
+  - 规则：关键词（Aho-Corasick 单次扫描）与正则，内置工具组的规则写在本模块，
+    MCP 服务的规则从 manifest 生成（routing.keywords / routing.patterns、工具名与别名、
+    描述中引号括起的示例说法），技能组的关键词从技能元数据生成
+  - 分类器：基于字符 unigram/bigram 的多项式朴素贝叶斯，用 intent_corpus.jsonl 与
+    manifest 示例训练（首次路由时训练，毫秒级）
+  - 当前消息没有规则命中时，沿用上一条用户消息的规则命中（"那明天呢" 之类的追问）
+  - 置信度低于 handoff.pre_router_min_confidence 时回退全量工具
+
+闲聊（置信的 none）只保留 live2d；技能列表只在回退或命中技能组时注入。
+intent_router.classify_intent 为基于 nano 模型的路由，延迟与费用较高，对话主路径使用本模块。
+"""
+
+import json
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, Optional, Pattern, Set, Tuple
+
+from system.config import get_config
+from system.parsing.keyword_automaton import KeywordAutomaton
+
+logger = logging.getLogger("LocalIntentRouter")
+
+CORPUS_FILE = Path(__file__).parent / "intent_corpus.jsonl"
+
+NONE = "none"
+ALWAYS_GROUPS = frozenset({"live2d"})  # 表情动作始终可用
+RULE_CONFIDENCE = 0.9
+CLASSIFIER_THRESHOLD = 0.35  # 分类器概率达到该值的工具组加入结果
+LATENCY_WINDOW = 500
+
+# OpenClaw 直接工具 → 工具组
+_OPENCLAW_TOOL_GROUPS = {
+    "web_search": "web",
+    "web_fetch": "web",
+    "browser": "browser",
+    "exec": "system",
+    "process": "system",
+    "read": "system",
+    "write": "system",
+    "edit": "system",
+    "grep": "system",
+    "find": "system",
+    "ls": "system",
+    "image": "system",
+    "memory_search": "memory",
+    "memory_get": "memory",
+    "cron": "schedule",
+}
+
+# 内置工具组规则：(关键词, 正则)
+_BUILTIN_RULES: Dict[str, Tuple[List[str], List[str]]] = {
+    "web": (
+        ["搜一下", "搜索", "搜搜", "查一下", "查查", "联网", "上网", "百度", "谷歌", "google", "新闻", "热点",
+         "最新", "股价", "汇率", "价格", "比分", "网页内容", "链接"],
+        [r"https?://", r"www\.", r"(多少钱|什么价)"],
+    ),
+    "browser": (
+        ["浏览器", "网页上", "打开网页", "登录网站", "填表", "表单"],
+        [],
+    ),
+    "system": (
+        ["命令", "终端", "shell", "cmd", "powershell", "脚本", "文件", "文件夹", "目录", "桌面上", "进程",
+         "内存", "cpu", "磁盘", "硬盘", "配置文件", "pip ", "npm ", "git "],
+        [r"[a-zA-Z]:[\\/]", r"\.(txt|md|py|json|pdf|docx?|xlsx?|csv|log)\b", r"(执行|运行|跑)一下.{0,10}(命令|脚本)"],
+    ),
+    "memory": (
+        ["记得", "记不记得", "回忆", "之前聊过", "上次说", "我说过"],
+        [],
+    ),
+    "schedule": (
+        ["提醒我", "提醒", "定时", "闹钟", "每天早上", "每周", "每天晚上", "倒计时"],
+        [r"\d+\s*(分钟|小时)(后|以后)", r"(明天|后天|今晚).{0,6}(点|:).{0,8}提醒"],
+    ),
+    "agent": (
+        ["调研", "报告", "研究一下", "多步", "agent模式", "agent 模式", "openclaw", "写一份", "整理成"],
+        [],
+    ),
+    "openclaw_admin": (
+        ["telegram", "discord", "微信群发", "会话列表", "网关", "节点", "画布", "子agent"],
+        [],
+    ),
+    "naga_control": (
+        ["语音", "声音", "live2d", "模型", "角色", "温度", "音乐", "播放", "下一首", "上一首", "暂停",
+         "清空会话", "当前会话", "旅行", "探索", "记忆库", "mcp服务", "mcp 服务", "设置", "配置"],
+        [r"(切换|换)(到|成|个)", r"(打开|关闭|关掉|开启)(语音|声音|live2d|tts)"],
+    ),
+    "skills": (
+        ["技能", "skill"],
+        [],
+    ),
+}
+
+_QUOTED = re.compile(r"[\"“「]([^\"”」\n]{2,12})[\"”」]")
+_ASCII_WORD = re.compile(r"[a-z0-9_]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """全角转半角、忽略大小写、合并空白"""
+    return _SPACES.sub(" ", unicodedata.normalize("NFKC", text)).strip().lower()
+
+
+def schema_group(name: str) -> str:
+    """function 名称 → 工具组"""
+    parts = name.split("__")
+    agent_type = parts[0]
+    if agent_type == "openclaw_tool" and len(parts) >= 2:
+        return _OPENCLAW_TOOL_GROUPS.get(parts[1], "openclaw_admin")
+    if agent_type == "openclaw":
+        return "agent"
+    if agent_type == "mcp" and len(parts) >= 3:
+        return f"mcp:{parts[1]}"
+    return agent_type
+
+
+# ---------------------------------------------------------------------------
+# 分类器
+# ---------------------------------------------------------------------------
+
+
+def tokenize(text: str) -> List[str]:
+    """字符 unigram + bigram（空白与标点处断开），英文与数字按整词"""
+    text = normalize_text(text)
+    tokens = _ASCII_WORD.findall(text)
+    chars = [ch for ch in _ASCII_WORD.sub(" ", text)]
+    prev = ""
+    for ch in chars:
+        if ch.isspace() or unicodedata.category(ch).startswith("P"):
+            prev = ""
+            continue
+        tokens.append(ch)
+        if prev:
+            tokens.append(prev + ch)
+        prev = ch
+    return tokens
+
+
+class LexicalClassifier:
+    """多项式朴素贝叶斯（多标签样本计入每个标签，无标签样本计为 none）"""
+
+    def __init__(self, alpha: float = 0.5):
+        self.alpha = alpha
+        self.labels: List[str] = []
+        self._log_prior: Dict[str, float] = {}
+        self._log_likelihood: Dict[str, Dict[str, float]] = {}
+        self._log_unseen: Dict[str, float] = {}
+
+    def fit(self, samples: Iterable[Tuple[str, Iterable[str]]]) -> "LexicalClassifier":
+        doc_counts: Counter = Counter()
+        token_counts: Dict[str, Counter] = {}
+        vocab: Set[str] = set()
+        for text, labels in samples:
+            tokens = tokenize(text)
+            vocab.update(tokens)
+            for label in (list(labels) or [NONE]):
+                doc_counts[label] += 1
+                token_counts.setdefault(label, Counter()).update(tokens)
+
+        total_docs = sum(doc_counts.values())
+        self.labels = sorted(doc_counts)
+        for label in self.labels:
+            counts = token_counts[label]
+            denom = sum(counts.values()) + self.alpha * (len(vocab) + 1)
+            self._log_prior[label] = math.log(doc_counts[label] / total_docs)
+            self._log_likelihood[label] = {tok: math.log((n + self.alpha) / denom) for tok, n in counts.items()}
+            self._log_unseen[label] = math.log(self.alpha / denom)
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        if not self.labels:
+            return {}
+        tokens = tokenize(text)
+        scores = {}
+        for label in self.labels:
+            likelihood, unseen = self._log_likelihood[label], self._log_unseen[label]
+            scores[label] = self._log_prior[label] + sum(likelihood.get(tok, unseen) for tok in tokens)
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+
+def load_corpus(path: Path = CORPUS_FILE) -> List[Tuple[str, List[str]]]:
+    """读取标注语料：每行 {"text": ..., "labels": [...]}"""
+    samples = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    samples.append((item["text"], list(item.get("labels", []))))
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"[LocalIntentRouter] 读取语料失败 {path}: {e}")
+    return samples
+
+
+# ---------------------------------------------------------------------------
+# 路由
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class PreRoute:
+    """预路由结果"""
+
+    groups: Set[str] = field(default_factory=set)
+    confidence: float = 0.0
+    fallback: bool = True  # True 表示下发全量工具
+    source: str = ""  # rules / context / classifier / chat
+    elapsed_ms: float = 0.0
+
+    @property
+    def include_skills(self) -> bool:
+        return self.fallback or "skills" in self.groups
+
+    def filter_schemas(self, schemas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.fallback:
+            return schemas
+        keep = self.groups | ALWAYS_GROUPS
+        return [s for s in schemas if schema_group(s.get("function", {}).get("name", "")) in keep]
+
+
+class LocalIntentRouter:
+    """规则 + 词法分类器的本地预路由"""
+
+    def __init__(self, min_confidence: Optional[float] = None, corpus: Optional[List[Tuple[str, List[str]]]] = None):
+        self._min_confidence = min_confidence
+        self._corpus = corpus
+        self._signature: Optional[Tuple] = None
+        self._automaton: KeywordAutomaton[str] = KeywordAutomaton(case_sensitive=False)
+        self._patterns: List[Tuple[Pattern, str]] = []
+        self._classifier = LexicalClassifier()
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._metrics: Dict[str, float] = {
+            "routed": 0,
+            "fallbacks": 0,
+            "chat": 0,
+            "by_rules": 0,
+            "by_context": 0,
+            "by_classifier": 0,
+        }
+
+    @property
+    def min_confidence(self) -> float:
+        if self._min_confidence is not None:
+            return self._min_confidence
+        return get_config().handoff.pre_router_min_confidence
+
+    # ── 构建 ──
+
+    @staticmethod
+    def _sources() -> Tuple[Dict[str, Any], List[Any]]:
+        manifests: Dict[str, Any] = {}
+        skills: List[Any] = []
+        try:
+            from mcpserver.mcp_registry import MANIFEST_CACHE, auto_register_mcp
+
+            auto_register_mcp()
+            manifests = dict(MANIFEST_CACHE)
+        except Exception as e:
+            logger.debug(f"[LocalIntentRouter] MCP manifest 不可用: {e}")
+        try:
+            from system.skill_manager import get_skill_manager
+
+            skills = list(get_skill_manager().get_all_metadata())
+        except Exception as e:
+            logger.debug(f"[LocalIntentRouter] 技能元数据不可用: {e}")
+        return manifests, skills
+
+    def _ensure_built(self) -> None:
+        manifests, skills = self._sources()
+        signature = (tuple((name, id(m)) for name, m in manifests.items()), tuple(s.name for s in skills))
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature == self._signature:
+                return
+            start = time.perf_counter()
+            automaton: KeywordAutomaton[str] = KeywordAutomaton(case_sensitive=False)
+            patterns: List[Tuple[Pattern, str]] = []
+            samples = list(self._corpus if self._corpus is not None else load_corpus())
+
+            for group, (keywords, regexes) in _BUILTIN_RULES.items():
+                automaton.add_all((normalize_text(k), group) for k in keywords)
+                patterns.extend((re.compile(p, re.IGNORECASE), group) for p in regexes)
+
+            for name, manifest in manifests.items():
+                group = f"mcp:{name}"
+                keywords, regexes, examples = self.rules_from_manifest(manifest)
+                automaton.add_all((normalize_text(k), group) for k in keywords)
+                for p in regexes:
+                    try:
+                        patterns.append((re.compile(p, re.IGNORECASE), group))
+                    except re.error as e:
+                        logger.warning(f"[LocalIntentRouter] {name} 的 routing.patterns 无效: {p} ({e})")
+                samples.extend((text, [group]) for text in examples)
+
+            for skill in skills:
+                automaton.add(normalize_text(skill.name), "skills")
+                for tag in getattr(skill, "tags", None) or []:
+                    automaton.add(normalize_text(tag), "skills")
+
+            self._automaton = automaton.build()
+            self._patterns = patterns
+            self._classifier = LexicalClassifier().fit(samples)
+            self._signature = signature
+            logger.info(
+                f"[LocalIntentRouter] 规则与分类器已构建: {len(manifests)} 个 MCP 服务, {len(samples)} 条样本, "
+                f"{(time.perf_counter() - start) * 1000:.1f}ms"
+            )
+
+    @staticmethod
+    def rules_from_manifest(manifest: Dict[str, Any]) -> Tuple[List[str], List[str], List[str]]:
+        """从 manifest 生成 (关键词, 正则, 训练样本)"""
+        routing = manifest.get("routing", {})
+        keywords = list(routing.get("keywords", []))
+        regexes = list(routing.get("patterns", []))
+        examples: List[str] = []
+        for command in manifest.get("capabilities", {}).get("invocationCommands", []):
+            for name in [command.get("command", ""), *command.get("aliases", [])]:
+                # 中文工具名（启动应用）与标识符式工具名（today_weather）作为关键词；
+                # time / today 这类普通英文单词容易误命中，不加入
+                if name and (not name.isascii() or "_" in name):
+                    keywords.append(name)
+            keywords.extend(_QUOTED.findall(command.get("description", "")))
+            try:
+                example = json.loads(command.get("example", "") or "{}")
+            except (TypeError, ValueError):
+                example = {}
+            query = example.get("query") if isinstance(example, dict) else None
+            if isinstance(query, str) and query and not query.startswith("<"):
+                examples.append(query)
+        return keywords, regexes, examples
+
+    # ── 路由 ──
+
+    def _rule_groups(self, text: str) -> Set[str]:
+        normalized = normalize_text(text)
+        groups = set(self._automaton.search(normalized))
+        for pattern, group in self._patterns:
+            if group not in groups and pattern.search(normalized):
+                groups.add(group)
+        return groups
+
+    def route(self, user_msg: str, messages: Optional[List[Dict[str, Any]]] = None) -> PreRoute:
+        """选择工具组；messages 为当前对话消息（用于追问时沿用上一条用户消息的命中）"""
+        start = time.perf_counter()
+        self._ensure_built()
+
+        groups = self._rule_groups(user_msg)
+        source = "rules"
+        if not groups and messages:
+            previous = _previous_user_text(messages, user_msg)
+            if previous:
+                groups = self._rule_groups(previous)
+                source = "context"
+
+        proba = self._classifier.predict_proba(user_msg)
+        predicted = {label for label, p in proba.items() if label != NONE and p >= CLASSIFIER_THRESHOLD}
+
+        if groups:
+            confidence = RULE_CONFIDENCE
+            groups |= predicted
+        elif proba:
+            top_label = max(proba, key=proba.get)
+            confidence = proba[top_label]
+            groups = predicted
+            source = "chat" if top_label == NONE else "classifier"
+        else:
+            confidence = 0.0
+
+        fallback = confidence < self.min_confidence
+        result = PreRoute(groups=groups, confidence=round(confidence, 3), fallback=fallback, source=source)
+        result.elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+        self._record(result)
+        logger.debug(
+            f"[LocalIntentRouter] \"{user_msg[:40]}\" → {sorted(groups) or 'none'} "
+            f"(置信度 {result.confidence}, {source}{', 回退全量' if fallback else ''}, {result.elapsed_ms}ms)"
+        )
+        return result
+
+    def _record(self, result: PreRoute) -> None:
+        self._metrics["routed"] += 1
+        self._latencies.append(result.elapsed_ms)
+        if result.fallback:
+            self._metrics["fallbacks"] += 1
+        elif result.source == "chat":
+            self._metrics["chat"] += 1
+        else:
+            self._metrics[f"by_{result.source}"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        ordered = sorted(self._latencies)
+        metrics: Dict[str, Any] = dict(self._metrics)
+        if metrics["routed"]:
+            metrics["fallback_rate"] = round(metrics["fallbacks"] / metrics["routed"], 4)
+        if ordered:
+            metrics["latency_ms_p50"] = ordered[len(ordered) // 2]
+            metrics["latency_ms_p99"] = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return {"min_confidence": self.min_confidence, "labels": self._classifier.labels, "metrics": metrics}
+
+
+def _previous_user_text(messages: List[Dict[str, Any]], current: str) -> str:
+    """当前消息之前的最近一条用户消息文本"""
+    skipped_current = False
+    for message in reversed(messages):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict) and p.get("type") == "text")
+        if not skipped_current and current in str(content):
+            skipped_current = True
+            continue
+        return str(content)
+    return ""
+
+
+_router: Optional[LocalIntentRouter] = None
+
+
+def get_pre_router() -> LocalIntentRouter:
+    """获取全局本地预路由器"""
+    global _router
+    if _router is None:
+        _router = LocalIntentRouter()
+    return _router
@@ -161,13 +161,11 @@ async def _toggle_live2d(params: dict) -> dict:
 
     # 通知 UI 隐藏/显示 Live2D
     try:
-        import httpx
-        from system.config import get_server_port
-        async with httpx.AsyncClient(timeout=3.0, trust_env=False) as client:
-            await client.post(
-                f"http://localhost:{get_server_port('api_server')}/ui_notification",
-                json={"action": "live2d_toggle", "enabled": enabled},
-            )
+        from system.service_transport import get_service_transport
+        await get_service_transport().post(
+            "api_server", "/ui_notification",
+            json={"action": "live2d_toggle", "enabled": enabled}, timeout=3.0,
+        )
     except Exception:
         pass
 
@@ -329,16 +327,12 @@ async def _start_travel(params: dict) -> dict:
 
     # 代理到 agent_server 实际执行探索
     try:
-        import httpx
-        from system.config import get_server_port
-        port = get_server_port("agent_server")
-        async with httpx.AsyncClient(timeout=10.0, trust_env=False) as client:
-            resp = await client.post(
-                f"http://127.0.0.1:{port}/travel/execute",
-                json={"session_id": session.session_id},
-            )
-            if resp.status_code >= 400:
-                logger.warning(f"[NagaControl] 旅行执行请求失败: {resp.status_code} {resp.text}")
+        from system.service_transport import get_service_transport
+        resp = await get_service_transport().post(
+            "agent_server", "/travel/execute", json={"session_id": session.session_id}, timeout=10.0
+        )
+        if resp.status_code >= 400:
+            logger.warning(f"[NagaControl] 旅行执行请求失败: {resp.status_code} {resp.text}")
     except Exception as e:
         logger.warning(f"[NagaControl] 代理旅行到 agent_server 失败: {e}")
 
@@ -400,13 +394,11 @@ async def _play_music(params: dict) -> dict:
         command["track"] = track
 
     try:
-        import httpx
-        from system.config import get_server_port
-        async with httpx.AsyncClient(timeout=3.0, trust_env=False) as client:
-            await client.post(
-                f"http://localhost:{get_server_port('api_server')}/ui_notification",
-                json={"action": "music_control", **command},
-            )
+        from system.service_transport import get_service_transport
+        await get_service_transport().post(
+            "api_server", "/ui_notification",
+            json={"action": "music_control", **command}, timeout=3.0,
+        )
         if track:
             return {"success": True, "result": f"音乐指令已发送: {action} - {track}"}
         return {"success": True, "result": f"音乐指令已发送: {action}"}
@@ -422,17 +414,16 @@ async def _send_notification(params: dict) -> dict:
         return {"success": False, "error": "需要 message 参数"}
 
     try:
-        import httpx
-        from system.config import get_server_port
-        async with httpx.AsyncClient(timeout=3.0, trust_env=False) as client:
-            await client.post(
-                f"http://localhost:{get_server_port('api_server')}/ui_notification",
-                json={
-                    "action": "show_notification",
-                    "message": message,
-                    "type": params.get("type", "info"),
-                },
-            )
+        from system.service_transport import get_service_transport
+        await get_service_transport().post(
+            "api_server", "/ui_notification",
+            json={
+                "action": "show_notification",
+                "message": message,
+                "type": params.get("type", "info"),
+            },
+            timeout=3.0,
+        )
         return {"success": True, "result": "通知已发送"}
     except Exception as e:
         return {"success": False, "error": f"通知发送失败: {e}"}
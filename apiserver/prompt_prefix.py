@@ -0,0 +1,163 @@
+"""提示词前缀追踪 - 衡量供应商前缀缓存（prompt caching）的命中潜力
+
+供应商的前缀缓存只对"与之前请求完全一致的开头部分"生效。每次请求把
+[tools, messages[0], messages[1], ...] 逐段规范化序列化并做链式哈希，
+与同一会话上一次请求逐段比较，得到可复用的前缀长度：
+
+  - prefix_hash: 可缓存前缀（tools + 最后一条 user 消息之前的所有消息）的哈希
+  - static_hash: 静态前缀（tools + 系统提示词）的哈希，跨会话比较
+  - shared_chars: 与本会话上一次请求相同的开头字符数（即理论上可命中缓存的部分）
+
+按提示词组装模式（legacy / stable）分别统计，便于对比两种模式的命中潜力。
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+_HASH_LEN = 16
+
+
+@dataclass
+class PrefixReport:
+    """单次请求的前缀分析结果"""
+
+    layout: str
+    prefix_hash: str
+    static_hash: str
+    prefix_chars: int  # 可缓存前缀长度
+    total_chars: int  # 整个请求长度
+    shared_chars: int  # 与本会话上一次请求相同的开头长度
+    static_reused: bool  # 静态前缀是否在近期请求中出现过
+
+    @property
+    def hit_ratio(self) -> float:
+        return round(self.shared_chars / self.total_chars, 4) if self.total_chars else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "hit_ratio": self.hit_ratio}
+
+
+def _serialize(segment: Any) -> str:
+    return json.dumps(segment, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def segment_chain(messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None
+                  ) -> Tuple[List[str], List[int]]:
+    """逐段链式哈希：第 i 个哈希覆盖前 i+1 段（tools 为第 0 段），同时返回各段长度"""
+    hashes, lengths = [], []
+    digest = hashlib.sha256()
+    for segment in [tools or [], *messages]:
+        text = _serialize(segment)
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\x00")
+        hashes.append(digest.copy().hexdigest()[:_HASH_LEN])
+        lengths.append(len(text))
+    return hashes, lengths
+
+
+def cacheable_segments(messages: List[Dict[str, Any]]) -> int:
+    """可缓存前缀的段数（含 tools 段）：最后一条 user 消息及之后的内容每次都会变化"""
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].get("role") == "user":
+            return i + 1
+    return len(messages) + 1
+
+
+class PromptPrefixTracker:
+    """记录每个会话上一次请求的链式哈希，计算前缀复用情况"""
+
+    def __init__(self, max_sessions: int = 256, recent_size: int = 20):
+        self._max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._static_hashes: "OrderedDict[str, None]" = OrderedDict()
+        self._recent: deque = deque(maxlen=recent_size)
+        self._layouts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, session_id: str, messages: List[Dict[str, Any]],
+                tools: Optional[List[Dict[str, Any]]] = None, layout: str = "legacy") -> PrefixReport:
+        hashes, lengths = segment_chain(messages, tools)
+        prefix_len = cacheable_segments(messages)
+        static_hash = hashes[min(1, len(hashes) - 1)]  # tools + messages[0]
+
+        with self._lock:
+            previous = self._sessions.pop(session_id, [])
+            self._sessions[session_id] = hashes
+            while len(self._sessions) > self._max_sessions:
+                self._sessions.popitem(last=False)
+
+            shared = 0
+            for old, new in zip(previous, hashes):
+                if old != new:
+                    break
+                shared += 1
+
+            static_reused = static_hash in self._static_hashes
+            self._static_hashes.pop(static_hash, None)
+            self._static_hashes[static_hash] = None
+            while len(self._static_hashes) > self._max_sessions:
+                self._static_hashes.popitem(last=False)
+
+            report = PrefixReport(
+                layout=layout,
+                prefix_hash=hashes[prefix_len - 1],
+                static_hash=static_hash,
+                prefix_chars=sum(lengths[:prefix_len]),
+                total_chars=sum(lengths),
+                shared_chars=sum(lengths[:shared]),
+                static_reused=static_reused,
+            )
+            self._recent.append({"session_id": session_id, **report.to_dict()})
+
+            counts = self._layouts.setdefault(layout, {
+                "requests": 0, "static_reused": 0, "prefix_chars": 0, "shared_chars": 0, "total_chars": 0,
+            })
+            counts["requests"] += 1
+            counts["static_reused"] += static_reused
+            counts["prefix_chars"] += report.prefix_chars
+            counts["shared_chars"] += report.shared_chars
+            counts["total_chars"] += report.total_chars
+        return report
+
+    def forget(self, session_id: Optional[str] = None) -> None:
+        """删除会话（None 表示全部）的上一次请求记录"""
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            layouts = {}
+            for layout, counts in sorted(self._layouts.items()):
+                total = counts["total_chars"]
+                layouts[layout] = {
+                    **counts,
+                    "static_reuse_rate": round(counts["static_reused"] / counts["requests"], 4),
+                    "cacheable_ratio": round(counts["prefix_chars"] / total, 4) if total else 0.0,
+                    "hit_ratio": round(counts["shared_chars"] / total, 4) if total else 0.0,
+                }
+            return {
+                "tracked_sessions": len(self._sessions),
+                "layouts": layouts,
+                "recent": list(self._recent),
+            }
+
+
+_tracker: Optional[PromptPrefixTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_prefix_tracker() -> PromptPrefixTracker:
+    """获取全局提示词前缀追踪器"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = PromptPrefixTracker()
+    return _tracker
@@ -9,7 +9,7 @@ from typing import AsyncGenerator
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 
-from system.config import get_config, build_system_prompt, build_context_supplement
+from system.config import get_config, build_system_prompt, build_stable_system_prompt, build_context_supplement
 from apiserver import naga_auth
 from apiserver.message_manager import message_manager
 from apiserver.llm_service import get_llm_service
@@ -32,6 +32,29 @@ router = APIRouter()
 # ============ 内部辅助函数 ============
 
 
+def _build_layout_system_prompt(skill_name=None) -> str:
+    """按提示词组装模式构建 messages[0]：legacy 为纯人格，stable 额外前置技能列表"""
+    if get_config().api.prompt_layout == "stable":
+        return build_stable_system_prompt(include_skills=not skill_name)
+    return build_system_prompt()
+
+
+def _report_prompt_prefix(session_id: str, messages, tools=None) -> None:
+    """记录本次请求的前缀哈希与可复用长度（用于衡量供应商前缀缓存命中潜力）"""
+    try:
+        from apiserver.prompt_prefix import get_prefix_tracker
+
+        layout = get_config().api.prompt_layout
+        report = get_prefix_tracker().observe(session_id, messages, tools, layout=layout)
+        logger.info(
+            f"[PromptPrefix] {layout} prefix={report.prefix_hash} static={report.static_hash} "
+            f"可缓存 {report.prefix_chars}/{report.total_chars} 字符, 与上次相同 {report.shared_chars} "
+            f"({report.hit_ratio:.0%})"
+        )
+    except Exception as e:
+        logger.debug(f"[PromptPrefix] 前缀统计失败: {e}")
+
+
 async def _trigger_chat_stream_no_intent(session_id: str, response_text: str):
     """触发聊天流式响应但不触发意图分析 - 发送纯粹的AI回复到UI"""
     try:
@@ -39,7 +62,7 @@ async def _trigger_chat_stream_no_intent(session_id: str, response_text: str):
         logger.info(f"[UI发送] 发送内容: {response_text[:200]}...")
 
         # 直接调用现有的流式对话接口，但跳过意图分析
-        import httpx
+        from system.service_transport import ServiceTransportError, get_service_transport
 
         # 构建请求数据 - 使用纯粹的AI回复内容，并跳过意图分析
         chat_request = {
@@ -51,25 +74,18 @@ async def _trigger_chat_stream_no_intent(session_id: str, response_text: str):
 
         }
 
-        # 调用现有的流式对话接口
-        from system.config import get_server_port
-
-        api_url = f"http://localhost:{get_server_port('api_server')}/chat/stream"
-
-        async with httpx.AsyncClient() as client:
-            async with client.stream("POST", api_url, json=chat_request) as response:
-                if response.status_code == 200:
-                    # 处理流式响应，包括TTS切割
-                    async for chunk in response.aiter_text():
-                        if chunk.strip():
-                            # 这里可以进一步处理流式响应
-                            # 或者直接让UI处理流式响应
-                            pass
+        # 调用现有的流式对话接口（同进程时直接驱动处理协程，无需 HTTP 往返）
+        try:
+            async for chunk in get_service_transport().stream("api_server", "POST", "/chat/stream", json=chat_request):
+                if chunk.strip():
+                    # 这里可以进一步处理流式响应
+                    # 或者直接让UI处理流式响应
+                    pass
 
-                    logger.info(f"[UI发送] AI回复已成功发送到UI: {session_id}")
-                    logger.info("[UI发送] 成功显示到UI")
-                else:
-                    logger.error(f"[UI发送] 调用流式对话接口失败: {response.status_code}")
+            logger.info(f"[UI发送] AI回复已成功发送到UI: {session_id}")
+            logger.info("[UI发送] 成功显示到UI")
+        except ServiceTransportError as e:
+            logger.error(f"[UI发送] 调用流式对话接口失败: {e.status_code}")
 
     except Exception as e:
         logger.error(f"[UI发送] 触发聊天流式响应失败: {e}")
@@ -78,7 +94,7 @@ async def _trigger_chat_stream_no_intent(session_id: str, response_text: str):
 async def _send_ai_response_directly(session_id: str, response_text: str):
     """直接发送AI回复到UI"""
     try:
-        import httpx
+        from system.service_transport import get_service_transport
 
         # 使用非流式接口发送AI回复
         chat_request = {
@@ -90,16 +106,11 @@ async def _send_ai_response_directly(session_id: str, response_text: str):
 
         }
 
-        from system.config import get_server_port
-
-        api_url = f"http://localhost:{get_server_port('api_server')}/chat"
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(api_url, json=chat_request)
-            if response.status_code == 200:
-                logger.info(f"[直接发送] AI回复已通过非流式接口发送到UI: {session_id}")
-            else:
-                logger.error(f"[直接发送] 非流式接口发送失败: {response.status_code}")
+        response = await get_service_transport().post("api_server", "/chat", json=chat_request, timeout=10.0)
+        if response.status_code == 200:
+            logger.info(f"[直接发送] AI回复已通过非流式接口发送到UI: {session_id}")
+        else:
+            logger.error(f"[直接发送] 非流式接口发送失败: {response.status_code}")
 
     except Exception as e:
         logger.error(f"[直接发送] 直接发送AI回复失败: {e}")
@@ -126,8 +137,8 @@ async def chat(request: ChatRequest):
             user_message = f"调度技能{skill_labels}：{user_message}"
         session_id = message_manager.create_session(request.session_id, temporary=request.temporary)
 
-        # 系统提示词 = 纯人格
-        system_prompt = build_system_prompt()
+        # 系统提示词 = 纯人格（stable 模式下附带技能列表）
+        system_prompt = _build_layout_system_prompt(request.skill)
 
         # 先构建对话消息（人格在 messages[0]）
         effective_message = user_message
@@ -171,8 +182,10 @@ async def chat(request: ChatRequest):
             include_tool_instructions=False,
             skill_name=request.skill,
             rag_section=rag_section,
+            stable_layout=get_config().api.prompt_layout == "stable",
         )
         messages.append({"role": "system", "content": supplement})
+        _report_prompt_prefix(session_id, messages)
 
         # 使用整合后的LLM服务（支持 reasoning_content）
         llm_service = get_llm_service()
@@ -227,8 +240,8 @@ async def chat_stream(request: ChatRequest):
             # 发送会话ID信息
             yield f"data: session_id: {session_id}\n\n"
 
-            # 系统提示词 = 纯人格
-            system_prompt = build_system_prompt()
+            # 系统提示词 = 纯人格（stable 模式下附带技能列表）
+            system_prompt = _build_layout_system_prompt(request.skill)
 
             # 用户消息使用带技能前缀的版本
             effective_message = user_message
@@ -275,20 +288,33 @@ async def chat_stream(request: ChatRequest):
 
             await _query_rag_stream()
 
-            # 构建附加知识（工具走原生 function calling，不再文本注入）
+            # 获取工具 schemas（原生 function calling）
+            # 本地意图预路由只下发相关工具组（技能模式与低置信度时下发全量）
+            from apiserver.tool_schemas import get_all_tool_schemas
+            tools = get_all_tool_schemas()
+            pre_route = None
+            if get_config().handoff.pre_router_enabled and not request.skill:
+                from apiserver.local_intent_router import get_pre_router
+
+                pre_route = get_pre_router().route(request.message, messages)
+                tools = pre_route.filter_schemas(tools)
+                logger.info(
+                    f"[ChatStream] 预路由: {sorted(pre_route.groups) or 'none'} "
+                    f"{'回退全量' if pre_route.fallback else f'下发 {len(tools)} 个工具'} "
+                    f"(置信度 {pre_route.confidence}, {pre_route.elapsed_ms}ms)"
+                )
+
+            # 构建附加知识（工具走原生 function calling，不再文本注入；stable 模式下技能列表已在 messages[0]）
             yield 'data: {"type":"status","text":"组织上下文"}\n\n'
             supplement = build_context_supplement(
-                include_skills=True,
+                include_skills=pre_route is None or pre_route.include_skills,
                 include_tool_instructions=False,
                 skill_name=request.skill,
                 rag_section=rag_section,
+                stable_layout=get_config().api.prompt_layout == "stable",
             )
             messages.append({"role": "system", "content": supplement})
 
-            # 获取工具 schemas（原生 function calling）
-            from apiserver.tool_schemas import get_all_tool_schemas
-            tools = get_all_tool_schemas()
-
             # 如果携带截屏图片，将最后一条 user 消息改为多模态格式（OpenAI vision 兼容）
             if request.images:
                 # 找到最后一条 user 消息的索引（跳过末尾的 system supplement）
@@ -307,6 +333,8 @@ async def chat_stream(request: ChatRequest):
                         "content": content_parts,
                     }
 
+            _report_prompt_prefix(session_id, messages, tools)
+
             # 初始化语音集成（根据voice_mode和return_audio决定）
             voice_integration = None
 
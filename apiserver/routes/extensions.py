@@ -388,15 +388,13 @@ def get_mcp_services():
     """列出所有 MCP 服务并检查可用性（同步端点，由 FastAPI 在线程池中执行）"""
     services: List[Dict[str, Any]] = []
 
-    # 1. 内置 agent（扫描 mcpserver 下所有 agent-manifest.json，与 mcp_registry 一致）
+    # 1. 内置 agent（复用 mcp_registry 按 mtime 缓存的 manifest 解析结果）
+    from mcpserver.mcp_registry import iter_manifests
+
     mcpserver_dir = Path(__file__).resolve().parent.parent.parent / "mcpserver"
     if not mcpserver_dir.exists():
         logger.warning(f"MCP 目录不存在: {mcpserver_dir}")
-    for manifest_path in sorted(mcpserver_dir.glob("**/agent-manifest.json")):
-        try:
-            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
-        except (json.JSONDecodeError, OSError):
-            continue
+    for manifest_path, manifest in iter_manifests(str(mcpserver_dir)):
         if manifest.get("agentType") != "mcp":
             continue
         available = _check_agent_available(manifest)
@@ -562,55 +560,56 @@ async def upload_document(file: UploadFile = File(...), description: str = Form(
 
 
 @router.post("/upload/parse")
-async def upload_parse(file: UploadFile = File(...)):
-    """上传并解析文档内容（支持 .docx / .xlsx / .txt）"""
-    import tempfile
+async def upload_parse(
+    file: UploadFile = File(...),
+    stream: bool = False,
+    max_chars: int = 50000,
+    max_rows: int = 500,
+):
+    """
+    上传并解析文档内容（支持 .docx / .xlsx / .txt / .csv / .md）
+
+    参数:
+    - stream: 为 true 时以 NDJSON 逐块返回 {"text": ...}，末行为 {"done": true, "truncated": ..., "char_count": N}
+    - max_chars: 字符预算，达到后停止解析
+    - max_rows: 每个工作表的行数上限（xlsx）
+    """
+    from apiserver import document_service
+
     filename = file.filename or "unknown"
     suffix = Path(filename).suffix.lower()
 
-    if suffix not in (".docx", ".xlsx", ".txt", ".csv", ".md"):
+    if suffix not in document_service.SUPPORTED_SUFFIXES:
         raise HTTPException(status_code=400, detail=f"不支持的文件格式: {suffix}，支持 .docx / .xlsx / .txt / .csv / .md")
 
-    # 写入临时文件
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = Path(tmp.name)
+    max_chars = max(1, min(max_chars, 2_000_000))
+    max_rows = max(1, max_rows)
+    # UploadFile 底层已是可随机访问的临时文件，直接交给解析器，无需再复制一份
+    source = file.file
+
+    if stream:
+        from fastapi.responses import StreamingResponse
+
+        async def ndjson():
+            char_count, truncated = 0, False
+            try:
+                async for chunk, truncated in document_service.stream_document(source, suffix, max_chars, max_rows):
+                    if chunk:
+                        char_count += len(chunk)
+                        yield json.dumps({"text": chunk}, ensure_ascii=False) + "\n"
+            except Exception as e:
+                logger.error(f"文档解析失败: {e}")
+                yield json.dumps({"error": f"解析失败: {e}", "char_count": char_count}, ensure_ascii=False) + "\n"
+                return
+            finally:
+                await file.close()
+            yield json.dumps({"done": True, "filename": filename, "truncated": truncated, "char_count": char_count},
+                             ensure_ascii=False) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
     try:
-        if suffix == ".docx":
-            import importlib.util
-            _docx_spec = importlib.util.spec_from_file_location(
-                "docx_extract", Path(__file__).parent.parent / "skills_templates" / "office-docs" / "tools" / "docx_extract.py"
-            )
-            _docx_mod = importlib.util.module_from_spec(_docx_spec)
-            _docx_spec.loader.exec_module(_docx_mod)
-            lines = _docx_mod.extract_docx_text(tmp_path)
-            content = "\n".join(lines)
-        elif suffix == ".xlsx":
-            import importlib.util, zipfile as _zf
-            _xlsx_spec = importlib.util.spec_from_file_location(
-                "xlsx_extract", Path(__file__).parent.parent / "skills_templates" / "office-docs" / "tools" / "xlsx_extract.py"
-            )
-            _xlsx_mod = importlib.util.module_from_spec(_xlsx_spec)
-            _xlsx_spec.loader.exec_module(_xlsx_mod)
-            with _zf.ZipFile(tmp_path, "r") as archive:
-                shared_strings = _xlsx_mod._load_shared_strings(archive)
-                sheets = _xlsx_mod._load_sheet_targets(archive)
-                parts = []
-                for name, path in sheets:
-                    rows = _xlsx_mod._parse_sheet(archive, path, shared_strings, max_rows=500)
-                    parts.append(f"## Sheet: {name}\n{_xlsx_mod._format_sheet_csv(rows, ',')}")
-                content = "\n".join(parts)
-        else:
-            # txt / csv / md 直接读取
-            content = tmp_path.read_text(encoding="utf-8", errors="replace")
-
-        # 截断过长内容
-        max_chars = 50000
-        truncated = len(content) > max_chars
-        if truncated:
-            content = content[:max_chars]
-
+        content, truncated = await document_service.parse_document_async(source, suffix, max_chars, max_rows)
         return {
             "status": "success",
             "filename": filename,
@@ -621,8 +620,6 @@ async def upload_parse(file: UploadFile = File(...)):
     except Exception as e:
         logger.error(f"文档解析失败: {e}")
         raise HTTPException(status_code=500, detail=f"解析失败: {str(e)}")
-    finally:
-        tmp_path.unlink(missing_ok=True)
 
 
 # ============ 旅行端点 ============
@@ -666,7 +663,7 @@ async def travel_start(payload: Dict[str, Any]):
 @router.get("/travel/status")
 async def travel_status():
     """返回当前活跃 session 或最新完成的"""
-    from apiserver.travel_service import get_active_session, list_sessions
+    from apiserver.travel_service import get_active_session, list_sessions, load_session
 
     active = get_active_session()
     if active:
@@ -674,7 +671,11 @@ async def travel_status():
 
     sessions = list_sessions()
     if sessions:
-        return {"status": "success", "session": sessions[0].model_dump(), "active": False}
+        try:
+            latest = load_session(sessions[0].session_id)
+        except FileNotFoundError:
+            return {"status": "success", "session": None, "active": False}
+        return {"status": "success", "session": latest.model_dump(), "active": False}
 
     return {"status": "success", "session": None, "active": False}
 
@@ -696,7 +697,7 @@ async def travel_stop(payload: Dict[str, Any] = None):
 
 @router.get("/travel/history")
 async def travel_history():
-    """历史列表"""
+    """历史列表（仅摘要，详情见 /travel/history/{session_id}）"""
     from apiserver.travel_service import list_sessions
 
     sessions = list_sessions()
@@ -748,49 +749,173 @@ async def get_memory_stats():
         raise HTTPException(status_code=500, detail=f"获取记忆统计失败: {str(e)}")
 
 
-@router.get("/memory/quintuples")
-async def get_quintuples():
-    """获取所有五元组 (用于知识图谱可视化)"""
-    try:
-        # 优先使用远程 NagaMemory 服务
-        from summer_memory.memory_client import get_remote_memory_client
+QUINTUPLE_PAGE_MAX = 5000
+_REMOTE_PAGE = 500  # NagaMemory 单次请求上限
+_NDJSON_CHUNK = 500
 
-        remote = get_remote_memory_client()
-        if remote is not None:
-            result = await remote.get_quintuples(limit=500)
-            quintuples_raw = result.get("quintuples") or result.get("results") or result.get("data") or []
-            # 兼容 NagaMemory 返回格式：可能是 dict 列表或 tuple 列表
-            quintuples = []
-            for q in quintuples_raw:
-                if isinstance(q, dict):
-                    quintuples.append({
-                        "subject": q.get("subject", ""),
-                        "subject_type": q.get("subject_type", ""),
-                        "predicate": q.get("predicate", q.get("relation", "")),
-                        "object": q.get("object", ""),
-                        "object_type": q.get("object_type", ""),
-                    })
-                elif isinstance(q, (list, tuple)) and len(q) >= 5:
-                    quintuples.append({
-                        "subject": q[0], "subject_type": q[1],
-                        "predicate": q[2], "object": q[3], "object_type": q[4],
-                    })
-            return {"status": "success", "quintuples": quintuples, "count": len(quintuples)}
 
-        # 回退到本地 summer_memory
-        from summer_memory.quintuple_graph import get_all_quintuples
+def _quintuple_dict(q) -> Optional[Dict[str, str]]:
+    """兼容 NagaMemory 返回格式：可能是 dict 或 tuple"""
+    if isinstance(q, dict):
+        return {
+            "subject": q.get("subject", ""),
+            "subject_type": q.get("subject_type", ""),
+            "predicate": q.get("predicate", q.get("relation", "")),
+            "object": q.get("object", ""),
+            "object_type": q.get("object_type", ""),
+        }
+    if isinstance(q, (list, tuple)) and len(q) >= 5:
+        return {"subject": q[0], "subject_type": q[1], "predicate": q[2], "object": q[3], "object_type": q[4]}
+    return None
+
+
+def _quintuple_matches(q: Dict[str, str], entity_type: Optional[str], relation: Optional[str]) -> bool:
+    if entity_type and entity_type not in (q["subject_type"], q["object_type"]):
+        return False
+    if relation and q["predicate"] != relation:
+        return False
+    return True
+
+
+def _encode_cursor(state: Dict[str, Any]) -> str:
+    import base64
+
+    return base64.urlsafe_b64encode(json.dumps(state, ensure_ascii=False).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: Optional[str]) -> Dict[str, Any]:
+    import base64
 
-        quintuples = get_all_quintuples()  # returns set[tuple]
+    if not cursor:
+        return {}
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(state, dict):
+            raise ValueError("cursor 不是对象")
+        return state
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的 cursor")
+
+
+async def _fetch_quintuples_page(
+    cursor_state: Dict[str, Any],
+    limit: int,
+    entity_type: Optional[str],
+    relation: Optional[str],
+) -> Tuple[List[Dict[str, str]], Optional[Dict[str, Any]]]:
+    """读取一页五元组，返回 (本页, 下一页游标状态)；远程按 offset 翻页，本地按键集翻页"""
+    import asyncio
+    from summer_memory.memory_client import get_remote_memory_client
+
+    remote = get_remote_memory_client()
+    if remote is not None:
+        import hashlib
+
+        offset = int(cursor_state.get("o", 0))
+        last_digest = cursor_state.get("h")
+        page: List[Dict[str, str]] = []
+        # 远程不支持过滤，按需多取几页直到凑满
+        while len(page) < limit:
+            batch = min(limit, _REMOTE_PAGE)
+            result = await remote.get_quintuples(limit=batch, offset=offset)
+            raw = result.get("quintuples") or result.get("results") or result.get("data") or []
+            # 后端忽略 offset 时每次返回同一批数据，继续翻页会死循环
+            digest = hashlib.sha1(json.dumps(raw, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()[:16]
+            if raw and digest == last_digest:
+                logger.warning(f"远程记忆服务在 offset={offset} 返回了与上一批相同的数据，停止翻页")
+                return page, None
+            last_digest = digest
+            consumed = 0
+            for q in raw:
+                consumed += 1
+                item = _quintuple_dict(q)
+                if item is not None and _quintuple_matches(item, entity_type, relation):
+                    page.append(item)
+                    if len(page) == limit:
+                        break
+            offset += consumed
+            # 只有最后一批完整读完才算结束；在批次中途凑满时游标指向批内，剩余匹配项留给下一页
+            if len(raw) < batch and consumed == len(raw):
+                return page, None
+        return page, {"o": offset, "h": last_digest}
+
+    # 回退到本地 summer_memory（文件读取与排序放到线程池，不阻塞事件循环）
+    from summer_memory.quintuple_graph import get_quintuples_page
+
+    rows, has_more = await asyncio.to_thread(
+        get_quintuples_page, cursor_state.get("k"), limit, entity_type, relation
+    )
+    page = [_quintuple_dict(q) for q in rows]
+    return page, ({"k": list(rows[-1])} if has_more and rows else None)
+
+
+@router.get("/memory/quintuples")
+async def get_quintuples(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    entity_type: Optional[str] = None,
+    relation: Optional[str] = None,
+    format: str = "json",
+):
+    """
+    获取五元组 (用于知识图谱可视化)
+
+    参数:
+    - cursor: 上一页返回的 next_cursor
+    - limit: 每页条数（最大 5000）；不传且非 ndjson 时返回全部
+    - entity_type: 按主体/客体类型过滤
+    - relation: 按关系过滤
+    - format: json（默认）或 ndjson（逐行流式返回全部匹配项，末行为 {"done": true, "count": N}）
+    """
+    try:
+        cursor_state = _decode_cursor(cursor)
+
+        if format == "ndjson":
+            from fastapi.responses import StreamingResponse
+
+            async def stream():
+                state, count = cursor_state, 0
+                while True:
+                    try:
+                        page, state = await _fetch_quintuples_page(state, _NDJSON_CHUNK, entity_type, relation)
+                    except Exception as e:
+                        logger.error(f"导出五元组错误: {e}")
+                        yield json.dumps({"error": str(e), "count": count}, ensure_ascii=False) + "\n"
+                        return
+                    if page:
+                        count += len(page)
+                        yield "".join(json.dumps(q, ensure_ascii=False) + "\n" for q in page)
+                    if state is None:
+                        break
+                yield json.dumps({"done": True, "count": count}) + "\n"
+
+            return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+        if format != "json":
+            raise HTTPException(status_code=400, detail="format 仅支持 json 或 ndjson")
+
+        if limit is None:
+            # 未分页：逐页拉取全部（兼容旧调用方）
+            quintuples: List[Dict[str, str]] = []
+            state: Optional[Dict[str, Any]] = cursor_state
+            while state is not None:
+                page, state = await _fetch_quintuples_page(state, QUINTUPLE_PAGE_MAX, entity_type, relation)
+                quintuples.extend(page)
+            return {"status": "success", "quintuples": quintuples, "count": len(quintuples), "next_cursor": None}
+
+        limit = max(1, min(limit, QUINTUPLE_PAGE_MAX))
+        quintuples, next_state = await _fetch_quintuples_page(cursor_state, limit, entity_type, relation)
         return {
             "status": "success",
-            "quintuples": [
-                {"subject": q[0], "subject_type": q[1], "predicate": q[2], "object": q[3], "object_type": q[4]}
-                for q in quintuples
-            ],
+            "quintuples": quintuples,
             "count": len(quintuples),
+            "next_cursor": _encode_cursor(next_state) if next_state else None,
         }
     except ImportError:
         return {"status": "success", "quintuples": [], "count": 0, "message": "记忆系统模块未找到"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取五元组错误: {e}")
         traceback.print_exc()
@@ -812,33 +937,17 @@ async def search_quintuples(keywords: str = ""):
         if remote is not None:
             result = await remote.query_by_keywords(keyword_list)
             quintuples_raw = result.get("quintuples") or result.get("results") or result.get("data") or []
-            quintuples = []
-            for q in quintuples_raw:
-                if isinstance(q, dict):
-                    quintuples.append({
-                        "subject": q.get("subject", ""),
-                        "subject_type": q.get("subject_type", ""),
-                        "predicate": q.get("predicate", q.get("relation", "")),
-                        "object": q.get("object", ""),
-                        "object_type": q.get("object_type", ""),
-                    })
-                elif isinstance(q, (list, tuple)) and len(q) >= 5:
-                    quintuples.append({
-                        "subject": q[0], "subject_type": q[1],
-                        "predicate": q[2], "object": q[3], "object_type": q[4],
-                    })
+            quintuples = [q for q in map(_quintuple_dict, quintuples_raw) if q is not None]
             return {"status": "success", "quintuples": quintuples, "count": len(quintuples)}
 
-        # 回退到本地 summer_memory
+        # 回退到本地 summer_memory（同步 Neo4j 查询放到线程池）
+        import asyncio
         from summer_memory.quintuple_graph import query_graph_by_keywords
 
-        results = query_graph_by_keywords(keyword_list)
+        results = await asyncio.to_thread(query_graph_by_keywords, keyword_list)
         return {
             "status": "success",
-            "quintuples": [
-                {"subject": q[0], "subject_type": q[1], "predicate": q[2], "object": q[3], "object_type": q[4]}
-                for q in results
-            ],
+            "quintuples": [_quintuple_dict(q) for q in results],
             "count": len(results),
         }
     except ImportError:
@@ -6,6 +6,8 @@ from fastapi import APIRouter, HTTPException
 
 from apiserver.message_manager import message_manager
 from apiserver.api_server import _vlm_sessions
+from apiserver.prompt_prefix import get_prefix_tracker
+from mcpserver.tool_cache import get_tool_cache
 
 router = APIRouter()
 
@@ -39,6 +41,8 @@ async def delete_session(session_id: str):
     """删除指定会话 - 委托给message_manager"""
     try:
         _vlm_sessions.discard(session_id)
+        get_tool_cache().drop_session(session_id)
+        get_prefix_tracker().forget(session_id)
         return message_manager.delete_session_api(session_id)
     except Exception as e:
         if "会话不存在" in str(e):
@@ -53,6 +57,8 @@ async def clear_all_sessions():
     """清空所有会话 - 委托给message_manager"""
     try:
         _vlm_sessions.clear()
+        get_tool_cache().drop_session()
+        get_prefix_tracker().forget()
         return message_manager.clear_all_sessions_api()
     except Exception as e:
         print(f"清空会话错误: {e}")
@@ -3,7 +3,7 @@
 import asyncio
 import logging
 import traceback
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from fastapi import APIRouter, HTTPException
 
@@ -146,6 +146,62 @@ async def get_system_prompt(include_skills: bool = False):
         raise HTTPException(status_code=500, detail=f"获取系统提示词失败: {str(e)}")
 
 
+@router.get("/system/prompt/stats")
+async def get_prompt_prefix_stats():
+    """获取提示词前缀统计（当前组装模式、各模式的可缓存比例与前缀复用率、最近请求的前缀哈希）"""
+    from apiserver.prompt_prefix import get_prefix_tracker
+
+    return {
+        "success": True,
+        "layout": get_config().api.prompt_layout,
+        "stats": get_prefix_tracker().get_stats(),
+    }
+
+
+@router.get("/llm/providers")
+async def get_llm_provider_stats():
+    """获取 LLM 提供商池状态（各提供商权重、健康系数、TTFT、错误率、并发占用、熔断器与故障转移次数）"""
+    from apiserver.llm_providers import get_provider_pool
+
+    return {
+        "success": True,
+        "stats": get_provider_pool().get_stats(),
+    }
+
+
+@router.get("/llm/cache")
+async def get_llm_cache_stats():
+    """获取 LLM 响应缓存统计（各调用点的精确/语义命中、未命中、条目数与节省的调用耗时）"""
+    from apiserver.llm_cache import get_response_cache
+
+    return {
+        "success": True,
+        "stats": get_response_cache().get_stats(),
+    }
+
+
+@router.delete("/llm/cache")
+async def clear_llm_cache(site: Optional[str] = None):
+    """清除 LLM 响应缓存（指定 site 时只清除该调用点）"""
+    from apiserver.llm_cache import get_response_cache
+
+    return {
+        "success": True,
+        "removed": get_response_cache().invalidate(site),
+    }
+
+
+@router.get("/guide/status")
+async def get_guide_status():
+    """获取攻略引擎状态（是否启用、干员缓存命中率与节省的图数据库往返次数、路由决策缓存命中率）"""
+    from guide_engine import get_guide_service
+
+    return {
+        "success": True,
+        "stats": get_guide_service().get_status(),
+    }
+
+
 @router.post("/system/prompt")
 async def update_system_prompt(payload: Dict[str, Any]):
     """更新系统提示词"""
@@ -9,7 +9,7 @@ from typing import Dict, Any
 
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 
-from system.config import build_system_prompt, build_context_supplement
+from system.config import get_config, build_system_prompt, build_stable_system_prompt, build_context_supplement
 from apiserver.message_manager import message_manager
 from apiserver.llm_service import get_llm_service
 
@@ -49,14 +49,9 @@ def _hide_tool_status_in_ui() -> None:
 async def _update_proactive_activity_silent():
     """异步更新用户活动时间（静默失败，不影响主流程）"""
     try:
-        import httpx
-        from system.config import get_server_port
+        from system.service_transport import get_service_transport
 
-        agent_port = get_server_port("agent_server")
-        activity_url = f"http://127.0.0.1:{agent_port}/proactive_vision/activity"
-
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            await client.post(activity_url)
+        await get_service_transport().post("agent_server", "/proactive_vision/activity", timeout=2.0)
     except Exception:
         pass  # 静默失败，不影响主对话流程
 
@@ -64,7 +59,7 @@ async def _update_proactive_activity_silent():
 async def _notify_ui_refresh(session_id: str, response_text: str):
     """通知UI刷新会话历史"""
     try:
-        import httpx
+        from system.service_transport import get_service_transport
 
         # 通过UI通知接口直接显示AI回复
         ui_notification_payload = {
@@ -73,16 +68,13 @@ async def _notify_ui_refresh(session_id: str, response_text: str):
             "ai_response": response_text,
         }
 
-        from system.config import get_server_port
-
-        api_url = f"http://localhost:{get_server_port('api_server')}/ui_notification"
-
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.post(api_url, json=ui_notification_payload)
-            if response.status_code == 200:
-                logger.info(f"[UI通知] AI回复显示通知发送成功: {session_id}")
-            else:
-                logger.error(f"[UI通知] AI回复显示通知失败: {response.status_code}")
+        response = await get_service_transport().post(
+            "api_server", "/ui_notification", json=ui_notification_payload, timeout=5.0
+        )
+        if response.status_code == 200:
+            logger.info(f"[UI通知] AI回复显示通知发送成功: {session_id}")
+        else:
+            logger.error(f"[UI通知] AI回复显示通知失败: {response.status_code}")
 
     except Exception as e:
         logger.error(f"[UI通知] 通知UI刷新失败: {e}")
@@ -247,12 +239,18 @@ async def tool_result_callback(payload: Dict[str, Any]):
         logger.info(f"[工具回调] 构建增强消息: {enhanced_message[:200]}...")
 
         # 构建对话风格提示词和消息
-        system_prompt = build_system_prompt()
+        stable_layout = get_config().api.prompt_layout == "stable"
+        if stable_layout:
+            system_prompt = build_stable_system_prompt(include_skills=True, include_tool_instructions=True)
+        else:
+            system_prompt = build_system_prompt()
         messages = message_manager.build_conversation_messages(
             session_id=session_id, system_prompt=system_prompt, current_message=enhanced_message
         )
         # 追加附加知识到末尾
-        supplement = build_context_supplement(include_skills=True, include_tool_instructions=True)
+        supplement = build_context_supplement(
+            include_skills=True, include_tool_instructions=True, stable_layout=stable_layout
+        )
         messages.append({"role": "system", "content": supplement})
 
         logger.info("[工具回调] 开始生成工具后回复...")
@@ -523,7 +521,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str = None):
             try:
                 message = json.loads(data)
                 if message.get("type") == "ping":
-                    await websocket.send_text(json.dumps({"type": "pong"}))
+                    await ws_manager.send_to_connection(websocket, {"type": "pong"})
             except json.JSONDecodeError:
                 pass
 
@@ -549,6 +547,32 @@ async def get_websocket_stats():
     }
 
 
+@router.get("/tools/stats")
+async def get_tool_execution_stats():
+    """获取工具调用统计（按工具的延迟/失败/超时、各服务熔断器状态、MCP 工具缓存命中率与预路由情况）"""
+    from apiserver.local_intent_router import get_pre_router
+    from apiserver.tool_execution import get_tool_executor
+    from mcpserver.tool_cache import get_tool_cache
+
+    return {
+        "success": True,
+        "stats": get_tool_executor().get_stats(),
+        "mcp_cache": get_tool_cache().get_stats(),
+        "pre_router": get_pre_router().get_stats(),
+    }
+
+
+@router.get("/search/stats")
+async def get_search_stats():
+    """获取联网搜索缓存统计（命中/未命中/合并请求数等）"""
+    from apiserver.web_search import get_web_search
+
+    return {
+        "success": True,
+        "stats": get_web_search().get_stats(),
+    }
+
+
 @router.post("/ws/broadcast")
 async def websocket_broadcast(payload: Dict[str, Any]):
     """
@@ -147,10 +147,11 @@ def _write_sheets(
 
     if output_path.is_dir() or output_path.suffix == "":
         output_path.mkdir(parents=True, exist_ok=True)
+        extension = "tsv" if delimiter == "\t" else "csv"
         for name, path in sheets:
             rows = _parse_sheet(archive, path, shared_strings, max_rows)
             content = _format_sheet_csv(rows, delimiter)
-            filename = f"{_sanitize_filename(name)}.{'tsv' if delimiter == '\t' else 'csv'}"
+            filename = f"{_sanitize_filename(name)}.{extension}"
             (output_path / filename).write_text(content, encoding="utf-8")
         return
 
@@ -0,0 +1,388 @@
+"""
+工具调用执行策略
+
+execute_tool_calls 通过 ToolExecutor 并行执行一轮工具调用：
+  - 每个工具按策略设置截止时间，超时返回错误结果而不是拖住整轮
+  - 幂等工具可配置对冲重试：首个请求在 hedge_after 秒内未完成时再发一次，先成功者为准
+  - 每个服务一个熔断器：连续失败达到阈值后快速失败，冷却期过后放行一个探测请求，
+    成功则恢复，失败则继续熔断（冷却时间翻倍，有上限）；探测被取消或只得到调用方错误
+    （缺少参数、未登录等，与服务健康无关）时交还探测名额
+  - 整轮有总预算，预算用尽时已完成的结果立即返回给模型，未完成的调用被取消并标记超时
+  - 按工具统计调用次数、失败/超时/熔断/对冲次数与延迟分位数
+
+策略按 "agentType:服务/工具" → "agentType:服务" → "agentType" 的顺序匹配，
+内置默认值可通过 handoff 配置中的 tool_timeouts / hedge_tools 覆盖。
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from system.config import get_config
+
+logger = logging.getLogger(__name__)
+
+# 内置超时（秒）：openclaw Agent 模式内部最长等待 120 秒，搜索上游超时 30 秒
+DEFAULT_TIMEOUTS: Dict[str, float] = {
+    "mcp": 30.0,
+    "mcp:game_guide": 90.0,
+    "mcp:screen_vision": 45.0,
+    "openclaw": 130.0,
+    "openclaw_tool": 60.0,
+    "openclaw_tool:web_search": 35.0,
+    "naga_control": 15.0,
+}
+
+BREAKER_MAX_RESET = 300.0
+LATENCY_WINDOW = 200
+
+ToolAttempt = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+@dataclass
+class ToolPolicy:
+    """单个工具调用的执行策略"""
+
+    timeout: float
+    hedge_after: Optional[float] = None  # 仅用于幂等工具；None 表示不对冲
+    max_hedges: int = 1
+    breaker_key: Optional[str] = None  # None 表示不经过熔断器
+
+
+def call_labels(call: Dict[str, Any]) -> Tuple[str, str]:
+    """工具调用结果中的 (service_name, tool_name)"""
+    agent_type = call.get("agentType", "")
+    if agent_type == "mcp":
+        return call.get("service_name", "") or "unknown", call.get("tool_name", "")
+    if agent_type == "openclaw":
+        return "openclaw", call.get("task_type", "message")
+    if agent_type == "openclaw_tool":
+        return "openclaw_tool", call.get("tool_name", "") or "unknown"
+    if agent_type == "naga_control":
+        return "naga_control", call.get("action", "")
+    return agent_type or "unknown", call.get("tool_name", "")
+
+
+def _policy_keys(call: Dict[str, Any]) -> List[str]:
+    agent_type = call.get("agentType", "")
+    if agent_type == "mcp":
+        service, tool = call.get("service_name", ""), call.get("tool_name", "")
+        return [f"mcp:{service}/{tool}", f"mcp:{service}", "mcp"]
+    if agent_type == "openclaw_tool":
+        return [f"openclaw_tool:{call.get('tool_name', '')}", "openclaw_tool"]
+    return [agent_type]
+
+
+def _breaker_key(call: Dict[str, Any]) -> Optional[str]:
+    """按下游服务划分熔断器；naga_control 为本地操作不熔断"""
+    agent_type = call.get("agentType", "")
+    if agent_type == "mcp":
+        return f"mcp:{call.get('service_name', '')}"
+    if agent_type == "openclaw_tool" and call.get("tool_name") == "web_search":
+        return "web_search"
+    if agent_type in ("openclaw", "openclaw_tool"):
+        return "openclaw"
+    return None
+
+
+# 结果中的 error_kind：调用方错误不计入熔断
+CALLER_ERROR = "caller"
+
+
+def error_result(call: Dict[str, Any], message: str, error_kind: Optional[str] = None) -> Dict[str, Any]:
+    service_name, tool_name = call_labels(call)
+    result = {
+        "tool_call": call,
+        "result": message,
+        "status": "error",
+        "service_name": service_name,
+        "tool_name": tool_name,
+    }
+    if error_kind:
+        result["error_kind"] = error_kind
+    return result
+
+
+class CircuitBreaker:
+    """连续失败熔断：closed → open（快速失败）→ half_open（放行一个探测）→ closed / open"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_at = 0.0
+        self.cooldown = reset_timeout
+        self.open_count = 0
+
+    def allow(self) -> bool:
+        """是否放行本次调用；冷却期过后只放行一个探测请求（探测超过一个冷却期仍未结束时再放行一个）"""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if (self.state == self.OPEN and now - self.opened_at >= self.cooldown) or (
+            self.state == self.HALF_OPEN and now - self.probe_at >= self.cooldown
+        ):
+            self.state = self.HALF_OPEN
+            self.probe_at = now
+            return True
+        return False
+
+    def release(self) -> None:
+        """探测没有得出结论（被取消 / 调用方错误）：回到 open，冷却期已过，下一次调用重新探测"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+
+    def retry_in(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.cooldown = self.reset_timeout
+
+    def record_failure(self) -> None:
+        if self.state == self.HALF_OPEN:
+            # 探测失败：继续熔断，冷却时间翻倍
+            self.cooldown = min(self.cooldown * 2, BREAKER_MAX_RESET)
+            self._open()
+            return
+        self.failures += 1
+        if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.open_count += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "open_count": self.open_count,
+            "retry_in": round(self.retry_in(), 2),
+        }
+
+
+class ToolStats:
+    """单个工具的调用统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0  # 熔断快速失败
+        self.cancelled = 0  # 轮预算用尽被取消
+        self.hedges = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 1)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "hedges": self.hedges,
+            "latency_ms": {
+                "avg": round(sum(ordered) / len(ordered) * 1000, 1) if ordered else None,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(ordered[-1] * 1000, 1) if ordered else None,
+            },
+        }
+
+
+class ToolExecutor:
+    """按策略执行一轮工具调用"""
+
+    def __init__(self, timeouts: Optional[Dict[str, float]] = None, hedges: Optional[Dict[str, float]] = None,
+                 round_budget: Optional[float] = None, failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None):
+        self._timeouts = timeouts
+        self._hedges = hedges
+        self._round_budget = round_budget
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.stats: Dict[str, ToolStats] = {}
+
+    # ── 策略 ──
+
+    @property
+    def round_budget(self) -> float:
+        if self._round_budget is not None:
+            return self._round_budget
+        return get_config().handoff.round_budget_seconds
+
+    def policy_for(self, call: Dict[str, Any]) -> ToolPolicy:
+        handoff = get_config().handoff
+        timeouts = {**DEFAULT_TIMEOUTS, **(self._timeouts if self._timeouts is not None else handoff.tool_timeouts)}
+        hedges = self._hedges if self._hedges is not None else handoff.hedge_tools
+        keys = _policy_keys(call)
+        timeout = next((timeouts[k] for k in keys if k in timeouts), handoff.tool_timeout_seconds)
+        hedge_after = next((hedges[k] for k in keys if k in hedges), None)
+        return ToolPolicy(timeout=timeout, hedge_after=hedge_after, breaker_key=_breaker_key(call))
+
+    def _breaker(self, key: str) -> CircuitBreaker:
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            handoff = get_config().handoff
+            breaker = self.breakers[key] = CircuitBreaker(
+                self._failure_threshold if self._failure_threshold is not None else handoff.breaker_failure_threshold,
+                self._reset_timeout if self._reset_timeout is not None else handoff.breaker_reset_seconds,
+            )
+        return breaker
+
+    def _stats(self, call: Dict[str, Any]) -> ToolStats:
+        service_name, tool_name = call_labels(call)
+        key = f"{service_name}/{tool_name}" if tool_name else service_name
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = ToolStats()
+        return stats
+
+    # ── 执行 ──
+
+    async def run_round(self, calls: List[Tuple[Dict[str, Any], ToolAttempt]]) -> List[Dict[str, Any]]:
+        """并行执行一轮工具调用，结果与 calls 一一对应；轮预算用尽时未完成的调用标记超时"""
+        return await self.collect([(call, self.start(call, attempt)) for call, attempt in calls])
+
+    def start(self, call: Dict[str, Any], attempt: ToolAttempt) -> "asyncio.Task":
+        """立即在后台开始执行单个调用（流式输出中解析出完整调用时提前派发），结果由 collect 统一收取"""
+        return asyncio.ensure_future(self.run_one(call, attempt))
+
+    async def collect(self, started: List[Tuple[Dict[str, Any], "asyncio.Task"]]) -> List[Dict[str, Any]]:
+        """等待已开始的调用，结果与 started 一一对应；从开始等待起计算轮预算，用尽时未完成的调用标记超时"""
+        if not started:
+            return []
+        calls = [call for call, _ in started]
+        tasks = [task for _, task in started]
+        budget = self.round_budget
+        done, pending = await asyncio.wait(tasks, timeout=budget if budget > 0 else None)
+
+        results = []
+        for call, task in zip(calls, tasks):
+            if task in pending:
+                task.cancel()
+                self._stats(call).cancelled += 1
+                logger.warning(f"[ToolExecutor] 本轮预算 {budget:g}s 用尽，取消未完成的调用: {call_labels(call)}")
+                results.append(error_result(call, f"执行超时：本轮工具预算 {budget:g} 秒已用尽，结果未返回"))
+            elif task.exception() is not None:
+                results.append(error_result(call, f"执行异常: {task.exception()}"))
+            else:
+                results.append(task.result())
+        return results
+
+    async def run_one(self, call: Dict[str, Any], attempt: ToolAttempt) -> Dict[str, Any]:
+        """按策略执行单个工具调用（截止时间 / 对冲 / 熔断），结果附带 elapsed_ms"""
+        policy = self.policy_for(call)
+        stats = self._stats(call)
+        stats.calls += 1
+        breaker = self._breaker(policy.breaker_key) if policy.breaker_key else None
+
+        if breaker is not None and not breaker.allow():
+            stats.rejected += 1
+            return error_result(
+                call, f"服务 {policy.breaker_key} 近期连续失败，已暂时熔断（约 {breaker.retry_in():.0f} 秒后重试）"
+            )
+
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._attempt(attempt, policy, stats), policy.timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            result = error_result(call, f"执行超时（{policy.timeout:g} 秒）")
+        except asyncio.CancelledError:
+            # 轮预算用尽或客户端断开被取消：不计入熔断，交还探测名额
+            if breaker is not None:
+                breaker.release()
+            raise
+        except Exception as e:
+            result = error_result(call, f"执行异常: {e}")
+
+        elapsed = time.monotonic() - start
+        stats.latencies.append(elapsed)
+        failed = result.get("status") == "error"
+        if failed:
+            stats.errors += 1
+        if breaker is not None:
+            if result.get("error_kind") == CALLER_ERROR:
+                breaker.release()
+            elif failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        result["elapsed_ms"] = round(elapsed * 1000, 1)
+        return result
+
+    @staticmethod
+    async def _attempt(attempt: ToolAttempt, policy: ToolPolicy, stats: ToolStats) -> Dict[str, Any]:
+        """执行一次调用；配置了对冲时在 hedge_after 秒后追加请求，取先成功的结果"""
+        if policy.hedge_after is None:
+            return await attempt()
+
+        tasks = [asyncio.ensure_future(attempt())]
+        last: Optional[Dict[str, Any]] = None
+        try:
+            while True:
+                can_hedge = len(tasks) <= policy.max_hedges
+                done, _ = await asyncio.wait(
+                    [t for t in tasks if not t.done()],
+                    timeout=policy.hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    if task.exception() is None:
+                        last = task.result()
+                        if last.get("status") != "error":
+                            return last
+                if all(t.done() for t in tasks):
+                    if last is not None:
+                        return last
+                    raise tasks[-1].exception()
+                if not done and can_hedge:
+                    stats.hedges += 1
+                    tasks.append(asyncio.ensure_future(attempt()))
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    # ── 统计 ──
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "round_budget_seconds": self.round_budget,
+            "tools": {key: stats.to_dict() for key, stats in sorted(self.stats.items())},
+            "breakers": {key: breaker.to_dict() for key, breaker in sorted(self.breakers.items())},
+        }
+
+
+_executor: Optional[ToolExecutor] = None
+
+
+def get_tool_executor() -> ToolExecutor:
+    """获取全局工具执行器（熔断器与统计在各轮、各会话间共享）"""
+    global _executor
+    if _executor is None:
+        _executor = ToolExecutor()
+    return _executor
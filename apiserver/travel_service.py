@@ -4,7 +4,9 @@
 """
 
 import json
+import os
 import re
+import threading
 import uuid
 import logging
 from datetime import datetime
@@ -71,12 +73,254 @@ class TravelSession(BaseModel):
     error: Optional[str] = None
 
 
+class TravelSessionSummary(BaseModel):
+    """索引中的 session 摘要（列表页使用，不含发现/社交明细）"""
+    session_id: str
+    status: TravelStatus
+    created_at: str
+    started_at: Optional[str] = None
+    completed_at: Optional[str] = None
+    time_limit_minutes: int = 300
+    credit_limit: int = 1000
+    credits_used: int = 0
+    elapsed_minutes: float = 0.0
+    discovery_count: int = 0
+    social_count: int = 0
+    error: Optional[str] = None
+
+
 # ── 持久化 ──────────────────────────────────────
+#
+# 每个 session 由三部分组成：
+#   <id>.json              标量字段（不含 discoveries / social_interactions）
+#   <id>.discoveries.jsonl 发现记录，只追加
+#   <id>.social.jsonl      社交记录，只追加
+# index.json 保存所有 session 的摘要，列表与活跃 session 查询只读索引。
+
+_INDEX_FILE = "index.json"
+_INDEX_VERSION = 1
+_RECORD_FIELDS = {"discoveries": TravelDiscovery, "social_interactions": SocialInteraction}
+_RECORD_SUFFIX = {"discoveries": "discoveries", "social_interactions": "social"}
+
 
 def _session_path(session_id: str) -> Path:
     return TRAVEL_DIR / f"{session_id}.json"
 
 
+def _records_path(session_id: str, field: str) -> Path:
+    return TRAVEL_DIR / f"{session_id}.{_RECORD_SUFFIX[field]}.jsonl"
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _summarize(session: TravelSession) -> TravelSessionSummary:
+    return TravelSessionSummary(
+        session_id=session.session_id,
+        status=session.status,
+        created_at=session.created_at,
+        started_at=session.started_at,
+        completed_at=session.completed_at,
+        time_limit_minutes=session.time_limit_minutes,
+        credit_limit=session.credit_limit,
+        credits_used=session.credits_used,
+        elapsed_minutes=session.elapsed_minutes,
+        discovery_count=len(session.discoveries),
+        social_count=len(session.social_interactions),
+        error=session.error,
+    )
+
+
+class _TravelStore:
+    """
+    带索引的 session 存储
+
+    索引常驻内存，按 index.json 的 mtime/大小判断是否被其它进程更新过；
+    活跃 session 由内存中的指针直接定位。
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._index: dict[str, TravelSessionSummary] = {}
+        self._index_sig: Optional[tuple] = None
+        self._active_id: Optional[str] = None
+
+    @property
+    def _index_path(self) -> Path:
+        return self.directory / _INDEX_FILE
+
+    # ── 索引 ──
+
+    def _refresh(self) -> None:
+        """确保内存索引与磁盘一致；首次运行时从旧格式文件重建"""
+        try:
+            st = self._index_path.stat()
+        except FileNotFoundError:
+            if self._index_sig is None:
+                self._rebuild()
+            return
+        sig = (st.st_mtime_ns, st.st_size)
+        if sig == self._index_sig:
+            return
+        try:
+            raw = json.loads(self._index_path.read_text(encoding="utf-8"))
+            if raw.get("version") != _INDEX_VERSION:
+                raise ValueError(f"索引版本不匹配: {raw.get('version')}")
+            self._index = {
+                sid: TravelSessionSummary.model_validate(entry) for sid, entry in raw.get("sessions", {}).items()
+            }
+            self._index_sig = sig
+            self._update_active()
+        except Exception as e:
+            logger.warning(f"旅行索引损坏，重新构建: {e}")
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        """扫描目录重建索引，并把旧格式（内嵌列表）迁移为追加式记录文件"""
+        self._index = {}
+        for path in self.directory.glob("*.json"):
+            if path.name == _INDEX_FILE:
+                continue
+            try:
+                raw = json.loads(path.read_text(encoding="utf-8"))
+                embedded = {field: raw.pop(field, None) for field in _RECORD_FIELDS}
+                session = TravelSession.model_validate(raw)
+                for field, model in _RECORD_FIELDS.items():
+                    records = [model.model_validate(r) for r in embedded[field] or []]
+                    if records:
+                        self._write_records(session.session_id, field, records)
+                    else:
+                        records = self._read_records(session.session_id, field)
+                    setattr(session, field, records)
+                if any(embedded.values()):
+                    self._write_body(session)
+                self._index[session.session_id] = _summarize(session)
+            except Exception as e:
+                logger.warning(f"跳过无法解析的旅行 session 文件 {path.name}: {e}")
+        self._save_index()
+
+    def _save_index(self) -> None:
+        payload = {
+            "version": _INDEX_VERSION,
+            "sessions": {sid: entry.model_dump(mode="json") for sid, entry in self._index.items()},
+        }
+        _atomic_write(self._index_path, json.dumps(payload, ensure_ascii=False))
+        st = self._index_path.stat()
+        self._index_sig = (st.st_mtime_ns, st.st_size)
+        self._update_active()
+
+    def _update_active(self) -> None:
+        running = [e for e in self._index.values() if e.status == TravelStatus.RUNNING]
+        running.sort(key=lambda e: e.created_at, reverse=True)
+        self._active_id = running[0].session_id if running else None
+
+    # ── session 文件 ──
+
+    def _write_body(self, session: TravelSession) -> None:
+        body = session.model_dump_json(exclude=set(_RECORD_FIELDS))
+        _atomic_write(_session_path(session.session_id), body)
+
+    def _read_records(self, session_id: str, field: str) -> list:
+        path = _records_path(session_id, field)
+        if not path.exists():
+            return []
+        model = _RECORD_FIELDS[field]
+        records = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(model.model_validate_json(line))
+                except Exception:
+                    # 追加过程中被中断留下的半行
+                    logger.warning(f"跳过损坏的旅行记录: {path.name}")
+        return records
+
+    def _write_records(self, session_id: str, field: str, records: list) -> None:
+        text = "".join(r.model_dump_json() + "\n" for r in records)
+        _atomic_write(_records_path(session_id, field), text)
+
+    def _count_records(self, session_id: str, field: str) -> Optional[int]:
+        """统计记录文件中已完整写入的行数；末尾残留半行时返回 None，由调用方整体重写"""
+        try:
+            data = _records_path(session_id, field).read_bytes()
+        except FileNotFoundError:
+            return 0
+        if data and not data.endswith(b"\n"):
+            return None
+        return data.count(b"\n")
+
+    def _append_records(self, session_id: str, field: str, records: list) -> None:
+        with open(_records_path(session_id, field), "a", encoding="utf-8") as f:
+            f.write("".join(r.model_dump_json() + "\n" for r in records))
+
+    # ── 公共接口 ──
+
+    def save(self, session: TravelSession) -> None:
+        with self._lock:
+            self._refresh()
+            for field in _RECORD_FIELDS:
+                records = getattr(session, field)
+                # 以记录文件实际行数为准：追加后、写索引前崩溃时索引里的计数是旧的，按它追加会重复写入
+                persisted = self._count_records(session.session_id, field)
+                if persisted is not None and len(records) > persisted:
+                    self._append_records(session.session_id, field, records[persisted:])
+                elif persisted is None or len(records) < persisted:
+                    # 列表被替换或截断，或文件末尾有中断留下的半行：整体重写
+                    self._write_records(session.session_id, field, records)
+            self._write_body(session)
+            self._index[session.session_id] = _summarize(session)
+            self._save_index()
+
+    def load(self, session_id: str) -> TravelSession:
+        path = _session_path(session_id)
+        if not path.exists():
+            raise FileNotFoundError(f"旅行 session 不存在: {session_id}")
+        raw = json.loads(path.read_text(encoding="utf-8"))
+        session = TravelSession.model_validate(raw)
+        for field in _RECORD_FIELDS:
+            if field not in raw:
+                setattr(session, field, self._read_records(session_id, field))
+        return session
+
+    def active(self) -> Optional[TravelSession]:
+        with self._lock:
+            self._refresh()
+            active_id = self._active_id
+        if active_id is None:
+            return None
+        try:
+            session = self.load(active_id)
+        except FileNotFoundError:
+            session = None
+        if session is not None and session.status == TravelStatus.RUNNING:
+            return session
+        # 索引与文件不一致（例如文件被外部修改），以文件为准修正索引
+        with self._lock:
+            if session is None:
+                self._index.pop(active_id, None)
+            else:
+                self._index[active_id] = _summarize(session)
+            self._save_index()
+        return self.active()
+
+    def summaries(self) -> list[TravelSessionSummary]:
+        with self._lock:
+            self._refresh()
+            entries = list(self._index.values())
+        entries.sort(key=lambda e: e.created_at, reverse=True)
+        return entries
+
+
+_store = _TravelStore(TRAVEL_DIR)
+
+
 def create_session(
     time_limit_minutes: int = 300,
     credit_limit: int = 1000,
@@ -98,41 +342,23 @@ def create_session(
 
 
 def save_session(session: TravelSession) -> None:
-    """将 session 写入 JSON 文件"""
-    path = _session_path(session.session_id)
-    path.write_text(session.model_dump_json(indent=2), encoding="utf-8")
+    """持久化 session：标量字段整体写入，新增的发现/社交记录追加写入，并更新索引"""
+    _store.save(session)
 
 
 def load_session(session_id: str) -> TravelSession:
-    """从文件读取 session"""
-    path = _session_path(session_id)
-    if not path.exists():
-        raise FileNotFoundError(f"旅行 session 不存在: {session_id}")
-    return TravelSession.model_validate_json(path.read_text(encoding="utf-8"))
+    """读取完整 session（含发现/社交明细）"""
+    return _store.load(session_id)
 
 
 def get_active_session() -> Optional[TravelSession]:
     """找到当前 status=running 的 session（最多一个）"""
-    for path in TRAVEL_DIR.glob("*.json"):
-        try:
-            session = TravelSession.model_validate_json(path.read_text(encoding="utf-8"))
-            if session.status == TravelStatus.RUNNING:
-                return session
-        except Exception:
-            continue
-    return None
+    return _store.active()
 
 
-def list_sessions() -> list[TravelSession]:
-    """列出所有 session，按 created_at 倒序"""
-    sessions: list[TravelSession] = []
-    for path in TRAVEL_DIR.glob("*.json"):
-        try:
-            sessions.append(TravelSession.model_validate_json(path.read_text(encoding="utf-8")))
-        except Exception:
-            continue
-    sessions.sort(key=lambda s: s.created_at, reverse=True)
-    return sessions
+def list_sessions() -> list[TravelSessionSummary]:
+    """列出所有 session 摘要，按 created_at 倒序"""
+    return _store.summaries()
 
 
 # ── Prompt 构建 ─────────────────────────────────
@@ -0,0 +1,305 @@
+"""
+联网搜索（NagaBusiness 搜索代理 / Brave Search）与结果缓存
+
+agentic loop 的 web_search 工具、前置搜索以及 agent_server 的本地搜索代理共用这里的实现：
+  - 按 (来源, 规范化查询, freshness) 缓存结果，带 TTL 与条目上限（LRU 淘汰）
+  - 缓存条目记录请求的结果数，请求更少结果时直接截取（前置搜索 8 条可复用工具调用的 10 条）
+  - 并发的相同查询只请求一次上游（single-flight），跨事件循环的等待者通过
+    run_coroutine_threadsafe 等待请求所在循环中的任务
+  - 格式化后的文本按结果数记忆，只生成一次
+失败结果不缓存。TTL 与条目上限读取 online_search 配置，也可在构造时覆盖（测试用）。
+"""
+
+import asyncio
+import logging
+import re
+import threading
+import time
+import unicodedata
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from system.config import get_config
+from apiserver import naga_auth
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("naga", "brave")
+UPSTREAM_TIMEOUT = 30.0
+
+CacheKey = Tuple[str, str, Optional[str]]  # (来源, 规范化查询, freshness)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class SearchError(Exception):
+    """上游返回错误（非 200 / 未配置来源）"""
+
+
+def normalize_query(query: str) -> str:
+    """缓存键用的查询规范化：全角转半角、合并空白、忽略大小写"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", query)).strip().lower()
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """格式化搜索结果为可读文本"""
+    if not results:
+        return "未找到相关搜索结果。"
+    lines = []
+    for i, r in enumerate(results, 1):
+        lines.append(f"{i}. {r.get('title', '')}")
+        lines.append(f"   URL: {r.get('url', '')}")
+        if r.get("description"):
+            lines.append(f"   摘要: {r['description']}")
+        if r.get("age"):
+            lines.append(f"   时间: {r['age']}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+@dataclass
+class SearchResult:
+    """一次上游搜索的结果"""
+
+    provider: str
+    query: str
+    count: int  # 请求的结果数
+    results: List[Dict[str, Any]]
+    fetched_at: float  # time.monotonic()
+    _texts: Dict[int, str] = field(default_factory=dict, repr=False)
+
+    def covers(self, count: int) -> bool:
+        """能否满足请求 count 条（上游返回不足 count 条时说明已是全部结果）"""
+        return count <= self.count or len(self.results) < self.count
+
+    def top(self, count: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.results if count is None else self.results[:count]
+
+    def text(self, count: Optional[int] = None) -> str:
+        """格式化文本（按结果数记忆）"""
+        n = len(self.top(count))
+        text = self._texts.get(n)
+        if text is None:
+            text = self._texts[n] = format_results(self.results[:n])
+        return text
+
+
+async def _await_shielded(task: "asyncio.Future") -> SearchResult:
+    return await asyncio.shield(task)
+
+
+class WebSearch:
+    """带缓存与请求合并的搜索客户端"""
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 naga_url: Optional[str] = None, brave_url: Optional[str] = None):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._naga_url = naga_url
+        self._brave_url = brave_url
+        self._cache: "OrderedDict[CacheKey, SearchResult]" = OrderedDict()
+        # 进行中的上游请求：键 -> (请求结果数, 所在事件循环, 任务)
+        self._inflight: Dict[CacheKey, Tuple[int, asyncio.AbstractEventLoop, "asyncio.Future"]] = {}
+        self._lock = threading.Lock()
+        # httpx 客户端绑定创建它的事件循环，按循环各自持有一个
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self._metrics: Dict[str, float] = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "expired": 0,
+            "evictions": 0,
+            "upstream_requests": 0,
+            "upstream_errors": 0,
+            "upstream_latency_ms_total": 0.0,
+            "upstream_latency_ms_last": 0.0,
+            "upstream_latency_ms_max": 0.0,
+        }
+
+    # ── 配置 ──
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl if self._ttl is not None else get_config().online_search.cache_ttl_seconds
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries if self._max_entries is not None else get_config().online_search.cache_max_entries
+
+    @property
+    def naga_url(self) -> str:
+        return self._naga_url or naga_auth.NAGA_MODEL_URL + "/tools/search"
+
+    @property
+    def brave_url(self) -> str:
+        return self._brave_url or get_config().online_search.search_api_base
+
+    @staticmethod
+    def default_provider() -> Optional[str]:
+        """已登录走 Naga 代理，未登录有 key 走 Brave，都没有返回 None"""
+        if naga_auth.is_authenticated():
+            return "naga"
+        if get_config().online_search.search_api_key:
+            return "brave"
+        return None
+
+    # ── 查询 ──
+
+    async def search(self, provider: str, query: str, count: int = 10,
+                     freshness: Optional[str] = None) -> SearchResult:
+        """搜索并返回结果；上游错误抛出 SearchError"""
+        if provider not in PROVIDERS:
+            raise ValueError(f"未知搜索来源: {provider}")
+        query = query.strip()
+        count = int(count or 10)
+        key: CacheKey = (provider, normalize_query(query), freshness or None)
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            cached = self._lookup(key, count)
+            if cached is not None:
+                self._metrics["hits"] += 1
+                return cached
+            inflight = self._inflight.get(key)
+            if inflight is not None and inflight[0] >= count and not inflight[2].done():
+                self._metrics["coalesced"] += 1
+                _, task_loop, task = inflight
+            else:
+                self._metrics["misses"] += 1
+                task_loop = loop
+                task = loop.create_task(self._fetch(key, provider, query, count, freshness))
+                # 等待者全部取消时也取走异常，避免 "exception was never retrieved"
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                self._inflight[key] = (count, loop, task)
+
+        if task_loop is loop:
+            return await asyncio.shield(task)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_await_shielded(task), task_loop))
+
+    def _lookup(self, key: CacheKey, count: int) -> Optional[SearchResult]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.fetched_at >= self.ttl:
+            del self._cache[key]
+            self._metrics["expired"] += 1
+            return None
+        if not entry.covers(count):
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _store(self, key: CacheKey, result: SearchResult) -> None:
+        if self.ttl <= 0:
+            return
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self._metrics["evictions"] += 1
+
+    # ── 上游请求 ──
+
+    def _client(self):
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=UPSTREAM_TIMEOUT, proxy=None)
+            self._clients[loop] = client
+        return client
+
+    async def _fetch(self, key: CacheKey, provider: str, query: str, count: int,
+                     freshness: Optional[str]) -> SearchResult:
+        params: Dict[str, Any] = {"q": query, "count": count}
+        if freshness:
+            params["freshness"] = freshness
+
+        client = self._client()
+        self._metrics["upstream_requests"] += 1
+        start = time.perf_counter()
+        try:
+            if provider == "naga":
+                token = naga_auth.get_access_token()
+                resp = await client.post(
+                    self.naga_url,
+                    json=params,
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+            else:
+                api_key = get_config().online_search.search_api_key
+                if not api_key:
+                    raise SearchError("未配置 search_api_key")
+                resp = await client.get(
+                    self.brave_url,
+                    params=params,
+                    headers={"Accept": "application/json", "X-Subscription-Token": api_key},
+                )
+            if resp.status_code != 200:
+                raise SearchError(self._error_message(provider, resp))
+            results = resp.json().get("web", {}).get("results", [])
+            result = SearchResult(provider, query, count, results, time.monotonic())
+            with self._lock:
+                self._store(key, result)
+            return result
+        except Exception:
+            self._metrics["upstream_errors"] += 1
+            raise
+        finally:
+            latency = (time.perf_counter() - start) * 1000
+            self._metrics["upstream_latency_ms_total"] += latency
+            self._metrics["upstream_latency_ms_last"] = round(latency, 2)
+            self._metrics["upstream_latency_ms_max"] = max(self._metrics["upstream_latency_ms_max"], round(latency, 2))
+            with self._lock:
+                if self._inflight.get(key, (None, None, None))[2] is asyncio.current_task():
+                    del self._inflight[key]
+
+    @staticmethod
+    def _error_message(provider: str, resp) -> str:
+        try:
+            err = resp.json()
+        except Exception:
+            return f"HTTP {resp.status_code}"
+        if provider == "naga" and isinstance(err.get("error"), dict):
+            return err["error"].get("message") or f"HTTP {resp.status_code}"
+        return str(err)[:200]
+
+    # ── 管理 ──
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        metrics = dict(self._metrics)
+        lookups = metrics["hits"] + metrics["misses"] + metrics["coalesced"]
+        metrics["hit_rate"] = round((metrics["hits"] + metrics["coalesced"]) / lookups, 4) if lookups else 0.0
+        if metrics["upstream_requests"]:
+            metrics["upstream_latency_ms_avg"] = round(
+                metrics["upstream_latency_ms_total"] / metrics["upstream_requests"], 2
+            )
+        metrics["upstream_latency_ms_total"] = round(metrics["upstream_latency_ms_total"], 2)
+        return {
+            "entries": len(self._cache),
+            "inflight": len(self._inflight),
+            "ttl_seconds": self.ttl,
+            "max_entries": self.max_entries,
+            "metrics": metrics,
+        }
+
+
+_web_search: Optional[WebSearch] = None
+_web_search_lock = threading.Lock()
+
+
+def get_web_search() -> WebSearch:
+    """获取全局搜索客户端"""
+    global _web_search
+    if _web_search is None:
+        with _web_search_lock:
+            if _web_search is None:
+                _web_search = WebSearch()
+    return _web_search
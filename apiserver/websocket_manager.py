@@ -1,32 +1,177 @@
 """
 WebSocket 连接管理器
 用于实时推送消息到前端
+
+每个连接拥有独立的有界发送队列与写协程：广播只负责把（只序列化一次的）消息
+放入各连接队列，慢连接不会拖慢其它连接。队列满时按溢出策略处理：
+- drop_oldest: 丢弃队列中最旧的消息
+- coalesce: 同一实体的状态消息只保留最新一条，仍然满则丢弃最旧的消息
+- disconnect: 断开该连接
 """
 
 import asyncio
 import json
 import logging
-from typing import Dict, Set, Any
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional, Set, Any, Tuple
 from fastapi import WebSocket, WebSocketDisconnect
 
 logger = logging.getLogger(__name__)
 
+OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# 可合并的状态类消息：类型 -> 标识所属实体的字段，队列中同一实体的旧状态会被新状态替换。
+# 只登记带有真实实体标识的状态快照；主动消息等内容类消息每条都要送达，不参与合并
+COALESCE_KEY_FIELDS: Dict[str, str] = {"tool_status": "tool_call_id"}
+
+
+def _coalesce_key(message: Dict[str, Any]) -> Optional[Hashable]:
+    field = COALESCE_KEY_FIELDS.get(message.get("type"))
+    if field is None:
+        return None
+    entity = message.get(field)
+    if entity is None:
+        # 缺少实体标识时无法判断是否为同一状态，按普通消息逐条发送
+        return None
+    return (message["type"], entity)
+
+
+class _ClientChannel:
+    """单个连接的发送队列与写协程"""
+
+    def __init__(self, manager: "WebSocketManager", websocket: WebSocket, session_id: Optional[str]):
+        self.manager = manager
+        self.websocket = websocket
+        self.session_id = session_id
+        self._queue: Deque[Tuple[str, Optional[Hashable], float]] = deque()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.send_latency_ms = 0.0      # 指数滑动平均
+        self.max_send_latency_ms = 0.0
+        self.max_queue_wait_ms = 0.0
+        self._task = asyncio.create_task(self._writer())
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, text: str, key: Optional[Hashable] = None) -> bool:
+        """放入发送队列（不阻塞）；返回 False 表示连接已关闭或因溢出被断开"""
+        if self._closed:
+            return False
+        item = (text, key, time.perf_counter())
+        queue = self._queue
+
+        if key is not None and self.manager.overflow_policy == "coalesce":
+            for i, (_, queued_key, _) in enumerate(queue):
+                if queued_key == key:
+                    queue[i] = item
+                    self.coalesced += 1
+                    return True
+
+        if len(queue) >= self.manager.queue_size:
+            policy = self.manager.overflow_policy
+            if policy == "disconnect":
+                logger.warning(f"[WebSocket] 发送队列溢出，断开慢连接: session={self.session_id}")
+                self.manager._schedule_drop(self)
+                return False
+            if policy == "coalesce":
+                # 优先丢弃最旧的可合并状态消息
+                for i, (_, queued_key, _) in enumerate(queue):
+                    if queued_key is not None:
+                        del queue[i]
+                        break
+                else:
+                    queue.popleft()
+            else:
+                queue.popleft()
+            self.dropped += 1
+
+        queue.append(item)
+        if len(queue) > self.max_depth:
+            self.max_depth = len(queue)
+        self._wakeup.set()
+        return True
+
+    async def _writer(self):
+        queue = self._queue
+        try:
+            while True:
+                if not queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                text, _, enqueued_at = queue.popleft()
+                start = time.perf_counter()
+                await asyncio.wait_for(self.websocket.send_text(text), timeout=self.manager.send_timeout)
+                end = time.perf_counter()
+
+                latency_ms = (end - start) * 1000
+                self.send_latency_ms = latency_ms if not self.sent else self.send_latency_ms * 0.9 + latency_ms * 0.1
+                self.max_send_latency_ms = max(self.max_send_latency_ms, latency_ms)
+                self.max_queue_wait_ms = max(self.max_queue_wait_ms, (start - enqueued_at) * 1000)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[WebSocket] 发送失败 (session={self.session_id}): {e!r}")
+            self._closed = True
+            await self.manager._drop(self)
+
+    async def close(self):
+        self._closed = True
+        self._queue.clear()
+        if self._task is not asyncio.current_task() and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "avg_send_latency_ms": round(self.send_latency_ms, 3),
+            "max_send_latency_ms": round(self.max_send_latency_ms, 3),
+            "max_queue_wait_ms": round(self.max_queue_wait_ms, 3),
+        }
+
 
 class WebSocketManager:
     """WebSocket连接管理器"""
 
-    def __init__(self):
+    def __init__(self, queue_size: int = 256, overflow_policy: str = "coalesce", send_timeout: float = 10.0):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {overflow_policy}，可选: {', '.join(OVERFLOW_POLICIES)}")
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+
         # session_id -> WebSocket connections
         self._connections: Dict[str, Set[WebSocket]] = {}
         # 全局连接（不绑定特定session）
         self._global_connections: Set[WebSocket] = set()
+        self._channels: Dict[WebSocket, _ClientChannel] = {}
         self._lock = asyncio.Lock()
+        self._broadcasts = 0
+        self._disconnected_slow = 0
 
     async def connect(self, websocket: WebSocket, session_id: str = None):
         """接受新的WebSocket连接"""
         await websocket.accept()
 
         async with self._lock:
+            self._channels[websocket] = _ClientChannel(self, websocket, session_id)
             if session_id:
                 if session_id not in self._connections:
                     self._connections[session_id] = set()
@@ -39,85 +184,81 @@ class WebSocketManager:
     async def disconnect(self, websocket: WebSocket, session_id: str = None):
         """断开WebSocket连接"""
         async with self._lock:
-            if session_id and session_id in self._connections:
-                self._connections[session_id].discard(websocket)
-                if not self._connections[session_id]:
-                    del self._connections[session_id]
-                logger.info(f"[WebSocket] 连接断开: session={session_id}")
-            else:
-                self._global_connections.discard(websocket)
-                logger.info("[WebSocket] 全局连接断开")
+            self._unregister(websocket, session_id)
+            channel = self._channels.pop(websocket, None)
+        if channel:
+            await channel.close()
+        if session_id:
+            logger.info(f"[WebSocket] 连接断开: session={session_id}")
+        else:
+            logger.info("[WebSocket] 全局连接断开")
+
+    def _unregister(self, websocket: WebSocket, session_id: Optional[str]):
+        if session_id and session_id in self._connections:
+            self._connections[session_id].discard(websocket)
+            if not self._connections[session_id]:
+                del self._connections[session_id]
+        else:
+            self._global_connections.discard(websocket)
+
+    async def _drop(self, channel: _ClientChannel):
+        """移除发送失败或溢出的连接并关闭底层 socket"""
+        async with self._lock:
+            if self._channels.get(channel.websocket) is not channel:
+                return
+            del self._channels[channel.websocket]
+            self._unregister(channel.websocket, channel.session_id)
+        await channel.close()
+        try:
+            await channel.websocket.close()
+        except Exception:
+            pass
+
+    def _schedule_drop(self, channel: _ClientChannel):
+        self._disconnected_slow += 1
+        channel._closed = True
+        asyncio.create_task(self._drop(channel))
+
+    def _enqueue(self, connections, message_json: str, key: Optional[Hashable]) -> int:
+        queued = 0
+        for ws in list(connections):
+            channel = self._channels.get(ws)
+            if channel and channel.enqueue(message_json, key):
+                queued += 1
+        return queued
+
+    async def send_to_connection(self, websocket: WebSocket, message: Dict[str, Any]) -> bool:
+        """通过连接自身的发送队列发送（避免与广播并发写同一 socket）"""
+        channel = self._channels.get(websocket)
+        if channel is None:
+            return False
+        return channel.enqueue(json.dumps(message, ensure_ascii=False), _coalesce_key(message))
 
     async def send_to_session(self, session_id: str, message: Dict[str, Any]):
-        """发送消息到特定会话的所有连接"""
+        """发送消息到特定会话的所有连接，返回成功入队的连接数"""
         if session_id not in self._connections:
             logger.debug(f"[WebSocket] 会话 {session_id} 无活跃连接")
             return 0
 
         message_json = json.dumps(message, ensure_ascii=False)
-        disconnected = set()
-        sent_count = 0
-
-        for ws in self._connections[session_id]:
-            try:
-                await ws.send_text(message_json)
-                sent_count += 1
-            except Exception as e:
-                logger.warning(f"[WebSocket] 发送失败: {e}")
-                disconnected.add(ws)
-
-        # 清理断开的连接
-        if disconnected:
-            async with self._lock:
-                self._connections[session_id] -= disconnected
-                if not self._connections[session_id]:
-                    del self._connections[session_id]
-
-        return sent_count
+        return self._enqueue(self._connections[session_id], message_json, _coalesce_key(message))
 
     async def broadcast(self, message: Dict[str, Any], exclude_session: str = None):
-        """广播消息到所有连接"""
+        """广播消息到所有连接，返回成功入队的连接数"""
         message_json = json.dumps(message, ensure_ascii=False)
-        disconnected_global = set()
-        disconnected_sessions = {}
-        sent_count = 0
+        key = _coalesce_key(message)
+        self._broadcasts += 1
 
         # 发送到全局连接
-        for ws in self._global_connections:
-            try:
-                await ws.send_text(message_json)
-                sent_count += 1
-            except Exception as e:
-                logger.warning(f"[WebSocket] 广播失败: {e}")
-                disconnected_global.add(ws)
+        sent_count = self._enqueue(self._global_connections, message_json, key)
 
         # 发送到所有会话连接
-        for session_id, connections in self._connections.items():
+        for session_id, connections in list(self._connections.items()):
             if session_id == exclude_session:
                 continue
+            sent_count += self._enqueue(connections, message_json, key)
 
-            for ws in connections:
-                try:
-                    await ws.send_text(message_json)
-                    sent_count += 1
-                except Exception as e:
-                    logger.warning(f"[WebSocket] 广播失败 (session={session_id}): {e}")
-                    if session_id not in disconnected_sessions:
-                        disconnected_sessions[session_id] = set()
-                    disconnected_sessions[session_id].add(ws)
-
-        # 清理断开的连接
-        if disconnected_global or disconnected_sessions:
-            async with self._lock:
-                self._global_connections -= disconnected_global
-
-                for session_id, ws_set in disconnected_sessions.items():
-                    if session_id in self._connections:
-                        self._connections[session_id] -= ws_set
-                        if not self._connections[session_id]:
-                            del self._connections[session_id]
-
-        logger.debug(f"[WebSocket] 广播完成: 发送{sent_count}条")
+        logger.debug(f"[WebSocket] 广播完成: 入队{sent_count}条")
         return sent_count
 
     async def send_proactive_message(self, message: str, source: str):
@@ -137,11 +278,24 @@ class WebSocketManager:
     def get_stats(self) -> Dict[str, Any]:
         """获取连接统计"""
         total_session_connections = sum(len(conns) for conns in self._connections.values())
+        channels = [channel.get_stats() for channel in self._channels.values()]
         return {
             "total_sessions": len(self._connections),
             "total_session_connections": total_session_connections,
             "global_connections": len(self._global_connections),
             "total_connections": total_session_connections + len(self._global_connections),
+            "queue": {
+                "size_limit": self.queue_size,
+                "overflow_policy": self.overflow_policy,
+                "total_depth": sum(c["queue_depth"] for c in channels),
+                "max_depth": max((c["queue_depth"] for c in channels), default=0),
+                "dropped": sum(c["dropped"] for c in channels),
+                "coalesced": sum(c["coalesced"] for c in channels),
+                "disconnected_slow": self._disconnected_slow,
+            },
+            "broadcasts": self._broadcasts,
+            "max_send_latency_ms": max((c["max_send_latency_ms"] for c in channels), default=0.0),
+            "connections": channels,
         }
 
 
@@ -153,5 +307,16 @@ def get_websocket_manager() -> WebSocketManager:
     """获取WebSocket管理器单例"""
     global _ws_manager
     if _ws_manager is None:
-        _ws_manager = WebSocketManager()
+        try:
+            from system.config import get_config
+
+            cfg = get_config().api_server
+            _ws_manager = WebSocketManager(
+                queue_size=cfg.ws_send_queue_size,
+                overflow_policy=cfg.ws_overflow_policy,
+                send_timeout=cfg.ws_send_timeout,
+            )
+        except Exception as e:
+            logger.warning(f"[WebSocket] 读取发送队列配置失败，使用默认值: {e}")
+            _ws_manager = WebSocketManager()
     return _ws_manager
@@ -48,8 +48,8 @@ export interface MemoryStats {
     taskTimeout: number
   }
 }
-import type { TravelSession } from '@/travel/types'
-export type { TravelDiscovery, SocialInteraction, TravelSession } from '@/travel/types'
+import type { TravelSession, TravelSessionSummary } from '@/travel/types'
+export type { TravelDiscovery, SocialInteraction, TravelSession, TravelSessionSummary } from '@/travel/types'
 
 export class CoreApiClient extends ApiClient {
   health(): Promise<{
@@ -251,7 +251,12 @@ export class CoreApiClient extends ApiClient {
     return this.instance.get('/memory/stats')
   }
 
-  getQuintuples(): Promise<{
+  getQuintuples(params?: {
+    cursor?: string
+    limit?: number
+    entityType?: string
+    relation?: string
+  }): Promise<{
     status: string
     quintuples: Array<{
       subject: string
@@ -261,8 +266,16 @@ export class CoreApiClient extends ApiClient {
       objectType: string
     }>
     count: number
-  }> {
-    return this.instance.get('/memory/quintuples')
+    nextCursor?: string | null
+  }> {
+    return this.instance.get('/memory/quintuples', {
+      params: {
+        cursor: params?.cursor,
+        limit: params?.limit,
+        entity_type: params?.entityType,
+        relation: params?.relation,
+      },
+    })
   }
 
   searchQuintuples(keywords: string): Promise<{
@@ -477,10 +490,17 @@ export class CoreApiClient extends ApiClient {
 
   getTravelHistory(): Promise<{
     status: 'success'
-    sessions: TravelSession[]
+    sessions: TravelSessionSummary[]
   }> {
     return this.instance.get('/travel/history')
   }
+
+  getTravelSession(sessionId: string): Promise<{
+    status: 'success'
+    session: TravelSession
+  }> {
+    return this.instance.get(`/travel/history/${encodeURIComponent(sessionId)}`)
+  }
 }
 
 export default new CoreApiClient(8000)
@@ -1,7 +1,7 @@
 import { useToast } from 'primevue/usetoast'
 import { computed, onMounted, onUnmounted, ref } from 'vue'
 import coreApi from '@/api/core'
-import type { TravelSession } from '@/travel/types'
+import type { TravelSession, TravelSessionSummary } from '@/travel/types'
 
 export const statusLabel: Record<string, string> = {
   pending: '准备中',
@@ -29,7 +29,7 @@ export function useTravel() {
   const loading = ref(false)
   const travelSession = ref<TravelSession | null>(null)
   const isActive = ref(false)
-  const historyList = ref<TravelSession[]>([])
+  const historyList = ref<TravelSessionSummary[]>([])
   let pollTimer: ReturnType<typeof setInterval> | null = null
 
   const isRunning = computed(() => travelSession.value?.status === 'running')
@@ -119,9 +119,14 @@ export function useTravel() {
     }
   }
 
-  function viewSession(session: TravelSession) {
-    travelSession.value = session
-    isActive.value = false
+  async function viewSession(summary: TravelSessionSummary) {
+    try {
+      const res = await coreApi.getTravelSession(summary.sessionId)
+      travelSession.value = res.session
+      isActive.value = false
+    } catch {
+      toast.add({ severity: 'error', summary: '加载失败', detail: '无法读取旅行详情', life: 3000 })
+    }
   }
 
   onMounted(async () => {
@@ -32,3 +32,18 @@ export interface TravelSession {
   summary?: string
   error?: string
 }
+
+export interface TravelSessionSummary {
+  sessionId: string
+  status: TravelSession['status']
+  createdAt: string
+  startedAt?: string
+  completedAt?: string
+  timeLimitMinutes: number
+  creditLimit: number
+  creditsUsed: number
+  elapsedMinutes: number
+  discoveryCount: number
+  socialCount: number
+  error?: string
+}
@@ -10,10 +10,12 @@
 - 真实伤害 = ATK × 倍率
 """
 
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 from enum import Enum
 
+import numpy as np
+
 from .gamedata_loader import (
     get_gamedata_loader,
     GameDataLoader,
@@ -94,6 +96,94 @@ class CalculationResult:
     raw_blackboard: Dict[str, float] = field(default_factory=dict)
 
 
+@dataclass
+class BatchCalculationResult:
+    """
+    批量计算结果
+
+    每个配置（干员 × 技能 × 技能等级）占第0维，敌人防御、法抗分别为第1、2维。
+    数值与逐个调用 calculate() 的结果一致。
+    """
+    operator_names: List[str] = field(default_factory=list)
+    skill_names: List[str] = field(default_factory=list)
+    skill_indices: List[int] = field(default_factory=list)
+    skill_levels: List[int] = field(default_factory=list)
+    damage_types: List[DamageType] = field(default_factory=list)
+
+    enemy_defenses: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    enemy_resistances: np.ndarray = field(default_factory=lambda: np.zeros(0))
+
+    final_atk: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    final_attack_interval: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    damage_per_hit: np.ndarray = field(default_factory=lambda: np.zeros((0, 0, 0)))
+    dps: np.ndarray = field(default_factory=lambda: np.zeros((0, 0, 0)))
+    total_skill_damage: np.ndarray = field(default_factory=lambda: np.zeros((0, 0, 0)))
+
+    # 找不到的干员/技能
+    missing: List[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.operator_names)
+
+    def rank(
+        self,
+        enemy_defense: Optional[float] = None,
+        enemy_res: Optional[float] = None,
+        metric: str = "dps",
+        top: Optional[int] = 10,
+        best_per_operator: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        在指定敌人防御/法抗下排序
+
+        Args:
+            enemy_defense: 敌人防御（取网格中最接近的值，默认第一个）
+            enemy_res: 敌人法抗（同上）
+            metric: 排序指标 dps / damage_per_hit / total_skill_damage
+            top: 返回前N条，None 表示全部
+            best_per_operator: 每个干员只保留最优的技能配置
+        """
+        if metric not in ("dps", "damage_per_hit", "total_skill_damage"):
+            raise ValueError(f"不支持的排序指标: {metric}")
+        if not self.operator_names:
+            return []
+
+        d = self._nearest(self.enemy_defenses, enemy_defense)
+        r = self._nearest(self.enemy_resistances, enemy_res)
+        values = getattr(self, metric)[:, d, r]
+
+        rows: List[Dict[str, Any]] = []
+        seen: set[str] = set()
+        for i in np.argsort(-values, kind="stable"):
+            name = self.operator_names[i]
+            if best_per_operator:
+                if name in seen:
+                    continue
+                seen.add(name)
+            rows.append({
+                "operator_name": name,
+                "skill_name": self.skill_names[i],
+                "skill_index": self.skill_indices[i],
+                "skill_level": self.skill_levels[i],
+                "damage_type": self.damage_types[i].value,
+                "enemy_defense": float(self.enemy_defenses[d]),
+                "enemy_res": float(self.enemy_resistances[r]),
+                "final_atk": float(self.final_atk[i]),
+                "damage_per_hit": float(self.damage_per_hit[i, d, r]),
+                "dps": float(self.dps[i, d, r]),
+                "total_skill_damage": float(self.total_skill_damage[i, d, r]),
+            })
+            if top is not None and len(rows) >= top:
+                break
+        return rows
+
+    @staticmethod
+    def _nearest(grid: np.ndarray, value: Optional[float]) -> int:
+        if value is None or grid.size == 0:
+            return 0
+        return int(np.argmin(np.abs(grid - value)))
+
+
 class CalculationService:
     """伤害计算服务"""
 
@@ -110,20 +200,11 @@ class CalculationService:
         Returns:
             CalculationResult 或 None（如果找不到干员/技能）
         """
-        # 1. 获取干员数据
-        char = self.loader.get_character(params.operator_name)
-        if not char:
-            return None
-
-        # 2. 获取技能数据
-        skills = self.loader.get_character_skills(char)
-        if params.skill_index >= len(skills):
-            return None
-
-        skill = skills[params.skill_index]
-        skill_level = skill.get_level(params.skill_level)
-        if not skill_level:
+        # 1-2. 获取干员与技能数据
+        resolved = self._resolve_skill_level(params)
+        if not resolved:
             return None
+        char, skill_level = resolved
 
         # 3. 创建结果对象
         result = CalculationResult(
@@ -190,6 +271,21 @@ class CalculationService:
 
         return result
 
+    def _resolve_skill_level(self, params: CalculationParams) -> Optional[Tuple[Character, SkillLevel]]:
+        """获取干员及指定技能等级数据，找不到时返回 None"""
+        char = self.loader.get_character(params.operator_name)
+        if not char:
+            return None
+
+        skills = self.loader.get_character_skills(char)
+        if params.skill_index >= len(skills):
+            return None
+
+        skill_level = skills[params.skill_index].get_level(params.skill_level)
+        if not skill_level:
+            return None
+        return char, skill_level
+
     def _calc_final_atk(
         self,
         char: Character,
@@ -312,11 +408,7 @@ class CalculationService:
             (damage, damage_type)
         """
         # 获取伤害倍率
-        ATK_SCALE_KEYS = {"atk_scale", "attack@atk_scale"}
-        atk_scale = 1.0
-        for key, value in skill_level.blackboard.items():
-            if key.lower() in ATK_SCALE_KEYS:
-                atk_scale = max(atk_scale, value)
+        atk_scale = self._get_atk_scale(skill_level)
 
         # 判断伤害类型
         damage_type = self._infer_damage_type(char, skill_level)
@@ -340,6 +432,16 @@ class CalculationService:
 
         return damage, damage_type
 
+    @staticmethod
+    def _get_atk_scale(skill_level: SkillLevel) -> float:
+        """获取技能伤害倍率（取 blackboard 中最大的倍率，至少为1）"""
+        ATK_SCALE_KEYS = {"atk_scale", "attack@atk_scale"}
+        atk_scale = 1.0
+        for key, value in skill_level.blackboard.items():
+            if key.lower() in ATK_SCALE_KEYS:
+                atk_scale = max(atk_scale, value)
+        return atk_scale
+
     @staticmethod
     def _infer_damage_type(char: Character | None, skill_level: SkillLevel) -> DamageType:
         """根据技能描述和干员职业推断伤害类型"""
@@ -496,6 +598,128 @@ class CalculationService:
 
         return self.calculate(params)
 
+    # ========== 批量计算 ==========
+
+    def calculate_batch(
+        self,
+        operator_names: Sequence[str],
+        skill_indices: Optional[Sequence[int]] = None,
+        skill_levels: Sequence[int] = (10,),
+        enemy_defenses: Sequence[float] = (0,),
+        enemy_resistances: Sequence[float] = (0,),
+        base_params: Optional[CalculationParams] = None,
+    ) -> BatchCalculationResult:
+        """
+        批量计算 干员 × 技能 × 技能等级 × 敌人防御 × 敌人法抗 的整张网格
+
+        与敌人无关的部分（攻击力、攻击间隔、倍率、伤害类型）逐配置复用标量路径的计算，
+        与敌人相关的伤害公式用 NumPy 广播一次算完。
+
+        Args:
+            operator_names: 干员名列表
+            skill_indices: 技能索引列表，None 表示干员的全部技能
+            skill_levels: 技能等级列表 1-10
+            enemy_defenses: 敌人防御取值
+            enemy_resistances: 敌人法抗取值
+            base_params: 其余参数（精英/信赖/潜能/额外buff等），模组仅对所属干员生效
+        """
+        base = base_params or CalculationParams()
+        batch = BatchCalculationResult(
+            enemy_defenses=np.asarray(enemy_defenses, dtype=np.float64),
+            enemy_resistances=np.asarray(enemy_resistances, dtype=np.float64),
+        )
+
+        final_atk: List[float] = []
+        atk_scale: List[float] = []
+        attack_interval: List[float] = []
+        attack_multiplier: List[int] = []
+        duration: List[float] = []
+
+        for operator_name in operator_names:
+            char = self.loader.get_character(operator_name)
+            if not char:
+                batch.missing.append(operator_name)
+                continue
+            skill_count = len(self.loader.get_character_skills(char))
+            indices = range(skill_count) if skill_indices is None else skill_indices
+            module_id = base.module_id
+            if module_id:
+                module = self.loader.get_module(module_id)
+                if not module or module.char_id != char.char_id:
+                    module_id = None
+
+            for skill_index in indices:
+                for level in skill_levels:
+                    params = replace(
+                        base,
+                        operator_name=operator_name,
+                        skill_index=skill_index,
+                        skill_level=level,
+                        module_id=module_id,
+                    )
+                    resolved = self._resolve_skill_level(params)
+                    if not resolved:
+                        batch.missing.append(f"{operator_name} S{skill_index + 1} Lv{level}")
+                        continue
+                    char, skill_level = resolved
+
+                    base_attack_time = char.phases[params.elite].base_attack_time if params.elite < len(char.phases) else 1.0
+                    attack_speed, interval = self._calc_attack_interval(base_attack_time, skill_level, params, char)
+
+                    batch.operator_names.append(char.name)
+                    batch.skill_names.append(skill_level.name)
+                    batch.skill_indices.append(skill_index)
+                    batch.skill_levels.append(level)
+                    batch.damage_types.append(self._infer_damage_type(char, skill_level))
+                    final_atk.append(self._calc_final_atk(char, params, skill_level))
+                    atk_scale.append(self._get_atk_scale(skill_level))
+                    attack_interval.append(interval)
+                    attack_multiplier.append(self._parse_attack_multiplier(skill_level))
+                    duration.append(skill_level.duration)
+
+        batch.final_atk = np.asarray(final_atk, dtype=np.float64)
+        batch.final_attack_interval = np.asarray(attack_interval, dtype=np.float64)
+
+        # 运算顺序与 _calc_damage / calculate 保持一致，保证逐位相同
+        enemy_def = batch.enemy_defenses * (1 - base.defense_ignore)
+        enemy_res = batch.enemy_resistances * (1 - base.res_ignore)
+        shape = (len(final_atk), enemy_def.size, enemy_res.size)
+
+        raw = (batch.final_atk * np.asarray(atk_scale, dtype=np.float64))[:, None, None]
+        floor = raw * 0.05
+        physical = np.maximum(floor, raw - enemy_def[None, :, None])
+        magical = np.maximum(floor, raw * (1 - enemy_res[None, None, :] / 100))
+
+        is_physical = np.asarray([t == DamageType.PHYSICAL for t in batch.damage_types], dtype=bool)[:, None, None]
+        is_magical = np.asarray([t == DamageType.MAGICAL for t in batch.damage_types], dtype=bool)[:, None, None]
+        damage = np.where(is_physical, physical, np.where(is_magical, magical, raw))
+        batch.damage_per_hit = np.broadcast_to(damage, shape).astype(np.float64)
+
+        hits_per_second = (1.0 / batch.final_attack_interval)[:, None, None]
+        batch.dps = batch.damage_per_hit * hits_per_second
+
+        durations = np.asarray(duration, dtype=np.float64)[:, None, None]
+        total_hits = durations / batch.final_attack_interval[:, None, None]
+        multipliers = np.asarray(attack_multiplier, dtype=np.float64)[:, None, None]
+        batch.total_skill_damage = np.where(
+            durations > 0, batch.damage_per_hit * multipliers * total_hits, 0.0
+        )
+
+        return batch
+
+    def format_ranking(self, rows: List[Dict[str, Any]], metric: str = "dps") -> str:
+        """格式化批量排序结果为易读文本"""
+        if not rows:
+            return "无可用计算结果"
+        head = rows[0]
+        lines = [f"敌人防御{head['enemy_defense']:.0f}，法抗{head['enemy_res']:.0f}% 下按 {metric} 排序："]
+        for i, row in enumerate(rows, 1):
+            lines.append(
+                f"{i}. {row['operator_name']} S{row['skill_index'] + 1} {row['skill_name']}"
+                f"（{self._level_to_str(row['skill_level'])}）: {row[metric]:.0f} ({row['damage_type']})"
+            )
+        return "\n".join(lines)
+
     def format_result(self, result: CalculationResult) -> str:
         """格式化计算结果为易读文本"""
         lines = [
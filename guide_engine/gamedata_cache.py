@@ -0,0 +1,157 @@
+"""
+GameData 二进制缓存
+
+把解析后的表对象序列化为带版本头的二进制文件，
+按源文件 mtime/size 校验，签名变化时再比对内容哈希，避免冷启动重复解析大 JSON。
+文件通过 mmap 读取，先只解码头部，校验通过后才解码表数据。
+名称索引（system.parsing.NameIndex）构建一次后随表缓存一起持久化。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# 缓存格式版本：修改表对象结构或索引结构时递增，旧缓存自动失效
+CACHE_VERSION = 2
+
+_MAGIC = b"NGDC"
+_HEADER_LEN = struct.Struct("<I")
+_HASH_CHUNK = 1 << 20
+
+
+def _file_sha1(path: Path) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_signature(path: Path, with_hash: bool = True) -> Dict[str, Any]:
+    """源文件签名：不存在的文件也记录下来，文件出现时缓存同样失效"""
+    try:
+        st = path.stat()
+    except OSError:
+        return {"name": path.name, "exists": False}
+    sig: Dict[str, Any] = {
+        "name": path.name,
+        "exists": True,
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+    }
+    if with_hash:
+        sig["sha1"] = _file_sha1(path)
+    return sig
+
+
+class TableCache:
+    """按表名存取的二进制缓存"""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+
+    def _cache_file(self, name: str) -> Path:
+        return self.cache_dir / f"{name}.v{CACHE_VERSION}.bin"
+
+    def load(self, name: str, sources: Sequence[Path]) -> Optional[Any]:
+        """读取缓存，签名不匹配或文件损坏时返回 None"""
+        cache_file = self._cache_file(name)
+        if not cache_file.exists():
+            return None
+
+        refreshed: Optional[List[Dict[str, Any]]] = None
+        payload_copy = b""
+        try:
+            with open(cache_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:4] != _MAGIC:
+                    return None
+                (header_len,) = _HEADER_LEN.unpack(mm[4:8])
+                payload_offset = 8 + header_len
+                header = pickle.loads(mm[8:payload_offset])
+
+                if header.get("version") != CACHE_VERSION:
+                    return None
+                valid, refreshed = self._check_sources(header.get("sources", []), sources)
+                if not valid:
+                    return None
+
+                with memoryview(mm) as view, view[payload_offset:] as payload_view:
+                    payload = pickle.loads(payload_view)
+                    if refreshed:
+                        payload_copy = bytes(payload_view)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, struct.error) as e:
+            print(f"[GameDataLoader] 缓存 {cache_file.name} 读取失败，将重新解析: {e}")
+            return None
+
+        if refreshed:
+            # 内容未变但 mtime 变了（如 git checkout），刷新签名免得下次再算哈希；
+            # 需在 mmap 关闭后写入，Windows 下无法替换仍被映射的文件
+            try:
+                self._write(cache_file, refreshed, payload_copy)
+            except OSError as e:
+                print(f"[GameDataLoader] 缓存 {cache_file.name} 签名刷新失败: {e}")
+        return payload
+
+    def store(self, name: str, sources: Sequence[Path], payload: Any) -> None:
+        """写入缓存（先写临时文件再原子替换）"""
+        signatures = [_source_signature(Path(p)) for p in sources]
+        try:
+            data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+            self._write(self._cache_file(name), signatures, data)
+        except (OSError, pickle.PicklingError, TypeError) as e:
+            print(f"[GameDataLoader] 缓存 {name} 写入失败: {e}")
+
+    def _write(self, cache_file: Path, signatures: List[Dict[str, Any]], payload_bytes: bytes) -> None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        header = pickle.dumps({"version": CACHE_VERSION, "sources": signatures}, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_file = cache_file.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp_file, "wb") as f:
+            f.write(_MAGIC)
+            f.write(_HEADER_LEN.pack(len(header)))
+            f.write(header)
+            f.write(payload_bytes)
+        os.replace(tmp_file, cache_file)
+
+    @staticmethod
+    def _check_sources(
+        stored: List[Dict[str, Any]], sources: Sequence[Path]
+    ) -> Tuple[bool, Optional[List[Dict[str, Any]]]]:
+        """
+        校验源文件签名
+
+        Returns:
+            (是否有效, 需要刷新的签名列表；无需刷新时为 None)
+        """
+        if len(stored) != len(sources):
+            return False, None
+
+        refreshed: List[Dict[str, Any]] = []
+        changed = False
+        for old, path in zip(stored, sources):
+            path = Path(path)
+            if old.get("name") != path.name:
+                return False, None
+            current = _source_signature(path, with_hash=False)
+            if not current["exists"] or not old.get("exists"):
+                if current["exists"] != old.get("exists"):
+                    return False, None
+                refreshed.append(current)
+                continue
+            if current["mtime_ns"] == old.get("mtime_ns") and current["size"] == old.get("size"):
+                refreshed.append(old)
+                continue
+            if current["size"] != old.get("size"):
+                return False, None
+            current["sha1"] = _file_sha1(path)
+            if current["sha1"] != old.get("sha1"):
+                return False, None
+            refreshed.append(current)
+            changed = True
+
+        return True, (refreshed if changed else None)
@@ -10,6 +10,10 @@ from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
 from functools import lru_cache
 
+from system.parsing.name_index import NameIndex
+
+from .gamedata_cache import TableCache
+
 
 @dataclass
 class PhaseAttributes:
@@ -199,6 +203,7 @@ class GameDataLoader:
         self.gamedata_root = gamedata_dir
         self.gamedata_dir = gamedata_dir / "arknights" / "gamedata"
         self.index_dir = gamedata_dir / "arknights" / "index"
+        self.cache = TableCache(gamedata_dir / "arknights" / "cache")
 
         self._characters: Dict[str, Character] = {}
         self._skills: Dict[str, Skill] = {}
@@ -206,6 +211,9 @@ class GameDataLoader:
         self._char_modules: Dict[str, List[Module]] = {}  # char_id -> [modules]
         self._enemies: Dict[str, Enemy] = {}
         self._name_mapping: Dict[str, str] = {}  # 名字 -> char_id
+        self._character_index = NameIndex()
+        self._enemy_index = NameIndex()
+        self._loaded_tables: set[str] = set()
         self._loaded = False
 
     def load(self):
@@ -213,11 +221,8 @@ class GameDataLoader:
         if self._loaded:
             return
 
-        self._load_characters()
-        self._load_skills()
-        self._load_modules()
-        self._load_enemies()
-        self._load_name_mapping()
+        for table in self._TABLE_SOURCES:
+            self._ensure_table(table)
         self._loaded = True
 
         print(f"[GameDataLoader] 数据加载完成:")
@@ -226,6 +231,84 @@ class GameDataLoader:
         print(f"  模组: {len(self._modules)}")
         print(f"  敌人: {len(self._enemies)}")
 
+    # 表名 -> 源文件（相对 gamedata_dir；operator_mapping 位于 index_dir）
+    _TABLE_SOURCES: Dict[str, Tuple[str, ...]] = {
+        "characters": ("character_table.json", "index:operator_mapping.json"),
+        "skills": ("skill_table.json",),
+        "modules": ("uniequip_table.json", "battle_equip_table.json"),
+        "enemies": ("enemy_handbook_table.json",),
+    }
+
+    def _table_sources(self, table: str) -> List[Path]:
+        paths = []
+        for name in self._TABLE_SOURCES[table]:
+            if name.startswith("index:"):
+                paths.append(self.index_dir / name[len("index:"):])
+            else:
+                paths.append(self.gamedata_dir / name)
+        return paths
+
+    def _ensure_table(self, table: str):
+        """按需加载单张表：优先读二进制缓存，失效时解析 JSON 并回写缓存"""
+        if table in self._loaded_tables:
+            return
+
+        sources = self._table_sources(table)
+        payload = self.cache.load(table, sources)
+        if payload is None:
+            payload = self._build_table(table)
+            if any(path.exists() for path in sources):
+                self.cache.store(table, sources, payload)
+
+        if table == "characters":
+            self._characters = payload["characters"]
+            self._name_mapping = payload["name_mapping"]
+            self._character_index = payload["index"]
+        elif table == "skills":
+            self._skills = payload["skills"]
+        elif table == "modules":
+            self._modules = payload["modules"]
+            self._char_modules = payload["char_modules"]
+        elif table == "enemies":
+            self._enemies = payload["enemies"]
+            self._enemy_index = payload["index"]
+        # 构建成功后才标记已加载，解析失败时下次调用会重试，而不是留下空表
+        self._loaded_tables.add(table)
+
+    def _build_table(self, table: str) -> Dict[str, Any]:
+        """从 JSON 源文件解析单张表"""
+        if table == "characters":
+            self._load_characters()
+            self._load_name_mapping()
+            return {
+                "characters": self._characters,
+                "name_mapping": self._name_mapping,
+                "index": self._build_character_index(),
+            }
+        if table == "skills":
+            self._load_skills()
+            return {"skills": self._skills}
+        if table == "modules":
+            self._load_modules()
+            return {"modules": self._modules, "char_modules": self._char_modules}
+        if table == "enemies":
+            self._load_enemies()
+            index = NameIndex()
+            for enemy_id, enemy in self._enemies.items():
+                index.add(enemy_id, [enemy.name])
+            return {"enemies": self._enemies, "index": index.finalize()}
+        raise KeyError(table)
+
+    def _build_character_index(self) -> NameIndex:
+        """构建干员名称索引（名字/代号/ID + operator_mapping 别名）"""
+        index = NameIndex()
+        for char_id, char in self._characters.items():
+            index.add(char_id, [char.name, char.appellation])
+        for name, char_id in self._name_mapping.items():
+            if char_id in self._characters:
+                index.add_alias(name, char_id)
+        return index.finalize(self._name_mapping.keys())
+
     def _load_characters(self):
         """加载干员数据"""
         char_file = self.gamedata_dir / "character_table.json"
@@ -512,7 +595,7 @@ class GameDataLoader:
 
     def get_character(self, name_or_id: str) -> Optional[Character]:
         """根据名字或ID获取干员"""
-        self.load()
+        self._ensure_table("characters")
 
         # 直接ID匹配
         if name_or_id in self._characters:
@@ -523,21 +606,21 @@ class GameDataLoader:
         if char_id:
             return self._characters.get(char_id)
 
-        # 模糊匹配
-        for char_id, char in self._characters.items():
-            if name_or_id in char.name or name_or_id in char.appellation:
-                return char
+        # 索引匹配：规范化精确 -> 子串 -> 前缀/拼音 -> 高分模糊
+        char_id = self._character_index.resolve(name_or_id)
+        if char_id:
+            return self._characters.get(char_id)
 
         return None
 
     def get_skill(self, skill_id: str) -> Optional[Skill]:
         """获取技能数据"""
-        self.load()
+        self._ensure_table("skills")
         return self._skills.get(skill_id)
 
     def get_character_skills(self, char: Character) -> List[Skill]:
         """获取干员的所有技能"""
-        self.load()
+        self._ensure_table("skills")
         skills = []
         for skill_id in char.skill_ids:
             skill = self._skills.get(skill_id)
@@ -547,40 +630,39 @@ class GameDataLoader:
 
     def get_module(self, module_id: str) -> Optional[Module]:
         """获取模组数据"""
-        self.load()
+        self._ensure_table("modules")
         return self._modules.get(module_id)
 
     def get_character_modules(self, char_id: str) -> List[Module]:
         """获取干员的所有模组"""
-        self.load()
+        self._ensure_table("modules")
         return self._char_modules.get(char_id, [])
 
     def get_enemy(self, name_or_id: str) -> Optional[Enemy]:
         """获取敌人数据"""
-        self.load()
+        self._ensure_table("enemies")
 
         if name_or_id in self._enemies:
             return self._enemies[name_or_id]
 
-        # 名字匹配
-        for enemy_id, enemy in self._enemies.items():
-            if name_or_id in enemy.name:
-                return enemy
+        enemy_id = self._enemy_index.resolve(name_or_id)
+        if enemy_id:
+            return self._enemies.get(enemy_id)
 
         return None
 
     def search_characters(self, keyword: str) -> List[Character]:
-        """搜索干员"""
-        self.load()
-        results = []
-        keyword = keyword.lower()
-
-        for char in self._characters.values():
-            if (keyword in char.name.lower() or
-                keyword in char.appellation.lower()):
-                results.append(char)
-
-        return results
+        """搜索干员（名字/代号子串，无结果时退化为前缀与拼音匹配）"""
+        self._ensure_table("characters")
+        char_ids = self._character_index.search_substring(keyword)
+        if not char_ids:
+            char_ids = self._character_index.search_prefix(keyword)
+        return [self._characters[char_id] for char_id in char_ids if char_id in self._characters]
+
+    def get_known_names(self) -> List[str]:
+        """已知干员名（按长度降序，供文本中优先匹配长名）"""
+        self._ensure_table("characters")
+        return self._character_index.known_names
 
 
 # 单例
@@ -121,6 +121,14 @@ class GuideService:
             metadata=metadata,
         )
 
+    def get_status(self) -> dict[str, Any]:
+        """攻略服务运行状态（缓存命中率、节省的图数据库往返次数等）"""
+        return {
+            "enabled": get_guide_engine_settings().enabled,
+            "operator_cache": self.neo4j.operator_cache.stats(),
+            "route_cache": self.router.get_cache_stats(),
+        }
+
     async def _resolve_request_game_id(
         self,
         request: GuideRequest,
@@ -291,9 +299,9 @@ class GuideService:
         operator_names: list[str] = []
         if graph_rag_enabled:
             operator_names = self._extract_operator_names_for_graph(request.content, route, prompt_config)
-            for name in operator_names:
-                task_keys.append(f"neo4j_op_{name}")
-                tasks.append(self.neo4j.get_operator(game_id, name))
+            if operator_names:
+                task_keys.append("neo4j_ops")
+                tasks.append(self.neo4j.get_operators(game_id, operator_names))
             # synergy 关系当前未导入种子数据，暂时跳过查询以避免无效警告
             # if operator_names:
             #     task_keys.append(f"neo4j_syn_{operator_names[0]}")
@@ -304,8 +312,11 @@ class GuideService:
         result_map: dict[str, Any] = dict(zip(task_keys, results))
 
         # ---- 处理 Neo4j 干员结果 ----
+        op_map = result_map.get("neo4j_ops")
+        if not isinstance(op_map, dict):
+            op_map = {}
         for name in operator_names:
-            op_data = result_map.get(f"neo4j_op_{name}")
+            op_data = op_map.get(name)
             if isinstance(op_data, dict):
                 context_parts.append(self._format_operator_context(op_data))
                 references.append(GuideReference(
@@ -616,9 +627,7 @@ class GuideService:
 
         # 从查询文本中匹配已知干员名（按名字长度降序，优先匹配长名）
         if query:
-            loader = get_gamedata_loader()
-            loader.load()
-            known_names = sorted(loader._name_mapping.keys(), key=len, reverse=True)
+            known_names = get_gamedata_loader().get_known_names()
             for name in known_names:
                 if name in query:
                     return name
@@ -656,9 +665,7 @@ class GuideService:
                         break
 
         # 来源3：GameDataLoader 已知干员名
-        loader = get_gamedata_loader()
-        loader.load()
-        known_names = sorted(loader._name_mapping.keys(), key=len, reverse=True)
+        known_names = get_gamedata_loader().get_known_names()
         for name in known_names:
             if name in query and name not in names:
                 names.append(name)
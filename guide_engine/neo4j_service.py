@@ -1,7 +1,10 @@
 import asyncio
+import hashlib
 import json
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 
 try:
     from neo4j import AsyncGraphDatabase
@@ -11,16 +14,82 @@ except ImportError:
 from .models import get_guide_engine_settings
 
 
+class OperatorCache:
+    """干员记录的进程内缓存（LRU 容量上限 + TTL，未命中的名字以较短 TTL 负缓存）"""
+
+    def __init__(self, max_size: int = 512, ttl: float = 600.0, negative_ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0             # 实际发出的批量查询次数
+        self.saved_round_trips = 0   # 相比每个名字一次查询省下的往返次数
+        self.invalidations = 0
+
+    def get(self, game_id: str, name: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """返回 (是否命中, 记录)"""
+        key = (game_id, name)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def put(self, game_id: str, name: str, record: Optional[Dict[str, Any]]) -> None:
+        ttl = self.ttl if record is not None else self.negative_ttl
+        key = (game_id, name)
+        self._entries[key] = (time.monotonic() + ttl, record)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, game_id: str | None = None) -> None:
+        """清除指定游戏（或全部）的缓存记录"""
+        if game_id is None:
+            self._entries.clear()
+        else:
+            for key in [k for k in self._entries if k[0] == game_id]:
+                del self._entries[key]
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "queries": self.queries,
+            "saved_round_trips": self.saved_round_trips,
+            "invalidations": self.invalidations,
+        }
+
+
 class Neo4jService:
     """Neo4j 图数据库服务"""
 
     AUTO_IMPORT_GAMES = {"arknights", "kantai-collection"}
+    SEED_FILES: Dict[str, List[str]] = {
+        "arknights": ["arknights_cn_operators.json", "arknights/cn/operators.json"],
+        "kantai-collection": ["kantai-collection_start2.json", "kantai_collection_start2.json"],
+    }
+    SEED_BATCH_SIZE = 300   # 单个事务写入的最大行数
+    SEED_WORKERS = 4        # 并行写入的事务数
     ENEMY_NAME_TOKENS = ("级", "鬼", "姬", "栖", "棲", "要塞", "砲台", "飞行场", "飛行場", "集积地", "集積地", "泊地")
 
     def __init__(self):
         self._driver = None
         self._seed_lock: asyncio.Lock = asyncio.Lock()
         self._seed_attempted_games: set[str] = set()
+        self.operator_cache = OperatorCache()
 
     async def connect(self):
         """连接 Neo4j"""
@@ -58,14 +127,56 @@ class Neo4jService:
             self._seed_attempted_games.add(game_id)
 
             try:
-                already_has_data = await self._has_seed_data(game_id)
-                if already_has_data:
-                    return
-                imported_count = await self._auto_import_seed_data(game_id)
-                print(f"[Neo4j] auto import completed: game_id={game_id}, imported={imported_count}")
+                await self.sync_seed_data(game_id)
             except Exception as exc:
                 print(f"[Neo4j] auto import failed: game_id={game_id}, error={exc}")
 
+    async def sync_seed_data(self, game_id: str, force: bool = False) -> int:
+        """
+        增量同步种子数据
+
+        源文件哈希与检查点一致且图数据库中仍有该游戏的数据时直接跳过（数据库被清空或换了实例时重新导入）；
+        否则按行内容哈希只写入新增/变更的实体，删除源文件中已不存在的实体。
+        每行的哈希随节点保存，中断后重跑会自动跳过已写入的行。
+
+        Args:
+            force: 忽略检查点，重新比对全部行
+
+        Returns:
+            写入或删除的实体数
+        """
+        file_path = self._find_seed_file(self.SEED_FILES.get(game_id, []))
+        if file_path is None:
+            print(f"[Neo4j] {game_id} seed file not found, skip auto import")
+            return 0
+
+        source_sha1 = self._file_sha1(file_path)
+        checkpoint = self._load_seed_checkpoint(game_id)
+        if not force and checkpoint.get("completed") and checkpoint.get("source_sha1") == source_sha1:
+            if await self._has_seed_data(game_id):
+                return 0
+            print(f"[Neo4j] {game_id} checkpoint completed but graph is empty, reimport seed data")
+
+        if not force and not checkpoint and await self._has_seed_data(game_id):
+            # 旧版本全量导入的数据：记录检查点后跳过，源文件变化时再增量同步
+            self._save_seed_checkpoint(game_id, {"source": file_path.name, "source_sha1": source_sha1, "completed": True})
+            return 0
+
+        self._save_seed_checkpoint(game_id, {"source": file_path.name, "source_sha1": source_sha1, "completed": False})
+        stats = await self._auto_import_seed_data(game_id)
+        self.operator_cache.invalidate(game_id)
+
+        changed = sum(item["changed"] + item["deleted"] for item in stats.values())
+        self._save_seed_checkpoint(game_id, {
+            "source": file_path.name,
+            "source_sha1": source_sha1,
+            "completed": True,
+            "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "labels": stats,
+        })
+        print(f"[Neo4j] seed sync completed: game_id={game_id}, changed={changed}")
+        return changed
+
     async def _has_seed_data(self, game_id: str) -> bool:
         if game_id == "arknights":
             result = await self.execute_query(
@@ -83,18 +194,18 @@ class Neo4jService:
 
         return True
 
-    async def _auto_import_seed_data(self, game_id: str) -> int:
+    async def _auto_import_seed_data(self, game_id: str) -> Dict[str, Dict[str, Any]]:
         if game_id == "arknights":
             return await self._import_arknights_seed_data(game_id)
         if game_id == "kantai-collection":
             return await self._import_kantai_seed_data(game_id)
-        return 0
+        return {}
 
-    async def _import_arknights_seed_data(self, game_id: str) -> int:
-        file_path = self._find_seed_file(["arknights_cn_operators.json", "arknights/cn/operators.json"])
+    async def _import_arknights_seed_data(self, game_id: str) -> Dict[str, Dict[str, Any]]:
+        file_path = self._find_seed_file(self.SEED_FILES["arknights"])
         if file_path is None:
             print("[Neo4j] arknights seed file not found, skip auto import")
-            return 0
+            return {}
 
         with open(file_path, "r", encoding="utf-8") as f:
             payload = json.load(f)
@@ -108,16 +219,23 @@ class Neo4jService:
 
         if not operators:
             print("[Neo4j] arknights seed file is empty, skip auto import")
-            return 0
+            return {}
 
         await self.init_constraints()
-        return await self.import_operators(game_id, operators)
+        stats = await self._sync_rows(
+            game_id,
+            "Operator",
+            [self._operator_row(operator) for operator in operators],
+            self._OPERATOR_UPSERT_QUERY,
+            delete_query=self._OPERATOR_DELETE_QUERY,
+        )
+        return {"Operator": stats}
 
-    async def _import_kantai_seed_data(self, game_id: str) -> int:
-        file_path = self._find_seed_file(["kantai-collection_start2.json", "kantai_collection_start2.json"])
+    async def _import_kantai_seed_data(self, game_id: str) -> Dict[str, Dict[str, Any]]:
+        file_path = self._find_seed_file(self.SEED_FILES["kantai-collection"])
         if file_path is None:
             print("[Neo4j] kantai seed file not found, skip auto import")
-            return 0
+            return {}
 
         await self.init_constraints()
 
@@ -169,27 +287,127 @@ class Neo4jService:
             else:
                 ships_rows.append(row)
 
-        imported_ship_count = await self._upsert_ship_rows(game_id, "Ship", ships_rows)
-        imported_enemy_count = await self._upsert_ship_rows(game_id, "EnemyShip", enemy_rows)
-        return imported_ship_count + imported_enemy_count
+        return {
+            "Ship": await self._upsert_ship_rows(game_id, "Ship", ships_rows),
+            "EnemyShip": await self._upsert_ship_rows(game_id, "EnemyShip", enemy_rows),
+        }
 
-    async def _upsert_ship_rows(self, game_id: str, label: str, rows: List[Dict[str, Any]]) -> int:
+    async def _upsert_ship_rows(self, game_id: str, label: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
         if label not in {"Ship", "EnemyShip"}:
             raise ValueError("invalid label")
-        if not rows:
-            return 0
 
         query = f"""
         UNWIND $rows AS row
         MERGE (n:{label} {{game_id: $game_id, id: row.id}})
         SET n += row
         """
+        delete_query = f"""
+        MATCH (n:{label} {{game_id: $game_id}})
+        WHERE n.id IN $ids
+        DETACH DELETE n
+        """
+        return await self._sync_rows(game_id, label, rows, query, delete_query=delete_query)
+
+    # ============ 增量同步 ============
+
+    async def _sync_rows(
+        self,
+        game_id: str,
+        label: str,
+        rows: List[Dict[str, Any]],
+        upsert_query: str,
+        delete_query: str | None = None,
+    ) -> Dict[str, Any]:
+        """
+        按行内容哈希增量写入
 
-        total = 0
-        for batch in self._chunk_rows(rows, 300):
-            await self.execute_query(query, {"game_id": game_id, "rows": batch})
-            total += len(batch)
-        return total
+        只有哈希与库中不同（或库中不存在）的行才会写入；delete_query 不为空时，
+        删除库中存在但本次行集中没有的实体。写入按 SEED_BATCH_SIZE 分批，
+        最多 SEED_WORKERS 个事务并行。
+        """
+        start = time.perf_counter()
+        for row in rows:
+            row["content_hash"] = self._row_hash(row)
+
+        existing_rows = await self.execute_query(
+            f"MATCH (n:{label} {{game_id: $game_id}}) RETURN n.id AS id, n.content_hash AS content_hash",
+            {"game_id": game_id},
+        )
+        existing = {str(item.get("id")): item.get("content_hash") for item in existing_rows}
+
+        changed = [row for row in rows if existing.get(str(row["id"])) != row["content_hash"]]
+        source_ids = {str(row["id"]) for row in rows}
+        removed = [entity_id for entity_id in existing if entity_id not in source_ids] if delete_query else []
+
+        semaphore = asyncio.Semaphore(self.SEED_WORKERS)
+
+        async def run(query: str, params: Dict[str, Any]) -> None:
+            async with semaphore:
+                await self.execute_query(query, params)
+
+        await asyncio.gather(*(
+            run(upsert_query, {"game_id": game_id, "rows": batch})
+            for batch in self._chunk_rows(changed, self.SEED_BATCH_SIZE)
+        ))
+        if removed:
+            await asyncio.gather(*(
+                run(delete_query, {"game_id": game_id, "ids": batch})
+                for batch in self._chunk_rows(removed, self.SEED_BATCH_SIZE)
+            ))
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "total": len(rows),
+            "changed": len(changed),
+            "skipped": len(rows) - len(changed),
+            "deleted": len(removed),
+            "seconds": round(elapsed, 3),
+        }
+        rate = len(rows) / elapsed if elapsed > 0 else 0.0
+        print(
+            f"[Neo4j] sync {label}: game_id={game_id}, total={stats['total']}, changed={stats['changed']}, "
+            f"skipped={stats['skipped']}, deleted={stats['deleted']}, {rate:.0f} rows/s"
+        )
+        return stats
+
+    @staticmethod
+    def _row_hash(row: Dict[str, Any]) -> str:
+        payload = {key: value for key, value in row.items() if key != "content_hash"}
+        encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _file_sha1(path: Path) -> str:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _seed_checkpoint_file(game_id: str) -> Path:
+        settings = get_guide_engine_settings()
+        return Path(settings.gamedata_dir) / ".seed_checkpoints" / f"{game_id}.json"
+
+    def _load_seed_checkpoint(self, game_id: str) -> Dict[str, Any]:
+        path = self._seed_checkpoint_file(game_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_seed_checkpoint(self, game_id: str, data: Dict[str, Any]) -> None:
+        path = self._seed_checkpoint_file(game_id)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            tmp_path.replace(path)
+        except OSError as exc:
+            print(f"[Neo4j] seed checkpoint save failed: game_id={game_id}, error={exc}")
 
     @staticmethod
     def _chunk_rows(rows: List[Dict[str, Any]], size: int) -> List[List[Dict[str, Any]]]:
@@ -246,23 +464,59 @@ class Neo4jService:
 
     async def get_operator(self, game_id: str, operator_name: str) -> Optional[Dict[str, Any]]:
         """获取干员完整信息"""
-        await self.ensure_seed_data(game_id)
-        query = """
-        MATCH (o:Operator {game_id: $game_id})
-        WHERE o.name = $name OR o.name_en = $name OR $name IN o.aliases
-        OPTIONAL MATCH (o)-[:HAS_SKILL]->(s:Skill)
-        OPTIONAL MATCH (o)-[:HAS_TALENT]->(t:Talent)
-        WITH o, collect(DISTINCT s {.*}) as skills, collect(DISTINCT t {.*}) as talents
-        RETURN o {
-            .*,
-            skills: skills,
-            talents: talents
-        } as operator
+        operators = await self.get_operators(game_id, [operator_name])
+        return operators.get(operator_name)
+
+    async def get_operators(self, game_id: str, operator_names: Sequence[str]) -> Dict[str, Optional[Dict[str, Any]]]:
         """
-        results = await self.execute_query(query, {"game_id": game_id, "name": operator_name})
-        if results and results[0].get("operator"):
-            return results[0]["operator"]
-        return None
+        批量获取干员完整信息
+
+        先查进程内缓存，未命中的名字通过一次 UNWIND 查询取回。
+
+        Returns:
+            名字 -> 干员信息（找不到为 None），保持传入顺序
+        """
+        names = list(dict.fromkeys(operator_names))
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        pending: List[str] = []
+        for name in names:
+            hit, record = self.operator_cache.get(game_id, name)
+            if hit:
+                found[name] = record
+            else:
+                pending.append(name)
+
+        if pending:
+            await self.ensure_seed_data(game_id)
+            query = """
+            UNWIND $names AS name
+            MATCH (o:Operator {game_id: $game_id})
+            WHERE o.name = name OR o.name_en = name OR name IN o.aliases
+            OPTIONAL MATCH (o)-[:HAS_SKILL]->(s:Skill)
+            OPTIONAL MATCH (o)-[:HAS_TALENT]->(t:Talent)
+            WITH name, o, collect(DISTINCT s {.*}) as skills, collect(DISTINCT t {.*}) as talents
+            RETURN name, o {
+                .*,
+                skills: skills,
+                talents: talents
+            } as operator
+            """
+            results = await self.execute_query(query, {"game_id": game_id, "names": pending})
+            self.operator_cache.queries += 1
+            self.operator_cache.saved_round_trips += len(pending) - 1
+
+            fetched: Dict[str, Dict[str, Any]] = {}
+            for row in results:
+                name = row.get("name")
+                if name is not None and name not in fetched and row.get("operator"):
+                    fetched[name] = row["operator"]
+            for name in pending:
+                record = fetched.get(name)
+                self.operator_cache.put(game_id, name, record)
+                found[name] = record
+
+        self.operator_cache.saved_round_trips += len(names) - len(pending)
+        return {name: found.get(name) for name in names}
 
     async def get_operator_synergies(self, game_id: str, operator_name: str, limit: int = 5) -> List[Dict[str, Any]]:
         """获取干员配合推荐"""
@@ -340,6 +594,83 @@ class Neo4jService:
                 if "already exists" not in str(e).lower():
                     print(f"Warning: {e}")
 
+    # 批量写入干员：同一事务内更新干员节点，并重建其技能/天赋节点
+    _OPERATOR_UPSERT_QUERY = """
+    UNWIND $rows AS row
+    MERGE (o:Operator {game_id: $game_id, id: row.id})
+    SET o.name = row.name,
+        o.name_en = row.name_en,
+        o.rarity = row.rarity,
+        o.class = row.class,
+        o.branch = row.branch,
+        o.trait = row.trait,
+        o.obtain = row.obtain,
+        o.aliases = row.aliases,
+        o.tags = row.tags,
+        o.content_hash = row.content_hash
+    WITH o, row
+    OPTIONAL MATCH (o)-[:HAS_SKILL|HAS_TALENT]->(old)
+    WITH o, row, collect(old) AS olds
+    FOREACH (x IN olds | DETACH DELETE x)
+    FOREACH (sk IN row.skills |
+        MERGE (s:Skill {game_id: $game_id, id: sk.id})
+        SET s.name = sk.name,
+            s.type = sk.type,
+            s.charge_type = sk.charge_type,
+            s.description = sk.description,
+            s.mastery_recommendation = sk.mastery_recommendation,
+            s.skill_index = sk.skill_index
+        MERGE (o)-[:HAS_SKILL]->(s))
+    FOREACH (tl IN row.talents |
+        MERGE (t:Talent {game_id: $game_id, id: tl.id})
+        SET t.name = tl.name,
+            t.description = tl.description
+        MERGE (o)-[:HAS_TALENT]->(t))
+    """
+
+    _OPERATOR_DELETE_QUERY = """
+    MATCH (o:Operator {game_id: $game_id})
+    WHERE o.id IN $ids
+    OPTIONAL MATCH (o)-[:HAS_SKILL|HAS_TALENT]->(x)
+    DETACH DELETE x, o
+    """
+
+    @staticmethod
+    def _operator_row(operator: Dict[str, Any]) -> Dict[str, Any]:
+        """把种子数据中的干员整理为批量写入的行（字段与 import_operator 一致）"""
+        return {
+            "id": operator["id"],
+            "name": operator["name"],
+            "name_en": operator.get("name_en", ""),
+            "rarity": operator.get("rarity", 0),
+            "class": operator.get("class", ""),
+            "branch": operator.get("branch", ""),
+            "trait": operator.get("trait", ""),
+            "obtain": operator.get("obtain", ""),
+            "aliases": operator.get("aliases", []),
+            "tags": operator.get("tags", []),
+            "skills": [
+                {
+                    "id": f"{operator['id']}_skill_{i}",
+                    "name": skill.get("name", ""),
+                    "type": skill.get("type", ""),
+                    "charge_type": skill.get("charge_type", ""),
+                    "description": skill.get("description", ""),
+                    "mastery_recommendation": skill.get("mastery_recommendation", ""),
+                    "skill_index": i,
+                }
+                for i, skill in enumerate(operator.get("skills", []), 1)
+            ],
+            "talents": [
+                {
+                    "id": f"{operator['id']}_talent_{i}",
+                    "name": talent.get("name", ""),
+                    "description": talent.get("description", ""),
+                }
+                for i, talent in enumerate(operator.get("talents", []), 1)
+            ],
+        }
+
     async def import_operator(self, game_id: str, operator: Dict[str, Any]):
         """导入单个干员数据"""
         # 创建干员节点
@@ -421,13 +752,18 @@ class Neo4jService:
                 },
             )
 
+        self.operator_cache.invalidate(game_id)
+
     async def import_operators(self, game_id: str, operators: List[Dict[str, Any]]) -> int:
-        """批量导入干员数据"""
-        count = 0
-        for operator in operators:
-            await self.import_operator(game_id, operator)
-            count += 1
-        return count
+        """批量导入干员数据（只写入内容有变化的干员，不删除其他干员）"""
+        stats = await self._sync_rows(
+            game_id,
+            "Operator",
+            [self._operator_row(operator) for operator in operators],
+            self._OPERATOR_UPSERT_QUERY,
+        )
+        self.operator_cache.invalidate(game_id)
+        return stats["changed"]
 
     async def create_synergy_relationship(
         self, game_id: str, operator1_name: str, operator2_name: str, reason: str, score: int = 5
@@ -476,6 +812,13 @@ class Neo4jService:
         """,
             {"game_id": game_id},
         )
+        self.operator_cache.invalidate(game_id)
+        # 数据已清空：删除种子检查点，并允许下次查询时重新自动导入
+        try:
+            self._seed_checkpoint_file(game_id).unlink(missing_ok=True)
+        except OSError as exc:
+            print(f"[Neo4j] seed checkpoint remove failed: game_id={game_id}, error={exc}")
+        self._seed_attempted_games.discard(game_id)
 
     async def get_stats(self, game_id: str) -> Dict[str, int]:
         """获取图数据库统计信息"""
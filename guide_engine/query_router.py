@@ -8,10 +8,13 @@
 """
 
 import re
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List, Tuple
 from enum import Enum
 from dataclasses import dataclass, field
 
+from system.parsing.keyword_automaton import KeywordAutomaton
+
 
 class QueryMode(str, Enum):
     """查询模式枚举"""
@@ -57,13 +60,47 @@ class RouteResult:
     mode: QueryMode
     reason: str
     entities: ExtractedEntities = field(default_factory=ExtractedEntities)
+    confidences: Dict[str, float] = field(default_factory=dict)  # 命中的各查询模式及置信度
+
+
+@dataclass
+class RuleMatches:
+    """单次扫描得到的全部规则命中情况"""
+    force_calculation: bool = False
+    force_wiki: bool = False
+    force_full: bool = False
+    calculation_keywords: List[Tuple[str, str]] = field(default_factory=list)
+    wiki_keywords: List[Tuple[str, str]] = field(default_factory=list)
+    guide_keywords: List[Tuple[str, str]] = field(default_factory=list)
+
+    def confidences(self) -> Dict[str, float]:
+        """各查询模式的置信度：强制正则命中最高，关键词命中数越多越高"""
+        def score(forced: bool, force_score: float, keywords: list) -> float:
+            if forced:
+                return force_score
+            if keywords:
+                return min(0.85, 0.6 + 0.1 * (len(keywords) - 1))
+            return 0.0
+
+        scores = {
+            QueryMode.CALCULATION.value: score(self.force_calculation, 0.95, self.calculation_keywords),
+            QueryMode.WIKI_ONLY.value: score(self.force_wiki, 0.9, self.wiki_keywords),
+            QueryMode.FULL.value: score(self.force_full, 0.9, self.guide_keywords),
+        }
+        return {mode: value for mode, value in scores.items() if value > 0}
 
 
 class QueryRouter:
     """查询路由器 - 根据用户问题决定查询模式并提取实体"""
 
+    # 路由决策缓存条数
+    DECISION_CACHE_SIZE = 512
+
     def __init__(self, llm_service=None):
         self.llm = llm_service
+        self._decision_cache: "OrderedDict[Tuple[str, str], Tuple[Optional[QueryMode], str, Dict[str, float]]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
         # ========== 计算类关键词（最高优先级）==========
         self.calculation_keywords = {
@@ -166,13 +203,71 @@ class QueryRouter:
             "0": 0, "1": 1, "2": 2, "3": 3,
         }
 
+        self.compile_rules()
+
+    def compile_rules(self):
+        """
+        把关键词与正则规则编译为单次扫描的匹配器
+
+        - 普通关键词进入 Aho-Corasick 自动机
+        - 正则规则（强制模式 + 含正则语法的关键词）合并为一个正则，
+          每条规则包在可选的前瞻命名组里，一次 match 即可得到所有命中的规则
+        修改规则列表后需重新调用本方法。
+        """
+        self._keyword_automaton: KeywordAutomaton[Tuple[str, str, str]] = KeywordAutomaton(case_sensitive=False)
+        self._keyword_order: Dict[Tuple[str, str, str], int] = {}
+        self._regex_labels: Dict[str, Tuple[str, str, str]] = {}
+        regex_parts: List[str] = []
+
+        def add_regex(label: Tuple[str, str, str], pattern: str, ignore_case: bool):
+            group = f"r{len(self._regex_labels)}"
+            self._regex_labels[group] = label
+            body = f"(?i:{pattern})" if ignore_case else pattern
+            regex_parts.append(f"(?:(?=[\\s\\S]*?(?P<{group}>{body})))?")
+
+        for group_name, keyword_dict in (
+            ("calculation_keywords", self.calculation_keywords),
+            ("wiki_keywords", self.wiki_keywords),
+            ("guide_keywords", self.guide_keywords),
+        ):
+            for category, keywords in keyword_dict.items():
+                for kw in keywords:
+                    label = (group_name, category, kw)
+                    self._keyword_order.setdefault(label, len(self._keyword_order))
+                    if ".*" in kw or "^" in kw:
+                        add_regex(label, kw, ignore_case=False)
+                    else:
+                        self._keyword_automaton.add(kw, label)
+        self._keyword_automaton.build()
+
+        for group_name, patterns in (
+            ("force_calculation", self.force_calculation_patterns),
+            ("force_wiki", self.force_wiki_patterns),
+            ("force_full", self.force_full_patterns),
+        ):
+            for pattern in patterns:
+                add_regex((group_name, "", pattern), pattern, ignore_case=True)
+
+        self._combined_regex = re.compile("".join(regex_parts))
+
+        self._compiled_entity_patterns = {
+            name: [(re.compile(pattern), ptype) for pattern, ptype in patterns]
+            for name, patterns in (
+                ("skill", self.skill_patterns),
+                ("mastery", self.mastery_patterns),
+                ("defense", self.defense_patterns),
+                ("res", self.res_patterns),
+            )
+        }
+        self._decision_cache.clear()
+
     def extract_entities(self, query: str) -> ExtractedEntities:
         """从用户问题中提取实体"""
         entities = ExtractedEntities()
 
         # 提取技能索引
-        for pattern, _ in self.skill_patterns:
-            match = re.search(pattern, query)
+        for pattern, _ in self._compiled_entity_patterns["skill"]:
+            match = pattern.search(query)
             if match:
                 val = match.group(1)
                 num = self.cn_num_map.get(val, int(val) if val.isdigit() else None)
@@ -181,8 +276,8 @@ class QueryRouter:
                 break
 
         # 提取专精等级
-        for pattern, ptype in self.mastery_patterns:
-            match = re.search(pattern, query)
+        for pattern, ptype in self._compiled_entity_patterns["mastery"]:
+            match = pattern.search(query)
             if match:
                 if ptype == "mastery_max":
                     entities.mastery = 3
@@ -198,15 +293,15 @@ class QueryRouter:
                 break
 
         # 提取敌人防御
-        for pattern, _ in self.defense_patterns:
-            match = re.search(pattern, query)
+        for pattern, _ in self._compiled_entity_patterns["defense"]:
+            match = pattern.search(query)
             if match:
                 entities.enemy_defense = int(match.group(1))
                 break
 
         # 提取敌人法抗
-        for pattern, _ in self.res_patterns:
-            match = re.search(pattern, query)
+        for pattern, _ in self._compiled_entity_patterns["res"]:
+            match = pattern.search(query)
             if match:
                 entities.enemy_res = float(match.group(1))
                 break
@@ -219,64 +314,107 @@ class QueryRouter:
 
         return entities
 
-    def _check_keywords(self, query: str, keyword_dict: Dict[str, list]) -> Tuple[bool, list]:
-        """检查问题是否命中关键词"""
-        matched = []
-        for category, keywords in keyword_dict.items():
-            for kw in keywords:
-                if ".*" in kw or "^" in kw:
-                    if re.search(kw, query):
-                        matched.append((category, kw))
-                elif kw.lower() in query.lower():
-                    matched.append((category, kw))
-        return len(matched) > 0, matched
-
-    def _check_patterns(self, query: str, patterns: list) -> bool:
-        """检查是否命中正则模式"""
-        for pattern in patterns:
-            if re.search(pattern, query, re.IGNORECASE):
-                return True
-        return False
+    def match_rules(self, query: str) -> RuleMatches:
+        """单次扫描匹配全部关键词与正则规则"""
+        labels = set(self._keyword_automaton.search(query))
+        match = self._combined_regex.match(query)
+        if match:
+            for group, value in match.groupdict().items():
+                if value is not None:
+                    labels.add(self._regex_labels[group])
+
+        matches = RuleMatches()
+        for group_name, category, rule in sorted(labels, key=lambda label: self._keyword_order.get(label, -1)):
+            if group_name.startswith("force_"):
+                setattr(matches, group_name, True)
+            else:
+                getattr(matches, group_name).append((category, rule))
+        return matches
 
     def route_by_rules(self, query: str) -> Tuple[Optional[QueryMode], str]:
         """使用规则匹配判断查询模式"""
-        query = query.strip()
-
+        mode, reason, _ = self._route_by_rules_cached(query.strip())
+        return mode, reason
+
+    def _route_by_rules_cached(self, query: str) -> Tuple[Optional[QueryMode], str, Dict[str, float]]:
+        cached = self._cache_get(("rules", query))
+        if cached is not None:
+            return cached
+        matches = self.match_rules(query)
+        mode, reason = self._decide(matches)
+        decision = (mode, reason, matches.confidences())
+        self._cache_put(("rules", query), decision)
+        return decision
+
+    @staticmethod
+    def _decide(matches: RuleMatches) -> Tuple[Optional[QueryMode], str]:
+        """按优先级从命中结果中得出查询模式"""
         # 1. 最高优先级：检查计算模式
-        if self._check_patterns(query, self.force_calculation_patterns):
+        if matches.force_calculation:
             return QueryMode.CALCULATION, "命中计算模式"
 
-        calc_hit, calc_matches = self._check_keywords(query, self.calculation_keywords)
-        if calc_hit:
-            return QueryMode.CALCULATION, f"命中计算关键词: {calc_matches[0]}"
+        if matches.calculation_keywords:
+            return QueryMode.CALCULATION, f"命中计算关键词: {matches.calculation_keywords[0]}"
 
         # 2. 检查强制wiki模式
-        if self._check_patterns(query, self.force_wiki_patterns):
+        if matches.force_wiki:
             return QueryMode.WIKI_ONLY, "命中强制wiki模式"
 
         # 3. 检查强制攻略模式
-        if self._check_patterns(query, self.force_full_patterns):
+        if matches.force_full:
             return QueryMode.FULL, "命中强制全查询模式"
 
         # 4. 检查关键词
-        wiki_hit, wiki_matches = self._check_keywords(query, self.wiki_keywords)
-        guide_hit, guide_matches = self._check_keywords(query, self.guide_keywords)
+        wiki_matches = matches.wiki_keywords
+        guide_matches = matches.guide_keywords
 
-        if wiki_hit and not guide_hit:
+        if wiki_matches and not guide_matches:
             return QueryMode.WIKI_ONLY, f"命中wiki关键词: {wiki_matches[0]}"
 
-        if guide_hit and not wiki_hit:
+        if guide_matches and not wiki_matches:
             return QueryMode.FULL, f"命中攻略关键词: {guide_matches[0]}"
 
-        if wiki_hit and guide_hit:
+        if wiki_matches and guide_matches:
             return None, f"关键词冲突: wiki={wiki_matches}, guide={guide_matches}"
 
         return None, "未命中任何关键词"
 
-    async def route_by_llm(self, query: str) -> Tuple[QueryMode, str]:
-        """使用LLM判断查询模式"""
+    # ========== 路由决策缓存 ==========
+
+    def _cache_get(self, key: Tuple[str, str]):
+        decision = self._decision_cache.get(key)
+        if decision is None:
+            self.cache_misses += 1
+            return None
+        self._decision_cache.move_to_end(key)
+        self.cache_hits += 1
+        return decision
+
+    def _cache_put(self, key: Tuple[str, str], decision) -> None:
+        self._decision_cache[key] = decision
+        self._decision_cache.move_to_end(key)
+        while len(self._decision_cache) > self.DECISION_CACHE_SIZE:
+            self._decision_cache.popitem(last=False)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """路由决策缓存统计"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            "size": len(self._decision_cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / total, 4) if total else 0.0,
+        }
+
+    async def route_by_llm(self, query: str) -> Tuple[QueryMode, str, bool]:
+        """
+        使用LLM判断查询模式
+
+        Returns:
+            (查询模式, 原因, 是否可缓存)；没有 LLM 或调用失败时回退为全查询且不可缓存
+        """
         if not self.llm:
-            return QueryMode.FULL, "无LLM服务，默认全查询"
+            return QueryMode.FULL, "无LLM服务，默认全查询", False
 
         prompt = """判断用户问题的类型，只回复A、B或C：
 
@@ -295,15 +433,15 @@ C = 需要攻略建议（培养建议、配队推荐、打法技巧、评价对
             result = response.strip().upper()
 
             if "A" in result and "B" not in result and "C" not in result:
-                return QueryMode.WIKI_ONLY, "LLM判断为基础数据查询"
+                return QueryMode.WIKI_ONLY, "LLM判断为基础数据查询", True
             elif "B" in result:
-                return QueryMode.CALCULATION, "LLM判断为精确计算"
+                return QueryMode.CALCULATION, "LLM判断为精确计算", True
             else:
-                return QueryMode.FULL, "LLM判断为攻略建议查询"
+                return QueryMode.FULL, "LLM判断为攻略建议查询", True
 
         except Exception as e:
             print(f"LLM路由判断失败: {e}")
-            return QueryMode.FULL, f"LLM判断失败，默认全查询: {e}"
+            return QueryMode.FULL, f"LLM判断失败，默认全查询: {e}", False
 
     async def _call_llm(self, model, prompt: str) -> str:
         """调用LLM"""
@@ -330,29 +468,38 @@ C = 需要攻略建议（培养建议、配队推荐、打法技巧、评价对
         entities = self.extract_entities(query)
 
         # 2. 规则匹配
-        mode, reason = self.route_by_rules(query)
+        key = query.strip()
+        mode, reason, confidences = self._route_by_rules_cached(key)
 
         if mode is not None:
             print(f"[QueryRouter] 规则匹配: {mode.value} - {reason}")
-            return RouteResult(mode=mode, reason=reason, entities=entities)
+            return RouteResult(mode=mode, reason=reason, entities=entities, confidences=confidences)
+
+        # 3. LLM判断（结果按问题缓存，重复提问不再调用）
+        cached = self._cache_get(("llm", key))
+        if cached is not None:
+            mode, reason, _ = cached
+            print(f"[QueryRouter] LLM判断(缓存): {mode.value} - {reason}")
+            return RouteResult(mode=mode, reason=reason, entities=entities, confidences=confidences)
 
-        # 3. LLM判断
         print(f"[QueryRouter] 规则无法确定，调用LLM: {reason}")
-        mode, reason = await self.route_by_llm(query)
+        mode, reason, cacheable = await self.route_by_llm(query)
         print(f"[QueryRouter] LLM判断: {mode.value} - {reason}")
+        if cacheable:
+            self._cache_put(("llm", key), (mode, reason, {}))
 
-        return RouteResult(mode=mode, reason=reason, entities=entities)
+        return RouteResult(mode=mode, reason=reason, entities=entities, confidences=confidences)
 
     def route_sync(self, query: str) -> RouteResult:
         """同步路由方法（仅使用规则，不调用LLM）"""
         entities = self.extract_entities(query)
-        mode, reason = self.route_by_rules(query)
+        mode, reason, confidences = self._route_by_rules_cached(query.strip())
 
         if mode is None:
             mode = QueryMode.FULL
             reason = "规则无法确定，默认全查询"
 
-        return RouteResult(mode=mode, reason=reason, entities=entities)
+        return RouteResult(mode=mode, reason=reason, entities=entities, confidences=confidences)
 
 
 # 单例
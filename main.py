@@ -467,7 +467,8 @@ class ServiceManager:
         """初始化MCP服务系统 - in-process 注册 agent"""
         try:
             from mcpserver.mcp_registry import auto_register_mcp
-            registered = auto_register_mcp()
+            # 实例延迟到首次调用时创建，这里只在后台并行预热，不阻塞启动
+            registered = auto_register_mcp(warm_up=True)
             logger.info(f"MCP服务已注册（in-process），共 {len(registered)} 个: {registered}")
         except Exception as e:
             logger.error(f"MCP服务系统初始化失败: {e}")
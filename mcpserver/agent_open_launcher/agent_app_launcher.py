@@ -4,11 +4,8 @@ import platform
 import subprocess
 import asyncio
 import json
-import sys
 
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-
-from comprehensive_app_scanner import get_comprehensive_scanner
+from mcpserver.agent_open_launcher.comprehensive_app_scanner import get_comprehensive_scanner
 
 
 class AppLauncherAgent(object):
@@ -100,6 +97,17 @@ class AppLauncherAgent(object):
             app_info = await self.scanner.find_app_by_name(app_name)
 
             if not app_info:
+                candidates = [app["name"] for app in await self.scanner.suggest_apps(app_name)]
+                if candidates:
+                    return {
+                        "status": "error",
+                        "message": f"未找到应用 '{app_name}'，可能是: {'、'.join(candidates)}。请与用户确认后使用准确名称重试。",
+                        "data": {
+                            "requested_app": app_name,
+                            "candidates": candidates,
+                        }
+                    }
+
                 app_info = await self.scanner.get_app_info_for_llm()
                 available_apps = app_info["apps"][:20]
 
@@ -0,0 +1,211 @@
+# app_index.py # 持久化应用索引：按单元签名增量扫描 + 名称索引
+"""
+应用索引
+
+- 各来源的扫描结果按 (来源, 单元) 持久化到 app_index.json，签名未变化的单元不再重新扫描
+- 合并去重后按路径建立应用表，名称索引支持规范化名、别名（exe / 快捷方式文件名）、
+  拼音全拼与首字母；前缀与模糊匹配只作为候选返回，不直接启动
+"""
+
+import json  # JSON #
+import ntpath  # Windows 路径（同时识别 / 与 \\） #
+import os  # 操作系统 #
+import threading  # 线程锁 #
+import time  # 计时 #
+from pathlib import Path  # 路径 #
+from typing import Dict, List, Mapping, Optional, Sequence  # 类型 #
+
+from system.parsing.name_index import NameIndex, normalize_name
+from mcpserver.agent_open_launcher.app_sources import AppSource
+
+# 索引格式版本：应用字段或单元划分变化时递增，旧索引自动丢弃
+INDEX_VERSION = 1
+
+
+def default_index_path() -> Path:
+    from system.config import get_data_dir
+    return get_data_dir() / "app_launcher" / "app_index.json"
+
+
+def merge_and_deduplicate(apps: List[Dict]) -> List[Dict]:
+    """合并和去重应用列表，同名时优先选择快捷方式，结果按名称排序 #"""
+    unique_apps: Dict[str, Dict] = {}
+    for app in apps:
+        name = app["name"]
+        existing_app = unique_apps.get(name)
+        if existing_app is None:
+            unique_apps[name] = app
+        elif app["source"] == "shortcut" and existing_app["source"] == "registry":
+            unique_apps[name] = app
+
+    result = list(unique_apps.values())
+    result.sort(key=lambda x: x["name"].lower())
+    return result
+
+
+def _app_aliases(app: Dict) -> List[str]:
+    """exe 与快捷方式的文件名作为别名 #"""
+    aliases = []
+    for key in ("path", "shortcut_path"):
+        value = app.get(key)
+        if value:
+            aliases.append(ntpath.splitext(ntpath.basename(value))[0])
+    return aliases
+
+
+class AppIndex:
+    """持久化、增量更新的应用索引 #"""
+
+    def __init__(self, sources: Sequence[AppSource], path: Optional[Path] = None,
+                 aliases: Optional[Mapping[str, str]] = None):
+        self.sources = list(sources)
+        self.path = Path(path) if path else default_index_path()
+        self.aliases = dict(aliases or {})  # 别名 -> 应用名 #
+        # {来源: {单元: {"signature": 签名, "apps": [...]}}}
+        self._units: Dict[str, Dict[str, Dict]] = {}
+        self._apps: List[Dict] = []
+        self._by_path: Dict[str, Dict] = {}
+        self._names = NameIndex().finalize()
+        self._lock = threading.Lock()
+        self.last_refresh: Dict = {}
+
+    # ── 持久化 ──
+
+    def load(self) -> bool:
+        """读取持久化索引；版本不符或损坏时返回 False #"""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != INDEX_VERSION or not isinstance(data.get("sources"), dict):
+            return False
+        with self._lock:
+            self._units = data["sources"]
+            self._rebuild()
+        return True
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps({"version": INDEX_VERSION, "sources": self._units}, ensure_ascii=False)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(payload, encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    # ── 增量扫描 ──
+
+    def refresh(self, full: bool = False) -> Dict:
+        """
+        按单元签名增量刷新（同步，耗时操作，应在线程中调用）
+
+        full=True 时忽略已有结果全部重新扫描。返回本次扫描统计。
+        """
+        start = time.perf_counter()
+        stats = {"scanned": 0, "reused": 0, "removed": 0}
+        with self._lock:
+            units: Dict[str, Dict[str, Dict]] = {}
+            for source in self.sources:
+                previous = {} if full else self._units.get(source.name, {})
+                current = {}
+                try:
+                    signatures = source.units()
+                except Exception as e:
+                    print(f"读取应用来源 {source.name} 失败: {e}")
+                    # 来源暂不可用时保留上次结果
+                    units[source.name] = previous
+                    continue
+                for unit_id, signature in signatures.items():
+                    cached = previous.get(unit_id)
+                    if cached is not None and cached.get("signature") == signature:
+                        current[unit_id] = cached
+                        stats["reused"] += 1
+                        continue
+                    try:
+                        apps = source.scan(unit_id)
+                    except Exception as e:
+                        print(f"扫描 {source.name}:{unit_id} 失败: {e}")
+                        continue
+                    current[unit_id] = {"signature": signature, "apps": apps}
+                    stats["scanned"] += 1
+                stats["removed"] += len(set(previous) - set(current))
+                units[source.name] = current
+
+            changed = full or stats["scanned"] or stats["removed"] or set(units) != set(self._units)
+            self._units = units
+            if changed:
+                self._rebuild()
+                try:
+                    self.save()
+                except OSError as e:
+                    print(f"保存应用索引失败: {e}")
+
+        stats["apps"] = len(self._apps)
+        stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        self.last_refresh = stats
+        return stats
+
+    def _rebuild(self) -> None:
+        """按来源顺序合并去重，重建路径表与名称索引 #"""
+        order = [source.name for source in self.sources]
+        names = sorted(self._units, key=lambda n: order.index(n) if n in order else len(order))
+        collected = [app for name in names for unit in self._units[name].values() for app in unit["apps"]]
+        apps = merge_and_deduplicate(collected)
+
+        by_path: Dict[str, Dict] = {}
+        index = NameIndex()
+        for app in apps:
+            key = os.path.normcase(app["path"])
+            by_path[key] = app
+            index.add(key, [app["name"]], _app_aliases(app))
+        for alias, app_name in self.aliases.items():
+            target = index.lookup(app_name)
+            if target:
+                index.add_alias(alias, target)
+
+        self._apps = apps
+        self._by_path = by_path
+        self._names = index.finalize(
+            name.lower() for app in apps for name in (app["name"], *_app_aliases(app))
+        )
+
+    # ── 查询 ──
+
+    @property
+    def apps(self) -> List[Dict]:
+        return self._apps
+
+    def get_by_path(self, path: str) -> Optional[Dict]:
+        return self._by_path.get(os.path.normcase(path))
+
+    def find(self, name: str) -> Optional[Dict]:
+        """
+        按名称查找可直接启动的应用：
+        精确（含别名、拼音全拼与首字母）-> 名称包含查询 -> 查询包含名称或别名（长名优先）
+
+        前缀与模糊命中可能是另一个程序，不在这里返回，见 suggest()
+        """
+        if not name or not normalize_name(name):
+            return None
+        names = self._names
+        key = names.lookup(name) or names.match_key(name)
+        if key is None:
+            hits = names.search_substring(name)
+            key = hits[0] if hits else None
+        if key is None:
+            name_lower = name.lower()
+            known = next((n for n in names.known_names if len(n) >= 2 and n in name_lower), None)
+            key = names.lookup(known) if known else None
+        return self._by_path.get(key) if key else None
+
+    def suggest(self, name: str, limit: int = 5) -> List[Dict]:
+        """find() 未命中时的候选应用：拼音/前缀 -> 模糊，交给用户确认而不直接启动"""
+        if not name or not normalize_name(name):
+            return []
+        return [self._by_path[key] for key in self._names.suggest(name, limit) if key in self._by_path]
+
+    def get_stats(self) -> Dict:
+        return {
+            "apps": len(self._apps),
+            "units": {name: len(units) for name, units in self._units.items()},
+            "index_path": str(self.path),
+            "last_refresh": self.last_refresh,
+        }
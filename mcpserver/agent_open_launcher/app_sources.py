@@ -0,0 +1,282 @@
+# app_sources.py # 应用来源（注册表 / 快捷方式目录），供应用索引增量扫描
+"""
+应用来源把扫描拆成若干"单元"，每个单元带一个廉价的签名（目录 mtime、注册表写入时间等）。
+索引只对签名变化的单元调用 scan()，其余单元直接复用上次持久化的结果。
+
+- DirectorySource：按目录递归查找指定后缀的文件，每个目录一个单元，
+  签名由目录 mtime 与其中匹配文件的 (名称, mtime, 大小) 组成；解析函数可注入，
+  因此可以在任意平台上用夹具目录测试
+- ShortcutSource：开始菜单与桌面的 .lnk 快捷方式（Windows，win32com 解析）
+- RegistrySource：App Paths 与 Uninstall 注册表（Windows），
+  每个卸载项一个单元，只有安装目录 mtime 变化时才重新遍历其中的 exe
+"""
+
+import hashlib  # 签名摘要 #
+import os  # 操作系统 #
+import platform  # 平台检测 #
+from typing import Callable, Dict, List, Optional, Sequence, Tuple  # 类型 #
+
+# 平台特定导入
+if platform.system() == 'Windows':
+    import winreg  # Windows注册表 #
+else:
+    # 在非Windows平台上，winreg模块不可用
+    winreg = None
+
+ShortcutParser = Callable[[str], Optional[Dict]]
+
+
+class AppSource:
+    """应用来源基类：units() 返回 {单元ID: 签名}，scan(单元ID) 返回该单元内的应用 #"""
+    name = "base"
+
+    def units(self) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def scan(self, unit_id: str) -> List[Dict]:
+        raise NotImplementedError
+
+
+def find_exe_files(directory: str) -> List[str]:
+    """在指定目录中递归查找可执行文件 #"""
+    exe_files = []
+    if not directory or not os.path.isdir(directory):
+        return exe_files
+    try:
+        for root, dirs, files in os.walk(directory):
+            for file in files:
+                if file.lower().endswith('.exe'):
+                    exe_files.append(os.path.join(root, file))
+    except OSError:
+        pass
+    return exe_files
+
+
+def _mtime_ns(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class DirectorySource(AppSource):
+    """按目录递归查找指定后缀的文件，每个目录是一个增量扫描单元 #"""
+
+    def __init__(self, name: str, roots: Sequence[str], suffix: str, parser: ShortcutParser):
+        self.name = name
+        self.roots = list(roots)
+        self.suffix = suffix.lower()
+        self.parser = parser
+        self._files: Dict[str, List[str]] = {}  # 单元 -> 上次 units() 时列出的匹配文件 #
+
+    def units(self) -> Dict[str, str]:
+        self._files = {}
+        signatures: Dict[str, str] = {}
+        seen = set()
+        for root in self.roots:
+            if not os.path.isdir(root):
+                continue
+            stack = [os.path.normpath(root)]
+            while stack:
+                directory = stack.pop()
+                key = os.path.normcase(directory)
+                if key in seen:
+                    continue
+                seen.add(key)
+                files: List[Tuple[str, int, int]] = []
+                try:
+                    with os.scandir(directory) as it:
+                        for entry in it:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    stack.append(entry.path)
+                                elif entry.name.lower().endswith(self.suffix):
+                                    stat = entry.stat()
+                                    files.append((entry.name, stat.st_mtime_ns, stat.st_size))
+                            except OSError:
+                                continue
+                except OSError:
+                    continue
+                if not files:
+                    continue
+                files.sort()
+                digest = hashlib.sha1(repr(files).encode("utf-8")).hexdigest()[:16]
+                signatures[directory] = f"{_mtime_ns(directory)}:{digest}"
+                self._files[directory] = [os.path.join(directory, name) for name, _, _ in files]
+        return signatures
+
+    def scan(self, unit_id: str) -> List[Dict]:
+        apps = []
+        for path in self._files.get(unit_id, ()):
+            try:
+                app_info = self.parser(path)
+                if app_info:
+                    apps.append(app_info)
+            except Exception as e:
+                print(f"解析失败 {path}: {e}")
+        return apps
+
+
+def parse_shortcut(lnk_path: str) -> Optional[Dict]:
+    """解析快捷方式文件 #"""
+    try:
+        import win32com.client
+
+        # 使用WScript.Shell解析快捷方式
+        shell = win32com.client.Dispatch("WScript.Shell")
+        shortcut = shell.CreateShortCut(lnk_path)
+        target_path = shortcut.TargetPath
+
+        if target_path and os.path.exists(target_path) and target_path.lower().endswith('.exe'):
+            # 获取应用名称（从快捷方式文件名）
+            app_name = os.path.splitext(os.path.basename(lnk_path))[0]
+
+            # 尝试获取更友好的显示名称
+            try:
+                description = shortcut.Description
+                if description:
+                    app_name = description
+            except Exception:
+                pass
+
+            return {
+                "name": app_name,
+                "path": target_path,
+                "type": "shortcut",
+                "source": "shortcut",
+                "shortcut_path": lnk_path,
+                "description": f"从快捷方式扫描到的应用: {app_name}"
+            }
+    except ImportError:
+        print("win32com模块未安装，跳过快捷方式解析")
+    except Exception as e:
+        print(f"解析快捷方式失败 {lnk_path}: {e}")
+
+    return None
+
+
+def default_shortcut_roots() -> List[str]:
+    """开始菜单与桌面目录 #"""
+    return [
+        os.path.expanduser(r"~\AppData\Roaming\Microsoft\Windows\Start Menu\Programs"),
+        r"C:\ProgramData\Microsoft\Windows\Start Menu\Programs",
+        os.path.expanduser(r"~\Desktop"),
+    ]
+
+
+class ShortcutSource(DirectorySource):
+    """开始菜单与桌面快捷方式 #"""
+
+    def __init__(self, roots: Optional[Sequence[str]] = None, parser: ShortcutParser = parse_shortcut):
+        super().__init__("shortcut", roots if roots is not None else default_shortcut_roots(), ".lnk", parser)
+
+
+_APP_PATHS_KEY = r"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths"
+_UNINSTALL_KEY = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"
+
+
+class RegistrySource(AppSource):
+    """Windows 注册表：App Paths 整体一个单元，每个卸载项一个单元 #"""
+    name = "registry"
+
+    def __init__(self):
+        self._uninstall: Dict[str, Tuple[str, str, str]] = {}  # 单元 -> (显示名, 安装目录, 类型) #
+
+    def _hives(self):
+        return (
+            ("HKLM", winreg.HKEY_LOCAL_MACHINE, "uninstall_registry", "从卸载注册表扫描到的应用"),
+            ("HKCU", winreg.HKEY_CURRENT_USER, "user_uninstall_registry", "从用户卸载注册表扫描到的应用"),
+        )
+
+    def units(self) -> Dict[str, str]:
+        signatures: Dict[str, str] = {}
+        self._uninstall = {}
+        # 非Windows平台没有注册表来源
+        if winreg is None:
+            return signatures
+
+        try:
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, _APP_PATHS_KEY) as key:
+                # QueryInfoKey 第三项为最后写入时间，任意子键变化都会更新
+                signatures["app_paths"] = str(winreg.QueryInfoKey(key)[2])
+        except OSError as e:
+            print(f"读取App Paths注册表失败: {e}")
+
+        for hive_name, hive, _, _ in self._hives():
+            try:
+                with winreg.OpenKey(hive, _UNINSTALL_KEY) as key:
+                    for i in range(winreg.QueryInfoKey(key)[0]):
+                        try:
+                            subkey_name = winreg.EnumKey(key, i)
+                            with winreg.OpenKey(key, subkey_name) as subkey:
+                                display_name, _ = winreg.QueryValueEx(subkey, "DisplayName")
+                                install_location, _ = winreg.QueryValueEx(subkey, "InstallLocation")
+                        except OSError:
+                            continue
+                        if not display_name or not install_location:
+                            continue
+                        unit_id = f"{hive_name}\\{subkey_name}"
+                        self._uninstall[unit_id] = (display_name, install_location, hive_name)
+                        signatures[unit_id] = f"{display_name}|{install_location}|{_mtime_ns(install_location)}"
+            except OSError as e:
+                print(f"扫描{hive_name} Uninstall注册表失败: {e}")
+        return signatures
+
+    def scan(self, unit_id: str) -> List[Dict]:
+        if winreg is None:
+            return []
+        if unit_id == "app_paths":
+            return self._scan_app_paths()
+
+        display_name, install_location, hive_name = self._uninstall[unit_id]
+        app_type, label = next((kind, desc) for name, _, kind, desc in self._hives() if name == hive_name)
+        return [
+            {
+                "name": display_name,
+                "path": exe_path,
+                "type": app_type,
+                "source": "registry",
+                "description": f"{label}: {display_name}"
+            }
+            for exe_path in find_exe_files(install_location)
+        ]
+
+    def _scan_app_paths(self) -> List[Dict]:
+        apps = []
+        try:
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, _APP_PATHS_KEY) as key:
+                for i in range(winreg.QueryInfoKey(key)[0]):
+                    try:
+                        app_name = winreg.EnumKey(key, i)
+                        if not app_name.endswith('.exe'):
+                            continue
+                        with winreg.OpenKey(key, app_name) as app_key:
+                            # 获取默认值（通常是可执行文件路径）
+                            exe_path, _ = winreg.QueryValueEx(app_key, "")
+                            if not exe_path or not os.path.exists(exe_path):
+                                continue
+                            display_name = app_name[:-4]
+                            # 尝试从注册表获取更友好的显示名称
+                            try:
+                                friendly_name, _ = winreg.QueryValueEx(app_key, "FriendlyAppName")
+                                if friendly_name:
+                                    display_name = friendly_name
+                            except OSError:
+                                pass
+                            apps.append({
+                                "name": display_name,
+                                "path": exe_path,
+                                "type": "registry",
+                                "source": "registry",
+                                "description": f"从注册表扫描到的应用: {display_name}"
+                            })
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"扫描App Paths注册表失败: {e}")
+        return apps
+
+
+def default_sources() -> List[AppSource]:
+    """默认来源：注册表在前，快捷方式在后（去重时快捷方式优先） #"""
+    return [RegistrySource(), ShortcutSource()]
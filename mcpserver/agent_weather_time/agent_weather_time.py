@@ -1,122 +1,285 @@
 # agent_weather_time.py # 天气和时间查询Agent
+import asyncio
 import json
+import os
 import aiohttp
-import requests
 import re
+import threading
+import time
+import weakref
 from datetime import datetime, timedelta
+from pathlib import Path
 from system.config import config, AI_NAME
 
-from mcpserver.agent_weather_time.city_codes import codes_map
+from mcpserver.agent_weather_time.city_index import format_candidates, get_city_index
 
 IPIP_URL = "https://myip.ipip.net/"
+WEATHER_URL = "http://t.weather.itboy.net/api/weather/city/{code}"
+
+# 缓存有效期（秒）：实况变化快，预报变化慢；过期后 STALE_GRACE 倍时间内先返回旧值再后台刷新
+WEATHER_TTL = {"now": 600, "forecast": 3600}
+STALE_GRACE = 2.0
+LOCATION_TTL = 6 * 3600
+UPSTREAM_TIMEOUT = 8
+
+
+def _default_location_cache() -> Path:
+    from system.config import get_data_dir
+    return get_data_dir() / "weather_time" / "local_city.json"
+
+
+async def _await_shielded(task):
+    return await asyncio.shield(task)
+
+
+async def _await_task(task_loop, task):
+    """等待任务结果；任务属于其他事件循环（api_server / mcp_server 共用同一实例）时在其循环中等待"""
+    if task_loop is asyncio.get_running_loop():
+        return await asyncio.shield(task)
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_await_shielded(task), task_loop))
 
 
 class WeatherTimeTool:
-    """天气和时间工具类"""
-    def __init__(self):
+    """天气和时间工具类
+
+    - 天气按 (城市编码, 类型) 缓存，过期后 stale-while-revalidate
+    - 本地城市按需异步解析并缓存到磁盘，构造时不做网络请求
+    - 上游地址可注入，便于对接本地 mock 服务测试
+    - 实例在多个事件循环间共享：HTTP 会话按循环各自持有，进行中的任务记录所属循环
+    """
+    def __init__(self, weather_url: str = WEATHER_URL, ip_url: str = IPIP_URL,
+                 location_cache_path: Path = None, ttl: dict = None):
+        self.weather_url = weather_url
+        self.ip_url = ip_url
+        self.ttl = {**WEATHER_TTL, **(ttl or {})}
+        self._location_cache_path = Path(location_cache_path) if location_cache_path else _default_location_cache()
         self._ip_info = None
         self._local_ip = None
         self._local_city = None
-        self._get_local_ip_and_city()
-        import asyncio
+        self._location_checked_at = 0.0
+        # {(city_code, kind): (fetched_at, value)}
+        self._cache = {}
+        # 正在进行的上游请求 {city_code: (所在事件循环, Task)}，同一城市并发请求只打一次上游
+        self._inflight = {}
+        self._location_task = None  # (所在事件循环, Task)
+        self._lock = threading.Lock()
+        # aiohttp 会话绑定创建它的事件循环，按循环各自持有一个
+        self._sessions = weakref.WeakKeyDictionary()
+        self._metrics = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "background_refreshes": 0,
+            "upstream_requests": 0,
+            "upstream_errors": 0,
+            "upstream_latency_ms_total": 0.0,
+            "upstream_latency_ms_max": 0.0,
+            "upstream_latency_ms_last": 0.0,
+            "location_lookups": 0,
+        }
+        self._load_location_cache()
+
+    # ── 本地城市 ──
+
+    def _load_location_cache(self):
         try:
-            try:
-                loop = asyncio.get_running_loop()
-                asyncio.create_task(self._preload_ip_info())
-            except RuntimeError:
-                self._ip_info = None
+            data = json.loads(self._location_cache_path.read_text(encoding='utf-8'))
+            self._local_ip = data.get('ip')
+            self._local_city = data.get('city')
+            self._location_checked_at = float(data.get('checked_at', 0))
         except Exception:
-            self._ip_info = None
+            pass
+
+    def _save_location_cache(self):
+        try:
+            self._location_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self._location_cache_path.with_suffix('.tmp')
+            tmp.write_text(json.dumps({
+                'ip': self._local_ip,
+                'city': self._local_city,
+                'checked_at': self._location_checked_at,
+            }, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp, self._location_cache_path)
+        except Exception:
+            pass
+
+    async def resolve_local_city(self):
+        """返回本地城市（磁盘缓存有效时直接使用；过期则异步刷新，刷新失败沿用旧值）"""
+        if self._local_city and time.time() - self._location_checked_at < LOCATION_TTL:
+            return self._local_city
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._location_task is None or self._location_task[1].done():
+                self._location_task = (loop, loop.create_task(self._get_local_ip_and_city()))
+            task_loop, task = self._location_task
+        await _await_task(task_loop, task)
+        return self._local_city
 
-    def _get_local_ip_and_city(self):
-        """同步获取本地IP和城市"""
+    async def _get_local_ip_and_city(self):
+        """异步获取本地IP和城市"""
+        self._metrics["location_lookups"] += 1
         try:
-            resp = requests.get(IPIP_URL, timeout=5)
-            resp.encoding = 'utf-8'
-            html = resp.text
+            session = await self._get_session()
+            async with session.get(self.ip_url, timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                html = await resp.text(encoding='utf-8', errors='replace')
             match = re.search(r"当前 IP：([\d\.]+)\s+来自于：(.+?)\s{2,}", html)
             if match:
                 self._local_ip = match.group(1)
                 self._local_city = match.group(2)
-            else:
-                self._local_ip = None
-                self._local_city = None
-        except Exception as e:
-            self._local_ip = None
-            self._local_city = None
+                self._location_checked_at = time.time()
+                self._save_location_cache()
+        except Exception:
+            pass
 
     async def _preload_ip_info(self):
         pass  # 兼容保留，不再异步获取IP
 
-    async def get_weather(self, code):
-        """调用itboy天气接口，返回实况天气+未来3天预报"""
-        url = f'http://t.weather.itboy.net/api/weather/city/{code}'
-        async with aiohttp.ClientSession() as session:
+    # ── 上游请求 ──
+
+    async def _get_session(self):
+        """复用当前事件循环的 HTTP 会话"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=UPSTREAM_TIMEOUT))
+            self._sessions[loop] = session
+        return session
+
+    async def close(self):
+        """关闭所有会话；其他循环的会话提交到各自循环中关闭"""
+        current = asyncio.get_running_loop()
+        for loop, session in list(self._sessions.items()):
+            if session.closed:
+                continue
+            if loop is current:
+                await session.close()
+            elif loop.is_running():
+                asyncio.run_coroutine_threadsafe(session.close(), loop)
+        self._sessions.clear()
+
+    async def _fetch_upstream(self, code):
+        """调用itboy天气接口，写入 now / forecast 两类缓存"""
+        url = self.weather_url.format(code=code)
+        session = await self._get_session()
+        self._metrics["upstream_requests"] += 1
+        start = time.perf_counter()
+        try:
             async with session.get(url) as resp:
                 data = await resp.json(content_type=None)
-                body: dict = data['data']
-                now = {}
+        except Exception:
+            self._metrics["upstream_errors"] += 1
+            raise
+        finally:
+            latency = (time.perf_counter() - start) * 1000
+            self._metrics["upstream_latency_ms_total"] += latency
+            self._metrics["upstream_latency_ms_last"] = round(latency, 2)
+            self._metrics["upstream_latency_ms_max"] = max(self._metrics["upstream_latency_ms_max"], round(latency, 2))
+
+        try:
+            body: dict = data['data']
+            now = {}
+
+            for k, v in body.items():
+                if k == 'forecast':
+                    continue
+                now[k] = v
+
+            now['weather'] = body['forecast'][0]
+        except Exception:
+            self._metrics["upstream_errors"] += 1
+            raise
+        fetched_at = time.monotonic()
+        self._cache[(code, 'now')] = (fetched_at, now)
+        self._cache[(code, 'forecast')] = (fetched_at, body['forecast'])
 
-                for k, v in body.items():
-                    if k == 'forecast':
-                        continue
-                    now[k] = v
+    def _refresh(self, code):
+        """启动（或复用进行中的）上游刷新任务，返回 (所在事件循环, Task)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            inflight = self._inflight.get(code)
+            if inflight is not None and not inflight[1].done():
+                return inflight
+            task = loop.create_task(self._fetch_upstream(code))
+            # 等待者全部取消或后台刷新失败时也取走异常，避免 "exception was never retrieved"
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            task.add_done_callback(lambda t, c=code: self._finish_refresh(c, t))
+            self._inflight[code] = (loop, task)
+        return loop, task
 
-                now['weather'] = body['forecast'][0]
+    def _finish_refresh(self, code, task):
+        with self._lock:
+            inflight = self._inflight.get(code)
+            if inflight is not None and inflight[1] is task:
+                del self._inflight[code]
 
-                return now, body['forecast'][:3], body['forecast']
+    async def get_cached(self, code, kind):
+        """按 (城市编码, 类型) 读取天气，kind 为 now 或 forecast"""
+        entry = self._cache.get((code, kind))
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            ttl = self.ttl[kind]
+            if age < ttl:
+                self._metrics["hits"] += 1
+                return entry[1]
+            if age < ttl * STALE_GRACE:
+                # 先返回旧值，后台刷新
+                self._metrics["stale_hits"] += 1
+                self._metrics["background_refreshes"] += 1
+                self._refresh(code)
+                return entry[1]
+
+        self._metrics["misses"] += 1
+        try:
+            await _await_task(*self._refresh(code))
+        except Exception:
+            if entry is not None:
+                # 上游失败时退回到过期数据
+                return entry[1]
+            raise
+        return self._cache[(code, kind)][1]
+
+    async def get_weather(self, code):
+        """返回实况天气+未来3天预报（与旧接口一致：now, 3天, 全部预报）"""
+        now = await self.get_cached(code, 'now')
+        forecast = await self.get_cached(code, 'forecast')
+        return now, forecast[:3], forecast
+
+    def get_metrics(self):
+        m = dict(self._metrics)
+        requests_count = m["upstream_requests"]
+        m["upstream_latency_ms_avg"] = round(m.pop("upstream_latency_ms_total") / requests_count, 2) if requests_count else 0.0
+        lookups = m["hits"] + m["stale_hits"] + m["misses"]
+        m["hit_rate"] = round((m["hits"] + m["stale_hits"]) / lookups, 4) if lookups else 0.0
+        m["cached_entries"] = len(self._cache)
+        m["local_city"] = self._local_city
+        return m
 
     async def handle(self, action=None, ip=None, city=None, query=None, format=None, **kwargs):
         """统一处理入口，支持LLM传入city参数或自动识别本地城市"""
         # 优先使用LLM传入的city参数，如果没有则使用本地城市
         if city and city.strip():
             city_str = city.strip()
-            province, city_name = city_str, city_str
-            match = re.match(r"^([\u4e00-\u9fa5]+) ([\u4e00-\u9fa5]+)$", city_str)
-            if match:
-                province = match.group(1)
-                city_name = match.group(2)
-            else:
-                parts = city_str.split()
-                if len(parts) >= 2:
-                    province = parts[-2]
-                    city_name = parts[-1]
-                else:
-                    province = ''
-                    city_name = ''
         else:
-            city_str = getattr(self, '_local_city', '') or ''
-            if city_str.startswith('中国'):
-                city_str = city_str[2:].strip()
-            province, city_name = city_str, city_str
-            if city_str:
-                match = re.match(r"^([\u4e00-\u9fa5]+) ([\u4e00-\u9fa5]+)$", city_str)
-                if match:
-                    province = match.group(1)
-                    city_name = match.group(2)
-                else:
-                    parts = city_str.split()
-                    if len(parts) >= 2:
-                        province = parts[-2]
-                        city_name = parts[-1]
-                    else:
-                        province = ''
-                        city_name = ''
-
-        # 查询城市代码
-        city_code = codes_map.get(f'{province}{city_name}')
-
-        if not city_code:
-            return {'status': 'error', 'message': f'未找到城市编码或该城市不存在: {city_name}, 确保city格式为{{省 市}}, 如:湖北 武汉, 直辖市请重复两遍市名, 如:北京 北京', 'data': {}}
-
-        now, d3, d15 = await self.get_weather(city_code)
+            city_str = await self.resolve_local_city() or ''
+
+        # 查询城市代码：支持"省 市"、"北京市"、"朝阳区"、拼音、首字母及错别字
+        match, candidates = get_city_index().lookup(city_str) if city_str else (None, [])
+        if not match:
+            # 只有较弱的前缀 / 模糊匹配时不擅自选城市，把候选交给用户确认
+            suggestions = format_candidates(candidates)
+            if suggestions:
+                return {'status': 'error', 'message': f'无法确定城市: {city_str}, 可能是: {"、".join(suggestions)}, 请确认后按{{省 市}}格式重新查询', 'data': {'candidates': suggestions}}
+            return {'status': 'error', 'message': f'未找到城市编码或该城市不存在: {city_str}, 确保city格式为{{省 市}}, 如:湖北 武汉', 'data': {}}
+        province, city_name, city_code = match.province, match.city, match.code
 
         # 今日天气查询
         if action in ['today_weather', 'current_weather', 'today']:
+            now = await self.get_cached(city_code, 'now')
             return {'status': 'success', 'message': f'{city_name}今日天气查询成功', 'data': {'city': city_name, 'weather': now}}
 
         # 未来天气查询
         elif action in ['forecast_weather', 'future_weather', 'forecast', 'weather_forecast']:
+            d15 = await self.get_cached(city_code, 'forecast')
             return {'status': 'success', 'message': f'{city_name}天气预报查询成功', 'data': {'city': city_name, 'forecast': d15}}
 
         elif action in ['time', 'get_time', 'current_time']:
@@ -138,13 +301,18 @@ class WeatherTimeAgent:
     """天气和时间Agent"""
     name = "WeatherTime Agent"
 
-    def __init__(self):
-        self._tool = WeatherTimeTool()
+    def __init__(self, **tool_options):
+        self._tool = WeatherTimeTool(**tool_options)
+        # 在实例化（通常是后台预热线程）时构建城市索引，首个查询无需等待
+        get_city_index()
         import sys
-        ip_str = getattr(self._tool, '_local_ip', '未获取到IP')
-        city_str = getattr(self._tool, '_local_city', '未知城市')
+        city_str = self._tool._local_city or '待首次查询时解析'
         sys.stderr.write(f'✅ WeatherTimeAgent初始化完成，登陆地址：{city_str}\n')
 
+    def get_metrics(self) -> dict:
+        """缓存命中与上游延迟统计"""
+        return self._tool.get_metrics()
+
     async def handle_handoff(self, task: dict) -> str:
         try:
             action = task.get("tool_name")
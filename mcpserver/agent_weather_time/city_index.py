@@ -0,0 +1,305 @@
+# city_index.py # 城市名称索引：规范化 / 拼音 / 前缀 / 编辑距离查找
+"""
+城市名称索引
+
+codes_map 的键是 "省份+城市"（直辖市重复两遍，如 "北京北京"），只支持精确查找。
+本模块在首次使用时构建一次索引，支持：
+
+- 规范化：去掉空白与分隔符、"中国" 前缀以及 省/市/区/县/自治区 等行政区后缀
+- 精确：省份+城市、城市名、拼音全拼、拼音首字母（"北京市"、"beijing"、"BJ"）
+- 前缀：排序键表 + 二分（"wuh" -> 武汉，"北京密" -> 北京密云）
+- 同音字：中文查询转拼音后匹配（"武汗" -> 武汉）
+- 模糊：对称删除法取候选，再做有界编辑距离（"beijng"、"北京朝杨"）
+
+查询返回按得分排序的候选，重名城市（如北京朝阳 / 辽宁朝阳）都会列出。
+只有最高分不低于 MIN_RESOLVE_SCORE 时才直接采用，较弱的前缀 / 模糊结果（"东京" -> 北京、
+只给省名 "湖北"）只作为候选提示，由调用方确认。
+"""
+
+import bisect
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+try:
+    from pypinyin import lazy_pinyin
+    PYPINYIN_AVAILABLE = True
+except ImportError:
+    lazy_pinyin = None  # type: ignore[assignment]
+    PYPINYIN_AVAILABLE = False
+
+# codes_map 中出现的省级名称，按长度降序以便优先匹配 "内蒙古"、"黑龙江"
+PROVINCES = sorted(
+    (
+        "北京", "天津", "上海", "重庆", "河北", "山西", "内蒙古", "辽宁", "吉林", "黑龙江",
+        "江苏", "浙江", "安徽", "福建", "江西", "山东", "河南", "湖北", "湖南", "广东",
+        "广西", "海南", "四川", "贵州", "云南", "西藏", "陕西", "甘肃", "青海", "宁夏",
+        "新疆", "台湾", "香港", "澳门",
+    ),
+    key=len,
+    reverse=True,
+)
+
+# 省级名称后可能跟的行政区后缀（较长的在前）
+_PROVINCE_SUFFIXES = ("维吾尔自治区", "壮族自治区", "回族自治区", "特别行政区", "自治区", "省", "市")
+# 城市名末尾的行政区后缀，去掉后至少保留两个字
+_CITY_SUFFIXES = ("市", "区", "县")
+
+_STRIP_PATTERN = re.compile(r"[\s·・\-_'\"“”‘’.。,，/]+")
+
+# 匹配类型及其基础得分
+MATCH_SCORES = {"exact": 1.0, "pinyin": 0.95, "initials": 0.85, "prefix": 0.7, "homophone": 0.6, "fuzzy": 0.5}
+# 直接采用的最低得分：同音字及以上，或几乎补全的前缀；编辑距离结果最高只有 0.5，只作为候选
+MIN_RESOLVE_SCORE = 0.6
+
+
+def _strip_city_suffix(name: str) -> str:
+    for suffix in _CITY_SUFFIXES:
+        if name.endswith(suffix) and len(name) - len(suffix) >= 2:
+            return name[:-len(suffix)]
+    return name
+
+
+def split_province(text: str) -> Tuple[str, str]:
+    """拆分开头的省级名称（连同其行政区后缀），返回 (省份, 剩余部分)"""
+    for province in PROVINCES:
+        if text.startswith(province):
+            rest = text[len(province):]
+            for suffix in _PROVINCE_SUFFIXES:
+                if rest.startswith(suffix):
+                    rest = rest[len(suffix):]
+                    break
+            return province, rest
+    return "", text
+
+
+def normalize_city(text: str) -> str:
+    """城市名规范化："中国 北京市 朝阳区" -> "北京朝阳"，"武汉市" -> "武汉"，"Bei Jing" -> "beijing" """
+    text = _STRIP_PATTERN.sub("", (text or "").lower())
+    if text.startswith("中国"):
+        text = text[2:]
+    province, rest = split_province(text)
+    if not province:
+        return _strip_city_suffix(text)
+    if not rest:
+        return province
+    return province + _strip_city_suffix(rest)
+
+
+def _pinyin(text: str) -> Tuple[str, str]:
+    """(拼音全拼, 拼音首字母)；未安装 pypinyin 时为空"""
+    if not PYPINYIN_AVAILABLE or not text:
+        return "", ""
+    syllables = [s.lower() for s in lazy_pinyin(text) if s and s.isalpha()]
+    return "".join(syllables), "".join(s[0] for s in syllables)
+
+
+def _max_distance(text: str) -> int:
+    """允许的编辑距离：短名只容忍一处错误"""
+    return 1 if len(text) <= 4 else 2
+
+
+def _deletes(text: str, depth: int) -> Set[str]:
+    """删除至多 depth 个字符得到的所有变体（含自身），用于对称删除法查找"""
+    variants = {text}
+    frontier = {text}
+    for _ in range(depth):
+        frontier = {item[:i] + item[i + 1:] for item in frontier if len(item) > 1 for i in range(len(item))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a: str, b: str, max_dist: int) -> int:
+    """有界编辑距离（相邻字符交换计为一次），超过 max_dist 时提前返回 max_dist + 1"""
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    before: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, before[j - 2] + 1)
+            current.append(value)
+            row_min = min(row_min, value)
+        if row_min > max_dist:
+            return max_dist + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+@dataclass(frozen=True)
+class CityMatch:
+    """城市查找结果"""
+    province: str
+    city: str
+    code: str
+    score: float
+    match_type: str
+
+    @property
+    def key(self) -> str:
+        """codes_map 中的原始键"""
+        return f"{self.province}{self.city}"
+
+    def to_dict(self) -> dict:
+        return {
+            "province": self.province,
+            "city": self.city,
+            "code": self.code,
+            "score": round(self.score, 3),
+            "match_type": self.match_type,
+        }
+
+
+class CityIndex:
+    """城市名称索引，构建后只读"""
+
+    def __init__(self, codes: Mapping[str, str]):
+        # 条目按 codes_map 顺序编号：(省份, 城市, 编码)
+        self._entries: List[Tuple[str, str, str]] = []
+        self._exact: Dict[str, List[Tuple[str, int]]] = {}        # 键 -> [(匹配类型, 条目)]
+        self._prefix_keys: List[Tuple[str, int]] = []             # (键, 条目)，排序后二分
+        self._deletes: Dict[str, Set[str]] = {}                   # 删除变体 -> 模糊键
+        self._fuzzy_keys: Dict[str, Set[int]] = {}                # 模糊键 -> 条目
+
+        for key, code in codes.items():
+            province, city = split_province(key)
+            if not city:
+                province, city = "", key
+            self._add(province, city, code)
+        self._prefix_keys.sort()
+
+    def _add(self, province: str, city: str, code: str) -> None:
+        entry = len(self._entries)
+        self._entries.append((province, city, code))
+
+        names = {normalize_city(province + city), _strip_city_suffix(city)}
+        keys: List[Tuple[str, str]] = [(name, "exact") for name in names]
+        for name in (city, province + city):
+            full, initials = _pinyin(name)
+            keys.append((full, "pinyin"))
+            keys.append((initials, "initials"))
+
+        seen: Set[Tuple[str, str]] = set()
+        for key, match_type in keys:
+            if not key or (key, match_type) in seen:
+                continue
+            seen.add((key, match_type))
+            self._exact.setdefault(key, []).append((match_type, entry))
+            self._prefix_keys.append((key, entry))
+            # 首字母太短，编辑距离没有意义
+            if match_type != "initials":
+                self._fuzzy_keys.setdefault(key, set()).add(entry)
+                for variant in _deletes(key, _max_distance(key)):
+                    self._deletes.setdefault(variant, set()).add(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _match(self, entry: int, score: float, match_type: str) -> CityMatch:
+        province, city, code = self._entries[entry]
+        return CityMatch(province, city, code, score, match_type)
+
+    def _rank(self, hits: Dict[int, Tuple[float, str]], province: str, limit: int) -> List[CityMatch]:
+        """按得分排序；同分时查询里带的省份优先，其次省会/直辖市本身，最后按原表顺序"""
+        def sort_key(entry: int):
+            score, _ = hits[entry]
+            entry_province, city, _ = self._entries[entry]
+            return (-score, entry_province != province if province else False, city != entry_province, entry)
+
+        return [self._match(entry, *hits[entry]) for entry in sorted(hits, key=sort_key)[:limit]]
+
+    def _exact_hits(self, key: str) -> Dict[int, Tuple[float, str]]:
+        hits: Dict[int, Tuple[float, str]] = {}
+        for match_type, entry in self._exact.get(key, ()):
+            score = MATCH_SCORES[match_type]
+            if entry not in hits or score > hits[entry][0]:
+                hits[entry] = (score, match_type)
+        return hits
+
+    def _prefix_hits(self, prefix: str) -> Dict[int, Tuple[float, str]]:
+        hits: Dict[int, Tuple[float, str]] = {}
+        keys = self._prefix_keys
+        for i in range(bisect.bisect_left(keys, (prefix,)), len(keys)):
+            key, entry = keys[i]
+            if not key.startswith(prefix):
+                break
+            # 补全部分越短得分越高
+            score = MATCH_SCORES["prefix"] * len(prefix) / len(key)
+            if entry not in hits or score > hits[entry][0]:
+                hits[entry] = (score, "prefix")
+        return hits
+
+    def _homophone_hits(self, query: str) -> Dict[int, Tuple[float, str]]:
+        """中文错别字按拼音匹配（"武汗" -> wuhan）"""
+        full, _ = _pinyin(query) if query.isalpha() and not query.isascii() else ("", "")
+        hits: Dict[int, Tuple[float, str]] = {}
+        for match_type, entry in self._exact.get(full, ()) if full else ():
+            if match_type == "pinyin":
+                hits[entry] = (MATCH_SCORES["homophone"], "homophone")
+        return hits
+
+    def _fuzzy_hits(self, query: str) -> Dict[int, Tuple[float, str]]:
+        """对称删除法取候选（两边各删至多 max_dist 个字符后相同），再校验编辑距离"""
+        max_dist = _max_distance(query)
+        candidates: Set[str] = set()
+        for variant in _deletes(query, max_dist):
+            candidates.update(self._deletes.get(variant, ()))
+
+        hits: Dict[int, Tuple[float, str]] = {}
+        for key in candidates:
+            dist = edit_distance(query, key, max_dist)
+            if dist > max_dist:
+                continue
+            score = MATCH_SCORES["fuzzy"] * (1 - dist / max(len(query), len(key)))
+            for entry in self._fuzzy_keys[key]:
+                if entry not in hits or score > hits[entry][0]:
+                    hits[entry] = (score, "fuzzy")
+        return hits
+
+    def search(self, query: str, limit: int = 5) -> List[CityMatch]:
+        """按 精确/拼音 -> 前缀 -> 同音字 -> 编辑距离 的顺序查找，返回排序后的候选"""
+        key = normalize_city(query)
+        if not key:
+            return []
+        province, _ = split_province(key)
+
+        for lookup in (self._exact_hits, self._prefix_hits, self._homophone_hits, self._fuzzy_hits):
+            hits = lookup(key)
+            if hits:
+                return self._rank(hits, province, limit)
+        return []
+
+    def lookup(self, query: str, limit: int = 5) -> Tuple[Optional[CityMatch], List[CityMatch]]:
+        """返回 (可直接采用的城市, 候选)；最高分低于 MIN_RESOLVE_SCORE 时不采用，只返回候选"""
+        matches = self.search(query, limit)
+        if matches and matches[0].score >= MIN_RESOLVE_SCORE:
+            return matches[0], matches
+        return None, matches
+
+    def resolve(self, query: str) -> Optional[CityMatch]:
+        """返回可直接采用的城市（得分不足时为 None）"""
+        return self.lookup(query, limit=1)[0]
+
+
+def format_candidates(matches: List[CityMatch]) -> List[str]:
+    """候选城市的 "省 市" 写法，用于错误提示"""
+    return [f"{m.province} {m.city}" if m.province else m.city for m in matches]
+
+
+def build_city_index(codes: Optional[Mapping[str, str]] = None) -> CityIndex:
+    """构建索引；默认使用天气接口的 codes_map"""
+    if codes is None:
+        from mcpserver.agent_weather_time.city_codes import codes_map
+        codes = codes_map
+    return CityIndex(codes)
+
+
+@lru_cache(maxsize=1)
+def get_city_index() -> CityIndex:
+    """进程内共享的城市索引，首次调用时构建"""
+    return build_city_index()
@@ -2,7 +2,8 @@
 
 from typing import Dict, Any, Optional, List
 from system.config import logger
-from mcpserver.mcp_registry import MCP_REGISTRY, MANIFEST_CACHE
+from mcpserver.mcp_registry import MANIFEST_CACHE, get_service_instance_async
+from mcpserver.tool_cache import get_tool_cache
 
 
 class MCPManager:
@@ -11,28 +12,54 @@ class MCPManager:
     def __init__(self):
         self._initialized = False
 
-    async def unified_call(self, service_name: str, tool_call: Dict[str, Any]) -> str:
-        """统一调用接口 - 路由到注册的agent的handle_handoff方法"""
-        agent = MCP_REGISTRY.get(service_name)
-        if not agent:
+    async def unified_call(self, service_name: str, tool_call: Dict[str, Any],
+                           session_id: Optional[str] = None) -> str:
+        """统一调用接口 - 路由到注册的agent的handle_handoff方法（实例在首次调用时创建）
+
+        manifest 声明了 cache 的工具按 (作用域, 服务, 工具, 规范化参数) 记忆结果，
+        声明了 mutating 的工具执行后清空同一服务的缓存。
+        """
+        if service_name not in MANIFEST_CACHE:
             return f'{{"status": "error", "message": "未找到服务: {service_name}"}}'
 
+        cache = get_tool_cache()
+        tool_name = str(tool_call.get("tool_name") or "")
+        policy = cache.policy_for(service_name, tool_name) if cache.enabled else None
+        key = cache.make_key(policy, service_name, tool_call, session_id) if policy else None
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                logger.debug(f"[MCPManager] 命中工具缓存: {service_name}/{tool_name}")
+                return cached
+        elif policy is not None and policy.cacheable:
+            cache.record_bypass(service_name)
+        generation = cache.generation(service_name)
+
+        agent = await get_service_instance_async(service_name)
+        if not agent:
+            return f'{{"status": "error", "message": "服务初始化失败: {service_name}"}}'
+
         try:
             result = await agent.handle_handoff(tool_call)
-            return result
         except Exception as e:
             logger.error(f"[MCPManager] 调用服务 {service_name} 失败: {e}")
             return f'{{"status": "error", "message": "调用失败: {e}"}}'
+        finally:
+            if policy is not None and policy.mutating:
+                cache.invalidate(service_name)
+
+        if key is not None:
+            cache.put(key, result, policy.ttl, generation)
+        return result
 
     def get_available_services(self) -> List[str]:
         """获取可用服务列表"""
-        return list(MCP_REGISTRY.keys())
+        return list(MANIFEST_CACHE.keys())
 
     def get_available_services_filtered(self) -> Dict[str, Any]:
         """获取服务详情"""
         result = {}
-        for name, instance in MCP_REGISTRY.items():
-            manifest = MANIFEST_CACHE.get(name, {})
+        for name, manifest in MANIFEST_CACHE.items():
             result[name] = {
                 "displayName": manifest.get("displayName", name),
                 "description": manifest.get("description", ""),
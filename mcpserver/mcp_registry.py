@@ -1,18 +1,31 @@
-"""MCP注册表 - manifest加载、agent实例创建、服务发现与查询"""
+"""MCP注册表 - manifest加载、agent实例创建、服务发现与查询
+
+注册只解析 manifest（按文件 mtime 缓存），agent 实例在首次调用时才创建；
+可选在后台线程池中并行预热。
+"""
 
 import json
 import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import sys
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 
 from system.config import logger
 
 # 全局注册表
-MCP_REGISTRY: Dict[str, Any] = {}  # MCP服务池 {name: agent_instance}
-MANIFEST_CACHE: Dict[str, Any] = {}  # manifest信息缓存 {name: manifest_dict}
+MCP_REGISTRY: Dict[str, Any] = {}  # 已创建的agent实例 {name: agent_instance}
+MANIFEST_CACHE: Dict[str, Any] = {}  # 已注册服务的manifest {name: manifest_dict}
+AGENT_INIT_STATS: Dict[str, Dict[str, Any]] = {}  # 实例创建状态与耗时 {name: {...}}
 _REGISTERED = False  # 是否已完成注册
 
+_MANIFEST_FILE_CACHE: Dict[str, Tuple[Tuple[int, int], Optional[Dict[str, Any]]]] = {}  # {path: ((mtime_ns, size), manifest)}
+_INSTANCE_LOCKS: Dict[str, threading.Lock] = {}
+_LOCKS_GUARD = threading.Lock()
+WARMUP_WORKERS = 4
+
 
 def load_manifest_file(manifest_path: Path) -> Optional[Dict[str, Any]]:
     """加载manifest文件"""
@@ -24,6 +37,32 @@ def load_manifest_file(manifest_path: Path) -> Optional[Dict[str, Any]]:
         return None
 
 
+def load_manifest_cached(manifest_path: Path) -> Optional[Dict[str, Any]]:
+    """按文件 mtime/大小缓存解析结果，文件未变化时不重复解析"""
+    try:
+        st = manifest_path.stat()
+    except OSError:
+        _MANIFEST_FILE_CACHE.pop(str(manifest_path), None)
+        return None
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _MANIFEST_FILE_CACHE.get(str(manifest_path))
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    manifest = load_manifest_file(manifest_path)
+    _MANIFEST_FILE_CACHE[str(manifest_path)] = (signature, manifest)
+    return manifest
+
+
+def iter_manifests(mcp_dir: str = "mcpserver") -> List[Tuple[Path, Dict[str, Any]]]:
+    """列出目录下所有可解析的 agent-manifest.json（按路径排序）"""
+    manifests = []
+    for manifest_file in sorted(Path(mcp_dir).glob("**/agent-manifest.json")):
+        manifest = load_manifest_cached(manifest_file)
+        if manifest:
+            manifests.append((manifest_file, manifest))
+    return manifests
+
+
 def create_agent_instance(manifest: Dict[str, Any]) -> Optional[Any]:
     """根据manifest创建agent实例"""
     try:
@@ -46,16 +85,11 @@ def create_agent_instance(manifest: Dict[str, Any]) -> Optional[Any]:
 
 
 def scan_and_register_mcp_agents(mcp_dir: str = "mcpserver") -> List[str]:
-    """扫描目录中的agent-manifest.json，注册MCP类型的agent"""
-    d = Path(mcp_dir)
+    """扫描目录中的agent-manifest.json，注册MCP类型的agent（只登记manifest，实例延迟创建）"""
     registered_agents = []
 
-    for manifest_file in d.glob("**/agent-manifest.json"):
+    for manifest_file, manifest in iter_manifests(mcp_dir):
         try:
-            manifest = load_manifest_file(manifest_file)
-            if not manifest:
-                continue
-
             agent_type = manifest.get("agentType")
             service_name = manifest.get("displayName")
 
@@ -67,11 +101,9 @@ def scan_and_register_mcp_agents(mcp_dir: str = "mcpserver") -> List[str]:
                 # 优先使用 name 字段（英文标识）做注册 key，fallback 到 displayName
                 registry_key = manifest.get("name") or service_name
                 MANIFEST_CACHE[registry_key] = manifest
-                agent_instance = create_agent_instance(manifest)
-                if agent_instance:
-                    MCP_REGISTRY[registry_key] = agent_instance
-                    registered_agents.append(registry_key)
-                    sys.stderr.write(f"✅ 注册MCP服务: {registry_key} ({service_name}) (来自 {manifest_file})\n")
+                AGENT_INIT_STATS.setdefault(registry_key, {"status": "pending"})
+                registered_agents.append(registry_key)
+                sys.stderr.write(f"✅ 注册MCP服务: {registry_key} ({service_name}) (来自 {manifest_file})\n")
 
         except Exception as e:
             sys.stderr.write(f"处理manifest文件失败 {manifest_file}: {e}\n")
@@ -80,6 +112,74 @@ def scan_and_register_mcp_agents(mcp_dir: str = "mcpserver") -> List[str]:
     return registered_agents
 
 
+def _instance_lock(service_name: str) -> threading.Lock:
+    with _LOCKS_GUARD:
+        lock = _INSTANCE_LOCKS.get(service_name)
+        if lock is None:
+            lock = _INSTANCE_LOCKS[service_name] = threading.Lock()
+        return lock
+
+
+def get_service_instance(service_name: str) -> Optional[Any]:
+    """获取服务实例，首次访问时创建（线程安全，同一服务只创建一次；创建失败后不再重试）"""
+    instance = MCP_REGISTRY.get(service_name)
+    if instance is not None:
+        return instance
+    manifest = MANIFEST_CACHE.get(service_name)
+    if manifest is None:
+        return None
+
+    with _instance_lock(service_name):
+        instance = MCP_REGISTRY.get(service_name)
+        if instance is not None:
+            return instance
+        if AGENT_INIT_STATS.get(service_name, {}).get("status") == "failed":
+            return None
+
+        AGENT_INIT_STATS[service_name] = {"status": "creating"}
+        start = time.perf_counter()
+        instance = create_agent_instance(manifest)
+        init_ms = round((time.perf_counter() - start) * 1000, 2)
+        if instance is None:
+            AGENT_INIT_STATS[service_name] = {"status": "failed", "init_ms": init_ms}
+            return None
+        MCP_REGISTRY[service_name] = instance
+        AGENT_INIT_STATS[service_name] = {"status": "ready", "init_ms": init_ms, "created_at": time.time()}
+        logger.info(f"[MCP Registry] 服务实例已创建: {service_name} ({init_ms}ms)")
+        return instance
+
+
+async def get_service_instance_async(service_name: str) -> Optional[Any]:
+    """异步获取服务实例；需要创建时在线程中执行构造函数，避免阻塞事件循环"""
+    instance = MCP_REGISTRY.get(service_name)
+    if instance is not None:
+        return instance
+    import asyncio
+
+    return await asyncio.to_thread(get_service_instance, service_name)
+
+
+def warm_up_agents(names: Optional[List[str]] = None, background: bool = True,
+                   max_workers: int = WARMUP_WORKERS) -> Optional[threading.Thread]:
+    """并行预创建服务实例；background=True 时在后台线程执行并立即返回"""
+    targets = [n for n in (names or list(MANIFEST_CACHE)) if n not in MCP_REGISTRY]
+    if not targets:
+        return None
+
+    def _run():
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-warmup") as pool:
+            list(pool.map(get_service_instance, targets))
+        logger.info(f"[MCP Registry] 预热完成: {len(targets)} 个服务, 耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    if not background:
+        _run()
+        return None
+    thread = threading.Thread(target=_run, name="mcp-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
 def get_service_info(service_name: str):
     """获取服务详细信息"""
     manifest = MANIFEST_CACHE.get(service_name)
@@ -130,39 +230,54 @@ def get_service_statistics():
         caps = manifest.get("capabilities", {})
         total_tools += len(caps.get("invocationCommands", []))
     return {
-        "total_services": len(MCP_REGISTRY),
+        "total_services": len(MANIFEST_CACHE),
         "total_tools": total_tools,
-        "service_names": list(MCP_REGISTRY.keys()),
+        "service_names": list(MANIFEST_CACHE.keys()),
+        "instantiated": len(MCP_REGISTRY),
     }
 
 
-def auto_register_mcp():
-    """自动扫描并注册MCP服务（幂等，重复调用不会重新注册）"""
+def auto_register_mcp(warm_up: bool = False):
+    """自动扫描并注册MCP服务（幂等，重复调用不会重新注册）
+
+    Args:
+        warm_up: 是否在后台并行预创建所有服务实例
+    """
     global _REGISTERED
-    if _REGISTERED:
-        return list(MCP_REGISTRY.keys())
-    registered = scan_and_register_mcp_agents("mcpserver")
-    _REGISTERED = True
-    logger.info(f"[MCP Registry] 自动注册完成，已注册 {len(registered)} 个服务: {registered}")
-    return registered
+    if not _REGISTERED:
+        registered = scan_and_register_mcp_agents("mcpserver")
+        _REGISTERED = True
+        logger.info(f"[MCP Registry] 自动注册完成，已注册 {len(registered)} 个服务: {registered}")
+    if warm_up:
+        warm_up_agents(background=True)
+    return list(MANIFEST_CACHE.keys())
 
 
 def get_registered_services() -> List[str]:
-    return list(MCP_REGISTRY.keys())
-
-
-def get_service_instance(service_name: str) -> Optional[Any]:
-    return MCP_REGISTRY.get(service_name)
+    return list(MANIFEST_CACHE.keys())
 
 
 def clear_registry():
     MCP_REGISTRY.clear()
     MANIFEST_CACHE.clear()
+    AGENT_INIT_STATS.clear()
 
 
 def get_registry_status() -> Dict[str, Any]:
+    agents = {}
+    for name in MANIFEST_CACHE:
+        agents[name] = dict(AGENT_INIT_STATS.get(name, {"status": "pending"}))
+        # agent 可选提供 get_metrics()（如缓存命中率、上游延迟）
+        get_metrics = getattr(MCP_REGISTRY.get(name), "get_metrics", None)
+        if callable(get_metrics):
+            try:
+                agents[name]["metrics"] = get_metrics()
+            except Exception as e:
+                agents[name]["metrics"] = {"error": str(e)}
     return {
-        "registered_services": len(MCP_REGISTRY),
+        "registered_services": len(MANIFEST_CACHE),
+        "instantiated_services": len(MCP_REGISTRY),
         "cached_manifests": len(MANIFEST_CACHE),
-        "service_names": list(MCP_REGISTRY.keys()),
+        "service_names": list(MANIFEST_CACHE.keys()),
+        "agents": agents,
     }
@@ -24,11 +24,20 @@ async def lifespan(app: FastAPI):
     get_mcp_manager()
 
     from mcpserver.mcp_registry import auto_register_mcp
-    auto_register_mcp()
+    auto_register_mcp(warm_up=True)
+
+    # 同进程的其他服务直接调用工具接口，无需经过 HTTP
+    from system.service_transport import get_service_transport
+    get_service_transport().register("mcp_server", {
+        ("POST", "/schedule"): lambda body: schedule_task(ScheduleRequest(**body)),
+        ("POST", "/call"): lambda body: call_tool(ToolCallRequest(**body)),
+    })
 
     logger.info("[MCP Server] 初始化完成")
     yield
 
+    get_service_transport().unregister("mcp_server")
+
     from mcpserver.mcp_manager import get_mcp_manager
     await get_mcp_manager().cleanup()
     logger.info("[MCP Server] 已关闭")
@@ -78,7 +87,7 @@ async def schedule_task(req: ScheduleRequest):
         service_name = call.get("service_name", "")
         tool_name = call.get("tool_name", "")
         try:
-            result = await manager.unified_call(service_name, call)
+            result = await manager.unified_call(service_name, call, session_id=req.session_id or None)
             return {"service_name": service_name, "tool_name": tool_name, "status": "ok", "result": result}
         except Exception as e:
             logger.error(f"[MCP Server] 工具调用失败: service={service_name}, error={e}")
@@ -135,11 +144,15 @@ async def list_services():
 async def server_status():
     """服务器状态"""
     from mcpserver.mcp_registry import get_service_statistics
+    from mcpserver.mcp_registry import get_registry_status
+    from mcpserver.tool_cache import get_tool_cache
     stats = get_service_statistics()
     return {
         "status": "running",
         "registered_services": stats["total_services"],
         "total_tools": stats["total_tools"],
+        "agents": get_registry_status()["agents"],
+        "tool_cache": get_tool_cache().get_stats(),
     }
 
 
@@ -175,22 +188,20 @@ async def _notify_proactive_vision_reset():
     避免短时间内重复分析同一屏幕。
     """
     try:
-        import httpx
-        from system.config import get_server_port
-
-        agent_port = get_server_port("agent_server")
-        url = f"http://127.0.0.1:{agent_port}/proactive_vision/reset_timer"
-
-        async with httpx.AsyncClient(timeout=3.0) as client:
-            resp = await client.post(url, json={"reason": "mcp_call_screen_vision"})
-            if resp.status_code == 200:
-                result = resp.json()
-                if result.get("success"):
-                    logger.debug("[MCP Server] 已通知ProactiveVision重置计时器")
-                else:
-                    logger.debug(f"[MCP Server] ProactiveVision重置失败: {result.get('error')}")
+        from system.service_transport import get_service_transport
+
+        resp = await get_service_transport().post(
+            "agent_server", "/proactive_vision/reset_timer",
+            json={"reason": "mcp_call_screen_vision"}, timeout=3.0,
+        )
+        if resp.status_code == 200:
+            result = resp.json()
+            if result.get("success"):
+                logger.debug("[MCP Server] 已通知ProactiveVision重置计时器")
             else:
-                logger.debug(f"[MCP Server] ProactiveVision通知失败: HTTP {resp.status_code}")
+                logger.debug(f"[MCP Server] ProactiveVision重置失败: {result.get('error')}")
+        else:
+            logger.debug(f"[MCP Server] ProactiveVision通知失败: HTTP {resp.status_code}")
     except Exception as e:
         # 静默失败，不影响主流程
         logger.debug(f"[MCP Server] ProactiveVision通知异常（忽略）: {e}")
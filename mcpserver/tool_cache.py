@@ -0,0 +1,267 @@
+"""MCP 工具结果缓存 - 幂等工具调用的记忆化
+
+manifest 的 invocationCommands 中可以为工具声明缓存策略：
+    "cache": {"ttl": 600, "scope": "global", "skip_if": ["auto_screenshot", "images"]}
+    "mutating": true
+  - ttl: 结果有效期（秒）
+  - scope: global（所有会话共享）或 session（按 session_id 隔离）
+  - skip_if: 这些参数有值时不走缓存（结果依赖屏幕等外部状态）
+  - aliases: 工具名别名，与 command 共用缓存条目
+  - mutating: 执行后清空同一服务的所有缓存条目
+
+缓存键为 (作用域, 服务, 工具, 规范化参数)；只缓存成功结果。服务被清空时递增版本号，
+清空前已发出、清空后才返回的调用不会写回旧结果。
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from system.config import get_config
+
+SCOPES = ("global", "session")
+
+# 调度用字段，不参与缓存键
+_META_KEYS = {"agentType", "service_name", "tool_name", "session_id"}
+
+CacheKey = Tuple[str, str, str, str]  # (作用域, 服务, 工具, 规范化参数)
+
+
+@dataclass
+class ToolCachePolicy:
+    """单个工具的缓存策略"""
+
+    command: str  # manifest 中的工具名（别名共用）
+    ttl: float = 0.0
+    scope: str = "global"
+    skip_if: List[str] = field(default_factory=list)
+    mutating: bool = False
+
+    @property
+    def cacheable(self) -> bool:
+        return self.ttl > 0
+
+
+def policies_from_manifest(manifest: Dict[str, Any]) -> Dict[str, ToolCachePolicy]:
+    """从 manifest 解析各工具（含别名）的缓存策略；未声明的工具不出现在结果中"""
+    policies: Dict[str, ToolCachePolicy] = {}
+    for command in manifest.get("capabilities", {}).get("invocationCommands", []):
+        name = command.get("command")
+        spec = command.get("cache") or {}
+        if not name or not (spec or command.get("mutating")):
+            continue
+        scope = spec.get("scope", "global")
+        policy = ToolCachePolicy(
+            command=name,
+            ttl=float(spec.get("ttl", 0) or 0),
+            scope=scope if scope in SCOPES else "global",
+            skip_if=list(spec.get("skip_if", [])),
+            mutating=bool(command.get("mutating")),
+        )
+        for tool in [name, *command.get("aliases", [])]:
+            policies[tool] = policy
+    return policies
+
+
+def canonical_args(tool_call: Dict[str, Any]) -> str:
+    """参数规范化：去掉调度字段、下划线开头的内部字段与空值，字符串去首尾空白，按键排序"""
+
+    def normalize(value: Any) -> Any:
+        if isinstance(value, str):
+            return value.strip()
+        if isinstance(value, dict):
+            return {str(k): normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+
+    args = {
+        k: normalize(v)
+        for k, v in tool_call.items()
+        if k not in _META_KEYS and not k.startswith("_") and v is not None and v != ""
+    }
+    return json.dumps(args, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def is_error_result(result: str) -> bool:
+    """工具返回的 JSON 中 status 为 error 时视为失败（非 JSON 文本视为成功）"""
+    try:
+        data = json.loads(result)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(data, dict) and data.get("status") == "error"
+
+
+@dataclass
+class _Entry:
+    result: str
+    expires_at: float
+
+
+class ToolResultCache:
+    """按 manifest 声明缓存 MCP 工具结果（LRU + TTL）"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._policies: Dict[str, Tuple[int, Dict[str, ToolCachePolicy]]] = {}  # {服务: (id(manifest), 策略)}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "bypassed": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+        self._service_metrics: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return get_config().handoff.tool_cache_enabled
+
+    @property
+    def max_entries(self) -> int:
+        if self._max_entries is not None:
+            return self._max_entries
+        return get_config().handoff.tool_cache_max_entries
+
+    # ── 策略 ──
+
+    def policy_for(self, service_name: str, tool_name: str) -> Optional[ToolCachePolicy]:
+        from mcpserver.mcp_registry import MANIFEST_CACHE
+
+        manifest = MANIFEST_CACHE.get(service_name)
+        if manifest is None:
+            return None
+        cached = self._policies.get(service_name)
+        if cached is None or cached[0] != id(manifest):
+            cached = self._policies[service_name] = (id(manifest), policies_from_manifest(manifest))
+        return cached[1].get(tool_name)
+
+    def make_key(self, policy: ToolCachePolicy, service_name: str, tool_call: Dict[str, Any],
+                 session_id: Optional[str]) -> Optional[CacheKey]:
+        """生成缓存键；不可缓存（未声明、命中 skip_if、会话级但无 session_id）时返回 None"""
+        if not policy.cacheable or any(tool_call.get(arg) for arg in policy.skip_if):
+            return None
+        if policy.scope == "session":
+            if not session_id:
+                return None
+            scope = f"session:{session_id}"
+        else:
+            scope = "global"
+        return scope, service_name, policy.command, canonical_args(tool_call)
+
+    # ── 读写 ──
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() >= entry.expires_at:
+                del self._entries[key]
+                self._metrics["expired"] += 1
+                entry = None
+            self._count(key[1], "hits" if entry is not None else "misses")
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry.result
+
+    def generation(self, service_name: str) -> int:
+        return self._generations.get(service_name, 0)
+
+    def put(self, key: CacheKey, result: str, ttl: float, generation: int) -> bool:
+        """写入成功结果；调用期间服务被清空过（版本号变化）则丢弃"""
+        if is_error_result(result):
+            return False
+        with self._lock:
+            if self.generation(key[1]) != generation:
+                return False
+            self._entries[key] = _Entry(result, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            self._metrics["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._metrics["evictions"] += 1
+        return True
+
+    def invalidate(self, service_name: str) -> int:
+        """清空服务的全部缓存条目（所有作用域），返回清除数量"""
+        with self._lock:
+            self._generations[service_name] = self.generation(service_name) + 1
+            keys = [k for k in self._entries if k[1] == service_name]
+            for key in keys:
+                del self._entries[key]
+            self._metrics["invalidations"] += 1
+        return len(keys)
+
+    def drop_session(self, session_id: Optional[str] = None) -> int:
+        """清除某个会话（None 表示所有会话）的会话级条目"""
+        scope = f"session:{session_id}" if session_id is not None else None
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == scope or (scope is None and k[0].startswith("session:"))]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            for service_name in {k[1] for k in self._entries}:
+                self._generations[service_name] = self.generation(service_name) + 1
+            self._entries.clear()
+
+    def record_bypass(self, service_name: str) -> None:
+        self._metrics["bypassed"] += 1
+        self._count(service_name, "bypassed")
+
+    def _count(self, service_name: str, name: str) -> None:
+        if name in ("hits", "misses"):
+            self._metrics[name] += 1
+        metrics = self._service_metrics.setdefault(service_name, {"hits": 0, "misses": 0, "bypassed": 0})
+        metrics[name] += 1
+
+    # ── 统计 ──
+
+    @staticmethod
+    def _hit_rate(metrics: Dict[str, int]) -> float:
+        lookups = metrics["hits"] + metrics["misses"]
+        return round(metrics["hits"] / lookups, 4) if lookups else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics: Dict[str, Any] = dict(self._metrics)
+            entries = len(self._entries)
+            per_service: Dict[str, int] = {}
+            for key in self._entries:
+                per_service[key[1]] = per_service.get(key[1], 0) + 1
+            services = {
+                name: {**counts, "hit_rate": self._hit_rate(counts), "entries": per_service.get(name, 0)}
+                for name, counts in sorted(self._service_metrics.items())
+            }
+        metrics["hit_rate"] = self._hit_rate(metrics)
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "metrics": metrics,
+            "services": services,
+        }
+
+
+_tool_cache: Optional[ToolResultCache] = None
+_tool_cache_lock = threading.Lock()
+
+
+def get_tool_cache() -> ToolResultCache:
+    """获取全局 MCP 工具结果缓存"""
+    global _tool_cache
+    if _tool_cache is None:
+        with _tool_cache_lock:
+            if _tool_cache is None:
+                _tool_cache = ToolResultCache()
+    return _tool_cache
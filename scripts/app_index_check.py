@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+应用索引增量扫描校验 -- 基于夹具目录树
+
+在临时目录中生成模拟的开始菜单（快捷方式用文本文件代替，内容为目标 exe 路径）
+与安装目录，用可注入解析函数的 DirectorySource 驱动 AppIndex，校验：
+  - 首次扫描解析全部目录并写入持久化索引
+  - 无变化时重扫不解析任何文件
+  - 只重新扫描新增/修改的目录，删除的目录从索引中移除
+  - 新实例加载持久化索引后无需重新解析
+  - 名称查找：规范化名、别名（exe 文件名）、拼音全拼/首字母与包含关系直接命中，
+    前缀与模糊匹配只作为候选
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/app_index_check.py [--dirs 200] [--per-dir 10]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcpserver.agent_open_launcher.app_index import AppIndex  # noqa: E402
+from mcpserver.agent_open_launcher.app_sources import DirectorySource  # noqa: E402
+
+PARSE_DELAY = 0.0005  # 模拟 COM 解析快捷方式的开销
+
+
+class FixtureParser:
+    """把 .lnk 夹具文件的内容当作目标路径，并统计解析次数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, lnk_path: str) -> Optional[Dict]:
+        self.calls += 1
+        time.sleep(PARSE_DELAY)
+        target = Path(lnk_path).read_text(encoding="utf-8").strip()
+        name = os.path.splitext(os.path.basename(lnk_path))[0]
+        return {
+            "name": name,
+            "path": target,
+            "type": "shortcut",
+            "source": "shortcut",
+            "shortcut_path": lnk_path,
+            "description": f"从快捷方式扫描到的应用: {name}",
+        }
+
+
+def write_shortcut(directory: Path, name: str, target: str) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{name}.lnk").write_text(target, encoding="utf-8")
+
+
+def build_tree(root: Path, dirs: int, per_dir: int) -> None:
+    for d in range(dirs):
+        for i in range(per_dir):
+            write_shortcut(root / f"Vendor{d}", f"Tool {d}-{i}", rf"C:\Program Files\Vendor{d}\tool_{d}_{i}.exe")
+    write_shortcut(root / "Social", "微信", r"C:\Program Files\Tencent\WeChat\WeChat.exe")
+    write_shortcut(root / "Browsers", "Google Chrome", r"C:\Program Files\Google\Chrome\chrome.exe")
+    write_shortcut(root / "Browsers", "Visual Studio Code", r"C:\Program Files\VSCode\Code.exe")
+
+
+def run_checks(dirs: int, per_dir: int) -> bool:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "Start Menu"
+        index_path = Path(tmp) / "app_index.json"
+        build_tree(root, dirs, per_dir)
+        total = dirs * per_dir + 3
+
+        def make_index(parser: FixtureParser) -> AppIndex:
+            source = DirectorySource("shortcut", [str(root)], ".lnk", parser)
+            return AppIndex([source], index_path, aliases={"vsc": "Visual Studio Code"})
+
+        parser = FixtureParser()
+        index = make_index(parser)
+        stats = index.refresh()
+        check("首次扫描解析全部快捷方式", parser.calls == total and len(index.apps) == total,
+              f"{stats['scanned']} 个目录, {parser.calls} 次解析, {stats['elapsed_ms']}ms")
+        check("写入持久化索引", index_path.exists())
+
+        parser.calls = 0
+        stats = index.refresh()
+        check("无变化时不解析", parser.calls == 0 and stats["scanned"] == 0,
+              f"复用 {stats['reused']} 个目录, {stats['elapsed_ms']}ms")
+
+        # 修改一个目录、新增一个目录、删除一个目录
+        write_shortcut(root / "Vendor0", "Tool new", r"C:\Program Files\Vendor0\new.exe")
+        write_shortcut(root / "Games", "Steam", r"C:\Program Files\Steam\steam.exe")
+        shutil.rmtree(root / "Vendor1")
+        stats = index.refresh()
+        check("只重扫变化的目录", stats["scanned"] == 2 and stats["removed"] == 1
+              and parser.calls == per_dir + 1 + 1,
+              f"重扫 {stats['scanned']} 个, 移除 {stats['removed']} 个, {parser.calls} 次解析")
+        check("删除目录的应用已移除", index.get_by_path(r"C:\Program Files\Vendor1\tool_1_0.exe") is None)
+
+        reloaded_parser = FixtureParser()
+        reloaded = make_index(reloaded_parser)
+        reloaded.load()
+        stats = reloaded.refresh()
+        check("新实例复用持久化索引", reloaded_parser.calls == 0 and len(reloaded.apps) == len(index.apps),
+              f"{len(reloaded.apps)} 个应用, {stats['elapsed_ms']}ms")
+
+        lookups = {
+            "google chrome": "Google Chrome",
+            "chrome": "Google Chrome",
+            "Chrome浏览器": "Google Chrome",
+            "weixin": "微信",
+            "WeChat": "微信",
+            "vsc": "Visual Studio Code",
+            "wx": "微信",
+        }
+        for query, expected in lookups.items():
+            app = reloaded.find(query)
+            check(f"查找 {query!r}", app is not None and app["name"] == expected, app["name"] if app else "未找到")
+
+        # 拼写错误或未安装的应用不直接启动，只给出候选
+        suggestions = {"steem": "Steam", "wei": "微信"}
+        for query, expected in suggestions.items():
+            app = reloaded.find(query)
+            names = [a["name"] for a in reloaded.suggest(query)]
+            check(f"{query!r} 仅作为候选", app is None and expected in names,
+                  f"find={app['name'] if app else None}, 候选={names}")
+        app = reloaded.find("Photoshop")
+        check("未安装的应用不误启动", app is None, app["name"] if app else "未找到")
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            reloaded.find("weixin")
+        print(f"查找耗时: {(time.perf_counter() - start) * 1000:.3f} µs/次 ({len(reloaded.apps)} 个应用)")
+
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="应用索引增量扫描校验")
+    parser.add_argument("--dirs", type=int, default=200, help="夹具目录数")
+    parser.add_argument("--per-dir", type=int, default=10, help="每个目录的快捷方式数")
+    args = parser.parse_args()
+    sys.exit(0 if run_checks(args.dirs, args.per_dir) else 1)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+城市索引基准测试
+
+构建天气 Agent 的城市索引，校验 codes_map 中每个键都能解析回自身编码，
+再对常见变体（带行政区后缀、拼音、首字母、错别字）逐条计时并打印排序后的候选；
+得分低于采用阈值、只作为候选提示的查询标记为 "候选"。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/city_index_benchmark.py [--repeat 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcpserver.agent_weather_time.city_codes import codes_map  # noqa: E402
+from mcpserver.agent_weather_time.city_index import build_city_index  # noqa: E402
+
+QUERIES = [
+    "湖北 武汉", "北京市", "北京市朝阳区", "朝阳", "武汉市", "内蒙古自治区呼和浩特市",
+    "beijing", "BJ", "CQ", "wuh", "北京密", "武汗", "beijng", "hefie", "北京朝杨", "xyz",
+    "东京", "巴黎", "湖北",
+]
+
+
+def run_benchmark(repeat: int) -> bool:
+    start = time.perf_counter()
+    index = build_city_index()
+    print(f"构建索引: {len(index)} 个城市, {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    mismatched = [key for key, code in codes_map.items() if getattr(index.resolve(key), "code", None) != code]
+    print(f"原始键自检: {len(codes_map) - len(mismatched)}/{len(codes_map)} 通过")
+
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            matches = index.search(query, limit=3)
+        elapsed_us = (time.perf_counter() - start) / repeat * 1e6
+        shown = ", ".join(f"{m.province}{m.city}({m.match_type} {m.score:.2f})" for m in matches) or "-"
+        status = "采用" if index.resolve(query) else ("候选" if matches else "-")
+        print(f"  {query:<14} {elapsed_us:8.1f} µs  {status}  {shown}")
+    return not mismatched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="城市索引基准测试")
+    parser.add_argument("--repeat", type=int, default=2000, help="每条查询的重复次数")
+    args = parser.parse_args()
+    sys.exit(0 if run_benchmark(args.repeat) else 1)
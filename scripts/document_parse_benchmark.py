@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+文档解析基准测试 -- 基于随机生成的 docx / xlsx
+
+生成指定规模的 docx（段落 + 表格）与多工作表 xlsx，对比：
+  旧路径：docx_extract.extract_docx_text / xlsx_extract._parse_sheet 整体解析后再截断
+  流式路径：document_service.parse_document 逐元素解析，达到字符预算即停止
+
+报告耗时、吞吐量与峰值内存（tracemalloc），并校验不截断时两条路径输出一致。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/document_parse_benchmark.py [--paragraphs 50000] [--rows 20000] [--sheets 4]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apiserver.document_service import load_extractor, parse_document  # noqa: E402
+
+WORD_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+SHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+WORDS = ["娜迦", "旅行", "记忆", "知识图谱", "agent", "server", "数据", "表格", "段落", "测试", "流式", "解析"]
+
+
+# ---------------------------------------------------------------------------
+# 数据生成
+# ---------------------------------------------------------------------------
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return escape(" ".join(rng.choice(WORDS) for _ in range(n)))
+
+
+def generate_docx(path: Path, paragraphs: int, seed: int) -> None:
+    rng = random.Random(seed)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("word/document.xml", "w") as f:
+            f.write(f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{WORD_NS}"><w:body>'.encode())
+            for i in range(paragraphs):
+                if i % 200 == 199:
+                    rows = "".join(
+                        "<w:tr>" + "".join(
+                            f"<w:tc><w:p><w:r><w:t>{_sentence(rng, 2)}</w:t></w:r></w:p></w:tc>" for _ in range(4)
+                        ) + "</w:tr>"
+                        for _ in range(5)
+                    )
+                    f.write(f"<w:tbl>{rows}</w:tbl>".encode())
+                else:
+                    f.write(f"<w:p><w:r><w:t>{_sentence(rng, rng.randint(3, 20))}</w:t></w:r></w:p>".encode())
+            f.write(b"</w:body></w:document>")
+
+
+def _col_ref(index: int) -> str:
+    letters = ""
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def generate_xlsx(path: Path, sheets: int, rows: int, seed: int) -> None:
+    rng = random.Random(seed)
+    shared = [f"{rng.choice(WORDS)}{i}" for i in range(500)]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        sheet_entries = "".join(
+            f'<sheet name="Sheet{i + 1}" sheetId="{i + 1}" r:id="rId{i + 1}"/>' for i in range(sheets)
+        )
+        archive.writestr(
+            "xl/workbook.xml",
+            f'<workbook xmlns="{SHEET_NS}" xmlns:r="{REL_NS}"><sheets>{sheet_entries}</sheets></workbook>',
+        )
+        rels = "".join(
+            f'<Relationship Id="rId{i + 1}" Target="worksheets/sheet{i + 1}.xml"/>' for i in range(sheets)
+        )
+        archive.writestr("xl/_rels/workbook.xml.rels", f'<Relationships xmlns="{RELS_NS}">{rels}</Relationships>')
+        archive.writestr(
+            "xl/sharedStrings.xml",
+            f'<sst xmlns="{SHEET_NS}">' + "".join(f"<si><t>{escape(s)}</t></si>" for s in shared) + "</sst>",
+        )
+        for sheet in range(sheets):
+            with archive.open(f"xl/worksheets/sheet{sheet + 1}.xml", "w") as f:
+                f.write(f'<worksheet xmlns="{SHEET_NS}"><sheetData>'.encode())
+                for r in range(1, rows + 1):
+                    cells = []
+                    for c in range(1, 9):
+                        ref = f"{_col_ref(c)}{r}"
+                        if c % 3 == 0:
+                            cells.append(f'<c r="{ref}" t="s"><v>{rng.randrange(len(shared))}</v></c>')
+                        elif c % 3 == 1:
+                            cells.append(f'<c r="{ref}"><v>{rng.uniform(0, 1e6):.3f}</v></c>')
+                        else:
+                            cells.append(f'<c r="{ref}" t="inlineStr"><is><t>{_sentence(rng, 2)}</t></is></c>')
+                    f.write(f'<row r="{r}">{"".join(cells)}</row>'.encode())
+                f.write(b"</sheetData></worksheet>")
+
+
+# ---------------------------------------------------------------------------
+# 旧实现
+# ---------------------------------------------------------------------------
+
+def legacy_parse(path: Path, suffix: str, max_chars: int, max_rows: int):
+    if suffix == ".docx":
+        content = "\n".join(load_extractor("docx_extract").extract_docx_text(path))
+    else:
+        mod = load_extractor("xlsx_extract")
+        with zipfile.ZipFile(path, "r") as archive:
+            shared_strings = mod._load_shared_strings(archive)
+            parts = []
+            for name, sheet_path in mod._load_sheet_targets(archive):
+                rows = mod._parse_sheet(archive, sheet_path, shared_strings, max_rows=max_rows)
+                parts.append(f"## Sheet: {name}\n{mod._format_sheet_csv(rows, ',')}")
+            content = "\n".join(parts)
+    truncated = len(content) > max_chars
+    return content[:max_chars], truncated
+
+
+def streaming_parse(path: Path, suffix: str, max_chars: int, max_rows: int):
+    with open(path, "rb") as f:
+        return parse_document(f, suffix, max_chars, max_rows)
+
+
+def measure(fn, *args):
+    # 耗时与峰值内存分两次测：tracemalloc 会给每次分配挂钩，逐元素解析的流式路径
+    # 小对象分配多，开着 tracemalloc 计时会被放大数倍，得出与实际相反的结论
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+# ---------------------------------------------------------------------------
+# 基准
+# ---------------------------------------------------------------------------
+
+def run_benchmark(paragraphs: int, rows: int, sheets: int, max_chars: int, seed: int) -> bool:
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        docx_path = Path(tmp) / "bench.docx"
+        xlsx_path = Path(tmp) / "bench.xlsx"
+        generate_docx(docx_path, paragraphs, seed)
+        generate_xlsx(xlsx_path, sheets, rows, seed)
+
+        cases = [
+            (docx_path, ".docx", rows),
+            (xlsx_path, ".xlsx", 500),   # 与接口默认的每表行数上限一致
+            (xlsx_path, ".xlsx", rows),  # 全量行
+        ]
+        for path, suffix, max_rows in cases:
+            size_mb = path.stat().st_size / 1e6
+            label = f"{suffix} {size_mb:.1f}MB" + (f" max_rows={max_rows}" if suffix == ".xlsx" else "")
+            print(f"== {label}")
+
+            for budget_label, budget in (("预算", max_chars), ("不截断", 10 ** 12)):
+                (legacy_content, legacy_trunc), legacy_time, legacy_peak = measure(
+                    legacy_parse, path, suffix, budget, max_rows)
+                (stream_content, stream_trunc), stream_time, stream_peak = measure(
+                    streaming_parse, path, suffix, budget, max_rows)
+                same = legacy_content == stream_content and legacy_trunc == stream_trunc
+                ok &= same
+                print(f"  [{budget_label}] 旧路径 {legacy_time * 1000:8.1f} ms  峰值 {legacy_peak / 1e6:7.1f} MB | "
+                      f"流式 {stream_time * 1000:8.1f} ms  峰值 {stream_peak / 1e6:7.1f} MB | "
+                      f"{len(stream_content)} 字符  吞吐 {size_mb / stream_time:6.1f} MB/s  "
+                      f"{'一致' if same else '不一致'}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="文档解析基准测试")
+    parser.add_argument("--paragraphs", type=int, default=50000, help="docx 段落数")
+    parser.add_argument("--rows", type=int, default=20000, help="xlsx 每个工作表的行数")
+    parser.add_argument("--sheets", type=int, default=4, help="xlsx 工作表数")
+    parser.add_argument("--max-chars", type=int, default=50000, help="字符预算")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    args = parser.parse_args()
+    sys.exit(0 if run_benchmark(args.paragraphs, args.rows, args.sheets, args.max_chars, args.seed) else 1)
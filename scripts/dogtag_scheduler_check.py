@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+军牌调度器校验 -- 使用毫秒级间隔的模拟职责
+
+校验基于最小堆的调度器：
+  - 只在最早触发时间或变更时唤醒（对比旧实现的每秒轮询）
+  - 调整间隔、禁用职责立即生效
+  - 并发上限、错过触发的 coalesce / skip 策略、抖动
+  - 事件任务倒计时的启动与取消
+并打印调度延迟 / 运行耗时直方图（Prometheus 文本）。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/dogtag_scheduler_check.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agentserver.dogtag.models import DogTag, DutyStatus, MisfirePolicy, TriggerType  # noqa: E402
+from agentserver.dogtag.registry import DogTagRegistry  # noqa: E402
+from agentserver.dogtag.scheduler import DogTagScheduler  # noqa: E402
+
+
+class Recorder:
+    """记录每次执行的开始时间，可选模拟耗时"""
+
+    def __init__(self, duration: float = 0.0):
+        self.duration = duration
+        self.starts = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self):
+        self.starts.append(time.monotonic())
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self.duration:
+                await asyncio.sleep(self.duration)
+        finally:
+            self.active -= 1
+
+
+def periodic(duty_id: str, interval: float, **kwargs) -> DogTag:
+    # interval_seconds 字段为 int，这里绕过校验以便使用毫秒级间隔
+    return DogTag.model_construct(
+        duty_id=duty_id, name=duty_id, description=duty_id,
+        trigger_type=TriggerType.PERIODIC, interval_seconds=interval,
+        delay_seconds=None, status=DutyStatus.ENABLED, activation=None,
+        execution_count=0, last_executed_at=None,
+        jitter_seconds=kwargs.get("jitter", 0.0),
+        misfire_policy=kwargs.get("policy", MisfirePolicy.COALESCE),
+        misfire_grace_seconds=kwargs.get("grace"),
+        max_concurrency=kwargs.get("concurrency", 1),
+    )
+
+
+async def run_checks() -> bool:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    # 1. 空闲时不轮询
+    registry = DogTagRegistry()
+    idle = Recorder()
+    registry.register(periodic("idle", 60), idle)
+    scheduler = DogTagScheduler(registry)
+    await scheduler.start()
+    await asyncio.sleep(1.0)
+    wakeups = scheduler.metrics.wakeups.get()
+    check("最近任务在 60s 后时不轮询", len(idle.starts) == 1 and wakeups <= 3, f"1s 内唤醒 {wakeups} 次")
+
+    # 2. 周期精度
+    fast = Recorder()
+    registry.register(periodic("fast", 0.1), fast)
+    await asyncio.sleep(1.05)
+    lag = scheduler.metrics.lag["fast"]
+    check("100ms 周期任务按时触发", 9 <= len(fast.starts) <= 12,
+          f"{len(fast.starts)} 次, 平均延迟 {lag.sum / max(lag.count, 1) * 1000:.2f}ms")
+
+    # 3. 调整间隔立即生效，禁用后不再触发
+    registry.register(periodic("fast", 0.02), fast)
+    before = len(fast.starts)
+    await asyncio.sleep(0.5)
+    check("调整间隔立即生效", len(fast.starts) - before >= 15, f"0.5s 内 {len(fast.starts) - before} 次")
+    registry.update_status("fast", DutyStatus.DISABLED)
+    before = len(fast.starts)
+    await asyncio.sleep(0.3)
+    check("禁用后不再触发", len(fast.starts) == before)
+
+    # 4. 并发上限
+    slow = Recorder(duration=0.35)
+    registry.register(periodic("slow", 0.1), slow)
+    await asyncio.sleep(1.0)
+    skipped = scheduler.metrics.skipped[("slow", "concurrency")].get()
+    check("并发上限生效", slow.max_active == 1 and skipped > 0, f"最大并发 {slow.max_active}, 跳过 {skipped} 次")
+    registry.unregister("slow")
+    await asyncio.sleep(0.4)
+
+    # 5. 错过触发：阻塞事件循环 0.6s
+    coalesce, skip = Recorder(), Recorder()
+    registry.register(periodic("coalesce", 0.1, grace=0.2), coalesce)
+    registry.register(periodic("skip", 0.1, grace=0.2, policy=MisfirePolicy.SKIP), skip)
+    await asyncio.sleep(0.05)
+    c0, s0 = len(coalesce.starts), len(skip.starts)
+    time.sleep(0.6)
+    await asyncio.sleep(0.01)
+    check("coalesce 策略合并补跑一次", len(coalesce.starts) - c0 == 1
+          and scheduler.metrics.misfires["coalesce"].get() == 1)
+    check("skip 策略放弃本次", len(skip.starts) == s0 and scheduler.metrics.skipped[("skip", "misfire")].get() == 1)
+    registry.unregister("coalesce")
+    registry.unregister("skip")
+
+    # 6. 抖动
+    jittered = Recorder()
+    registry.register(periodic("jitter", 0.05, jitter=0.05), jittered)
+    await asyncio.sleep(1.0)
+    registry.unregister("jitter")
+    gaps = [b - a for a, b in zip(jittered.starts, jittered.starts[1:])]
+    check("抖动分散触发时间", gaps and min(gaps) >= 0.045 and max(gaps) - min(gaps) > 0.01,
+          f"间隔 {min(gaps) * 1000:.0f}-{max(gaps) * 1000:.0f}ms" if gaps else "")
+
+    # 7. 事件倒计时
+    event = Recorder()
+    registry.register(DogTag(duty_id="event", name="event", description="event",
+                             trigger_type=TriggerType.EVENT_DRIVEN, delay_seconds=1,
+                             status=DutyStatus.ENABLED), event)
+    scheduler.on_conversation_ended()
+    check("对话结束启动倒计时", scheduler.is_countdown_active("event"))
+    scheduler.on_conversation_started()
+    check("对话开始取消倒计时", not scheduler.is_countdown_active("event"))
+    scheduler.on_conversation_ended()
+    await asyncio.sleep(1.1)
+    check("倒计时到期执行", len(event.starts) == 1)
+
+    await scheduler.stop()
+    print()
+    print(scheduler.metrics.get_prometheus_format())
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run_checks()) else 1)
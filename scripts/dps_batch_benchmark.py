@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+批量 DPS 计算基准测试 -- 基于随机生成的干员数据
+
+生成一份合成的 ArknightsGameData（干员/技能表），对比：
+  标量路径：逐个调用 CalculationService.calculate()
+  批量路径：CalculationService.calculate_batch() 一次算完整张网格
+
+同时随机抽样网格单元，校验批量结果与标量结果逐位一致。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/dps_batch_benchmark.py [--operators 300] [--samples 2000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guide_engine.calculation_service import CalculationParams, CalculationService  # noqa: E402
+from guide_engine.gamedata_loader import GameDataLoader  # noqa: E402
+
+PROFESSIONS = ["SNIPER", "CASTER", "WARRIOR", "PIONEER", "SUPPORT", "SPECIAL"]
+DESCRIPTIONS = [
+    "攻击力提升",
+    "攻击造成法术伤害",
+    "攻击造成真实伤害",
+    "每次攻击发射3个飞弹",
+    "连续攻击2次",
+    "",
+]
+
+
+# ---------------------------------------------------------------------------
+# 数据生成
+# ---------------------------------------------------------------------------
+
+def generate_gamedata(root: Path, operator_count: int, seed: int) -> list:
+    """生成合成的干员/技能表，返回干员名列表"""
+    rng = random.Random(seed)
+    gamedata_dir = root / "arknights" / "gamedata"
+    gamedata_dir.mkdir(parents=True, exist_ok=True)
+
+    characters = {}
+    skills = {}
+    names = []
+    for i in range(operator_count):
+        char_id = f"char_{i:04d}_bench"
+        name = f"干员{i:04d}"
+        names.append(name)
+        skill_refs = []
+        for s in range(3):
+            skill_id = f"skchr_{i:04d}_{s}"
+            skill_refs.append({"skillId": skill_id})
+            levels = []
+            for lv in range(10):
+                blackboard = [
+                    {"key": "atk", "value": round(1 + rng.uniform(0, 1.5) * (lv + 1) / 10, 3)},
+                    {"key": "atk_scale", "value": round(rng.uniform(1.0, 3.0), 3)},
+                ]
+                if rng.random() < 0.4:
+                    blackboard.append({"key": "attack_speed", "value": rng.randint(10, 100)})
+                levels.append({
+                    "name": f"技能{s + 1}",
+                    "description": rng.choice(DESCRIPTIONS),
+                    "duration": rng.choice([0, 10, 20, 30]),
+                    "spData": {"spType": 1, "spCost": rng.randint(10, 60), "initSp": rng.randint(0, 30)},
+                    "blackboard": blackboard,
+                })
+            skills[skill_id] = {"iconId": skill_id, "levels": levels}
+
+        characters[char_id] = {
+            "name": name,
+            "appellation": f"Bench{i:04d}",
+            "profession": rng.choice(PROFESSIONS),
+            "rarity": "TIER_6",
+            "phases": [
+                {"attributesKeyFrames": [{"data": {}}, {"data": {
+                    "atk": rng.randint(300, 900) + elite * 150,
+                    "baseAttackTime": rng.choice([0.85, 1.0, 1.2, 1.6, 2.3]),
+                }}]}
+                for elite in range(3)
+            ],
+            "skills": skill_refs,
+            "talents": [],
+            "favorKeyFrames": [{"data": {"atk": 0}}, {"data": {"atk": rng.randint(0, 100)}}],
+        }
+
+    (gamedata_dir / "character_table.json").write_text(json.dumps(characters, ensure_ascii=False), encoding="utf-8")
+    (gamedata_dir / "skill_table.json").write_text(json.dumps(skills, ensure_ascii=False), encoding="utf-8")
+    return names
+
+
+# ---------------------------------------------------------------------------
+# 基准与一致性校验
+# ---------------------------------------------------------------------------
+
+def run_benchmark(operator_count: int, samples: int, seed: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        names = generate_gamedata(Path(tmp), operator_count, seed)
+
+        service = CalculationService.__new__(CalculationService)
+        service.loader = GameDataLoader(tmp)
+        service.loader.load()
+
+        skill_levels = [7, 8, 9, 10]
+        defenses = list(range(0, 1601, 100))
+        resistances = list(range(0, 61, 10))
+        grid_size = len(names) * 3 * len(skill_levels) * len(defenses) * len(resistances)
+        print(f"干员 {len(names)} × 技能 3 × 等级 {len(skill_levels)} × 防御 {len(defenses)} × 法抗 {len(resistances)}"
+              f" = {grid_size} 个单元")
+
+        start = time.perf_counter()
+        batch = service.calculate_batch(names, None, skill_levels, defenses, resistances)
+        batch_time = time.perf_counter() - start
+        print(f"批量路径: {batch_time * 1000:.1f} ms")
+
+        # 随机抽样校验一致性，同时据此估算标量路径耗时
+        rng = random.Random(seed + 1)
+        mismatches = 0
+        start = time.perf_counter()
+        for _ in range(samples):
+            i = rng.randrange(len(batch))
+            d = rng.randrange(len(defenses))
+            r = rng.randrange(len(resistances))
+            result = service.calculate(CalculationParams(
+                operator_name=batch.operator_names[i],
+                skill_index=batch.skill_indices[i],
+                skill_level=batch.skill_levels[i],
+                enemy_defense=defenses[d],
+                enemy_res=resistances[r],
+            ))
+            expected = (result.damage_per_hit, result.dps, result.total_skill_damage)
+            actual = (batch.damage_per_hit[i, d, r], batch.dps[i, d, r], batch.total_skill_damage[i, d, r])
+            if expected != tuple(float(v) for v in actual):
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"  不一致: {batch.operator_names[i]} S{batch.skill_indices[i] + 1} "
+                          f"Lv{batch.skill_levels[i]} def={defenses[d]} res={resistances[r]} "
+                          f"标量={expected} 批量={actual}")
+        scalar_time = (time.perf_counter() - start) / samples * grid_size
+        print(f"标量路径（按 {samples} 次抽样外推）: {scalar_time * 1000:.1f} ms")
+        print(f"加速比: {scalar_time / batch_time:.1f}x")
+        print(f"一致性校验: {samples - mismatches}/{samples} 通过")
+
+        print()
+        print(service.format_ranking(batch.rank(enemy_defense=800, top=5, best_per_operator=True)))
+        return mismatches == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量 DPS 计算基准测试")
+    parser.add_argument("--operators", type=int, default=300, help="合成干员数量")
+    parser.add_argument("--samples", type=int, default=2000, help="一致性校验抽样次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+    sys.exit(0 if run_benchmark(args.operators, args.samples, args.seed) else 1)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+攻略引擎种子数据增量导入
+
+按行内容哈希比对 Neo4j 中已有的实体，只写入新增/变更的行并删除源文件中已移除的实体，
+打印每个标签的 rows/s 与 changed/skipped/deleted 统计。源文件未变化时直接跳过；
+导入中断后重跑会从已写入的位置继续。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/import_guide_seed.py [--game arknights] [--force]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guide_engine.neo4j_service import Neo4jService  # noqa: E402
+
+
+async def main(game_ids: list, force: bool) -> None:
+    service = Neo4jService()
+    try:
+        for game_id in game_ids:
+            changed = await service.sync_seed_data(game_id, force=force)
+            print(f"{game_id}: {changed} 个实体已写入或删除")
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="攻略引擎种子数据增量导入")
+    parser.add_argument(
+        "--game",
+        action="append",
+        choices=sorted(Neo4jService.AUTO_IMPORT_GAMES),
+        help="要导入的游戏，可重复指定；默认全部",
+    )
+    parser.add_argument("--force", action="store_true", help="忽略检查点，重新比对全部行")
+    args = parser.parse_args()
+    asyncio.run(main(args.game or sorted(Neo4jService.AUTO_IMPORT_GAMES), args.force))
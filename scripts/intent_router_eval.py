@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+本地意图预路由离线评估 -- 基于带标注的留出语料
+
+对每条标注消息运行 LocalIntentRouter（不调用任何模型），报告：
+  - 工具召回率：所需工具组全部被选中的消息占比（回退全量计为召回）
+  - 回退全量比例、闲聊判定比例
+  - 工具 schema token 节省：按下发的 schema 计，与每次都下发全量相比
+  - 每条消息的路由耗时（p50 / p99 / max）
+列出漏召回的消息，便于补充规则或训练语料（apiserver/intent_corpus.jsonl）。
+评估语料与训练语料不重叠。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/intent_router_eval.py [--repeat 20] [--min-confidence 0.6]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apiserver.local_intent_router import LocalIntentRouter, load_corpus  # noqa: E402
+from apiserver.tool_schemas import get_all_tool_schemas  # noqa: E402
+
+# (消息, 所需工具组)；空集表示不需要工具
+LABELED_MESSAGES = [
+    ("嗨，最近怎么样", set()),
+    ("你真可爱", set()),
+    ("给我讲讲三国演义的故事", set()),
+    ("帮我润色一下这段自我介绍", set()),
+    ("怎么理解牛顿第二定律", set()),
+    ("写一个快速排序的 Python 实现", set()),
+    ("今天工作好多好烦", set()),
+    ("你喜欢猫还是狗", set()),
+    ("晚上吃什么好呢", set()),
+    ("谢谢啦", set()),
+    ("用一句话总结相对论", set()),
+    ("搜一下今天的科技新闻", {"web"}),
+    ("查查特斯拉股价", {"web"}),
+    ("最近有什么好看的新电影上映", {"web"}),
+    ("现在一克黄金多少钱", {"web"}),
+    ("帮我看看 https://github.com/trending 上有什么", {"web"}),
+    ("NBA 昨天比赛结果", {"web"}),
+    ("用浏览器帮我打开知乎", {"browser"}),
+    ("执行 dir 命令看看", {"system"}),
+    ("帮我读一下 C:\\Users\\me\\todo.txt", {"system"}),
+    ("桌面上有哪些文件", {"system"}),
+    ("电脑 CPU 占用有点高，看看是哪个进程", {"system"}),
+    ("你还记得我喜欢吃什么吗", {"memory"}),
+    ("明天早上七点提醒我开会", {"schedule"}),
+    ("半小时后提醒我收衣服", {"schedule"}),
+    ("帮我调研一下国内大模型厂商，写一份报告", {"agent"}),
+    ("杭州今天天气怎么样", {"mcp:weather_time"}),
+    ("明天会下雨吗", {"mcp:weather_time"}),
+    ("深圳这周末气温多少", {"mcp:weather_time"}),
+    ("现在几点", {"mcp:weather_time"}),
+    ("今天要不要带伞", {"mcp:weather_time"}),
+    ("未来几天天气预报", {"mcp:weather_time"}),
+    ("明日方舟 1-7 怎么过", {"mcp:game_guide"}),
+    ("原神雷神怎么配队", {"mcp:game_guide"}),
+    ("崩铁流萤带什么遗器", {"mcp:game_guide"}),
+    ("能天使S3专三秒伤多少", {"mcp:game_guide"}),
+    ("这个关卡有什么打法", {"mcp:game_guide"}),
+    ("鸣潮新角色值得抽吗", {"mcp:game_guide"}),
+    ("看一下我屏幕上是什么", {"mcp:screen_vision"}),
+    ("右下角那个图标是什么", {"mcp:screen_vision"}),
+    ("这个界面我该点哪里", {"mcp:screen_vision"}),
+    ("帮我看看这个弹窗什么意思", {"mcp:screen_vision"}),
+    ("打开记事本", {"mcp:app_launcher"}),
+    ("启动一下微信", {"mcp:app_launcher"}),
+    ("我都装了哪些软件", {"mcp:app_launcher"}),
+    ("帮我打开 Photoshop", {"mcp:app_launcher"}),
+    ("把语音关了", {"naga_control"}),
+    ("换成 GPT 模型", {"naga_control"}),
+    ("来点音乐", {"naga_control"}),
+    ("切换角色", {"naga_control"}),
+    ("暂停 Live2D", {"naga_control"}),
+    ("有哪些技能可以用", {"skills"}),
+    ("查一下上海明天天气然后提醒我带伞", {"mcp:weather_time", "schedule"}),
+    ("截个图看看这关怎么打", {"mcp:screen_vision", "mcp:game_guide"}),
+    ("那后天呢", {"mcp:weather_time"}),  # 追问：上一条为天气
+]
+
+# 追问消息的上文（上一条用户消息）
+CONTEXT = {
+    "那后天呢": "北京明天天气怎么样",
+}
+
+
+def count_tokens(schemas) -> int:
+    text = json.dumps(schemas, ensure_ascii=False)
+    try:
+        import litellm
+
+        return litellm.token_counter(model="gpt-4", text=text)
+    except Exception:
+        return int(len(text) * 0.6)
+
+
+def main(repeat: int, min_confidence: float) -> bool:
+    overlap = {text for text, _ in load_corpus()} & {text for text, _ in LABELED_MESSAGES}
+    if overlap:
+        print(f"评估语料与训练语料重叠: {sorted(overlap)}")
+        return False
+
+    router = LocalIntentRouter(min_confidence=min_confidence)
+    schemas = get_all_tool_schemas()
+    full_tokens = count_tokens(schemas)
+    token_cache = {}
+
+    start = time.perf_counter()
+    router.route("预热")
+    print(f"规则与分类器构建: {(time.perf_counter() - start) * 1000:.1f}ms, 全量 schema {len(schemas)} 个 / {full_tokens} tokens\n")
+
+    recalled, fallbacks, chats, tokens_sent = 0, 0, 0, 0
+    latencies = []
+    misses = []
+    for text, expected in LABELED_MESSAGES:
+        messages = [{"role": "user", "content": CONTEXT[text]}] if text in CONTEXT else []
+        messages.append({"role": "user", "content": text})
+        route = router.route(text, messages)
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            router.route(text, messages)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+        selected = route.filter_schemas(schemas)
+        key = tuple(s["function"]["name"] for s in selected)
+        if key not in token_cache:
+            token_cache[key] = count_tokens(selected)
+        tokens_sent += token_cache[key]
+
+        fallbacks += route.fallback
+        chats += (not route.fallback and route.source == "chat")
+        if route.fallback or expected <= route.groups:
+            recalled += 1
+        else:
+            misses.append((text, expected, route))
+
+    total = len(LABELED_MESSAGES)
+    latencies.sort()
+    saved = 1 - tokens_sent / (full_tokens * total)
+    print(f"消息数: {total}")
+    print(f"工具召回率: {recalled / total:.1%}")
+    print(f"回退全量: {fallbacks / total:.1%}")
+    print(f"判定闲聊: {chats / total:.1%}")
+    print(f"平均 schema tokens: {tokens_sent / total:.0f} / {full_tokens}（节省 {saved:.1%}）")
+    print(f"路由耗时 ms: p50 {statistics.median(latencies):.3f}  "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.3f}  max {latencies[-1]:.3f}")
+
+    if misses:
+        print("\n漏召回：")
+        for text, expected, route in misses:
+            print(f"  {text}  期望 {sorted(expected)}  实际 {sorted(route.groups)} "
+                  f"({route.source}, 置信度 {route.confidence})")
+    print()
+    print(router.get_stats())
+    return recalled / total >= 0.9 and latencies[int(len(latencies) * 0.99)] < 1.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地意图预路由离线评估")
+    parser.add_argument("--repeat", type=int, default=20, help="每条消息重复路由次数（测延迟）")
+    parser.add_argument("--min-confidence", type=float, default=0.6, help="回退全量的置信度阈值")
+    args = parser.parse_args()
+    sys.exit(0 if main(args.repeat, args.min_confidence) else 1)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+LLM 响应缓存校验 -- 不调用模型
+
+用计数的模拟调用替代真实模型，经 LLMService.cached_call 校验：
+  - 精确匹配：相同 (调用点, 模型, 消息, 参数) 命中，参数或模型不同未命中，连接参数（api_key 等）不影响键
+  - TTL 过期后重新调用
+  - 语义匹配：措辞相近的问题超过阈值时复用，无关问题或上下文不同未命中
+  - 空回答、校验失败、调用异常不写入缓存
+  - 未配置策略或配置关闭的调用点不缓存
+  - 超过条目上限时按 LRU 淘汰
+  - 落盘后新实例可加载未过期条目
+  - 按调用点统计命中与节省的耗时
+并输出统计信息。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/llm_cache_check.py
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from system.config import get_config  # noqa: E402
+from apiserver import llm_cache  # noqa: E402
+from apiserver.llm_cache import LLMResponseCache, embed_text  # noqa: E402
+from apiserver.llm_service import LLMService  # noqa: E402
+
+CALL_DELAY = 0.05
+
+INTENT_SYSTEM = {"role": "system", "content": "判断用户消息需要的工具，只输出工具名或 none"}
+
+
+class CountingCall:
+    """模拟模型调用：记录调用次数，按顺序返回预设回答"""
+
+    def __init__(self, *replies, error: Exception = None):
+        self.replies = list(replies) or ["回答"]
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(CALL_DELAY)
+        if self.error is not None:
+            raise self.error
+        return self.replies[min(self.calls, len(self.replies)) - 1]
+
+
+def intent_messages(user: str, history=()):
+    return [INTENT_SYSTEM, *history, {"role": "user", "content": user}]
+
+
+async def run_checks() -> bool:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    api = get_config().api
+    original = (api.response_cache_enabled, dict(api.response_cache_sites))
+    api.response_cache_enabled = True
+    api.response_cache_sites = {
+        "check_exact": {"ttl": 60},
+        "check_ttl": {"ttl": 0.3},
+        "context_compressor": {"enabled": False},
+    }
+    temp_dir = Path(tempfile.mkdtemp())
+    cache_path = temp_dir / "responses.json"
+    cache = LLMResponseCache(path=cache_path, max_entries=50, persist=True)
+    llm_cache._response_cache = cache
+    service = LLMService()
+    messages = [{"role": "system", "content": "总结以下对话"}, {"role": "user", "content": "用户：你好\n助手：你好呀"}]
+    params = {"temperature": 0.3, "max_tokens": 500}
+
+    try:
+        # 1. 精确匹配
+        call = CountingCall("摘要 A")
+        first = await service.cached_call("check_exact", messages, call, model="m", params=params)
+        start = time.monotonic()
+        second = await service.cached_call("check_exact", messages, call, model="m",
+                                           params={**params, "api_key": "sk-other", "timeout": 5})
+        hit_ms = (time.monotonic() - start) * 1000
+        check("相同输入命中（连接参数不影响缓存键）", call.calls == 1 and first.content == second.content == "摘要 A",
+              f"命中耗时 {hit_ms:.2f} ms，原调用 {CALL_DELAY * 1000:.0f} ms")
+
+        await service.cached_call("check_exact", messages, call, model="m", params={**params, "temperature": 0.9})
+        await service.cached_call("check_exact", messages, call, model="other", params=params)
+        check("参数或模型不同时未命中", call.calls == 3)
+
+        # 2. TTL
+        call = CountingCall("短期")
+        await service.cached_call("check_ttl", messages, call, model="m")
+        await service.cached_call("check_ttl", messages, call, model="m")
+        await asyncio.sleep(0.35)
+        await service.cached_call("check_ttl", messages, call, model="m")
+        check("TTL 过期后重新调用", call.calls == 2)
+
+        # 3. 语义匹配（intent_router 内置语义策略）
+        call = CountingCall("web_search", "none", "none")
+        await service.cached_call("intent_router", intent_messages("杭州今天天气怎么样"), call, model="nano")
+        similar = await service.cached_call("intent_router", intent_messages("杭州今天天气怎么样？"), call, model="nano")
+        check("措辞相近的问题复用结果", call.calls == 1 and similar.content == "web_search",
+              f"相似度 {float(embed_text('杭州今天天气怎么样') @ embed_text('杭州今天天气怎么样？')):.3f}")
+        await service.cached_call("intent_router", intent_messages("给我讲个笑话吧"), call, model="nano")
+        check("无关问题未命中", call.calls == 2,
+              f"相似度 {float(embed_text('杭州今天天气怎么样') @ embed_text('给我讲个笑话吧')):.3f}")
+        history = [{"role": "user", "content": "我在上海"}, {"role": "assistant", "content": "好的"}]
+        await service.cached_call("intent_router", intent_messages("杭州今天天气怎么样", history), call, model="nano")
+        check("上下文不同时不做语义复用", call.calls == 3)
+
+        # 4. 不缓存的结果
+        empty = CountingCall("  ")
+        for _ in range(2):
+            await service.cached_call("check_exact", [{"role": "user", "content": "空"}], empty, model="m")
+        invalid = CountingCall("不是 JSON")
+        for _ in range(2):
+            await service.cached_call("check_exact", [{"role": "user", "content": "校验"}], invalid, model="m",
+                                      validate=lambda text: text.startswith("["))
+        failing = CountingCall(error=RuntimeError("503"))
+        raised = 0
+        for _ in range(2):
+            try:
+                await service.cached_call("check_exact", [{"role": "user", "content": "异常"}], failing, model="m")
+            except RuntimeError:
+                raised += 1
+        check("空回答、校验失败、调用异常不缓存", empty.calls == 2 and invalid.calls == 2
+              and failing.calls == 2 and raised == 2)
+
+        # 5. 未启用的调用点
+        call = CountingCall("摘要")
+        for site in ("context_compressor", "unknown_site"):
+            await service.cached_call(site, messages, call, model="m")
+            await service.cached_call(site, messages, call, model="m")
+        check("关闭或未配置策略的调用点不缓存", call.calls == 4 and "unknown_site" not in cache.get_stats()["sites"])
+
+        # 6. LRU
+        small = LLMResponseCache(path=temp_dir / "small.json", max_entries=3, persist=False)
+        llm_cache._response_cache = small
+        call = CountingCall("r")
+        for i in range(4):
+            await service.cached_call("check_exact", [{"role": "user", "content": f"q{i}"}], call, model="m")
+        await service.cached_call("check_exact", [{"role": "user", "content": "q0"}], call, model="m")
+        check("超过条目上限按 LRU 淘汰", call.calls == 5 and small.get_stats()["entries"] == 3)
+        llm_cache._response_cache = cache
+
+        # 7. 持久化
+        saved = cache.maybe_save(force=True)
+        reloaded = LLMResponseCache(path=cache_path, max_entries=50, persist=True)
+        llm_cache._response_cache = reloaded
+        call = CountingCall("不应调用")
+        exact = await service.cached_call("check_exact", messages, call, model="m", params=params)
+        semantic = await service.cached_call("intent_router", intent_messages("杭州 今天天气怎么样!"), call, model="nano")
+        check("落盘后新实例加载缓存（含语义索引）", saved and call.calls == 0 and exact.content == "摘要 A"
+              and semantic.content == "web_search", f"{reloaded.get_stats()['entries']} 条")
+        llm_cache._response_cache = cache
+
+        # 8. 统计
+        stats = cache.get_stats()
+        sites = stats["sites"]
+        check("按调用点统计命中与节省耗时", sites["check_exact"]["exact_hits"] == 1
+              and sites["intent_router"]["semantic_hits"] == 1 and stats["saved_ms"] >= CALL_DELAY * 1000 * 2,
+              f"节省 {stats['saved_ms']} ms")
+
+        print()
+        print(stats)
+    finally:
+        api.response_cache_enabled, api.response_cache_sites = original
+        llm_cache._response_cache = None
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run_checks()) else 1)
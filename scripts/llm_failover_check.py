@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+LLM 提供商池故障转移校验 -- 基于本地模拟的 OpenAI 兼容服务
+
+在本机启动多个模拟 /v1/chat/completions 服务（可控制首 token 延迟、HTTP 错误、流中途断开），
+把它们配置为提供商池后通过 LLMService 调用，校验：
+  - 按权重分配请求
+  - 未输出内容前的 5xx / 首 token 超时切换到下一个提供商，客户端只看到一份回复
+  - 已开始输出后中断不再切换（避免重复内容）
+  - 请求本身错误（400）不切换，也不计入熔断
+  - TTFT 慢的提供商分到的请求变少，连续失败的提供商被熔断
+  - 并发上限：满载的提供商不再接新请求，多出的请求分给其他提供商；名额可跨事件循环（线程）共享
+  - 非流式调用同样故障转移
+  - config.json 中的 providers 配置可被解析
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/llm_failover_check.py
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web  # noqa: E402
+
+from system.config import APIConfig, get_config  # noqa: E402
+from apiserver import llm_providers  # noqa: E402
+from apiserver.llm_providers import ProviderEndpoint, ProviderPool, endpoints_from_config  # noqa: E402
+from apiserver.llm_service import LLMService  # noqa: E402
+
+
+class MockProvider:
+    """模拟 OpenAI 兼容服务，行为可在运行中调整"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.first_token_delay = 0.0
+        self.status = 200  # 非 200 时直接返回错误
+        self.break_after = None  # 输出 N 个分片后断开连接
+        self.hold = 0.0  # 输出完成前的保持时间（用于观测并发）
+        self.requests = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.port = 0
+        self._runner = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def reset(self, **kwargs):
+        self.first_token_delay, self.status, self.break_after, self.hold = 0.0, 200, None, 0.0
+        self.requests = self.in_flight = self.peak = 0
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            body = await request.json()
+            if self.status != 200:
+                error = {"error": {"message": f"{self.name} 返回 {self.status}", "type": "mock_error"}}
+                return web.json_response(error, status=self.status)
+            await asyncio.sleep(self.first_token_delay)
+            if request.transport is None or request.transport.is_closing():
+                return web.Response(status=499)  # 客户端已因首 token 超时放弃
+            pieces = [f"[{self.name}]", "你好", "。"]
+            if not body.get("stream"):
+                await asyncio.sleep(self.hold)
+                return web.json_response(self._completion("".join(pieces)))
+
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            for i, piece in enumerate(pieces):
+                if self.break_after is not None and i >= self.break_after:
+                    await asyncio.sleep(0.1)  # 先让客户端收到已发送的分片
+                    request.transport.close()
+                    return response
+                await response.write(f"data: {json.dumps(self._chunk(piece), ensure_ascii=False)}\n\n".encode())
+                await asyncio.sleep(self.hold / len(pieces))
+            await response.write(f"data: {json.dumps(self._chunk(None, 'stop'))}\n\n".encode())
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        finally:
+            self.in_flight -= 1
+
+    def _chunk(self, content, finish_reason=None) -> dict:
+        delta = {"content": content} if content else {}
+        return {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": "mock", "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+    def _completion(self, content: str) -> dict:
+        return {"id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()), "model": "mock",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 3, "total_tokens": 4}}
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+async def stream_text(service: LLMService) -> str:
+    text = ""
+    async for chunk in service.stream_chat_with_context([{"role": "user", "content": "你好"}]):
+        data = json.loads(chunk[6:])
+        if data["type"] == "content":
+            text += data["text"]
+    return text
+
+
+async def run_checks() -> bool:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    a, b = MockProvider("A"), MockProvider("B")
+    for mock in (a, b):
+        await mock.start()
+    get_config().api.first_token_timeout = 0.5
+    service = LLMService()
+
+    def use_pool(weight_a=1.0, weight_b=1.0, concurrency_a=0) -> ProviderPool:
+        pool = ProviderPool([
+            ProviderEndpoint("A", "mock", a.base_url, "sk-a", weight=weight_a, max_concurrency=concurrency_a),
+            ProviderEndpoint("B", "mock", b.base_url, "sk-b", weight=weight_b),
+        ], rng=random.Random(7))
+        llm_providers._pool = pool
+        a.reset()
+        b.reset()
+        return pool
+
+    try:
+        # 1. 加权路由
+        use_pool(weight_a=3.0, weight_b=1.0)
+        for _ in range(40):
+            await stream_text(service)
+        share = a.requests / 40
+        check("按权重分配请求", 0.6 <= share <= 0.9, f"A {a.requests} / B {b.requests}")
+
+        # 2. 5xx 故障转移
+        pool = use_pool(weight_a=100.0, weight_b=0.01)
+        a.status = 503
+        text = await stream_text(service)
+        check("5xx 时切换提供商且只输出一份回复", text == "[B]你好。" and pool.states[0].failovers == 1, text)
+
+        # 3. 首 token 超时
+        pool = use_pool(weight_a=100.0, weight_b=0.01)
+        a.first_token_delay = 2.0
+        start = time.monotonic()
+        text = await stream_text(service)
+        elapsed = time.monotonic() - start
+        check("首 token 超时后切换", text == "[B]你好。" and elapsed < 1.5, f"{elapsed * 1000:.0f} ms")
+
+        # 4. 已输出后中断
+        pool = use_pool(weight_a=100.0, weight_b=0.01)
+        a.break_after = 1
+        text = await stream_text(service)
+        check("已开始输出后不再切换", text.startswith("[A]") and "流式调用出错" in text and b.requests == 0, text[:40])
+
+        # 5. 400 不切换
+        pool = use_pool(weight_a=100.0, weight_b=0.01)
+        a.status = 400
+        text = await stream_text(service)
+        check("请求错误（400）不切换", "流式调用出错" in text and b.requests == 0)
+        for _ in range(4):
+            await stream_text(service)
+        check("请求错误不计入熔断", pool.states[0].breaker.state == "closed" and pool.states[0].failures == 0,
+              f"熔断器 {pool.states[0].breaker.state}, 失败 {pool.states[0].failures} 次")
+
+        # 6. TTFT 健康评分
+        pool = use_pool()
+        a.first_token_delay = 0.4
+        for _ in range(8):
+            await stream_text(service)
+        a.requests = b.requests = 0
+        for _ in range(30):
+            await stream_text(service)
+        stats = {p["name"]: p for p in pool.get_stats()["providers"]}
+        check("TTFT 慢的提供商分到更少请求", a.requests < b.requests,
+              f"A {a.requests} / B {b.requests}, TTFT {stats['A']['ttft_ms']} / {stats['B']['ttft_ms']} ms")
+
+        # 7. 熔断
+        pool = use_pool(weight_a=100.0, weight_b=0.01)
+        a.status = 500
+        for _ in range(3):
+            await stream_text(service)
+        requests_before = a.requests
+        for _ in range(5):
+            await stream_text(service)
+        check("连续失败后熔断", pool.states[0].breaker.state == "open" and a.requests == requests_before
+              and b.requests == 8, f"A {a.requests} / B {b.requests}")
+
+        # 8. 并发上限
+        pool = use_pool(weight_a=100.0, weight_b=0.01, concurrency_a=1)
+        a.hold = b.hold = 0.3
+        texts = await asyncio.gather(*(stream_text(service) for _ in range(4)))
+        check("并发上限内分配", a.peak == 1 and b.requests == 3 and all(t.endswith("你好。") for t in texts),
+              f"A 峰值 {a.peak}, B {b.requests} 个")
+
+        # 8b. 另一个线程的事件循环共享并发名额
+        state = ProviderPool([ProviderEndpoint("S", "mock", a.base_url, "sk", max_concurrency=1)]).states[0]
+        await state.acquire(1.0)
+        other: dict = {}
+
+        def other_loop():
+            async def wait_slot():
+                start = time.monotonic()
+                other["ok"] = await state.acquire(2.0)
+                other["waited"] = time.monotonic() - start
+                state.release()
+            asyncio.run(wait_slot())
+
+        thread = threading.Thread(target=other_loop)
+        thread.start()
+        await asyncio.sleep(0.2)
+        state.release()
+        await asyncio.to_thread(thread.join)
+        check("并发名额跨事件循环共享", other.get("ok") is True and 0.15 < other["waited"] < 1.0
+              and state.in_flight == 0, f"另一循环等待 {other.get('waited', 0) * 1000:.0f} ms")
+
+        # 9. 非流式
+        pool = use_pool(weight_a=100.0, weight_b=0.01)
+        a.status = 502
+        reply = await service.chat_with_context([{"role": "user", "content": "你好"}])
+        check("非流式调用故障转移", reply == "[B]你好。", reply)
+
+        # 10. 配置解析
+        api = APIConfig(model="main-model", base_url="https://main.example/v1", providers=[
+            {"name": "backup", "base_url": "https://backup.example/v1", "api_key": "k", "weight": 0.5},
+            {"base_url": "https://other.example/v1", "model": "other-model", "max_concurrency": 2},
+            {"name": "off", "base_url": "https://off.example/v1", "enabled": False},
+        ])
+        endpoints = endpoints_from_config(api)
+        check("providers 配置解析", [e.name for e in endpoints] == ["primary", "backup", "other.example"]
+              and endpoints[1].model == "main-model" and endpoints[2].max_concurrency == 2)
+
+        print()
+        print(pool.get_stats())
+    finally:
+        llm_providers._pool = None
+        for mock in (a, b):
+            await mock.stop()
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run_checks()) else 1)
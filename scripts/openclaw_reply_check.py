@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+OpenClaw 异步回复收取校验 -- 本地模拟 Gateway，不需要安装 OpenClaw
+
+用 aiohttp 启动一个模拟 Gateway（/hooks/agent 返回 202 并按脚本异步写入会话历史，
+/tools/invoke 提供 sessions_history，可选 /events 事件流），校验：
+  - 端到端：send_message 收到带结束标记的回复后立即完成，与旧的固定 3 秒轮询对比延迟与请求数
+  - 无结束标记时在静默期后完成，多条回复全部收集
+  - 游标：同一会话的第二个任务只返回自己的回复（消息没有 id 时按内容指纹）
+  - 同一会话的多个等待者共用一个拉取器
+  - 长时间无输出时按退避拉取
+  - 新消息超过拉取窗口时扩大 limit，不漏消息
+  - 事件流推送唤醒；Gateway 不支持事件流时回退到轮询
+  - 超时返回空列表
+  - 发送前游标拉取失败时，会话中已有的旧回复不会被当成本次回复
+  - 空闲的会话监听器被回收
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/openclaw_reply_check.py
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agentserver.openclaw.openclaw_client import OpenClawClient, OpenClawConfig  # noqa: E402
+from agentserver.openclaw import reply_channel  # noqa: E402
+from agentserver.openclaw.reply_channel import OpenClawReplyChannel  # noqa: E402
+
+_ids = itertools.count(1)
+
+
+def assistant(text: str = "", delay: float = 0.0, stop: str = None, tool: bool = False):
+    content = [{"type": "toolCall", "name": "exec"}] if tool else [{"type": "text", "text": text}]
+    msg = {"role": "assistant", "content": content}
+    if stop:
+        msg["stopReason"] = stop
+    return delay, msg
+
+
+def tool_result(delay: float):
+    return delay, {"role": "toolResult", "content": [{"type": "text", "text": "ok"}]}
+
+
+class FakeGateway:
+    """模拟 OpenClaw Gateway：每次 /hooks/agent 按 self.script 在后台写入消息（delay 为相对发送时刻的秒数）"""
+
+    def __init__(self, with_ids: bool = True, events: bool = False):
+        self.with_ids = with_ids
+        self.events = events
+        self.script = []
+        self.sessions = {}
+        self.history_requests = {}
+        self.subscribers = {}
+        self.runs = []
+        self.fail_history = set()  # 这些会话的下一次 sessions_history 返回 500
+
+    def append(self, session_key: str, msg: dict) -> None:
+        msg = dict(msg, timestamp=time.time())
+        if self.with_ids:
+            msg["id"] = f"m{next(_ids)}"
+        self.sessions.setdefault(session_key, []).append(msg)
+        for queue in self.subscribers.get(session_key, []):
+            queue.put_nowait(msg)
+
+    async def run(self, session_key: str, script) -> None:
+        start = time.monotonic()
+        for delay, msg in script:
+            await asyncio.sleep(max(0.0, start + delay - time.monotonic()))
+            self.append(session_key, msg)
+
+    async def hooks_agent(self, request):
+        body = await request.json()
+        key = body["sessionKey"]
+        self.append(key, {"role": "user", "content": body["message"]})
+        self.runs.append(asyncio.ensure_future(self.run(key, list(self.script))))
+        return web.json_response({"ok": True, "runId": f"run-{len(self.runs)}"}, status=202)
+
+    async def tools_invoke(self, request):
+        body = await request.json()
+        key, limit = body["args"]["sessionKey"], body["args"]["limit"]
+        self.history_requests[key] = self.history_requests.get(key, 0) + 1
+        if key in self.fail_history:
+            self.fail_history.discard(key)
+            return web.json_response({"ok": False}, status=500)
+        messages = self.sessions.get(key, [])[-limit:]
+        return web.json_response({"ok": True, "result": {"details": {"messages": messages}}})
+
+    async def event_stream(self, request):
+        if not self.events:
+            raise web.HTTPNotFound()
+        key = request.query["sessionKey"]
+        queue = asyncio.Queue()
+        self.subscribers.setdefault(key, []).append(queue)
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            while True:
+                msg = await queue.get()
+                await response.write(f"data: {json.dumps({'sessionKey': key, 'role': msg['role']})}\n\n".encode())
+        finally:
+            self.subscribers[key].remove(queue)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/hooks/agent", self.hooks_agent)
+        app.router.add_post("/tools/invoke", self.tools_invoke)
+        app.router.add_get("/events", self.event_stream)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        for run in self.runs:
+            run.cancel()
+        await self.runner.cleanup()
+
+
+async def legacy_poll(client: OpenClawClient, session_key: str, timeout_seconds: float = 60):
+    """旧实现：首次等待 1 秒，之后每 3 秒拉取最近 50 条，assistant 回复数连续两次不变即结束"""
+    await asyncio.sleep(1.0)
+    start, last_count, stable = time.time(), 0, 0
+    while time.time() - start < timeout_seconds:
+        http = await client._get_client()
+        response = await http.post(
+            f"{client.config.gateway_url}/tools/invoke",
+            json={"tool": "sessions_history", "args": {"sessionKey": session_key, "limit": 50}},
+        )
+        replies = client._extract_all_assistant_replies(response.json())
+        if len(replies) > last_count:
+            last_count, stable = len(replies), 0
+        else:
+            stable += 1
+            if stable >= 2 and replies:
+                return replies
+        await asyncio.sleep(3.0)
+    return []
+
+
+def make_client(url: str, session_file: Path, events_path: str = None, **channel_kwargs) -> OpenClawClient:
+    client = OpenClawClient(OpenClawConfig(gateway_url=url, timeout=30, events_path=events_path))
+    client._SESSION_FILE = session_file  # 不覆盖真实的会话持久化文件
+    if channel_kwargs:
+        client._reply_channel = OpenClawReplyChannel(client, **channel_kwargs)
+    return client
+
+
+FAST = {"min_interval": 0.05, "max_interval": 0.4, "settle_seconds": 0.3}
+
+
+async def run_checks() -> bool:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    temp_dir = Path(tempfile.mkdtemp())
+    session_file = temp_dir / "openclaw_session.json"
+    gateway = FakeGateway()
+    url = await gateway.start()
+    clients = []
+
+    def new_client(**kwargs) -> OpenClawClient:
+        clients.append(make_client(url, session_file, **kwargs))
+        return clients[-1]
+
+    try:
+        # 1. 端到端（默认参数）：工具调用后给出带结束标记的回复
+        gateway.script = [assistant(delay=0.3, tool=True, stop="toolUse"), tool_result(0.6),
+                          assistant("杭州今天晴", delay=1.2, stop="stop")]
+        client = new_client()
+        start = time.monotonic()
+        task = await client.send_message("查天气", session_key="e2e", timeout_seconds=30)
+        new_latency = time.monotonic() - start
+        new_requests = gateway.history_requests["e2e"]
+
+        legacy = new_client()
+        http = await legacy._get_client()
+        start = time.monotonic()
+        await http.post(f"{url}/hooks/agent", json={"message": "查天气", "sessionKey": "legacy"})
+        legacy_replies = await legacy_poll(legacy, "legacy")
+        legacy_latency = time.monotonic() - start
+        check("带结束标记的回复立即完成", task.result.get("replies") == ["杭州今天晴"] and legacy_replies == ["杭州今天晴"]
+              and new_latency < 2.5 and new_latency < legacy_latency / 2,
+              f"回复在 1.2 s 写入：新 {new_latency:.2f} s / {new_requests} 次请求（含发送前游标），"
+              f"旧轮询 {legacy_latency:.2f} s / {gateway.history_requests['legacy']} 次请求")
+
+        # 2. 无结束标记：静默期后完成，多条回复全部收集
+        gateway.script = [assistant("第一段", delay=0.2), assistant(delay=0.3, tool=True), tool_result(0.5),
+                          assistant("第二段", delay=0.7)]
+        client = new_client(**FAST)
+        start = time.monotonic()
+        task = await client.send_message("分段回复", session_key="settle", timeout_seconds=10)
+        elapsed = time.monotonic() - start
+        check("无结束标记时静默期后完成并收集全部回复", task.result.get("replies") == ["第一段", "第二段"]
+              and 0.9 < elapsed < 1.8, f"{elapsed:.2f} s，静默期 {FAST['settle_seconds']} s")
+
+        # 3. 游标：同一会话第二个任务只返回自己的回复（消息无 id，按内容指纹）
+        gateway.with_ids = False
+        client = new_client(**FAST)
+        gateway.script = [assistant("第一次的回复", delay=0.1, stop="stop")]
+        first = await client.send_message("第一次", session_key="cursor", timeout_seconds=10)
+        gateway.script = [assistant("第二次的回复", delay=0.1, stop="stop")]
+        second = await client.send_message("第二次", session_key="cursor", timeout_seconds=10)
+        legacy_all = client._extract_all_assistant_replies(
+            {"result": {"details": {"messages": gateway.sessions["cursor"]}}})
+        check("同一会话只返回本次任务的回复", first.result.get("replies") == ["第一次的回复"]
+              and second.result.get("replies") == ["第二次的回复"], f"旧实现会返回 {legacy_all}")
+        gateway.with_ids = True
+
+        # 4. 共享拉取器：同一会话 5 个等待者与 1 个等待者的拉取次数相近
+        async def waiters(session_key: str, count: int):
+            client = new_client(**FAST)
+            channel = client._reply_channel
+            cursor = await channel.cursor(session_key)
+            gateway.runs.append(asyncio.ensure_future(gateway.run(session_key, [assistant("完成", 1.0, "stop")])))
+            replies = await asyncio.gather(*(channel.wait_for_replies(session_key, 10, cursor=cursor)
+                                             for _ in range(count)))
+            return replies, gateway.history_requests[session_key]
+
+        single, single_requests = await waiters("shared-1", 1)
+        many, many_requests = await waiters("shared-5", 5)
+        check("同一会话的等待者共用拉取器", all(r == ["完成"] for r in single + many)
+              and many_requests <= single_requests + 1,
+              f"1 个等待者 {single_requests} 次请求，5 个等待者 {many_requests} 次请求")
+
+        # 5. 退避：4 秒无输出
+        gateway.script = [assistant("终于好了", delay=4.0, stop="stop")]
+        client = new_client(**FAST)
+        start = time.monotonic()
+        task = await client.send_message("长任务", session_key="backoff", timeout_seconds=10)
+        elapsed = time.monotonic() - start
+        requests = gateway.history_requests["backoff"]
+        fixed = int(4.0 / FAST["min_interval"])
+        check("长时间无输出时退避拉取", task.result.get("replies") == ["终于好了"] and requests < fixed / 4
+              and elapsed < 4.0 + FAST["max_interval"] + 0.3,
+              f"{requests} 次请求（固定 {FAST['min_interval']} s 间隔约 {fixed} 次），{elapsed:.2f} s 完成")
+
+        # 6. 拉取窗口：一次写入 30 条回复，limit 从 10 扩大
+        gateway.script = [assistant(f"第{i}条", delay=0.3) for i in range(29)] + [assistant("第29条", 0.3, "stop")]
+        client = new_client(**FAST)
+        task = await client.send_message("批量", session_key="window", timeout_seconds=10)
+        stats = client._reply_channel.get_stats()["sessions"]["window"]
+        check("新消息超过拉取窗口时不漏消息", task.result.get("replies") == [f"第{i}条" for i in range(30)],
+              f"limit 扩大到 {stats['history_limit']}")
+
+        # 7. 事件流推送唤醒（兜底轮询间隔放宽，回复靠推送及时收取）
+        gateway.events = True
+        gateway.script = [assistant("推送到了", delay=2.0, stop="stop")]
+        client = new_client(events_path="/events", min_interval=0.05, max_interval=2.0, settle_seconds=0.3)
+        start = time.monotonic()
+        task = await client.send_message("推送", session_key="push", timeout_seconds=10)
+        elapsed = time.monotonic() - start
+        stats = client._reply_channel.get_stats()
+        check("事件流推送唤醒拉取", task.result.get("replies") == ["推送到了"] and stats["push_supported"] is True
+              and elapsed < 2.3 and stats["sessions"]["push"]["pushes"] >= 1,
+              f"{elapsed:.2f} s 完成，{gateway.history_requests['push']} 次请求，"
+              f"{stats['sessions']['push']['pushes']} 次推送")
+
+        gateway.events = False
+        gateway.script = [assistant("轮询到了", delay=0.3, stop="stop")]
+        client = new_client(events_path="/events", **FAST)
+        task = await client.send_message("不支持推送", session_key="no-push", timeout_seconds=10)
+        check("Gateway 不支持事件流时回退到轮询", task.result.get("replies") == ["轮询到了"]
+              and client._reply_channel.push_supported is False)
+
+        # 8. 超时
+        gateway.script = []
+        client = new_client(**FAST)
+        start = time.monotonic()
+        task = await client.send_message("没有回复", session_key="timeout", timeout_seconds=1)
+        elapsed = time.monotonic() - start
+        check("超时返回", "replies" not in task.result and 0.9 < elapsed < 1.5, f"{elapsed:.2f} s")
+
+        # 9. 游标拉取失败：会话里已有旧回复，第一次成功拉取只建立游标
+        for i in range(3):
+            gateway.append("unprimed", assistant(f"旧回复{i}", stop="stop")[1])
+        gateway.fail_history.add("unprimed")
+        gateway.script = [assistant("新回复", delay=0.5, stop="stop")]
+        client = new_client(**FAST)
+        task = await client.send_message("游标失败", session_key="unprimed", timeout_seconds=10)
+        check("游标拉取失败时不返回旧回复", task.result.get("replies") == ["新回复"], str(task.result.get("replies")))
+
+        # 10. 空闲监听器回收
+        channel = client._reply_channel
+        before = len(channel.get_stats()["sessions"])
+        original_idle = reply_channel.WATCHER_IDLE_SECONDS
+        reply_channel.WATCHER_IDLE_SECONDS = 0.0
+        try:
+            channel.watcher("fresh-session")
+        finally:
+            reply_channel.WATCHER_IDLE_SECONDS = original_idle
+        after = list(channel.get_stats()["sessions"])
+        check("空闲的会话监听器被回收", before >= 1 and after == ["fresh-session"], f"{before} 个 -> {after}")
+
+        print()
+        print(clients[0]._reply_channel.get_stats())
+    finally:
+        for client in clients:
+            await client.close()
+        await gateway.stop()
+        for path in temp_dir.iterdir():
+            path.unlink()
+        temp_dir.rmdir()
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run_checks()) else 1)
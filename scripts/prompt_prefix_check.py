@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+提示词前缀稳定性校验 -- 不调用模型
+
+按 /chat/stream 的方式组装多轮对话的请求（系统提示词 + 历史 + 当前消息 + 附加知识），
+分别在 legacy / stable 两种组装模式下交给 PromptPrefixTracker，校验：
+  - 模板按文件 mtime/大小缓存，未变化时不重复读取，文件修改后重新读取
+  - stable 模式下技能列表位于 messages[0]，附加知识只含时间 / RAG 等易变内容
+  - 同一会话相邻两轮的静态前缀哈希一致，上一轮请求（除附加知识外）整体可复用
+  - 附加知识中的时间变化不影响前缀哈希
+  - stable 模式的可复用比例高于 legacy
+并输出两种模式的统计对比。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/prompt_prefix_check.py [--turns 6]
+"""
+
+import argparse
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from system import config as config_module  # noqa: E402
+from system.config import (  # noqa: E402
+    build_context_supplement,
+    build_stable_system_prompt,
+    build_system_prompt,
+    get_config,
+    load_prompt_template,
+    set_active_character,
+)
+from apiserver.prompt_prefix import PromptPrefixTracker  # noqa: E402
+from apiserver.tool_schemas import get_all_tool_schemas  # noqa: E402
+
+USER_MESSAGES = [
+    "杭州今天天气怎么样",
+    "那明天呢",
+    "帮我搜一下西湖附近的餐厅",
+    "你还记得我上次说喜欢吃什么吗",
+    "谢谢，晚上提醒我订位",
+    "再讲个笑话吧",
+    "明天早上七点叫我起床",
+    "晚安",
+]
+
+
+def build_request(layout: str, history: list, user_message: str, turn: int) -> list:
+    """模拟 chat_stream 的消息组装（RAG 内容随轮次变化）"""
+    stable = layout == "stable"
+    system_prompt = build_stable_system_prompt() if stable else build_system_prompt()
+    messages = [{"role": "system", "content": system_prompt}, *history, {"role": "user", "content": user_message}]
+    supplement = build_context_supplement(
+        include_skills=True,
+        rag_section=f"\n\n## 相关记忆\n\n- 用户(人物) —[喜欢]→ 第 {turn} 轮召回(记忆)",
+        stable_layout=stable,
+    )
+    messages.append({"role": "system", "content": supplement})
+    return messages
+
+
+def run_checks(turns: int) -> bool:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    set_active_character(get_config().system.active_character)
+    tools = get_all_tool_schemas()
+
+    # 1. 模板缓存
+    reads = []
+    original_read_text = pathlib.Path.read_text
+
+    def counting_read_text(self, *args, **kwargs):
+        reads.append(self.name)
+        return original_read_text(self, *args, **kwargs)
+
+    pathlib.Path.read_text = counting_read_text
+    temp_dir = pathlib.Path(tempfile.mkdtemp())
+    original_dir = config_module._SYSTEM_PROMPTS_DIR
+    try:
+        for _ in range(50):
+            build_context_supplement(include_skills=True, include_tool_instructions=True)
+        template_reads = reads.count("tool_dispatch_prompt.txt") + reads.count("agentic_tool_prompt.txt")
+        check("模板未变化时不重复读取", template_reads <= 2, f"50 次组装读取模板 {template_reads} 次")
+
+        config_module._SYSTEM_PROMPTS_DIR = temp_dir
+        template = temp_dir / "tool_dispatch_prompt.txt"
+        template.write_text("v1 {time_info}", encoding="utf-8")
+        first = load_prompt_template("tool_dispatch_prompt.txt")
+        time.sleep(0.01)
+        template.write_text("v2 changed {time_info}", encoding="utf-8")
+        second = load_prompt_template("tool_dispatch_prompt.txt")
+        check("模板修改后重新读取", first.startswith("v1") and second.startswith("v2"))
+        template.unlink()
+        check("模板删除后返回空字符串", load_prompt_template("tool_dispatch_prompt.txt") == "")
+    finally:
+        pathlib.Path.read_text = original_read_text
+        config_module._SYSTEM_PROMPTS_DIR = original_dir
+        config_module._PROMPT_TEMPLATE_CACHE.pop("tool_dispatch_prompt.txt", None)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    # 2. 内容分布
+    stable_request = build_request("stable", [], USER_MESSAGES[0], 1)
+    skills_marker = "## 可用技能"
+    check("stable 模式技能列表位于 messages[0]", skills_marker in stable_request[0]["content"]
+          and skills_marker not in stable_request[-1]["content"])
+    legacy_request = build_request("legacy", [], USER_MESSAGES[0], 1)
+    check("legacy 模式保持原有布局", skills_marker not in legacy_request[0]["content"]
+          and skills_marker in legacy_request[-1]["content"])
+
+    # 3. 多轮对话
+    tracker = PromptPrefixTracker()
+    reports = {}
+    for layout in ("legacy", "stable"):
+        history = []
+        reports[layout] = []
+        for turn, user_message in enumerate(USER_MESSAGES[:turns], 1):
+            messages = build_request(layout, history, user_message, turn)
+            reports[layout].append(tracker.observe(f"{layout}-session", messages, tools, layout=layout))
+            history += [{"role": "user", "content": user_message},
+                        {"role": "assistant", "content": f"第 {turn} 轮回复：好的。"}]
+
+    stable_reports = reports["stable"]
+    check("静态前缀哈希跨轮一致", len({r.static_hash for r in stable_reports}) == 1
+          and all(r.static_reused for r in stable_reports[1:]))
+    check("上一轮可缓存前缀整体复用", all(cur.shared_chars >= prev.prefix_chars
+                                      for prev, cur in zip(stable_reports, stable_reports[1:])))
+
+    messages = build_request("stable", [], USER_MESSAGES[0], 1)
+    time.sleep(1.05)
+    again = build_request("stable", [], USER_MESSAGES[0], 2)
+    probe = PromptPrefixTracker()
+    first, second = probe.observe("t", messages, tools), probe.observe("t", again, tools)
+    check("附加知识变化不影响前缀哈希", first.prefix_hash == second.prefix_hash
+          and messages[-1]["content"] != again[-1]["content"])
+
+    def mean_ratio(layout: str) -> float:
+        later = reports[layout][1:]
+        return sum(r.hit_ratio for r in later) / len(later)
+
+    legacy_ratio, stable_ratio = mean_ratio("legacy"), mean_ratio("stable")
+    check("stable 可复用比例高于 legacy", stable_ratio > legacy_ratio,
+          f"legacy {legacy_ratio:.1%} / stable {stable_ratio:.1%}（第 2 轮起平均）")
+
+    print()
+    for layout, layout_reports in reports.items():
+        print(f"{layout}:")
+        for turn, report in enumerate(layout_reports, 1):
+            print(f"  第 {turn} 轮 prefix={report.prefix_hash} 可缓存 {report.prefix_chars}/{report.total_chars} "
+                  f"与上次相同 {report.shared_chars} ({report.hit_ratio:.1%})")
+    stats = tracker.get_stats()
+    stats.pop("recent")
+    print(stats)
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="提示词前缀稳定性校验")
+    parser.add_argument("--turns", type=int, default=6, help="模拟的对话轮数（2-8）")
+    args = parser.parse_args()
+    sys.exit(0 if run_checks(max(2, min(args.turns, len(USER_MESSAGES)))) else 1)
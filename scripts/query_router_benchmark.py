@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+攻略查询路由基准测试 -- 基于带标注的问题语料
+
+对每条标注问题运行 QueryRouter 规则路由（单次扫描匹配器），报告：
+  - 准确率（规则无法确定时按 route_sync 的默认全查询计）
+  - 规则未命中、需要 LLM 兜底的比例
+  - 每条问题的路由耗时（冷启动 / 命中决策缓存）
+  - 与逐条正则顺序匹配的旧实现是否得出相同结论
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/query_router_benchmark.py [--repeat 200]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guide_engine.query_router import QueryMode, QueryRouter  # noqa: E402
+
+# (问题, 期望模式)
+LABELED_QUERIES = [
+    ("能天使S3专三DPS多少", QueryMode.CALCULATION),
+    ("银灰三技能打800防敌人伤害是多少", QueryMode.CALCULATION),
+    ("艾雅法拉二技能对50法抗的秒伤", QueryMode.CALCULATION),
+    ("帮我计算一下陈的总伤", QueryMode.CALCULATION),
+    ("史尔特尔S3满专能打多少", QueryMode.CALCULATION),
+    ("对1000防御的敌人，W的dps怎么样", QueryMode.CALCULATION),
+    ("莫斯提马实际攻击力是多少", QueryMode.CALCULATION),
+    ("山的每秒伤害", QueryMode.CALCULATION),
+    ("伤害计算：棘刺S3", QueryMode.CALCULATION),
+    ("玛恩纳专精三的输出是多少", QueryMode.CALCULATION),
+    ("技能是什么", QueryMode.WIKI_ONLY),
+    ("能天使的攻击力是多少", QueryMode.WIKI_ONLY),
+    ("查一下银灰的属性", QueryMode.WIKI_ONLY),
+    ("艾雅法拉的稀有度是什么", QueryMode.WIKI_ONLY),
+    ("塞雷娅血量多少", QueryMode.WIKI_ONLY),
+    ("凯尔希的天赋效果", QueryMode.WIKI_ONLY),
+    ("史尔特尔几星", QueryMode.WIKI_ONLY),
+    ("晋升需要什么材料", QueryMode.WIKI_ONLY),
+    ("夜莺的获取方式", QueryMode.WIKI_ONLY),
+    ("浊心斯卡蒂的攻击间隔", QueryMode.WIKI_ONLY),
+    ("玛恩纳怎么养", QueryMode.FULL),
+    ("新手先练谁", QueryMode.FULL),
+    ("陈值不值得练", QueryMode.FULL),
+    ("推荐一个危机合约阵容", QueryMode.FULL),
+    ("1-7怎么打", QueryMode.FULL),
+    ("这期卡池要不要抽", QueryMode.FULL),
+    ("银灰强不强", QueryMode.FULL),
+    ("艾雅法拉和伊芙利特比哪个好", QueryMode.FULL),
+    ("重装干员带什么模组", QueryMode.FULL),
+    ("低配通关攻略", QueryMode.FULL),
+    ("斯卡蒂配队思路", QueryMode.FULL),
+    ("有什么好用的先锋", QueryMode.FULL),
+    ("这个关卡的机制", QueryMode.FULL),
+    ("最强的狙击是谁", QueryMode.FULL),
+    ("今天吃什么", QueryMode.FULL),
+]
+
+
+def legacy_route(router: QueryRouter, query: str):
+    """旧实现：逐个关键词、逐条正则顺序匹配"""
+    query = query.strip()
+
+    def check_patterns(patterns):
+        return any(re.search(p, query, re.IGNORECASE) for p in patterns)
+
+    def check_keywords(keyword_dict):
+        matched = []
+        for category, keywords in keyword_dict.items():
+            for kw in keywords:
+                if ".*" in kw or "^" in kw:
+                    if re.search(kw, query):
+                        matched.append((category, kw))
+                elif kw.lower() in query.lower():
+                    matched.append((category, kw))
+        return matched
+
+    if check_patterns(router.force_calculation_patterns):
+        return QueryMode.CALCULATION
+    if check_keywords(router.calculation_keywords):
+        return QueryMode.CALCULATION
+    if check_patterns(router.force_wiki_patterns):
+        return QueryMode.WIKI_ONLY
+    if check_patterns(router.force_full_patterns):
+        return QueryMode.FULL
+    wiki = check_keywords(router.wiki_keywords)
+    guide = check_keywords(router.guide_keywords)
+    if wiki and not guide:
+        return QueryMode.WIKI_ONLY
+    if guide and not wiki:
+        return QueryMode.FULL
+    return None
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def run_benchmark(repeat: int):
+    router = QueryRouter()
+
+    correct = 0
+    unresolved = 0
+    disagreements = []
+    for query, expected in LABELED_QUERIES:
+        mode, reason = router.route_by_rules(query)
+        if mode is None:
+            unresolved += 1
+        legacy = legacy_route(router, query)
+        if legacy != mode:
+            disagreements.append((query, legacy, mode))
+        actual = router.route_sync(query).mode
+        if actual == expected:
+            correct += 1
+        else:
+            print(f"  误判: {query!r} 期望={expected.value} 实际={actual.value} ({reason})")
+
+    total = len(LABELED_QUERIES)
+    print(f"语料: {total} 条")
+    print(f"准确率: {correct}/{total} = {correct / total:.1%}")
+    print(f"需要 LLM 兜底: {unresolved}/{total}")
+    print(f"与旧实现结论不一致: {len(disagreements)}")
+    for query, legacy, mode in disagreements:
+        print(f"  {query!r}: 旧={legacy} 新={mode}")
+
+    # 冷路径：每次清空决策缓存
+    cold, legacy_times, warm = [], [], []
+    for _ in range(repeat):
+        for query, _ in LABELED_QUERIES:
+            router._decision_cache.clear()
+            start = time.perf_counter()
+            router.route_by_rules(query)
+            cold.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            legacy_route(router, query)
+            legacy_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            router.route_by_rules(query)
+            warm.append(time.perf_counter() - start)
+
+    print()
+    for label, values in (("旧实现(顺序匹配)", legacy_times), ("单次扫描", cold), ("决策缓存命中", warm)):
+        print(f"{label:<16} 平均 {statistics.mean(values) * 1e6:7.1f} µs  "
+              f"p50 {percentile(values, 0.5) * 1e6:7.1f} µs  p95 {percentile(values, 0.95) * 1e6:7.1f} µs")
+    return not disagreements
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="攻略查询路由基准测试")
+    parser.add_argument("--repeat", type=int, default=200, help="语料重复次数")
+    args = parser.parse_args()
+    sys.exit(0 if run_benchmark(args.repeat) else 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+MCP 工具结果缓存校验 -- 基于模拟服务
+
+向注册表登记一个模拟 MCP 服务（manifest 声明 cache / mutating），通过 MCPManager.unified_call 调用，校验：
+  - 相同参数（键顺序、首尾空白、空值、内部字段不同）命中缓存，不再调用服务
+  - 工具名别名共用缓存条目
+  - 会话级工具按 session_id 隔离，无 session_id 时不缓存
+  - skip_if 参数有值时不走缓存
+  - 失败结果不缓存、TTL 过期后重新调用
+  - mutating 工具执行后清空同一服务的缓存，执行中被清空的调用不写回旧结果
+  - 内置 manifest 中声明的策略可被解析
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/tool_cache_check.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcpserver.mcp_manager import MCPManager  # noqa: E402
+from mcpserver.mcp_registry import AGENT_INIT_STATS, MANIFEST_CACHE, MCP_REGISTRY, iter_manifests  # noqa: E402
+from mcpserver import tool_cache as tool_cache_module  # noqa: E402
+from mcpserver.tool_cache import ToolResultCache, policies_from_manifest  # noqa: E402
+
+SERVICE = "fake_service"
+
+MANIFEST = {
+    "name": SERVICE,
+    "displayName": "模拟服务",
+    "agentType": "mcp",
+    "capabilities": {
+        "invocationCommands": [
+            {"command": "lookup", "aliases": ["find"], "cache": {"ttl": 0.3, "scope": "global"}},
+            {"command": "ask", "cache": {"ttl": 60, "scope": "session", "skip_if": ["auto_screenshot"]}},
+            {"command": "slow_lookup", "cache": {"ttl": 60, "scope": "global"}},
+            {"command": "update", "mutating": True},
+            {"command": "now"},
+        ]
+    },
+}
+
+
+class FakeAgent:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.release = asyncio.Event()
+
+    async def handle_handoff(self, task: dict) -> str:
+        self.calls += 1
+        if task["tool_name"] == "slow_lookup":
+            await self.release.wait()
+        if self.fail:
+            return json.dumps({"status": "error", "message": "上游不可用"}, ensure_ascii=False)
+        return json.dumps({"status": "ok", "data": {"n": self.calls}}, ensure_ascii=False)
+
+
+async def run_checks() -> bool:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    agent = FakeAgent()
+    MANIFEST_CACHE[SERVICE] = MANIFEST
+    MCP_REGISTRY[SERVICE] = agent
+    AGENT_INIT_STATS[SERVICE] = {"status": "ready"}
+    cache = tool_cache_module._tool_cache = ToolResultCache(max_entries=64)
+    manager = MCPManager()
+
+    async def call(tool: str, session_id=None, **args) -> str:
+        return await manager.unified_call(SERVICE, {"service_name": SERVICE, "tool_name": tool, **args},
+                                          session_id=session_id)
+
+    # 1. 规范化参数
+    first = await call("lookup", city="北京", days=3)
+    again = await manager.unified_call(SERVICE, {"days": 3, "tool_name": "lookup", "city": " 北京 ", "query": "",
+                                                 "_tool_call_id": "call_1", "agentType": "mcp"})
+    check("相同参数命中缓存", agent.calls == 1 and again == first)
+    await call("find", city="北京", days=3)
+    check("别名共用缓存条目", agent.calls == 1)
+    await call("lookup", city="上海", days=3)
+    check("不同参数分开缓存", agent.calls == 2)
+
+    # 2. 会话级
+    agent.calls = 0
+    await call("ask", session_id="s1", query="怎么打")
+    await call("ask", session_id="s1", query="怎么打")
+    await call("ask", session_id="s2", query="怎么打")
+    await call("ask", query="怎么打")
+    await call("ask", query="怎么打")
+    check("会话级缓存按会话隔离", agent.calls == 4, f"上游 {agent.calls} 次")
+    await call("ask", session_id="s1", query="怎么打", auto_screenshot=True)
+    check("skip_if 参数有值时不走缓存", agent.calls == 5 and cache.get_stats()["metrics"]["bypassed"] >= 3)
+    cache.drop_session("s1")
+    await call("ask", session_id="s1", query="怎么打")
+    check("删除会话清除会话级条目", agent.calls == 6)
+
+    # 3. 不可缓存 / 失败 / 过期
+    agent.calls = 0
+    await call("now")
+    await call("now")
+    check("未声明 cache 的工具不缓存", agent.calls == 2)
+    agent.fail = True
+    await call("lookup", city="广州")
+    agent.fail = False
+    await call("lookup", city="广州")
+    check("失败结果不缓存", agent.calls == 4)
+    await asyncio.sleep(0.35)
+    await call("lookup", city="广州")
+    check("TTL 过期后重新调用", agent.calls == 5 and cache.get_stats()["metrics"]["expired"] >= 1)
+
+    # 4. mutating 清空
+    agent.calls = 0
+    await call("lookup", city="深圳")
+    await call("ask", session_id="s3", query="配队")
+    await call("update", value=1)
+    await call("lookup", city="深圳")
+    await call("ask", session_id="s3", query="配队")
+    check("mutating 工具清空同服务缓存", agent.calls == 5, f"上游 {agent.calls} 次")
+
+    pending = asyncio.ensure_future(call("slow_lookup", key="x"))
+    await asyncio.sleep(0.01)
+    await call("update", value=2)
+    agent.release.set()
+    await pending
+    await call("slow_lookup", key="x")
+    check("执行中被清空的调用不写回旧结果", agent.calls == 8, f"上游 {agent.calls} 次")
+
+    # 5. 内置 manifest
+    declared = {}
+    for _, manifest in iter_manifests("mcpserver"):
+        for tool, policy in policies_from_manifest(manifest).items():
+            declared[f"{manifest.get('name')}/{tool}"] = policy
+    # 天气工具在 agent 内部已按城市缓存，启动应用不改变应用列表，二者都不应声明策略
+    check("内置 manifest 策略可解析", declared["app_launcher/获取应用列表"].cacheable
+          and declared["game_guide/ask_guide"].scope == "session"
+          and not any(tool.startswith("weather_time/") for tool in declared)
+          and "app_launcher/启动应用" not in declared,
+          f"{len(declared)} 个工具")
+
+    stats = cache.get_stats()
+    print()
+    print(stats)
+    check("统计包含服务命中率", stats["services"][SERVICE]["hit_rate"] > 0)
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run_checks()) else 1)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+工具调用执行策略校验 -- 基于模拟工具
+
+用可控延迟 / 失败的模拟工具驱动 ToolExecutor（缩短超时与冷却时间），校验：
+  - 单个工具超时返回错误结果，不拖住整轮
+  - 轮预算用尽时已完成的结果立即返回，未完成的调用被取消并标记超时
+  - 对冲：首个请求慢时追加的请求先返回
+  - 熔断：连续失败达到阈值后快速失败，冷却后探测成功恢复，探测失败冷却时间翻倍，
+    探测被取消后重新探测，调用方错误不计入熔断
+  - execute_tool_calls 结果与输入一一对应（含未知 agentType）
+  - 统计中的次数与延迟分位数
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/tool_execution_check.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apiserver.tool_execution import CALLER_ERROR, CircuitBreaker, ToolExecutor, error_result  # noqa: E402
+
+
+def mcp_call(service: str, tool: str = "run") -> dict:
+    return {"agentType": "mcp", "service_name": service, "tool_name": tool}
+
+
+class FakeTool:
+    """按调用顺序返回预设的延迟与状态"""
+
+    def __init__(self, call: dict, plan):
+        self.call = call
+        self.plan = list(plan)  # [(延迟秒, 状态)]，用完后重复最后一项
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self) -> dict:
+        delay, status = self.plan[min(self.started, len(self.plan) - 1)]
+        self.started += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {
+            "tool_call": self.call,
+            "result": f"第 {self.started} 次 {status}",
+            "status": status,
+            "service_name": self.call["service_name"],
+            "tool_name": self.call["tool_name"],
+        }
+
+
+async def run_checks() -> bool:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    def new_executor(**kwargs) -> ToolExecutor:
+        kwargs.setdefault("timeouts", {"mcp": 0.3})
+        kwargs.setdefault("hedges", {})
+        kwargs.setdefault("round_budget", 5.0)
+        kwargs.setdefault("failure_threshold", 3)
+        kwargs.setdefault("reset_timeout", 0.2)
+        return ToolExecutor(**kwargs)
+
+    # 1. 单个工具超时
+    executor = new_executor()
+    slow = FakeTool(mcp_call("slow"), [(2.0, "success")])
+    fast = FakeTool(mcp_call("fast"), [(0.01, "success")])
+    start = time.monotonic()
+    out = await executor.run_round([(slow.call, slow), (fast.call, fast)])
+    elapsed = time.monotonic() - start
+    check("超时返回错误结果", out[0]["status"] == "error" and "超时" in out[0]["result"] and slow.cancelled == 1,
+          out[0]["result"])
+    check("超时不拖住整轮", out[1]["status"] == "success" and elapsed < 0.5, f"{elapsed * 1000:.0f} ms")
+
+    # 2. 轮预算
+    executor = new_executor(timeouts={"mcp": 10.0}, round_budget=0.2)
+    tools = [FakeTool(mcp_call(f"svc{i}"), [(delay, "success")]) for i, delay in enumerate((0.01, 0.05, 3.0))]
+    start = time.monotonic()
+    out = await executor.run_round([(t.call, t) for t in tools])
+    elapsed = time.monotonic() - start
+    check("预算用尽时返回已完成结果", [r["status"] for r in out] == ["success", "success", "error"]
+          and elapsed < 0.35, f"{elapsed * 1000:.0f} ms")
+    await asyncio.sleep(0.05)
+    check("未完成的调用被取消", tools[2].cancelled == 1 and executor.stats["svc2/run"].cancelled == 1)
+    check("结果与输入顺序一致", [r["service_name"] for r in out] == ["svc0", "svc1", "svc2"])
+
+    # 3. 对冲
+    executor = new_executor(timeouts={"mcp": 2.0}, hedges={"mcp:search": 0.05})
+    hedged = FakeTool(mcp_call("search"), [(1.0, "success"), (0.02, "success")])
+    start = time.monotonic()
+    out = await executor.run_one(hedged.call, hedged)
+    elapsed = time.monotonic() - start
+    check("对冲请求先返回", out["result"] == "第 2 次 success" and elapsed < 0.2, f"{elapsed * 1000:.0f} ms")
+    await asyncio.sleep(0.05)
+    check("对冲成功后取消慢请求", hedged.cancelled == 1 and executor.stats["search/run"].hedges == 1)
+
+    plain = FakeTool(mcp_call("other"), [(0.1, "success")])
+    await executor.run_one(plain.call, plain)
+    check("未配置的工具不对冲", plain.started == 1)
+
+    # 4. 熔断
+    executor = new_executor()
+    flaky = FakeTool(mcp_call("flaky"), [(0.01, "error")] * 3 + [(0.01, "success")])
+    for _ in range(3):
+        await executor.run_one(flaky.call, flaky)
+    breaker = executor.breakers["mcp:flaky"]
+    rejected = await executor.run_one(flaky.call, flaky)
+    check("连续失败后熔断", breaker.state == CircuitBreaker.OPEN and flaky.started == 3
+          and "熔断" in rejected["result"], rejected["result"])
+
+    healthy = FakeTool(mcp_call("healthy"), [(0.01, "success")])
+    out = await executor.run_one(healthy.call, healthy)
+    check("熔断按服务隔离", out["status"] == "success")
+
+    await asyncio.sleep(0.25)
+    probe = await executor.run_one(flaky.call, flaky)
+    check("冷却后探测成功恢复", probe["status"] == "success" and breaker.state == CircuitBreaker.CLOSED)
+
+    down = FakeTool(mcp_call("down"), [(0.01, "error")])
+    for _ in range(3):
+        await executor.run_one(down.call, down)
+    breaker = executor.breakers["mcp:down"]
+    await asyncio.sleep(0.25)
+    await executor.run_one(down.call, down)
+    check("探测失败继续熔断且冷却翻倍", breaker.state == CircuitBreaker.OPEN and breaker.cooldown == 0.4
+          and down.started == 4, f"cooldown={breaker.cooldown}")
+
+    # 探测被取消（轮预算用尽 / 客户端断开）后交还探测名额
+    stuck = FakeTool(mcp_call("stuck"), [(0.01, "error")] * 3 + [(1.0, "success"), (0.01, "success")])
+    for _ in range(3):
+        await executor.run_one(stuck.call, stuck)
+    breaker = executor.breakers["mcp:stuck"]
+    await asyncio.sleep(0.25)
+    probe_task = asyncio.ensure_future(executor.run_one(stuck.call, stuck))
+    await asyncio.sleep(0.05)
+    probe_task.cancel()
+    await asyncio.gather(probe_task, return_exceptions=True)
+    released = breaker.state
+    out = await executor.run_one(stuck.call, stuck)
+    check("探测被取消后重新探测", released == CircuitBreaker.OPEN and out["status"] == "success"
+          and breaker.state == CircuitBreaker.CLOSED, f"取消后状态 {released}")
+
+    # 调用方错误（缺少参数、未登录等）不计入熔断
+    caller_call = mcp_call("guide")
+
+    async def caller_error():
+        return error_result(caller_call, "缺少参数", CALLER_ERROR)
+
+    for _ in range(5):
+        await executor.run_one(caller_call, caller_error)
+    breaker = executor.breakers["mcp:guide"]
+    check("调用方错误不计入熔断", breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+          and executor.stats["guide/run"].errors == 5)
+
+    # 5. execute_tool_calls 对齐
+    from apiserver import agentic_tool_loop
+    from apiserver import tool_execution
+
+    async def fake_mcp(call, session_id=None):
+        await asyncio.sleep(0.01)
+        return {"tool_call": call, "result": "ok", "status": "success",
+                "service_name": call["service_name"], "tool_name": call["tool_name"]}
+
+    original = agentic_tool_loop._execute_mcp_call
+    agentic_tool_loop._execute_mcp_call = fake_mcp
+    tool_execution._executor = new_executor()
+    try:
+        calls = [mcp_call("a"), {"agentType": "bogus"}, mcp_call("b")]
+        out = await agentic_tool_loop.execute_tool_calls(calls, "check")
+    finally:
+        agentic_tool_loop._execute_mcp_call = original
+        tool_execution._executor = None
+    check("未知 agentType 占位保持对齐", [r["status"] for r in out] == ["success", "error", "success"]
+          and out[2]["service_name"] == "b" and "elapsed_ms" in out[0])
+
+    # 6. 统计
+    executor = new_executor(timeouts={"mcp": 1.0})
+    for delay in [0.01] * 18 + [0.1, 0.2]:
+        tool = FakeTool(mcp_call("stats"), [(delay, "success")])
+        await executor.run_one(tool.call, tool)
+    latency = executor.get_stats()["tools"]["stats/run"]["latency_ms"]
+    check("延迟分位数", latency["p50"] < 30 and 80 <= latency["p95"] <= 250 and latency["max"] >= 190, str(latency))
+
+    print()
+    print(executor.get_stats())
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run_checks()) else 1)
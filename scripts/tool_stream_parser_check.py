@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+文本工具调用增量解析校验 -- 模糊测试 + 模拟流式对话
+
+1. 模糊测试：随机生成混有说明文字、```tool``` 代码块（含全角字符、数组、非法JSON、未闭合尾块）、
+   裸JSON、干扰代码块的模型输出，按随机大小切分后逐段喂给 StreamingToolCallParser，校验：
+     - finish() 的 (clean_text, tool_calls) 与 parse_tool_calls_from_text(完整文本) 完全一致
+     - 每喂一段后已返回的调用，恰好等于当前前缀中已闭合代码块里的调用（不早也不晚）
+2. 长文本：逐段解析的总耗时与"定期对累积文本重新做批量解析"对比
+3. 模拟对话：用模拟的流式 LLM 与慢工具驱动 run_agentic_loop，校验工具在模型输出结束前已开始执行，
+   整轮耗时约为 max(剩余输出, 工具耗时) 而不是两者之和
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/tool_stream_parser_check.py [--cases 1000] [--seed 0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apiserver import agentic_tool_loop, llm_service, tool_execution  # noqa: E402
+from apiserver.agentic_tool_loop import (  # noqa: E402
+    _TOOL_BLOCK_PATTERN,
+    _parse_tool_block,
+    StreamingToolCallParser,
+    parse_tool_calls_from_text,
+)
+from apiserver.tool_execution import ToolExecutor  # noqa: E402
+
+PROSE = ["让我查一下", "好的，", "今天天气不错。", "Sure, let me check.", "{不是JSON}", "花括号 { 与 } 混在文字里",
+         "`行内代码`", "``", "```too", "冒号：逗号，", "\n", "\n\n\n", "  ", "稍等"]
+
+
+def random_call(rng: random.Random) -> str:
+    call = rng.choice([
+        {"agentType": "mcp", "service_name": "weather_time", "tool_name": "today_weather", "city": "杭州"},
+        {"agentType": "openclaw_tool", "tool_name": "web_search", "args": {"query": "西湖 餐厅", "count": 5}},
+        {"agentType": "live2d", "action": "happy"},
+        {"agentType": "naga_control", "command": "open_settings"},
+        {"service_name": "no_agent_type"},
+        {"agentType": "", "x": 1},
+    ])
+    text = json.dumps(call, ensure_ascii=False, indent=rng.choice([None, 2]))
+    variant = rng.random()
+    if variant < 0.15:
+        text = text.replace("{", "｛").replace("}", "｝").replace(":", "：").replace(",", "，")
+    elif variant < 0.25:
+        text = f"[{text}, {text}]"
+    elif variant < 0.32:
+        text = text[:-1]  # 缺少右括号
+    elif variant < 0.38:
+        text = text.replace('"', "'")  # json5 可解析
+    return text
+
+
+def random_block(rng: random.Random, closed: bool = True) -> str:
+    header = "```tool" + rng.choice(["", " ", "\t", "  \t"]) + "\n"
+    body = "\n".join(random_call(rng) for _ in range(rng.choice([0, 1, 1, 2, 3])))
+    return header + body + ("\n```" if closed else "")
+
+
+def random_output(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(1, 8)):
+        kind = rng.random()
+        if kind < 0.4:
+            parts.append(rng.choice(PROSE))
+        elif kind < 0.7:
+            parts.append(random_block(rng))
+        elif kind < 0.8:
+            parts.append("\n" + random_call(rng) + "\n")  # 裸JSON
+        elif kind < 0.9:
+            parts.append(rng.choice(["```tool 没有换行", "```python\nprint({'a': 1})\n```", "````tool\n", "```tools\n{}"]))
+        else:
+            parts.append("```")
+    if rng.random() < 0.2:
+        parts.append(random_block(rng, closed=False))
+    return "".join(parts)
+
+
+def split_stream(rng: random.Random, text: str):
+    pos = 0
+    while pos < len(text):
+        size = rng.choice([1, 1, 2, 3, 5, 8, 20])
+        yield text[pos:pos + size]
+        pos += size
+
+
+def closed_blocks(text: str) -> list:
+    """批量解析完整文本得到的已闭合代码块：[(闭合位置, 块内调用)]，流式解析应在喂到闭合位置时返回这些调用"""
+    return [(match.end(), _parse_tool_block(match.group(1)))
+            for match in _TOOL_BLOCK_PATTERN.finditer(text) if match.group(0).endswith("```")]
+
+
+def dumps(calls) -> str:
+    return json.dumps(calls, ensure_ascii=False, sort_keys=True)
+
+
+def fuzz(cases: int, seed: int):
+    rng = random.Random(seed)
+    mismatches, timing_errors, with_calls, early = 0, 0, 0, 0
+    first_failure = None
+    for case in range(cases):
+        text = random_output(rng)
+        blocks = closed_blocks(text)
+        parser = StreamingToolCallParser()
+        emitted, fed = [], 0
+        for delta in split_stream(rng, text):
+            emitted.extend(parser.feed(delta))
+            fed += len(delta)
+            expected_so_far = [call for end, calls in blocks if end <= fed for call in calls]
+            if dumps(emitted) != dumps(expected_so_far):
+                timing_errors += 1
+                first_failure = first_failure or (case, "timing", text)
+                break
+        expected = parse_tool_calls_from_text(text)
+        actual = parser.finish()
+        if actual[0] != expected[0] or dumps(actual[1]) != dumps(expected[1]):
+            mismatches += 1
+            first_failure = first_failure or (case, "result", text)
+        with_calls += bool(expected[1])
+        early += bool(emitted)
+    return mismatches, timing_errors, with_calls, early, first_failure
+
+
+def long_stream_timing(rng: random.Random):
+    body = "".join(rng.choice(PROSE[:4]) for _ in range(6000)) + random_block(rng) + "收尾。" * 200
+    deltas = list(split_stream(random.Random(1), body))
+
+    start = time.perf_counter()
+    parser = StreamingToolCallParser()
+    for delta in deltas:
+        parser.feed(delta)
+    incremental_calls = parser.finish()[1]
+    incremental = time.perf_counter() - start
+
+    start = time.perf_counter()
+    text = ""
+    for i, delta in enumerate(deltas):
+        text += delta
+        if i % 100 == 0:  # 每 100 段重新做一次批量解析（已经比逐段重解析少两个数量级）
+            parse_tool_calls_from_text(text)
+    batch_calls = parse_tool_calls_from_text(text)[1]
+    rescan = time.perf_counter() - start
+    return len(body), len(deltas), incremental, rescan, dumps(incremental_calls) == dumps(batch_calls)
+
+
+class FakeLLM:
+    """模拟流式 LLM：第一轮先输出工具调用块，再继续输出一段说明文字；第二轮直接回答"""
+
+    def __init__(self, tail_chunks: int, chunk_delay: float):
+        self.tail_chunks = tail_chunks
+        self.chunk_delay = chunk_delay
+        self.round = 0
+        self.first_stream_end = None
+
+    async def stream_chat_with_context(self, messages, temperature=0.7, model_override=None, tools=None):
+        self.round += 1
+        if self.round == 1:
+            call = {"agentType": "mcp", "service_name": "weather_time", "tool_name": "today_weather", "city": "杭州"}
+            pieces = ["让我查一下杭州的天气。\n", "```tool\n", json.dumps(call, ensure_ascii=False)[:30],
+                      json.dumps(call, ensure_ascii=False)[30:], "\n```", "\n"]
+            pieces += [f"顺便说一句，第 {i} 段补充说明。" for i in range(self.tail_chunks)]
+        else:
+            pieces = ["杭州今天晴，", "适合出门。"]
+        for piece in pieces:
+            await asyncio.sleep(self.chunk_delay)
+            yield f"data: {json.dumps({'type': 'content', 'text': piece}, ensure_ascii=False)}\n\n"
+        if self.round == 1:
+            self.first_stream_end = time.monotonic()
+
+
+async def simulated_round(tail_chunks: int, chunk_delay: float, tool_delay: float, stop_at: str = ""):
+    """跑一轮模拟对话；stop_at 非空时收到该类型事件后关闭生成器（模拟客户端断开）"""
+    fake_llm = FakeLLM(tail_chunks, chunk_delay)
+    tool_started = []
+    tool_cancelled = []
+
+    async def fake_mcp(call, session_id=None):
+        tool_started.append(time.monotonic())
+        try:
+            await asyncio.sleep(tool_delay)
+        except asyncio.CancelledError:
+            tool_cancelled.append(time.monotonic())
+            raise
+        return {"tool_call": call, "result": "晴 25℃", "status": "success",
+                "service_name": call["service_name"], "tool_name": call["tool_name"]}
+
+    original_llm, original_mcp = llm_service.get_llm_service, agentic_tool_loop._execute_mcp_call
+    llm_service.get_llm_service = lambda: fake_llm
+    agentic_tool_loop._execute_mcp_call = fake_mcp
+    tool_execution._executor = ToolExecutor(timeouts={"mcp": 5.0}, hedges={}, round_budget=10.0)
+    events = []
+    try:
+        messages = [{"role": "system", "content": "你是助手"}, {"role": "user", "content": "杭州天气怎么样"}]
+        t0 = time.monotonic()
+        loop_gen = agentic_tool_loop.run_agentic_loop(messages, "stream-parser-check", max_rounds=2)
+        async for chunk in loop_gen:
+            data = json.loads(chunk[6:])
+            events.append((data.get("type"), time.monotonic() - t0, data))
+            if stop_at and data.get("type") == stop_at:
+                break
+        await loop_gen.aclose()
+        await asyncio.sleep(0.05)  # 让被取消的工具任务处理 CancelledError
+    finally:
+        llm_service.get_llm_service = original_llm
+        agentic_tool_loop._execute_mcp_call = original_mcp
+        tool_execution._executor = None
+    return fake_llm, tool_started, events, t0, tool_cancelled
+
+
+async def run_checks(cases: int, seed: int) -> bool:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    # 1. 模糊测试
+    mismatches, timing_errors, with_calls, early, failure = fuzz(cases, seed)
+    check("增量解析结果与批量解析一致", mismatches == 0, f"{cases} 个用例，{with_calls} 个含工具调用，不一致 {mismatches}")
+    check("代码块闭合时立即返回调用", timing_errors == 0, f"{early} 个用例在流式阶段返回调用，时机错误 {timing_errors}")
+    if failure:
+        print(f"  首个失败用例 #{failure[0]} ({failure[1]}): {failure[2]!r}")
+
+    # 2. 长文本
+    chars, chunks, incremental, rescan, same = long_stream_timing(random.Random(seed))
+    check("长文本逐段解析无需重复扫描", same and incremental < rescan,
+          f"{chars} 字 / {chunks} 段：增量 {incremental * 1000:.1f} ms，每 100 段重解析 {rescan * 1000:.1f} ms")
+
+    # 3. 模拟对话
+    chunk_delay, tail_chunks, tool_delay = 0.05, 16, 0.8
+    fake_llm, tool_started, events, t0, _ = await simulated_round(tail_chunks, chunk_delay, tool_delay)
+    types = [e[0] for e in events]
+    lead = fake_llm.first_stream_end - tool_started[0] if tool_started else -1.0
+    check("工具在模型输出结束前开始执行", len(tool_started) == 1 and lead > 0.5,
+          f"提前 {lead * 1000:.0f} ms 开始")
+    tool_results = next((e for e in events if e[0] == "tool_results"), None)
+    wait = tool_results[1] - (fake_llm.first_stream_end - t0) if tool_results else float("inf")
+    check("输出结束后只需等待工具剩余耗时", tool_results is not None
+          and tool_results[2]["results"][0]["status"] == "success" and wait < tool_delay - 0.4,
+          f"输出结束后等待 {wait * 1000:.0f} ms，工具耗时 {tool_delay * 1000:.0f} ms")
+    check("事件顺序与结束轮保持不变", types.count("tool_calls") == 1 and types.index("tool_calls") < types.index("tool_results")
+          and types[-1] == "round_end" and events[-1][2].get("has_more") is False)
+
+    # 4. 流式输出结束后、工具结果返回前客户端断开：提前派发的工具调用应被取消
+    for stop_at in ("content_clean", "tool_calls"):
+        _, tool_started, events, _, tool_cancelled = await simulated_round(2, 0.01, tool_delay, stop_at=stop_at)
+        check(f"{stop_at} 事件后断开时取消提前派发的工具", len(tool_started) == 1 and len(tool_cancelled) == 1,
+              f"开始 {len(tool_started)} 个，取消 {len(tool_cancelled)} 个")
+
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="文本工具调用增量解析校验")
+    parser.add_argument("--cases", type=int, default=1000, help="模糊测试用例数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run_checks(args.cases, args.seed)) else 1)
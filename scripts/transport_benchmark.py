@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+服务间传输微基准 -- 进程内直接调度 vs 本机 HTTP
+
+在后台线程中用 uvicorn 启动一个测试服务（与 main.py 中各服务器相同的运行方式，独立事件循环），
+服务在 lifespan 中把路由注册到 ServiceTransport，然后从主线程的事件循环分别通过：
+  - inprocess (跨循环)：run_coroutine_threadsafe 投递到服务的事件循环
+  - inprocess (同循环)：调用方与服务在同一事件循环（如 api_server 调用自身）
+  - http：本机 HTTP（分离部署时的回退路径）
+调用同一组处理协程，先校验两种传输的结果、错误状态码与流式输出一致，再比较单次调用开销。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/transport_benchmark.py [--calls 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn  # noqa: E402
+from fastapi import FastAPI, HTTPException  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+
+from system.service_transport import (  # noqa: E402
+    HttpTransport,
+    ServiceTransport,
+    ServiceTransportError,
+)
+
+SERVICE = "bench"
+
+
+class ToolCallRequest(BaseModel):
+    service_name: str
+    tool_name: str = ""
+    params: Dict[str, Any] = {}
+
+
+def build_app(transport: ServiceTransport) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.loop = asyncio.get_running_loop()
+        transport.register(SERVICE, {
+            ("POST", "/echo"): echo,
+            ("POST", "/call"): lambda body: call(ToolCallRequest(**body)),
+            ("POST", "/fail"): fail,
+            ("POST", "/stream"): stream,
+            ("GET", "/health"): lambda body: health(),
+        })
+        yield
+        transport.unregister(SERVICE)
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.post("/echo")
+    async def echo(payload: Dict[str, Any]):
+        return {"success": True, "echo": payload}
+
+    @app.post("/call")
+    async def call(req: ToolCallRequest):
+        return {"status": "ok", "result": f"{req.service_name}/{req.tool_name}", "params": req.params}
+
+    @app.post("/fail")
+    async def fail(payload: Dict[str, Any]):
+        raise HTTPException(503, "OpenClaw 客户端未就绪")
+
+    @app.post("/stream")
+    async def stream(payload: Dict[str, Any]):
+        async def generate():
+            for i in range(int(payload.get("chunks", 5))):
+                await asyncio.sleep(0)
+                yield f"data: {i}\n\n"
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def measure(transport: ServiceTransport, calls: int, payload: Dict[str, Any]) -> Dict[str, float]:
+    for _ in range(50):
+        await transport.post(SERVICE, "/echo", json=payload)
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await transport.post(SERVICE, "/echo", json=payload)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples) * 1e6,
+        "p50": samples[len(samples) // 2] * 1e6,
+        "p99": samples[int(len(samples) * 0.99)] * 1e6,
+    }
+
+
+async def run_checks(transport: ServiceTransport, http_only: ServiceTransport) -> bool:
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    payload = {"message": "你好", "n": 1, "nested": {"items": [1, 2, 3]}}
+    a = await transport.post(SERVICE, "/echo", json=payload)
+    b = await http_only.post(SERVICE, "/echo", json=payload)
+    check("进程内调用走 inprocess", a.transport == "inprocess" and b.transport == "http")
+    check("两种传输结果一致", a.status_code == b.status_code == 200 and a.json() == b.json())
+
+    call = {"service_name": "screen_vision", "tool_name": "look_screen", "params": {"x": 1}}
+    a = await transport.post(SERVICE, "/call", json=call)
+    b = await http_only.post(SERVICE, "/call", json=call)
+    check("Pydantic 请求体一致", a.json() == b.json(), a.json().get("result"))
+
+    a = await transport.post(SERVICE, "/call", json={"tool_name": "x"})
+    b = await http_only.post(SERVICE, "/call", json={"tool_name": "x"})
+    check("校验失败返回 422", a.status_code == b.status_code == 422)
+
+    a = await transport.post(SERVICE, "/fail", json={})
+    b = await http_only.post(SERVICE, "/fail", json={})
+    check("HTTPException 状态码与 detail 一致", a.status_code == b.status_code == 503 and a.json() == b.json(),
+          a.text)
+
+    a = await transport.get(SERVICE, "/health")
+    check("GET 路由", a.json() == {"status": "healthy"})
+
+    a = [chunk async for chunk in transport.stream(SERVICE, "POST", "/stream", json={"chunks": 20})]
+    b = [chunk async for chunk in http_only.stream(SERVICE, "POST", "/stream", json={"chunks": 20})]
+    check("流式输出一致", "".join(a) == "".join(b) and len(a) == 20, f"{len(a)} 块")
+
+    try:
+        async for _ in transport.stream(SERVICE, "POST", "/fail", json={}):
+            pass
+        check("流式错误抛出 ServiceTransportError", False)
+    except ServiceTransportError as e:
+        check("流式错误抛出 ServiceTransportError", e.status_code == 503)
+
+    a = await transport.post(SERVICE, "/unknown", json={})
+    check("未注册路由回退 HTTP", a.transport == "http" and a.status_code == 404)
+
+    return all(results)
+
+
+async def benchmark(transport: ServiceTransport, http_only: ServiceTransport, calls: int,
+                    server_loop: asyncio.AbstractEventLoop):
+    payloads = {
+        "小请求": {"event": "started"},
+        "10KB 请求": {"content": "屏幕内容" * 2500, "source": "heartbeat"},
+    }
+    print(f"\n{'payload':<10} {'transport':<20} {'mean µs':>10} {'p50 µs':>10} {'p99 µs':>10}")
+    for label, payload in payloads.items():
+        rows = {
+            "inprocess (跨循环)": await measure(transport, calls, payload),
+            "inprocess (同循环)": await asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(measure(transport, calls, payload), server_loop)),
+            "http": await measure(http_only, calls, payload),
+        }
+        for name, stats in rows.items():
+            print(f"{label:<10} {name:<20} {stats['mean']:>10.1f} {stats['p50']:>10.1f} {stats['p99']:>10.1f}")
+        print(f"{'':<10} http / inprocess(跨循环) = {rows['http']['mean'] / rows['inprocess (跨循环)']['mean']:.1f}x")
+
+
+async def main(calls: int) -> bool:
+    port = free_port()
+    http = HttpTransport(ports={SERVICE: port})
+    transport = ServiceTransport(http=http)
+    http_only = ServiceTransport(prefer_inprocess=False, http=http)
+
+    app = build_app(transport)
+    server = start_server(app, port)
+    try:
+        ok = await run_checks(transport, http_only)
+        await benchmark(transport, http_only, calls, app.state.loop)
+        print()
+        print(transport.get_stats())
+    finally:
+        await http.close()
+        server.should_exit = True
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="服务间传输微基准")
+    parser.add_argument("--calls", type=int, default=2000, help="每组调用次数")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.calls)) else 1)
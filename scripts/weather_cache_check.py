@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+天气工具缓存校验 -- 基于本地 mock HTTP 服务
+
+在本机启动一个模拟 itboy 天气接口与 IP 定位页面的 aiohttp 服务，
+让 WeatherTimeTool 指向它，校验：
+  - 同一城市重复查询命中缓存，不再请求上游
+  - 并发查询同一城市只请求一次上游
+  - 过期后先返回旧值并在后台刷新（stale-while-revalidate）
+  - 上游失败时退回过期数据
+  - 本地城市异步解析并写入磁盘缓存，新实例直接复用
+  - 同一实例在两个事件循环（api_server / mcp_server）中并发查询：合并为一次上游请求，会话按循环各自持有
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/weather_cache_check.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcpserver.agent_weather_time.agent_weather_time import WeatherTimeTool  # noqa: E402
+
+UPSTREAM_DELAY = 0.05
+
+
+class MockUpstream:
+    def __init__(self):
+        self.weather_calls = 0
+        self.ip_calls = 0
+        self.fail = False
+
+    async def weather(self, request: web.Request) -> web.Response:
+        self.weather_calls += 1
+        await asyncio.sleep(UPSTREAM_DELAY)
+        if self.fail:
+            return web.Response(status=502, text="bad gateway")
+        code = request.match_info["code"]
+        forecast = [{"ymd": f"day{i}", "type": "晴", "high": f"高温 {20 + i}℃"} for i in range(15)]
+        body = {"data": {"shidu": "50%", "wendu": str(self.weather_calls), "code": code, "forecast": forecast}}
+        return web.json_response(body)
+
+    async def ip(self, request: web.Request) -> web.Response:
+        self.ip_calls += 1
+        return web.Response(text="当前 IP：10.0.0.1  来自于：中国 湖北 武汉  电信\n", content_type="text/html")
+
+
+async def run_checks() -> bool:
+    upstream = MockUpstream()
+    app = web.Application()
+    app.router.add_get("/api/weather/city/{code}", upstream.weather)
+    app.router.add_get("/ip", upstream.ip)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        location_cache = Path(tmp) / "local_city.json"
+        tool = WeatherTimeTool(
+            weather_url=base + "/api/weather/city/{code}",
+            ip_url=base + "/ip",
+            location_cache_path=location_cache,
+            ttl={"now": 0.3, "forecast": 0.3},
+        )
+        try:
+            result = await tool.handle("today_weather", city="湖北 武汉")
+            check("首次查询成功", result["status"] == "success", result["message"])
+            await tool.handle("today_weather", city="湖北 武汉")
+            await tool.handle("forecast_weather", city="湖北 武汉")
+            check("重复查询命中缓存", upstream.weather_calls == 1, f"上游请求 {upstream.weather_calls} 次")
+
+            await asyncio.gather(*(tool.handle("today_weather", city="北京 北京") for _ in range(20)))
+            check("并发查询合并为一次上游请求", upstream.weather_calls == 2, f"上游请求 {upstream.weather_calls} 次")
+
+            await asyncio.sleep(0.35)
+            before = upstream.weather_calls
+            stale = await tool.get_cached("101200101", "now")
+            check("过期后立即返回旧值", stale["wendu"] == "1", f"wendu={stale['wendu']}")
+            await asyncio.sleep(UPSTREAM_DELAY * 3)
+            fresh = await tool.get_cached("101200101", "now")
+            check("后台刷新完成", upstream.weather_calls == before + 1 and fresh["wendu"] != "1",
+                  f"wendu={fresh['wendu']}")
+
+            upstream.fail = True
+            await asyncio.sleep(0.65)
+            fallback = await tool.get_cached("101200101", "now")
+            check("上游失败时退回过期数据", fallback["wendu"] == fresh["wendu"])
+            upstream.fail = False
+
+            result = await tool.handle("time")
+            check("本地城市异步解析", result["data"]["city"] == "武汉" and upstream.ip_calls == 1,
+                  f"city={result['data']['city']}")
+            cached = json.loads(location_cache.read_text(encoding="utf-8"))
+            check("本地城市写入磁盘缓存", cached.get("city") == "中国 湖北 武汉")
+
+            second = WeatherTimeTool(
+                weather_url=base + "/api/weather/city/{code}",
+                ip_url=base + "/ip",
+                location_cache_path=location_cache,
+            )
+            await second.handle("time")
+            check("新实例复用磁盘缓存", upstream.ip_calls == 1)
+            await second.close()
+
+            other_loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+            thread.start()
+            try:
+                before = upstream.weather_calls
+                remote = asyncio.run_coroutine_threadsafe(tool.handle("today_weather", city="浙江 杭州"), other_loop)
+                await asyncio.sleep(UPSTREAM_DELAY / 5)
+                local = await tool.handle("today_weather", city="浙江 杭州")
+                remote_result = await asyncio.wrap_future(remote)
+                check("跨事件循环并发查询合并为一次上游请求",
+                      local["status"] == remote_result["status"] == "success" and upstream.weather_calls == before + 1
+                      and len(tool._sessions) == 2, f"上游请求 {upstream.weather_calls - before} 次，会话 {len(tool._sessions)} 个")
+                sessions = list(tool._sessions.values())
+                await tool.close()
+                await asyncio.sleep(0.05)
+                check("关闭时释放各事件循环的会话", all(s.closed for s in sessions) and not tool._sessions)
+            finally:
+                other_loop.call_soon_threadsafe(other_loop.stop)
+                thread.join()
+
+            metrics = tool.get_metrics()
+            print(json.dumps(metrics, ensure_ascii=False, indent=2))
+        finally:
+            await tool.close()
+            await runner.cleanup()
+
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run_checks()) else 1)
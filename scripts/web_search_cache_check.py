@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+联网搜索缓存校验 -- 基于本地 mock 搜索服务
+
+在本机启动模拟 NagaBusiness /tools/search 与 Brave Search 接口的 aiohttp 服务，
+让 WebSearch 指向它，校验：
+  - 相同查询（含大小写/空白/全角差异）命中缓存，不再请求上游
+  - 请求更少结果时复用缓存条目，请求更多结果时重新请求
+  - 并发的相同查询只请求一次上游（同一事件循环与跨事件循环）
+  - 格式化文本只生成一次
+  - TTL 过期后重新请求、条目上限触发 LRU 淘汰、失败结果不缓存
+  - agentic loop 的前置搜索与 web_search 工具调用、agent_server 搜索代理共用缓存
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/web_search_cache_check.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apiserver import web_search as web_search_module  # noqa: E402
+from apiserver.web_search import SearchError, WebSearch  # noqa: E402
+from system.config import get_config  # noqa: E402
+
+UPSTREAM_DELAY = 0.05
+
+
+class MockSearch:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def _body(self, query: str, count: int) -> dict:
+        results = [
+            {"title": f"{query} 结果 {i}", "url": f"https://example.com/{i}", "description": f"摘要 {i}", "age": "1天前"}
+            for i in range(count)
+        ]
+        return {"web": {"results": results}}
+
+    async def naga(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        await asyncio.sleep(UPSTREAM_DELAY)
+        if self.fail:
+            return web.json_response({"error": {"message": "quota exceeded"}}, status=429)
+        params = await request.json()
+        return web.json_response(self._body(params["q"], int(params["count"])))
+
+    async def brave(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        await asyncio.sleep(UPSTREAM_DELAY)
+        if self.fail:
+            return web.json_response({"message": "bad gateway"}, status=502)
+        return web.json_response(self._body(request.query["q"], int(request.query["count"])))
+
+
+def run_in_thread_loop(coro_factory):
+    """在另一个线程的事件循环中运行协程（模拟 agent_server 的事件循环）"""
+    box = {}
+
+    def runner():
+        box["result"] = asyncio.run(coro_factory())
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    return thread, box
+
+
+async def run_checks() -> bool:
+    upstream = MockSearch()
+    app = web.Application()
+    app.router.add_post("/tools/search", upstream.naga)
+    app.router.add_get("/brave", upstream.brave)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+
+    results = []
+
+    def check(name: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"{'✓' if ok else '✗'} {name}" + (f"  ({detail})" if detail else ""))
+
+    def new_search(**kwargs) -> WebSearch:
+        kwargs.setdefault("ttl", 60)
+        kwargs.setdefault("max_entries", 64)
+        return WebSearch(naga_url=base + "/tools/search", brave_url=base + "/brave", **kwargs)
+
+    get_config().online_search.search_api_key = "test-key"
+    search = new_search()
+
+    # 1. 重复查询与规范化
+    first = await search.search("naga", "Python asyncio", count=10)
+    again = await search.search("naga", "  python　ASYNCIO ", count=10)
+    check("重复查询命中缓存", upstream.calls == 1 and again is first, f"上游 {upstream.calls} 次")
+
+    # 2. 结果数
+    fewer = await search.search("naga", "python asyncio", count=8)
+    check("更少结果复用缓存条目", upstream.calls == 1 and len(fewer.top(8)) == 8)
+    await search.search("naga", "python asyncio", count=15)
+    check("更多结果重新请求", upstream.calls == 2)
+    check("不同来源 / freshness 分开缓存", (await search.search("brave", "python asyncio")) is not None
+          and (await search.search("naga", "python asyncio", freshness="pd")) is not None and upstream.calls == 4)
+
+    # 3. 格式化文本记忆
+    check("格式化文本只生成一次", first.text(8) is first.text(8) and first.text(8).startswith("1. "))
+
+    # 4. 同循环并发合并
+    upstream.calls = 0
+    hits = await asyncio.gather(*[search.search("naga", "并发查询", count=5) for _ in range(20)])
+    check("并发相同查询只请求一次", upstream.calls == 1 and all(h is hits[0] for h in hits),
+          f"合并 {search.get_stats()['metrics']['coalesced']} 次")
+
+    # 5. 跨事件循环合并
+    upstream.calls = 0
+    main_task = asyncio.ensure_future(search.search("naga", "跨循环查询", count=5))
+    await asyncio.sleep(0.01)
+    thread, box = run_in_thread_loop(lambda: search.search("naga", "跨循环查询", count=5))
+    main_result = await main_task
+    await asyncio.get_running_loop().run_in_executor(None, thread.join)
+    check("跨事件循环的相同查询只请求一次", upstream.calls == 1 and box.get("result") is main_result)
+
+    # 6. TTL
+    short = new_search(ttl=0.2)
+    upstream.calls = 0
+    await short.search("brave", "ttl")
+    await short.search("brave", "ttl")
+    await asyncio.sleep(0.25)
+    await short.search("brave", "ttl")
+    check("过期后重新请求", upstream.calls == 2 and short.get_stats()["metrics"]["expired"] == 1)
+
+    # 7. 条目上限
+    bounded = new_search(max_entries=3)
+    for i in range(5):
+        await bounded.search("brave", f"q{i}")
+    stats = bounded.get_stats()
+    check("条目上限 LRU 淘汰", stats["entries"] == 3 and stats["metrics"]["evictions"] == 2)
+
+    # 8. 失败不缓存
+    upstream.fail = True
+    upstream.calls = 0
+    errors = []
+    for _ in range(2):
+        try:
+            await search.search("naga", "失败查询")
+        except SearchError as e:
+            errors.append(str(e))
+    upstream.fail = False
+    check("失败结果不缓存", len(errors) == 2 and upstream.calls == 2, errors[0] if errors else "")
+
+    # 9. agentic loop / agent_server 共用缓存
+    from apiserver import naga_auth
+    from apiserver.agentic_tool_loop import _execute_brave_search, execute_pre_search
+
+    web_search_module._web_search = shared = new_search()
+    upstream.calls = 0
+    if not naga_auth.is_authenticated():
+        pre = await execute_pre_search("今天的新闻", count=8)
+        tool = await _execute_brave_search({"args": {"query": "今天的新闻", "count": 5}})
+        check("前置搜索与工具调用共用缓存", pre and tool["status"] == "success" and upstream.calls == 1)
+
+        from agentserver.agent_server import _local_search_proxy
+
+        proxied = await _local_search_proxy({"query": "今天的新闻", "count": 3})
+        text = proxied["result"]["content"][0]["text"]
+        check("agent_server 搜索代理共用缓存", proxied["success"] and upstream.calls == 1 and text.count("URL:") == 3)
+    print()
+    print(shared.get_stats())
+
+    await runner.cleanup()
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run_checks()) else 1)
@@ -135,6 +135,22 @@ async def _extract_quintuples_async_structured(text):
     return []
 
 
+def _parse_quintuple_json(content):
+    """解析模型返回的五元组 JSON 数组，混有其他文字时截取数组部分；无法解析时返回 None"""
+    try:
+        quintuples = json.loads(content)
+    except json.JSONDecodeError:
+        if '[' not in content or ']' not in content:
+            return None
+        try:
+            quintuples = json.loads(content[content.index('['):content.rindex(']') + 1])
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(quintuples, list):
+        return None
+    return [tuple(t) for t in quintuples if isinstance(t, list) and len(t) == 5]
+
+
 async def _extract_quintuples_async_fallback(text):
     """传统JSON解析的异步五元组提取（回退方案）"""
     prompt = f"""
@@ -177,34 +193,35 @@ async def _extract_quintuples_async_fallback(text):
 除了JSON数据，请不要输出任何其他数据，例如：```、```json、以下是我提取的数据：。
 """
 
+    from apiserver.llm_service import get_llm_service
+
+    messages = [{"role": "user", "content": prompt}]
+    params = {"max_tokens": config.api.max_tokens, "temperature": 0.3}
     max_retries = 2
 
     for attempt in range(max_retries + 1):
         try:
-            response = await async_client.chat.completions.create(
-                model=config.api.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=config.api.max_tokens,
-                temperature=0.3,
-                timeout=600 + (attempt * 20)
+            async def call() -> str:
+                response = await async_client.chat.completions.create(
+                    model=config.api.model,
+                    messages=messages,
+                    timeout=600 + (attempt * 20),
+                    **params
+                )
+                return response.choices[0].message.content.strip()
+
+            # 同一段文本重复抽取时复用结果；只缓存能解析出 JSON 数组的回答
+            result = await get_llm_service().cached_call(
+                "quintuple_extraction", messages, call, model=config.api.model, params=params,
+                validate=lambda content: _parse_quintuple_json(content) is not None,
             )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # 尝试解析JSON
-            try:
-                quintuples = json.loads(content)
-                logger.info(f"传统方法成功，提取到 {len(quintuples)} 个五元组")
-                return [tuple(t) for t in quintuples if len(t) == 5]
-            except json.JSONDecodeError:
-                logger.error(f"JSON解析失败，原始内容: {content[:200]}")
-                # 尝试直接提取数组
-                if '[' in content and ']' in content:
-                    start = content.index('[')
-                    end = content.rindex(']') + 1
-                    quintuples = json.loads(content[start:end])
-                    return [tuple(t) for t in quintuples if len(t) == 5]
-                raise
+            content = result.content
+
+            quintuples = _parse_quintuple_json(content)
+            if quintuples is None:
+                raise ValueError(f"JSON解析失败，原始内容: {content[:200]}")
+            logger.info(f"传统方法成功，提取到 {len(quintuples)} 个五元组")
+            return quintuples
 
         except Exception as e:
             logger.error(f"传统方法提取失败: {str(e)}")
@@ -218,6 +218,59 @@ def get_all_quintuples():
     return load_quintuples()
 
 
+# 按文件签名缓存的有序五元组列表，供分页/流式导出复用，避免每页重新读取整个文件
+_sorted_cache: tuple = (None, [])
+
+
+def _sorted_quintuples() -> list:
+    global _sorted_cache
+    try:
+        st = os.stat(QUINTUPLES_FILE)
+        signature = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return []
+    if _sorted_cache[0] != signature:
+        _sorted_cache = (signature, sorted(load_quintuples()))
+    return _sorted_cache[1]
+
+
+def _match_filters(q, entity_type: Optional[str], relation: Optional[str]) -> bool:
+    if entity_type and q[1] != entity_type and q[4] != entity_type:
+        return False
+    if relation and q[2] != relation:
+        return False
+    return True
+
+
+def get_quintuples_page(after=None, limit: int = 500, entity_type: Optional[str] = None,
+                        relation: Optional[str] = None):
+    """
+    按稳定顺序分页读取五元组（键集分页）
+
+    Args:
+        after: 上一页最后一个五元组，None 表示从头开始
+        limit: 每页条数
+        entity_type: 主体或客体类型过滤
+        relation: 关系过滤
+
+    Returns:
+        (本页五元组列表, 是否还有下一页)
+    """
+    from bisect import bisect_right
+
+    items = _sorted_quintuples()
+    start = bisect_right(items, tuple(after)) if after else 0
+    page = []
+    for i in range(start, len(items)):
+        q = items[i]
+        if not _match_filters(q, entity_type, relation):
+            continue
+        if len(page) == limit:
+            return page, True
+        page.append(q)
+    return page, False
+
+
 def query_graph_by_keywords(keywords):
     results = []
     _graph = get_graph()
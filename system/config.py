@@ -234,6 +234,21 @@ class SystemConfig(BaseModel):
         return v.upper()
 
 
+PROMPT_LAYOUTS = ("legacy", "stable")
+
+
+class LLMProviderConfig(BaseModel):
+    """备用 LLM 提供商（OpenAI 兼容接口），与主配置一起组成提供商池"""
+
+    name: str = Field(default="", description="提供商名称（用于日志与统计，留空时使用 base_url）")
+    api_key: str = Field(default="", description="API密钥")
+    base_url: str = Field(default="", description="API基础URL")
+    model: str = Field(default="", description="模型名称（留空时使用主配置的 model）")
+    weight: float = Field(default=1.0, ge=0.0, description="路由权重，0 表示仅在其他提供商都不可用时使用")
+    max_concurrency: int = Field(default=0, ge=0, description="最大并发请求数（0 为不限制）")
+    enabled: bool = Field(default=True, description="是否启用")
+
+
 class APIConfig(BaseModel):
     """API服务配置"""
 
@@ -247,6 +262,32 @@ class APIConfig(BaseModel):
     context_load_days: int = Field(default=3, ge=1, le=30, description="加载历史上下文的天数")
     context_parse_logs: bool = Field(default=True, description="是否从日志文件解析上下文")
     applied_proxy: bool = Field(default=True, description="是否应用代理")
+    prompt_layout: str = Field(
+        default="legacy",
+        description="提示词组装模式：legacy（技能等附加知识整体追加在末尾）/ stable（稳定内容前置，便于命中供应商前缀缓存）",
+    )
+    weight: float = Field(default=1.0, ge=0.0, description="主提供商的路由权重（与 providers 一起加权分配）")
+    max_concurrency: int = Field(default=0, ge=0, description="主提供商最大并发请求数（0 为不限制）")
+    providers: List[LLMProviderConfig] = Field(default_factory=list, description="备用提供商列表（故障转移与负载均衡）")
+    first_token_timeout: float = Field(
+        default=30.0, gt=0, description="首个 token 超时（秒），超时且尚未输出内容时切换到下一个提供商"
+    )
+    response_cache_enabled: bool = Field(
+        default=True, description="是否缓存非对话类辅助调用（摘要、意图分类、五元组抽取等）的 LLM 响应"
+    )
+    response_cache_max_entries: int = Field(default=2000, ge=1, le=100000, description="LLM 响应缓存最大条目数")
+    response_cache_persist: bool = Field(default=True, description="LLM 响应缓存是否持久化到数据目录")
+    response_cache_sites: Dict[str, Dict[str, Any]] = Field(
+        default_factory=dict,
+        description="按调用点覆盖缓存策略，如 {\"context_compressor\": {\"enabled\": false}, \"intent_router\": {\"threshold\": 0.97}}",
+    )
+
+    @field_validator("prompt_layout")
+    @classmethod
+    def validate_prompt_layout(cls, v):
+        if v not in PROMPT_LAYOUTS:
+            raise ValueError(f"提示词组装模式必须是以下之一: {list(PROMPT_LAYOUTS)}")
+        return v
 
 
 class APIServerConfig(BaseModel):
@@ -257,6 +298,11 @@ class APIServerConfig(BaseModel):
     port: int = Field(default_factory=lambda: server_ports.api_server, description="API服务器端口")
     auto_start: bool = Field(default=True, description="启动时自动启动API服务器")
     docs_enabled: bool = Field(default=True, description="是否启用API文档")
+    ws_send_queue_size: int = Field(default=256, ge=1, le=10000, description="每个WebSocket连接的发送队列上限")
+    ws_overflow_policy: str = Field(
+        default="coalesce", description="发送队列溢出策略: drop_oldest/coalesce/disconnect"
+    )
+    ws_send_timeout: float = Field(default=10.0, ge=0.5, le=120.0, description="单条WebSocket消息发送超时（秒）")
 
 
 class GRAGConfig(BaseModel):
@@ -281,6 +327,24 @@ class HandoffConfig(BaseModel):
     max_loop_stream: int = Field(default=5, ge=1, le=20, description="流式模式最大工具调用循环次数")
     max_loop_non_stream: int = Field(default=5, ge=1, le=20, description="非流式模式最大工具调用循环次数")
     show_output: bool = Field(default=False, description="是否显示工具调用输出")
+    tool_timeout_seconds: float = Field(default=60.0, gt=0, le=600, description="未单独配置的工具调用超时时间（秒）")
+    tool_timeouts: Dict[str, float] = Field(
+        default_factory=dict,
+        description="按工具覆盖超时（秒），键为 agentType、agentType:服务 或 agentType:服务/工具",
+    )
+    hedge_tools: Dict[str, float] = Field(
+        default_factory=dict,
+        description="幂等工具的对冲重试：键同 tool_timeouts，值为首个请求多少秒未完成时追加请求",
+    )
+    round_budget_seconds: float = Field(default=150.0, ge=0, le=900, description="每轮工具调用总预算（秒），0 表示不限")
+    breaker_failure_threshold: int = Field(default=3, ge=1, le=20, description="服务连续失败多少次后熔断")
+    breaker_reset_seconds: float = Field(default=30.0, gt=0, le=600, description="熔断后多久放行探测请求（秒）")
+    tool_cache_enabled: bool = Field(default=True, description="是否缓存 manifest 中声明了 cache 的 MCP 工具结果")
+    tool_cache_max_entries: int = Field(default=512, ge=1, le=10000, description="MCP 工具结果缓存条目上限")
+    pre_router_enabled: bool = Field(default=True, description="是否用本地意图预路由只下发相关工具 schema")
+    pre_router_min_confidence: float = Field(
+        default=0.6, ge=0.0, le=1.0, description="本地预路由置信度低于该值时下发全量工具"
+    )
 
 
 class BrowserConfig(BaseModel):
@@ -554,6 +618,8 @@ class OnlineSearchConfig(BaseModel):
     num_results: int = Field(default=5, ge=1, le=20, description="搜索结果数量")
     search_api_key: str = Field(default="", description="Brave Search API Key（未登录Naga时使用）")
     search_api_base: str = Field(default="https://api.search.brave.com/res/v1/web/search", description="搜索API地址")
+    cache_ttl_seconds: int = Field(default=300, ge=0, le=86400, description="搜索结果缓存有效期（秒），0 表示不缓存")
+    cache_max_entries: int = Field(default=256, ge=1, le=10000, description="搜索结果缓存最大条目数")
 
 
 class OpenClawConfig(BaseModel):
@@ -567,6 +633,9 @@ class OpenClawConfig(BaseModel):
     timeout: int = Field(default=120, ge=5, le=600, description="请求超时时间（秒）")
     default_model: Optional[str] = Field(default=None, description="默认模型")
     default_channel: str = Field(default="last", description="默认消息通道")
+    events_path: Optional[str] = Field(
+        default=None, description="Gateway 回复事件流（SSE）路径，配置后优先推送唤醒收取回复，不支持时回退到增量轮询"
+    )
     enabled: bool = Field(default=False, description="是否启用 OpenClaw 集成")
 
 
@@ -736,6 +805,28 @@ def save_prompt(name: str, content: str):
     get_prompt_manager().save_prompt(name, content)
 
 
+# system/prompts/ 模板缓存：{文件名: ((mtime_ns, 大小), 内容)}，文件变化时才重新读取
+_SYSTEM_PROMPTS_DIR = Path(__file__).parent / "prompts"
+_PROMPT_TEMPLATE_CACHE: Dict[str, tuple] = {}
+
+
+def load_prompt_template(filename: str) -> str:
+    """读取 system/prompts/ 下的模板，按文件 mtime/大小缓存，文件不存在时返回空字符串"""
+    template_file = _SYSTEM_PROMPTS_DIR / filename
+    try:
+        st = template_file.stat()
+    except OSError:
+        _PROMPT_TEMPLATE_CACHE.pop(filename, None)
+        return ""
+    signature = (st.st_mtime_ns, st.st_size)
+    cached = _PROMPT_TEMPLATE_CACHE.get(filename)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    content = template_file.read_text(encoding="utf-8")
+    _PROMPT_TEMPLATE_CACHE[filename] = (signature, content)
+    return content
+
+
 def build_system_prompt() -> str:
     """
     构建纯人格系统提示词（仅 conversation_style_prompt）
@@ -751,6 +842,58 @@ def build_system_prompt() -> str:
     return get_prompt("conversation_style_prompt", ai_name=config.system.ai_name)
 
 
+def build_stable_system_prompt(include_skills: bool = True, include_tool_instructions: bool = False) -> str:
+    """
+    构建 stable 组装模式下的系统提示词：人格 + 技能列表 + 工具调用指令
+
+    这些内容在会话内基本不变，放在 messages[0] 使其成为可缓存前缀的一部分；
+    压缩摘要由 context_compressor 追加在其后，时间/RAG/搜索等易变内容
+    仍由 build_context_supplement(stable_layout=True) 追加在末尾。
+
+    Args:
+        include_skills: 是否包含技能列表（主动选择技能时为 False）
+        include_tool_instructions: 是否注入工具调用指令（原生 function calling 模式下为 False）
+
+    Returns:
+        稳定的系统提示词
+    """
+    parts = [build_system_prompt()]
+    if include_skills:
+        parts.append(_build_skills_section())
+    if include_tool_instructions:
+        parts.append(_build_tool_instructions())
+    return "".join(parts)
+
+
+def _build_skills_section() -> str:
+    """技能元数据列表（无技能时为空）"""
+    try:
+        from system.skill_manager import get_skills_prompt
+
+        skills_prompt = get_skills_prompt()
+        if skills_prompt:
+            return "\n\n" + skills_prompt
+    except ImportError:
+        pass
+    return ""
+
+
+def _build_tool_instructions() -> str:
+    """工具调用指令（agentic_tool_prompt.txt 渲染可用 MCP 服务列表）"""
+    raw_template = load_prompt_template("agentic_tool_prompt.txt")
+
+    available_mcp_tools = ""
+    try:
+        from mcpserver.mcp_registry import auto_register_mcp
+        auto_register_mcp()
+        from mcpserver.mcp_manager import get_mcp_manager
+        available_mcp_tools = get_mcp_manager().format_available_services() or "（暂无MCP服务注册）"
+    except Exception:
+        available_mcp_tools = "（MCP服务未启动）"
+
+    return "\n\n" + raw_template.replace("{available_mcp_tools}", available_mcp_tools)
+
+
 def build_context_supplement(
     include_skills: bool = True,
     include_tool_instructions: bool = False,
@@ -758,6 +901,7 @@ def build_context_supplement(
     rag_section: str = "",
     route_result=None,
     search_section: str = "",
+    stable_layout: bool = False,
 ) -> str:
     """
     构建附加知识内容（追加在 messages 末尾的独立 system 消息）
@@ -776,6 +920,7 @@ def build_context_supplement(
         rag_section: RAG 记忆召回内容（由 api_server 传入）
         route_result: IntentRouter 路由结果（已废弃，保留参数签名向后兼容）
         search_section: 前置搜索结果内容（由 api_server 传入）
+        stable_layout: stable 组装模式，技能列表与工具指令已由 build_stable_system_prompt() 前置，此处不再注入
 
     Returns:
         渲染后的附加知识内容
@@ -791,33 +936,13 @@ def build_context_supplement(
 
     # 技能元数据列表（仅在未主动选择技能时注入）
     skills_section = ""
-    if not skill_name and include_skills:
-        try:
-            from system.skill_manager import get_skills_prompt
-
-            skills_prompt = get_skills_prompt()
-            if skills_prompt:
-                skills_section = "\n\n" + skills_prompt
-        except ImportError:
-            pass
+    if not skill_name and include_skills and not stable_layout:
+        skills_section = _build_skills_section()
 
     # 工具调用指令（include_tool_instructions=False 时跳过，原生 function calling 不需要）
     tool_instructions = ""
-    if include_tool_instructions:
-        _sys_prompts = Path(__file__).parent / "prompts"
-        tool_prompt_file = _sys_prompts / "agentic_tool_prompt.txt"
-        raw_template = tool_prompt_file.read_text(encoding="utf-8") if tool_prompt_file.exists() else ""
-
-        available_mcp_tools = ""
-        try:
-            from mcpserver.mcp_registry import auto_register_mcp
-            auto_register_mcp()
-            from mcpserver.mcp_manager import get_mcp_manager
-            available_mcp_tools = get_mcp_manager().format_available_services() or "（暂无MCP服务注册）"
-        except Exception:
-            available_mcp_tools = "（MCP服务未启动）"
-
-        tool_instructions = "\n\n" + raw_template.replace("{available_mcp_tools}", available_mcp_tools)
+    if include_tool_instructions and not stable_layout:
+        tool_instructions = _build_tool_instructions()
 
     # 激活技能指令
     skill_active_section = ""
@@ -836,10 +961,8 @@ def build_context_supplement(
         except ImportError:
             pass
 
-    # 加载 tool_dispatch_prompt.txt 模板并替换占位符（始终从 system/prompts/ 加载）
-    _sys_prompts = Path(__file__).parent / "prompts"
-    _dispatch_file = _sys_prompts / "tool_dispatch_prompt.txt"
-    raw_template = _dispatch_file.read_text(encoding="utf-8") if _dispatch_file.exists() else ""
+    # 加载 tool_dispatch_prompt.txt 模板并替换占位符（始终从 system/prompts/ 加载，文件未变化时走缓存）
+    raw_template = load_prompt_template("tool_dispatch_prompt.txt")
     result = raw_template.replace("{time_info}", time_info)
     result = result.replace("{skills_section}", skills_section)
     result = result.replace("{tool_instructions}", tool_instructions)
@@ -1,12 +1,17 @@
 """
 服务健康检查和连通性诊断系统
 检查所有服务的端口、API连接、依赖等
+
+所有探测并发执行并受统一截止时间约束；每个探测结果按各自 TTL 缓存，
+后台刷新任务保持缓存新鲜，/health 类端点与启动检查可直接读取缓存。
 """
 
 import asyncio
 import socket
 import logging
-from typing import Dict, Any, List, Optional
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 
@@ -31,10 +36,45 @@ class HealthCheckResult:
     checks: List[Dict[str, Any]] = field(default_factory=list)
     latency_ms: Optional[float] = None
 
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可序列化格式"""
+        return {
+            "status": self.status.value,
+            "message": self.message,
+            "checks": self.checks,
+            "details": self.details,
+            "latency_ms": self.latency_ms,
+        }
+
+
+@dataclass
+class _ProbeEntry:
+    """缓存的探测结果"""
+    result: HealthCheckResult
+    checked_at: float       # time.monotonic()
+    duration_ms: float
+
 
 class HealthChecker:
     """健康检查器"""
 
+    # check_all 的统一截止时间（秒），超时的探测继续在后台完成并写入缓存
+    DEFAULT_DEADLINE = 6.0
+    # 各探测结果的缓存有效期（秒）
+    PROBE_TTLS: Dict[str, float] = {
+        "api_server": 30.0,
+        "agent_server": 30.0,
+        "mcp_server": 30.0,
+        "screen_vision_mcp": 60.0,
+        "proactive_vision": 60.0,
+        "websocket": 30.0,
+    }
+    DEFAULT_TTL = 30.0
+    # 后台刷新间隔（秒），需小于 TTL 才能让读取始终命中缓存
+    REFRESH_INTERVAL = 15.0
+    # 每个探测保留的历史样本数
+    HISTORY_SIZE = 120
+
     def __init__(self):
         from system.config import get_server_port, get_config
 
@@ -48,32 +88,179 @@ class HealthChecker:
         cfg = get_config()
         self.api_enabled = bool(getattr(cfg.api_server, "enabled", True) and getattr(cfg.api_server, "auto_start", True))
 
-    async def check_all(self) -> Dict[str, HealthCheckResult]:
-        """检查所有服务"""
-        results = {}
-
-        # 并发检查所有服务
-        tasks = {
-            "api_server": self.check_api_server(),
-            "agent_server": self.check_agent_server(),
-            "mcp_server": self.check_mcp_server(),
-            "screen_vision_mcp": self.check_screen_vision_mcp(),
-            "proactive_vision": self.check_proactive_vision(),
-            "websocket": self.check_websocket(),
+        self._cache: Dict[str, _ProbeEntry] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._history: Dict[str, Deque[Tuple[float, float, str]]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _probes(self) -> Dict[str, Callable[[], Awaitable[HealthCheckResult]]]:
+        return {
+            "api_server": self.check_api_server,
+            "agent_server": self.check_agent_server,
+            "mcp_server": self.check_mcp_server,
+            "screen_vision_mcp": self.check_screen_vision_mcp,
+            "proactive_vision": self.check_proactive_vision,
+            "websocket": self.check_websocket,
         }
 
-        for service_name, task in tasks.items():
-            try:
-                results[service_name] = await task
-            except Exception as e:
-                logger.error(f"[HealthCheck] 检查 {service_name} 失败: {e}")
+    async def check_all(self, deadline: Optional[float] = None, use_cache: bool = True) -> Dict[str, HealthCheckResult]:
+        """
+        并发检查所有服务
+
+        Args:
+            deadline: 统一截止时间（秒），到期仍未完成的探测记为 UNKNOWN，
+                      但会继续在后台运行并在完成后写入缓存
+            use_cache: 是否直接使用未过期的缓存结果
+        """
+        deadline = self.DEFAULT_DEADLINE if deadline is None else deadline
+        probes = self._probes()
+        results: Dict[str, HealthCheckResult] = {}
+        pending: Dict[str, asyncio.Task] = {}
+
+        for service_name, probe in probes.items():
+            entry = self._cache.get(service_name)
+            if use_cache and entry is not None and self._is_fresh(service_name, entry):
+                results[service_name] = entry.result
+            else:
+                pending[service_name] = self._start_probe(service_name, probe)
+
+        if pending:
+            done, _ = await asyncio.wait(pending.values(), timeout=deadline)
+            for service_name, task in pending.items():
+                if task in done:
+                    results[service_name] = task.result()
+                    continue
+                last = self._cache.get(service_name)
                 results[service_name] = HealthCheckResult(
                     service_name=service_name,
                     status=ServiceStatus.UNKNOWN,
-                    message=f"检查失败: {e}",
+                    message=f"检查超时（{deadline:g}s 内未完成）",
+                    details={"last_status": last.result.status.value} if last else {},
                 )
 
-        return results
+        return {service_name: results[service_name] for service_name in probes}
+
+    async def readiness(self, budget: float = 0.05) -> Dict[str, Any]:
+        """
+        按延迟预算返回就绪状态
+
+        直接读取缓存；缺失或过期的探测在后台刷新，最多等待 budget 秒。
+        """
+        probes = self._probes()
+        stale = [
+            self._start_probe(service_name, probe)
+            for service_name, probe in probes.items()
+            if service_name not in self._cache or not self._is_fresh(service_name, self._cache[service_name])
+        ]
+        if stale and budget > 0:
+            await asyncio.wait(stale, timeout=budget)
+
+        now = time.monotonic()
+        results: Dict[str, HealthCheckResult] = {}
+        services: Dict[str, Any] = {}
+        for service_name in probes:
+            entry = self._cache.get(service_name)
+            if entry is None:
+                results[service_name] = HealthCheckResult(
+                    service_name=service_name,
+                    status=ServiceStatus.UNKNOWN,
+                    message="尚未完成首次检查",
+                )
+                services[service_name] = {"status": ServiceStatus.UNKNOWN.value, "message": "尚未完成首次检查"}
+                continue
+            results[service_name] = entry.result
+            services[service_name] = {
+                "status": entry.result.status.value,
+                "message": entry.result.message,
+                "age_s": round(now - entry.checked_at, 3),
+                "stale": not self._is_fresh(service_name, entry),
+                "duration_ms": entry.duration_ms,
+            }
+
+        summary = self.get_summary(results)
+        return {
+            "ready": summary["unhealthy"] == 0 and summary["unknown"] == 0,
+            "summary": summary,
+            "services": services,
+        }
+
+    def _is_fresh(self, service_name: str, entry: _ProbeEntry) -> bool:
+        ttl = self.PROBE_TTLS.get(service_name, self.DEFAULT_TTL)
+        return time.monotonic() - entry.checked_at < ttl
+
+    def _start_probe(self, service_name: str, probe: Callable[[], Awaitable[HealthCheckResult]]) -> asyncio.Task:
+        """启动探测；同一服务已有探测在进行时复用该任务"""
+        task = self._inflight.get(service_name)
+        if task is not None and not task.done():
+            return task
+        task = asyncio.create_task(self._run_probe(service_name, probe))
+        self._inflight[service_name] = task
+        return task
+
+    async def _run_probe(self, service_name: str, probe: Callable[[], Awaitable[HealthCheckResult]]) -> HealthCheckResult:
+        start = time.perf_counter()
+        try:
+            result = await probe()
+        except Exception as e:
+            logger.error(f"[HealthCheck] 检查 {service_name} 失败: {e}")
+            result = HealthCheckResult(
+                service_name=service_name,
+                status=ServiceStatus.UNKNOWN,
+                message=f"检查失败: {e}",
+            )
+        duration_ms = round((time.perf_counter() - start) * 1000, 2)
+
+        self._cache[service_name] = _ProbeEntry(result=result, checked_at=time.monotonic(), duration_ms=duration_ms)
+        history = self._history.setdefault(service_name, deque(maxlen=self.HISTORY_SIZE))
+        history.append((time.time(), duration_ms, result.status.value))
+        self._inflight.pop(service_name, None)
+        return result
+
+    def get_latency_history(self) -> Dict[str, Any]:
+        """各探测的耗时历史与分位数"""
+        history: Dict[str, Any] = {}
+        for service_name, samples in self._history.items():
+            durations = sorted(sample[1] for sample in samples)
+            if not durations:
+                continue
+            history[service_name] = {
+                "count": len(durations),
+                "p50_ms": durations[len(durations) // 2],
+                "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+                "max_ms": durations[-1],
+                "samples": [
+                    {"timestamp": ts, "duration_ms": duration, "status": status}
+                    for ts, duration, status in samples
+                ],
+            }
+        return history
+
+    def start_background_refresh(self, interval: Optional[float] = None) -> None:
+        """在当前事件循环启动后台刷新任务（重复调用无副作用）"""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._refresh_loop(interval or self.REFRESH_INTERVAL))
+
+    async def stop_background_refresh(self) -> None:
+        """停止后台刷新任务"""
+        task, self._refresh_task = self._refresh_task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.check_all(use_cache=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[HealthCheck] 后台刷新失败: {e}")
+            await asyncio.sleep(interval)
 
     async def check_port(self, host: str, port: int, timeout: float = 2.0) -> bool:
         """检查端口是否可连接"""
@@ -169,16 +356,16 @@ class HealthChecker:
                 checks=checks,
             )
 
-        # 2. 检查健康端点（假设有/health）
-        health_check = await self.check_http_endpoint(f"http://127.0.0.1:{port}/health")
+        # 2. 检查健康端点（假设有/health） 3. 检查WebSocket统计端点（并发）
+        health_check, ws_stats_check = await asyncio.gather(
+            self.check_http_endpoint(f"http://127.0.0.1:{port}/health"),
+            self.check_http_endpoint(f"http://127.0.0.1:{port}/ws/stats"),
+        )
         checks.append({
             "name": "health_endpoint",
             "passed": health_check.get("success") and health_check.get("ok"),
             "details": health_check,
         })
-
-        # 3. 检查WebSocket统计端点
-        ws_stats_check = await self.check_http_endpoint(f"http://127.0.0.1:{port}/ws/stats")
         checks.append({
             "name": "websocket_stats",
             "passed": ws_stats_check.get("success") and ws_stats_check.get("ok"),
@@ -279,16 +466,16 @@ class HealthChecker:
                 checks=checks,
             )
 
-        # 2. 检查服务列表端点
-        services_check = await self.check_http_endpoint(f"http://127.0.0.1:{port}/services")
+        # 2. 检查服务列表端点 3. 检查状态端点（并发）
+        services_check, status_check = await asyncio.gather(
+            self.check_http_endpoint(f"http://127.0.0.1:{port}/services"),
+            self.check_http_endpoint(f"http://127.0.0.1:{port}/status"),
+        )
         checks.append({
             "name": "services_endpoint",
             "passed": services_check.get("success") and services_check.get("ok"),
             "details": services_check,
         })
-
-        # 3. 检查状态端点
-        status_check = await self.check_http_endpoint(f"http://127.0.0.1:{port}/status")
         checks.append({
             "name": "status_endpoint",
             "passed": status_check.get("success") and status_check.get("ok"),
@@ -386,16 +573,18 @@ class HealthChecker:
         agent_port = self.ports["agent_server"]
         checks = []
 
-        # 1. 检查配置端点
-        config_check = await self.check_http_endpoint(f"http://127.0.0.1:{agent_port}/proactive_vision/config")
+        # 1. 检查配置端点 2. 检查状态端点 3. 检查metrics端点（并发）
+        config_check, status_check, metrics_check = await asyncio.gather(
+            self.check_http_endpoint(f"http://127.0.0.1:{agent_port}/proactive_vision/config"),
+            self.check_http_endpoint(f"http://127.0.0.1:{agent_port}/proactive_vision/status"),
+            self.check_http_endpoint(f"http://127.0.0.1:{agent_port}/proactive_vision/metrics"),
+        )
         checks.append({
             "name": "config_endpoint",
             "passed": config_check.get("success") and config_check.get("ok"),
             "details": config_check,
         })
 
-        # 2. 检查状态端点
-        status_check = await self.check_http_endpoint(f"http://127.0.0.1:{agent_port}/proactive_vision/status")
         is_enabled = False
         is_running = False
 
@@ -418,8 +607,6 @@ class HealthChecker:
             "details": {"enabled": is_enabled, "running": is_running},
         })
 
-        # 3. 检查metrics端点
-        metrics_check = await self.check_http_endpoint(f"http://127.0.0.1:{agent_port}/proactive_vision/metrics")
         checks.append({
             "name": "metrics_endpoint",
             "passed": metrics_check.get("success") and metrics_check.get("ok"),
@@ -481,16 +668,17 @@ class HealthChecker:
                 checks=checks,
             )
 
-        # 1. 检查WebSocket统计端点
-        stats_check = await self.check_http_endpoint(f"http://127.0.0.1:{api_port}/ws/stats")
+        # 1. 检查WebSocket统计端点 2. 检查WebSocket广播端点（并发）
+        stats_check, broadcast_check = await asyncio.gather(
+            self.check_http_endpoint(f"http://127.0.0.1:{api_port}/ws/stats"),
+            self.check_http_endpoint(f"http://127.0.0.1:{api_port}/ws/broadcast"),
+        )
         checks.append({
             "name": "ws_stats_endpoint",
             "passed": stats_check.get("success") and stats_check.get("ok"),
             "details": stats_check,
         })
 
-        # 2. 检查WebSocket广播端点
-        broadcast_check = await self.check_http_endpoint(f"http://127.0.0.1:{api_port}/ws/broadcast")
         # 注意：POST端点用GET会返回405，但说明端点存在
         endpoint_exists = broadcast_check.get("success") or broadcast_check.get("status_code") == 405
         checks.append({
@@ -563,8 +751,10 @@ async def perform_startup_health_check():
     logger.info("[HealthCheck] 开始启动时健康检查...")
 
     checker = get_health_checker()
-    results = await checker.check_all()
+    results = await checker.check_all(use_cache=False)
     summary = checker.get_summary(results)
+    # 之后的 /health 类请求直接读取由后台任务维持的缓存
+    checker.start_background_refresh()
 
     logger.info(f"[HealthCheck] 健康检查完成: {summary['overall_status']}")
     logger.info(f"[HealthCheck] 健康度: {summary['overall_health_percent']}%")
@@ -2,5 +2,7 @@
 
 from .json_parser import parse_non_standard_json, validate_tool_call
 from .intent_analyzer import IntentAnalyzer
+from .keyword_automaton import KeywordAutomaton
+from .name_index import NameIndex, normalize_name
 
-__all__ = ["parse_non_standard_json", "validate_tool_call", "IntentAnalyzer"]
+__all__ = ["parse_non_standard_json", "validate_tool_call", "IntentAnalyzer", "KeywordAutomaton", "NameIndex", "normalize_name"]
@@ -0,0 +1,81 @@
+"""关键词多模式匹配：Aho-Corasick 自动机，一次扫描找出文本中出现的全部关键词"""
+
+from collections import deque
+from typing import Dict, Generic, Hashable, Iterable, List, Set, Tuple, TypeVar
+
+T = TypeVar("T", bound=Hashable)
+
+
+class KeywordAutomaton(Generic[T]):
+    """
+    Aho-Corasick 自动机
+
+    每个关键词绑定一个载荷（如 (类别, 关键词)），search() 返回命中的载荷集合。
+    case_sensitive=False 时关键词与文本统一转小写。
+    """
+
+    def __init__(self, case_sensitive: bool = False):
+        self.case_sensitive = case_sensitive
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[T]] = [set()]
+        self._built = True
+
+    def add(self, keyword: str, payload: T) -> None:
+        """登记关键词；同一关键词可绑定多个载荷"""
+        if not keyword:
+            return
+        if not self.case_sensitive:
+            keyword = keyword.lower()
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = nxt
+        self._output[state].add(payload)
+        self._built = False
+
+    def add_all(self, items: Iterable[Tuple[str, T]]) -> "KeywordAutomaton[T]":
+        for keyword, payload in items:
+            self.add(keyword, payload)
+        return self
+
+    def build(self) -> "KeywordAutomaton[T]":
+        """广度优先计算失败指针，并把失败链上的输出合并到当前状态"""
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._output[nxt] |= self._output[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def search(self, text: str) -> Set[T]:
+        """返回文本中出现的所有关键词的载荷"""
+        if not self._built:
+            self.build()
+        if not self.case_sensitive:
+            text = text.lower()
+        found: Set[T] = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found |= output[state]
+        return found
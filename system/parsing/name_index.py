@@ -0,0 +1,214 @@
+"""实体名称索引：精确 / 别名 / 子串 / 前缀（含拼音、首字母）/ n-gram 模糊查找"""
+
+from __future__ import annotations
+
+import bisect
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_STRIP_PATTERN = re.compile(r"[\s·・\-_'\"“”‘’.。,，]+")
+_pinyin_func = None  # None：尚未导入；False：未安装 pypinyin
+
+# resolve() 自动采用模糊结果的最低 Dice 相似度；低于它的命中只能经 suggest() 作为候选
+RESOLVE_FUZZY_THRESHOLD = 0.75
+
+
+def normalize_name(text: str) -> str:
+    """名称规范化：小写并去掉空白与常见分隔符"""
+    return _STRIP_PATTERN.sub("", (text or "").lower())
+
+
+def _lazy_pinyin():
+    """首次用到时再导入 pypinyin（词典加载较慢），未安装时返回 None"""
+    global _pinyin_func
+    if _pinyin_func is None:
+        try:
+            from pypinyin import lazy_pinyin
+        except ImportError:
+            lazy_pinyin = False
+        _pinyin_func = lazy_pinyin
+    return _pinyin_func or None
+
+
+def _pinyin_keys(text: str) -> List[str]:
+    """全拼与首字母（未安装 pypinyin 时为空）"""
+    lazy_pinyin = _lazy_pinyin() if text else None
+    if lazy_pinyin is None:
+        return []
+    syllables = [s for s in lazy_pinyin(text) if s]
+    if not syllables:
+        return []
+    full = normalize_name("".join(syllables))
+    initials = normalize_name("".join(s[0] for s in syllables))
+    return [key for key in (full, initials) if key]
+
+
+def _ngrams(text: str) -> set[str]:
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class NameIndex:
+    """
+    实体名称索引
+
+    - 精确：规范化后的名字、英文代号、ID 和别名
+    - 子串：单字/二元组倒排表取候选，再校验子串，结果与逐个扫描一致
+    - 前缀：排序键表 + 二分，键包含规范化名、拼音全拼与首字母
+    - 模糊：二元组 Dice 相似度
+    """
+
+    def __init__(self):
+        self._order: Dict[str, int] = {}                     # entity_id -> 插入顺序
+        self._names: Dict[str, Tuple[str, ...]] = {}         # entity_id -> 小写原名
+        self._exact: Dict[str, str] = {}                     # 规范化名 -> entity_id
+        self._postings: Dict[str, set[str]] = {}             # 单字/二元组 -> entity_id 集合
+        self._prefix_keys: List[Tuple[str, int, str]] = []  # (键, 顺序, entity_id)
+        self._fuzzy_grams: Dict[str, set[str]] = {}          # entity_id -> 规范化名二元组
+        self._known_names: List[str] = []
+
+    def add(self, entity_id: str, names: Iterable[str], aliases: Iterable[str] = ()) -> None:
+        """登记实体；names 参与子串匹配，aliases 只参与精确与前缀匹配"""
+        if entity_id not in self._order:
+            self._order[entity_id] = len(self._order)
+        order = self._order[entity_id]
+
+        lowered = tuple(n.lower() for n in names if n)
+        self._names[entity_id] = self._names.get(entity_id, ()) + lowered
+        for name in lowered:
+            for ch in set(name):
+                self._postings.setdefault(ch, set()).add(entity_id)
+            for gram in _ngrams(name):
+                self._postings.setdefault(gram, set()).add(entity_id)
+
+        keys: set[str] = set()
+        for raw in (entity_id, *lowered, *aliases):
+            norm = normalize_name(raw)
+            if not norm:
+                continue
+            self._exact.setdefault(norm, entity_id)
+            keys.add(norm)
+        for raw in (*lowered, *aliases):
+            keys.update(_pinyin_keys(raw))
+        self._prefix_keys.extend((key, order, entity_id) for key in keys)
+
+        grams = self._fuzzy_grams.setdefault(entity_id, set())
+        for name in lowered:
+            grams.update(_ngrams(normalize_name(name)))
+
+    def add_alias(self, alias: str, entity_id: str) -> None:
+        """登记额外别名（如 operator_mapping 中的名字）"""
+        norm = normalize_name(alias)
+        if not norm:
+            return
+        self._exact[norm] = entity_id
+        order = self._order.get(entity_id, len(self._order))
+        self._prefix_keys.append((norm, order, entity_id))
+        self._prefix_keys.extend((key, order, entity_id) for key in _pinyin_keys(alias))
+
+    def finalize(self, known_names: Iterable[str] = ()) -> "NameIndex":
+        """排序前缀键并预计算按长度降序的已知名字列表"""
+        self._prefix_keys.sort()
+        self._known_names = sorted(set(known_names), key=len, reverse=True)
+        return self
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    @property
+    def known_names(self) -> List[str]:
+        """按长度降序的已知名字（用于在文本中优先匹配长名）"""
+        return self._known_names
+
+    def lookup(self, query: str) -> Optional[str]:
+        """精确匹配（大小写与分隔符不敏感）"""
+        return self._exact.get(normalize_name(query))
+
+    def match_key(self, query: str) -> Optional[str]:
+        """索引键完全相等的实体（含拼音全拼与首字母），不做前缀扩展"""
+        key = normalize_name(query)
+        if not key:
+            return None
+        start = bisect.bisect_left(self._prefix_keys, (key,))
+        if start < len(self._prefix_keys) and self._prefix_keys[start][0] == key:
+            return self._prefix_keys[start][2]
+        return None
+
+    def search_substring(self, keyword: str) -> List[str]:
+        """返回名字中包含 keyword 的实体，按登记顺序"""
+        keyword = (keyword or "").lower()
+        if not keyword:
+            return sorted(self._order, key=self._order.__getitem__)
+
+        candidates: Optional[set[str]] = None
+        for gram in (_ngrams(keyword) if len(keyword) >= 2 else {keyword}):
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            candidates = set(posting) if candidates is None else candidates & posting
+            if not candidates:
+                return []
+
+        matched = [
+            entity_id for entity_id in candidates or ()
+            if any(keyword in name for name in self._names.get(entity_id, ()))
+        ]
+        matched.sort(key=self._order.__getitem__)
+        return matched
+
+    def search_prefix(self, prefix: str, limit: int = 20) -> List[str]:
+        """前缀匹配（规范化名、拼音全拼、拼音首字母）"""
+        prefix = normalize_name(prefix)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self._prefix_keys, (prefix,))
+        hits: Dict[str, Tuple[int, int]] = {}
+        for key, order, entity_id in self._prefix_keys[start:]:
+            if not key.startswith(prefix):
+                break
+            rank = (len(key) - len(prefix), order)
+            if entity_id not in hits or rank < hits[entity_id]:
+                hits[entity_id] = rank
+        return sorted(hits, key=hits.__getitem__)[:limit]
+
+    def search_fuzzy(self, query: str, limit: int = 5, threshold: float = 0.5) -> List[Tuple[str, float]]:
+        """二元组 Dice 相似度模糊匹配"""
+        query_grams = _ngrams(normalize_name(query))
+        if not query_grams:
+            return []
+
+        candidates: set[str] = set()
+        for gram in query_grams:
+            candidates.update(self._postings.get(gram, ()))
+
+        scored: List[Tuple[str, float]] = []
+        for entity_id in candidates:
+            grams = self._fuzzy_grams.get(entity_id)
+            if not grams:
+                continue
+            score = 2 * len(query_grams & grams) / (len(query_grams) + len(grams))
+            if score >= threshold:
+                scored.append((entity_id, score))
+        scored.sort(key=lambda item: (-item[1], self._order[item[0]]))
+        return scored[:limit]
+
+    def resolve(self, query: str) -> Optional[str]:
+        """按 精确 -> 子串 -> 前缀/拼音 -> 高分模糊 的顺序解析单个实体"""
+        if not query:
+            return None
+        entity_id = self.lookup(query)
+        if entity_id:
+            return entity_id
+        for search in (self.search_substring, self.search_prefix):
+            hits = search(query)
+            if hits:
+                return hits[0]
+        fuzzy = self.search_fuzzy(query, limit=1, threshold=RESOLVE_FUZZY_THRESHOLD)
+        return fuzzy[0][0] if fuzzy else None
+
+    def suggest(self, query: str, limit: int = 5) -> List[str]:
+        """候选实体：前缀/拼音命中在前，其后为模糊命中，供调用方交给用户确认"""
+        hits = self.search_prefix(query, limit=limit)
+        hits += [entity_id for entity_id, _ in self.search_fuzzy(query, limit=limit) if entity_id not in hits]
+        return hits[:limit]
@@ -0,0 +1,348 @@
+"""
+服务间传输层
+
+API / MCP / Agent 服务器默认作为同一进程内的线程运行（main.py ServiceManager），
+各自拥有独立的 uvicorn 事件循环。服务在 lifespan 启动时把自身事件循环和内部路由的
+处理协程注册到这里；调用目标服务时：
+
+  - 目标已在本进程注册 → 直接执行处理协程（同一事件循环直接 await，
+    跨事件循环用 run_coroutine_threadsafe 投递到目标循环），
+    省去 JSON 序列化、TCP 往返与 uvicorn 请求解析
+  - 目标未注册（分离部署 / 服务未启动 / 路由未注册）→ 回退到 HTTP
+
+ServiceResponse 提供与 httpx.Response 相同的 status_code / json() / text，
+调用方无需关心实际走的是哪种传输。
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import weakref
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from starlette.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+# 路由处理协程：接收请求体（GET 为空字典），返回与 HTTP 端点相同的结果
+RouteHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+RouteKey = Tuple[str, str]  # (方法, 路径)
+
+_STREAM_END = object()
+
+
+class ServiceTransportError(Exception):
+    """流式调用返回非 200 状态"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"HTTP {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class ServiceResponse:
+    """与 httpx.Response 常用接口一致的响应"""
+
+    __slots__ = ("status_code", "transport", "_data", "_text")
+
+    def __init__(self, status_code: int, data: Any = None, text: Optional[str] = None,
+                 transport: str = "inprocess"):
+        self.status_code = status_code
+        self.transport = transport
+        self._data = data
+        self._text = text
+
+    def json(self) -> Any:
+        if self._data is None and self._text:
+            self._data = json.loads(self._text)
+        return self._data
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            if self._data is None:
+                self._text = ""
+            elif isinstance(self._data, str):
+                self._text = self._data
+            else:
+                self._text = json.dumps(self._data, ensure_ascii=False)
+        return self._text
+
+    @property
+    def is_success(self) -> bool:
+        return 200 <= self.status_code < 300
+
+
+@dataclass
+class _ServiceEndpoint:
+    loop: asyncio.AbstractEventLoop
+    routes: Dict[RouteKey, RouteHandler] = field(default_factory=dict)
+
+    @property
+    def alive(self) -> bool:
+        return not self.loop.is_closed() and self.loop.is_running()
+
+
+def _encode_result(result: Any) -> ServiceResponse:
+    """把处理协程的返回值转换为响应（与 FastAPI 的序列化规则一致）"""
+    from fastapi.encoders import jsonable_encoder
+    from starlette.responses import Response
+
+    if isinstance(result, Response):
+        body = result.body.decode(result.charset or "utf-8") if result.body else ""
+        return ServiceResponse(result.status_code, text=body)
+    return ServiceResponse(200, data=jsonable_encoder(result))
+
+
+def _encode_error(error: Exception) -> ServiceResponse:
+    """把处理协程抛出的异常转换为与 HTTP 端点一致的错误响应"""
+    from pydantic import ValidationError
+    from starlette.exceptions import HTTPException
+
+    if isinstance(error, HTTPException):
+        return ServiceResponse(error.status_code, data={"detail": error.detail})
+    if isinstance(error, ValidationError):
+        return ServiceResponse(422, data={"detail": json.loads(error.json())})
+    logger.error(f"[ServiceTransport] 进程内调用异常: {type(error).__name__}: {error}")
+    return ServiceResponse(500, data={"detail": str(error)})
+
+
+async def _next_chunk(iterator) -> Any:
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return _STREAM_END
+
+
+class InProcessTransport:
+    """进程内传输：在目标服务的事件循环上直接执行处理协程"""
+
+    name = "inprocess"
+
+    def __init__(self):
+        self._services: Dict[str, _ServiceEndpoint] = {}
+        self._lock = threading.Lock()
+
+    def register(self, service: str, routes: Dict[RouteKey, RouteHandler],
+                 loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """注册服务的事件循环与路由（在服务自身的事件循环中调用，通常位于 lifespan）"""
+        endpoint = _ServiceEndpoint(
+            loop=loop or asyncio.get_running_loop(),
+            routes={(method.upper(), path): handler for (method, path), handler in routes.items()},
+        )
+        with self._lock:
+            self._services[service] = endpoint
+        logger.info(f"[ServiceTransport] {service} 已注册进程内路由 {len(endpoint.routes)} 个")
+
+    def unregister(self, service: str) -> None:
+        with self._lock:
+            self._services.pop(service, None)
+
+    def resolve(self, service: str, method: str, path: str) -> Optional[Tuple[asyncio.AbstractEventLoop, RouteHandler]]:
+        endpoint = self._services.get(service)
+        if endpoint is None or not endpoint.alive:
+            return None
+        handler = endpoint.routes.get((method.upper(), path))
+        return (endpoint.loop, handler) if handler else None
+
+    def services(self) -> Dict[str, int]:
+        return {name: len(endpoint.routes) for name, endpoint in self._services.items() if endpoint.alive}
+
+    @staticmethod
+    async def _run_on(loop: asyncio.AbstractEventLoop, coro: Awaitable[Any], timeout: Optional[float]) -> Any:
+        """在目标事件循环上执行协程；同一循环直接 await"""
+        if asyncio.get_running_loop() is loop:
+            return await asyncio.wait_for(coro, timeout) if timeout else await coro
+        # wrap_future 的取消会传递给目标循环中的任务
+        future = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+        return await asyncio.wait_for(future, timeout) if timeout else await future
+
+    async def request(self, loop: asyncio.AbstractEventLoop, handler: RouteHandler,
+                      payload: Dict[str, Any], timeout: Optional[float]) -> ServiceResponse:
+        try:
+            result = await self._run_on(loop, handler(payload), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            return _encode_error(e)
+        if isinstance(result, StreamingResponse):
+            # 非流式调用拿到流式响应时读完整个响应体
+            chunks = [chunk async for chunk in self._iterate(loop, result, timeout)]
+            return ServiceResponse(result.status_code, text="".join(chunks))
+        return _encode_result(result)
+
+    async def stream(self, loop: asyncio.AbstractEventLoop, handler: RouteHandler,
+                     payload: Dict[str, Any], timeout: Optional[float]) -> AsyncIterator[str]:
+        try:
+            result = await self._run_on(loop, handler(payload), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            error = _encode_error(e)
+            raise ServiceTransportError(error.status_code, error.text)
+        if isinstance(result, StreamingResponse) and result.status_code == 200:
+            async for chunk in self._iterate(loop, result, timeout):
+                yield chunk
+            return
+        response = _encode_result(result)
+        if response.status_code != 200:
+            raise ServiceTransportError(response.status_code, response.text)
+        if response.text:
+            yield response.text
+
+    async def _iterate(self, loop: asyncio.AbstractEventLoop, response, timeout: Optional[float]) -> AsyncIterator[str]:
+        """逐块读取流式响应；生成器在其所属的事件循环上推进"""
+        iterator = response.body_iterator.__aiter__()
+        try:
+            while True:
+                chunk = await self._run_on(loop, _next_chunk(iterator), timeout)
+                if chunk is _STREAM_END:
+                    break
+                yield chunk.decode("utf-8") if isinstance(chunk, (bytes, bytearray)) else chunk
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None and not loop.is_closed():
+                try:
+                    await self._run_on(loop, aclose(), timeout)
+                except Exception:
+                    pass
+
+
+class HttpTransport:
+    """HTTP 传输：分离部署或目标未在本进程注册时使用"""
+
+    name = "http"
+
+    def __init__(self, host: str = "127.0.0.1", ports: Optional[Dict[str, int]] = None):
+        self.host = host
+        self.ports = dict(ports or {})  # 覆盖 config 中的端口（测试 / 分离部署）
+        # httpx 客户端绑定创建它的事件循环，按循环各自持有一个
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+    def url(self, service: str, path: str) -> str:
+        port = self.ports.get(service)
+        if port is None:
+            from system.config import get_server_port
+            port = get_server_port(service)
+        return f"http://{self.host}:{port}{path}"
+
+    def _client(self):
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            # 本机请求不走系统代理
+            client = httpx.AsyncClient(timeout=httpx.Timeout(timeout=30.0, connect=5.0), trust_env=False)
+            self._clients[loop] = client
+        return client
+
+    async def request(self, service: str, method: str, path: str, payload: Optional[Dict[str, Any]],
+                      timeout: Optional[float]) -> ServiceResponse:
+        kwargs: Dict[str, Any] = {"json": payload} if method.upper() != "GET" else {}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        resp = await self._client().request(method, self.url(service, path), **kwargs)
+        return ServiceResponse(resp.status_code, text=resp.text, transport=self.name)
+
+    async def stream(self, service: str, method: str, path: str, payload: Optional[Dict[str, Any]],
+                     timeout: Optional[float]) -> AsyncIterator[str]:
+        kwargs: Dict[str, Any] = {"json": payload} if method.upper() != "GET" else {}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        async with self._client().stream(method, self.url(service, path), **kwargs) as resp:
+            if resp.status_code != 200:
+                body = await resp.aread()
+                raise ServiceTransportError(resp.status_code, body.decode("utf-8", "replace"))
+            async for chunk in resp.aiter_text():
+                yield chunk
+
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+class ServiceTransport:
+    """按目标服务选择传输：已在本进程注册走进程内，否则走 HTTP"""
+
+    def __init__(self, prefer_inprocess: bool = True, http: Optional[HttpTransport] = None):
+        self.prefer_inprocess = prefer_inprocess
+        self.inprocess = InProcessTransport()
+        self.http = http or HttpTransport()
+        self._calls: Counter = Counter()
+
+    # ── 注册 ──
+
+    def register(self, service: str, routes: Dict[RouteKey, RouteHandler],
+                 loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self.inprocess.register(service, routes, loop)
+
+    def unregister(self, service: str) -> None:
+        self.inprocess.unregister(service)
+
+    def _resolve(self, service: str, method: str, path: str):
+        if not self.prefer_inprocess:
+            return None
+        return self.inprocess.resolve(service, method, path)
+
+    # ── 调用 ──
+
+    async def request(self, service: str, method: str, path: str, json: Optional[Dict[str, Any]] = None,
+                      timeout: Optional[float] = None) -> ServiceResponse:
+        target = self._resolve(service, method, path)
+        if target is not None:
+            self._calls[(service, self.inprocess.name)] += 1
+            loop, handler = target
+            return await self.inprocess.request(loop, handler, json or {}, timeout)
+        self._calls[(service, self.http.name)] += 1
+        return await self.http.request(service, method, path, json, timeout)
+
+    async def post(self, service: str, path: str, json: Optional[Dict[str, Any]] = None,
+                   timeout: Optional[float] = None) -> ServiceResponse:
+        return await self.request(service, "POST", path, json=json, timeout=timeout)
+
+    async def get(self, service: str, path: str, timeout: Optional[float] = None) -> ServiceResponse:
+        return await self.request(service, "GET", path, timeout=timeout)
+
+    async def stream(self, service: str, method: str, path: str, json: Optional[Dict[str, Any]] = None,
+                     timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """流式调用，逐块返回文本；非 200 响应抛出 ServiceTransportError"""
+        target = self._resolve(service, method, path)
+        if target is not None:
+            self._calls[(service, self.inprocess.name)] += 1
+            loop, handler = target
+            async for chunk in self.inprocess.stream(loop, handler, json or {}, timeout):
+                yield chunk
+            return
+        self._calls[(service, self.http.name)] += 1
+        async for chunk in self.http.stream(service, method, path, json, timeout):
+            yield chunk
+
+    def get_stats(self) -> Dict[str, Any]:
+        calls: Dict[str, Dict[str, int]] = {}
+        for (service, transport), count in self._calls.items():
+            calls.setdefault(service, {})[transport] = count
+        return {
+            "prefer_inprocess": self.prefer_inprocess,
+            "inprocess_services": self.inprocess.services(),
+            "calls": calls,
+        }
+
+
+_transport: Optional[ServiceTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_service_transport() -> ServiceTransport:
+    """获取全局服务传输实例"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = ServiceTransport()
+    return _transport